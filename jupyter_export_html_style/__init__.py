@@ -9,17 +9,24 @@ This package provides:
 - A custom nbconvert preprocessor to handle style metadata
 - A custom HTML exporter with style support
 - A custom WebPDF exporter with style support
+- A screenshot exporter for notebook previews and thumbnails
 - Integration with JupyterLab for enhanced HTML export
 """
 
 __version__ = "0.1.1"
 
-from .exporters import StyledHTMLExporter, StyledSlidesExporter, StyledWebPDFExporter
+from .exporters import (
+    StyledHTMLExporter,
+    StyledScreenshotExporter,
+    StyledSlidesExporter,
+    StyledWebPDFExporter,
+)
 from .preprocessor import StylePreprocessor
 
 __all__ = [
     "StylePreprocessor",
     "StyledHTMLExporter",
+    "StyledScreenshotExporter",
     "StyledSlidesExporter",
     "StyledWebPDFExporter",
     "__version__",
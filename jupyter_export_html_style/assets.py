@@ -0,0 +1,532 @@
+"""
+Offline asset routing for printing exported HTML in a browser.
+
+The HTML templates reference MathJax, require.js and fonts on public CDNs, and
+notebooks reference images next to the notebook file. When a document is
+printed, every request the browser makes is routed through an
+:class:`AssetRouter`: the document itself and local files are served straight
+from disk, CDN assets are served from a local :class:`AssetStore`, and
+everything else is aborted immediately, or passed to the network if asked.
+
+The store is a directory keyed by URL, so different versions of an asset are
+kept side by side. It is populated ahead of time as a build step with
+``python -m jupyter_export_html_style.assets``, or by printing once with
+``remote_assets = "record"``. MathJax loads its configuration, extensions and
+fonts on demand, so populating the store with a MathJax URL stores the whole
+MathJax distribution of that version, from its npm package.
+"""
+
+import argparse
+import hashlib
+import logging
+import mimetypes
+import os
+import pathlib
+import re
+import sys
+import tarfile
+import tempfile
+import urllib.parse
+import urllib.request
+
+from .cache import default_cache_dir
+
+_log = logging.getLogger(__name__)
+
+# Origin the printed document is served from. Hosts under .localhost never
+# resolve to another machine and are treated as secure contexts.
+ASSET_ORIGIN = "http://jupyter-export.localhost"
+
+# Name under which a document held in memory is served from its base directory.
+DOCUMENT_NAME = "__jupyter_export__.html"
+
+# What an AssetRouter does with requests for remote URLs missing from the store.
+REMOTE_ASSET_POLICIES = ("network", "offline", "record")
+
+# Suffix of the files recording the content type of a stored asset.
+_CONTENT_TYPE_SUFFIX = ".content-type"
+
+# Registry the distributions of on-demand loading libraries are downloaded from.
+NPM_REGISTRY = "https://registry.npmjs.org"
+
+# MathJax 2 URLs on a CDN; the rest of the version's distribution is loaded
+# relative to the directory they are in.
+_MATHJAX_URL = re.compile(r"^(?P<base>https?://[^?#]+/mathjax/(?P<version>2\.\d+\.\d+)/)")
+
+# Parts of the MathJax distribution that a browser never loads: the unminified
+# sources, the image fonts of the old HTML-CSS output and the tests.
+_MATHJAX_UNUSED = re.compile(r"^(unpacked|test|docs)/|/png/")
+
+
+def default_asset_store_dir():
+    """Return the directory of the asset store when no path is configured.
+
+    Returns:
+        (str): The ``assets`` directory inside :func:`~.cache.default_cache_dir`.
+    """
+    return os.path.join(default_cache_dir(), "assets")
+
+
+def default_asset_urls():
+    """Return the CDN URLs referenced by the default templates.
+
+    Returns:
+        (list): The require.js and MathJax URLs of nbconvert's HTML exporter.
+    """
+    from nbconvert.exporters import HTMLExporter
+
+    exporter = HTMLExporter()
+    return [exporter.require_js_url, exporter.mathjax_url]
+
+
+class AssetStore:
+    """A directory of remote assets keyed by their URL.
+
+    An asset is stored at ``<path>/<host>/<url path>``; URLs with a query string
+    get a suffix derived from the query, so that e.g. different font CSS
+    requests do not collide. Versioned CDN URLs therefore keep every version
+    of an asset side by side. The content type of an asset is stored next to
+    it and otherwise guessed from its extension, so files copied into the
+    store by hand are served as well.
+
+    Args:
+        path (str or os.PathLike): Directory holding the assets. It is created
+            when the first asset is stored.
+
+    Attributes:
+        path (str): Absolute path of the store directory.
+
+    Examples:
+        >>> store = AssetStore("/opt/render/assets")
+        >>> store.populate(default_asset_urls())
+        >>> store.get("https://cdn.jsdelivr.net/npm/requirejs/require.min.js")
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.fspath(path))
+
+    def path_for(self, url):
+        """Return the file an asset is stored in.
+
+        Args:
+            url (str): The ``http`` or ``https`` URL of the asset.
+
+        Returns:
+            (str or None): The file path, or None if the URL cannot be stored.
+        """
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return None
+        segments = [
+            urllib.parse.unquote(segment) for segment in parts.path.split("/") if segment
+        ]
+        if not segments or parts.path.endswith("/"):
+            segments.append("index")
+        if any(segment in (".", "..") or os.sep in segment for segment in segments):
+            return None
+        if parts.query:
+            digest = hashlib.sha256(parts.query.encode("utf-8")).hexdigest()[:16]
+            segments[-1] = f"{segments[-1]}@{digest}"
+        return os.path.join(self.path, parts.hostname, *segments)
+
+    def __contains__(self, url):
+        return self._stored_path(url) is not None
+
+    def _stored_path(self, url):
+        """Return the stored file of a URL, falling back to the URL without query."""
+        path = self.path_for(url)
+        if path is not None and not os.path.isfile(path) and "?" in url:
+            # Cache busters such as MathJax's "?V=2.7.7" name the same file.
+            path = self.path_for(url.split("?", 1)[0])
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    def get(self, url):
+        """Look up a stored asset.
+
+        A URL with a query string that is not stored is served from the same
+        URL without the query, if that is stored.
+
+        Args:
+            url (str): The URL of the asset.
+
+        Returns:
+            (tuple or None): The file path and content type of the asset, or
+                None if it is not in the store.
+        """
+        path = self._stored_path(url)
+        if path is None:
+            return None
+        try:
+            with open(path + _CONTENT_TYPE_SUFFIX, encoding="utf-8") as f:
+                content_type = f.read().strip()
+        except OSError:
+            content_type = None
+        if not content_type:
+            guessed, _ = mimetypes.guess_type(urllib.parse.urlsplit(url).path)
+            content_type = guessed or "application/octet-stream"
+        return path, content_type
+
+    def put(self, url, body, content_type=None):
+        """Store an asset, replacing any stored version of the same URL.
+
+        The file is written to a temporary name and renamed into place, so
+        concurrent readers never see a partial asset.
+
+        Args:
+            url (str): The URL of the asset.
+            body (bytes): The content of the asset.
+
+        Keyword Parameters:
+            content_type (str or None): The content type to serve the asset
+                with. If None, it is guessed from the URL. Defaults to None.
+
+        Returns:
+            (str or None): The file the asset was stored in, or None if the URL
+                cannot be stored.
+        """
+        path = self.path_for(url)
+        if path is None:
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomically(path, body)
+        if content_type:
+            _write_atomically(path + _CONTENT_TYPE_SUFFIX, content_type.encode("utf-8"))
+        return path
+
+    def fetch(self, url, timeout=30):
+        """Download an asset from the network and store it.
+
+        Args:
+            url (str): The URL of the asset.
+
+        Keyword Parameters:
+            timeout (float): Seconds allowed for the download. Defaults to 30.
+
+        Returns:
+            (str or None): The file the asset was stored in, or None if the URL
+                cannot be stored.
+
+        Raises:
+            urllib.error.URLError: If the download fails.
+        """
+        with urllib.request.urlopen(url, timeout=timeout) as response:  # noqa: S310
+            body = response.read()
+            content_type = response.headers.get("Content-Type")
+        return self.put(url, body, content_type)
+
+    def fetch_package(self, archive_url, base_url, skip=None, timeout=120):
+        """Download an npm package and store its files below a CDN URL.
+
+        Args:
+            archive_url (str): URL of the package's ``.tgz`` archive.
+            base_url (str): URL of the directory the CDN serves the package
+                from, ending with ``/``.
+
+        Keyword Parameters:
+            skip (re.Pattern or None): Files of the package, relative to its
+                root, that are not stored. Defaults to None.
+            timeout (float): Seconds allowed for the download. Defaults to 120.
+
+        Returns:
+            (int): Number of files stored.
+
+        Raises:
+            urllib.error.URLError: If the download fails.
+            tarfile.TarError: If the archive cannot be read.
+        """
+        stored = 0
+        with urllib.request.urlopen(archive_url, timeout=timeout) as response:  # noqa: S310
+            with tarfile.open(fileobj=response, mode="r|gz") as archive:
+                for member in archive:
+                    # npm archives hold the package in a "package/" directory.
+                    name = member.name.split("/", 1)[-1]
+                    if not member.isfile() or (skip is not None and skip.search(name)):
+                        continue
+                    url = base_url + urllib.parse.quote(name)
+                    if self.put(url, archive.extractfile(member).read()) is not None:
+                        stored += 1
+        return stored
+
+    def populate(self, urls, refresh=False, registry=NPM_REGISTRY):
+        """Download the assets that are not stored yet.
+
+        MathJax 2 loads its configuration, extensions and fonts on demand, so
+        for a MathJax URL the whole distribution of its version is stored
+        below the URL's directory as well.
+
+        Args:
+            urls (iterable): URLs of the assets.
+
+        Keyword Parameters:
+            refresh (bool): Download stored assets again. Defaults to False.
+            registry (str): npm registry the MathJax distribution is
+                downloaded from. Defaults to :data:`NPM_REGISTRY`.
+
+        Returns:
+            (list): The URLs that were downloaded, including package archives.
+        """
+        fetched = []
+        for url in urls:
+            if refresh or url not in self:
+                self.fetch(url)
+                fetched.append(url)
+            mathjax = _MATHJAX_URL.match(url)
+            if mathjax and (refresh or mathjax["base"] + "MathJax.js" not in self):
+                version = mathjax["version"]
+                archive_url = f"{registry.rstrip('/')}/mathjax/-/mathjax-{version}.tgz"
+                self.fetch_package(archive_url, mathjax["base"], skip=_MATHJAX_UNUSED)
+                fetched.append(archive_url)
+        return fetched
+
+
+def document_url(path):
+    """Return the URL a local file is served at by an :class:`AssetRouter`.
+
+    Args:
+        path (str or os.PathLike): Absolute path of the file.
+
+    Returns:
+        (str): The file's path below :data:`ASSET_ORIGIN`.
+    """
+    return ASSET_ORIGIN + pathlib.Path(os.path.abspath(path)).as_uri()[len("file://") :]
+
+
+class AssetRouter:
+    """Routes the requests of a page printing one document.
+
+    Requests are handled in this order:
+
+    - The document URL is served from memory, or from the HTML file.
+    - Other URLs on :data:`ASSET_ORIGIN` are local files, served from disk if
+      they are inside ``base_dir`` and aborted otherwise.
+    - ``data:`` and ``blob:`` URLs are left to the browser.
+    - Remote URLs in the store are served from the store.
+    - Other remote URLs are aborted (``"offline"``), passed to the network
+      (``"network"``), or downloaded and added to the store (``"record"``).
+      Downloads that fail are aborted.
+
+    The document is served at ``<base_dir>/<file name>`` on the virtual origin
+    (:data:`DOCUMENT_NAME` for documents held in memory), so relative references
+    resolve exactly as they would next to the notebook.
+
+    :meth:`handle` routes a Playwright page; :meth:`fetch` applies the same rules
+    for engines that lay the document out in-process.
+
+    Args:
+        html_path (str or None): Path of the HTML file to print. Unused if
+            ``html`` is given.
+
+    Keyword Parameters:
+        base_dir (str or None): Directory relative references in the document
+            are resolved against, normally the notebook's directory. Defaults
+            to the current working directory.
+        store (AssetStore or None): Store of remote assets. Defaults to None.
+        remote (str): Policy for remote URLs missing from the store, one of
+            :data:`REMOTE_ASSET_POLICIES`. Defaults to ``"offline"``.
+        html (str, bytes or None): The document itself, served from memory
+            without touching the disk. Defaults to None.
+
+    Attributes:
+        url (str): The URL to navigate the page to.
+        counts (dict): Number of requests that were served from a ``"file"``,
+            from the ``"store"``, sent to the ``"network"``, ``"recorded"`` or
+            ``"aborted"``.
+
+    Examples:
+        >>> router = AssetRouter(html_path, base_dir, store, remote="offline")
+        >>> await page.route("**/*", router.handle)
+        >>> await page.goto(router.url)
+
+        >>> # Serve a rendered document without writing it to disk
+        >>> router = AssetRouter(None, base_dir, store, html=html)
+    """
+
+    def __init__(self, html_path, base_dir=None, store=None, remote="offline", html=None):
+        if remote not in REMOTE_ASSET_POLICIES:
+            msg = f"Unknown remote asset policy {remote!r}, expected one of {REMOTE_ASSET_POLICIES}"
+            raise ValueError(msg)
+        self.html_path = html_path
+        self.html = html.encode("utf-8") if isinstance(html, str) else html
+        self.base_dir = os.path.realpath(base_dir or os.getcwd())
+        self.store = store
+        self.remote = remote
+        name = DOCUMENT_NAME if self.html is not None else os.path.basename(html_path)
+        self.url = document_url(os.path.join(self.base_dir, name))
+        self.counts = dict.fromkeys(("file", "store", "network", "recorded", "aborted"), 0)
+
+    def is_document(self, url):
+        """Check whether a URL refers to the printed document.
+
+        Args:
+            url (str): The requested URL.
+
+        Returns:
+            (bool): True if the URL is the document URL, ignoring any query or
+                fragment.
+        """
+        return urllib.parse.urlsplit(url).path == urllib.parse.urlsplit(self.url).path
+
+    def local_path(self, url):
+        """Return the local file a URL on the document's origin refers to.
+
+        Args:
+            url (str): The requested URL.
+
+        Returns:
+            (str or None): The file path, or None if the URL is not on the
+                document's origin or points outside ``base_dir``.
+        """
+        if not url.startswith(ASSET_ORIGIN + "/"):
+            return None
+        if self.is_document(url):
+            return self.html_path
+        path = os.path.realpath(urllib.request.url2pathname(urllib.parse.urlsplit(url).path))
+        if os.path.commonpath([path, self.base_dir]) != self.base_dir:
+            return None
+        return path
+
+    async def handle(self, route):
+        """Serve, forward or abort one request; a Playwright route handler.
+
+        Args:
+            route (playwright.async_api.Route): The intercepted request.
+        """
+        url = route.request.url
+        if url.startswith(("data:", "blob:")):
+            await route.continue_()
+            return
+
+        if url.startswith(ASSET_ORIGIN + "/"):
+            if self.html is not None and self.is_document(url):
+                await route.fulfill(body=self.html, content_type="text/html; charset=utf-8")
+                return
+            path = self.local_path(url)
+            if path is not None and os.path.isfile(path):
+                self.counts["file"] += 1
+                await route.fulfill(path=path)
+            else:
+                self.counts["aborted"] += 1
+                await route.abort()
+            return
+
+        stored = self.store.get(url) if self.store is not None else None
+        if stored is not None:
+            path, content_type = stored
+            self.counts["store"] += 1
+            await route.fulfill(path=path, content_type=content_type)
+        elif self.remote == "network":
+            self.counts["network"] += 1
+            await route.continue_()
+        elif self.remote == "record" and self.store is not None:
+            try:
+                response = await route.fetch()
+                body = await response.body()
+            except Exception as e:
+                # Unreachable hosts fail the page's request at once, as offline.
+                _log.debug("Could not record %s: %s", url, e)
+                self.counts["aborted"] += 1
+                await route.abort()
+                return
+            if response.ok:
+                self.store.put(url, body, response.headers.get("content-type"))
+                self.counts["recorded"] += 1
+            await route.fulfill(response=response, body=body)
+        else:
+            self.counts["aborted"] += 1
+            await route.abort()
+
+    def fetch(self, url, fetch_remote):
+        """Serve one request synchronously, for engines that print in-process.
+
+        Requests are handled by the same rules as :meth:`handle`. Aborted
+        requests raise instead.
+
+        Args:
+            url (str): The requested URL.
+            fetch_remote (callable): Takes a URL that is not served locally
+                (``data:`` URLs and remote URLs) and returns its body (bytes)
+                and content type (str or None) from the network.
+
+        Returns:
+            (tuple): The body (bytes) and content type (str or None).
+
+        Raises:
+            FileNotFoundError: If the request is aborted.
+        """
+        if url.startswith(("data:", "blob:")):
+            return fetch_remote(url)
+
+        if url.startswith(ASSET_ORIGIN + "/"):
+            if self.html is not None and self.is_document(url):
+                return self.html, "text/html; charset=utf-8"
+            path = self.local_path(url)
+            if path is not None and os.path.isfile(path):
+                self.counts["file"] += 1
+                with open(path, "rb") as f:
+                    return f.read(), mimetypes.guess_type(path)[0]
+            self.counts["aborted"] += 1
+            raise FileNotFoundError(f"{url} is not a file the document may read")
+
+        stored = self.store.get(url) if self.store is not None else None
+        if stored is not None:
+            path, content_type = stored
+            self.counts["store"] += 1
+            with open(path, "rb") as f:
+                return f.read(), content_type
+        if self.remote == "network":
+            self.counts["network"] += 1
+            return fetch_remote(url)
+        if self.remote == "record" and self.store is not None:
+            body, content_type = fetch_remote(url)
+            self.store.put(url, body, content_type)
+            self.counts["recorded"] += 1
+            return body, content_type
+        self.counts["aborted"] += 1
+        raise FileNotFoundError(f"{url} is not in the asset store")
+
+
+def _write_atomically(path, data):
+    """Write bytes to a file through a temporary file in the same directory."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def main(argv=None):
+    """Populate an asset store from the command line.
+
+    Args:
+        argv (list or None): Command line arguments. Defaults to ``sys.argv[1:]``.
+
+    Returns:
+        (int): The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m jupyter_export_html_style.assets",
+        description="Download CDN assets into the asset store used for printing PDFs.",
+    )
+    parser.add_argument(
+        "urls",
+        nargs="*",
+        help="Asset URLs to store. Defaults to the require.js and MathJax URLs of the templates.",
+    )
+    parser.add_argument("--store", default=default_asset_store_dir(), help="Store directory.")
+    parser.add_argument("--refresh", action="store_true", help="Download stored assets again.")
+    args = parser.parse_args(argv)
+
+    store = AssetStore(args.store)
+    for url in store.populate(args.urls or default_asset_urls(), refresh=args.refresh):
+        # Package archives are unpacked into the store rather than stored.
+        print(f"{url} -> {store.path_for(url) if url in store else store.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,572 @@
+"""
+Parallel batch export of many notebooks.
+
+``jupyter nbconvert`` converts one notebook per process, so converting a large
+collection pays for importing nbconvert and building the Jinja environment over
+and over. :func:`export_notebooks` instead loads the exporter and its template
+once, then forks a pool of worker processes that share the loaded state
+copy-on-write and convert the notebooks in parallel, each in isolation: a
+notebook that fails to convert is reported and the batch carries on.
+
+The same is available from the command line::
+
+    jupyter-export-batch --to styled_html --jobs 8 --output-dir site notebooks/
+
+The command keeps a manifest of its exports in the output directory (see
+:mod:`.manifest`), so that running it again only re-exports the notebooks
+whose content, stylesheets, images or exporter configuration changed, and
+deletes the exports of notebooks that were removed.
+"""
+
+import argparse
+import concurrent.futures
+import multiprocessing
+import multiprocessing.util
+import os
+import sys
+import time
+from collections import namedtuple
+
+from nbconvert.writers import FilesWriter
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook, new_output
+from traitlets.config import Config
+from traitlets.config.loader import JSONFileConfigLoader, PyFileConfigLoader
+
+from .browser import shutdown_browser_pools
+from .exporters import (
+    StyledHTMLExporter,
+    StyledScreenshotExporter,
+    StyledSlidesExporter,
+    StyledWebPDFExporter,
+)
+from .exporters.webpdf import _batch_context
+from .manifest import MANIFEST_NAME, ExportManifest, build_entry, configuration_key, is_current
+
+# Exporters available to the batch command, by their nbconvert entry point name.
+EXPORTERS = {
+    "styled_html": StyledHTMLExporter,
+    "styled_webpdf": StyledWebPDFExporter,
+    "styled_slides": StyledSlidesExporter,
+    "styled_screenshot": StyledScreenshotExporter,
+}
+
+ExportResult = namedtuple(
+    "ExportResult",
+    ["index", "source", "output", "seconds", "error", "skipped"],
+    defaults=[False],
+)
+ExportResult.__doc__ = """The outcome of exporting one notebook of a batch.
+
+Attributes:
+    index (int): Position of the notebook in the batch.
+    source (str): Path of the notebook.
+    output (str or None): Path of the written file, or None if the export failed.
+    seconds (float or None): Time spent converting and writing the notebook, or
+        None if the worker running it died.
+    error (Exception or None): The exception that made the export fail.
+    skipped (bool): True if the notebook was not exported because the
+        manifest shows its export is up to date; ``output`` is then the
+        existing export.
+"""
+
+# The exporter, writer and configuration key of this process, set up by
+# _start_worker and inherited by forked workers.
+_WORKER = None
+
+
+def find_notebooks(paths):
+    """Expand notebook files and directories into a list of notebook files.
+
+    Args:
+        paths (iterable): Notebook files and directories. Directories are
+            searched recursively for ``.ipynb`` files, skipping checkpoints
+            and hidden directories.
+
+    Returns:
+        (list): The notebook paths; files found in a directory are sorted.
+
+    Examples:
+        >>> find_notebooks(["reports/", "extra.ipynb"])
+        ['reports/a.ipynb', 'reports/b/c.ipynb', 'extra.ipynb']
+    """
+    notebooks = []
+    for path in paths:
+        path = os.fspath(path)
+        if not os.path.isdir(path):
+            notebooks.append(path)
+            continue
+        found = []
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            found.extend(os.path.join(root, name) for name in files if name.endswith(".ipynb"))
+        notebooks.extend(sorted(found))
+    return notebooks
+
+
+def export_notebooks(
+    paths,
+    exporter="styled_html",
+    output_dir=None,
+    jobs=None,
+    ordered=False,
+    config=None,
+    manifest=None,
+    force=False,
+    root=None,
+):
+    """Export many notebooks in a pool of pre-forked worker processes.
+
+    When the workers are forked, the exporter is created and its template
+    loaded first, so every worker starts with a ready exporter instead of
+    importing nbconvert and compiling the templates itself.
+
+    Args:
+        paths (iterable): Paths of the notebooks to export.
+
+    Keyword Parameters:
+        exporter (str or type): Name of the exporter (a key of
+            :data:`EXPORTERS`) or an exporter class. Defaults to
+            ``"styled_html"``.
+        output_dir (str or None): Directory the exports are written to, in
+            the same folder layout as the notebooks below ``root``. None writes
+            each export next to its notebook. Defaults to None.
+        jobs (int or None): Number of worker processes. None uses one per CPU;
+            0 exports in this process, one notebook at a time. Defaults to None.
+        ordered (bool): Yield the results in the order of ``paths`` instead of
+            as they complete. Defaults to False.
+        config (Config, dict or None): Configuration of the exporter. Defaults
+            to None.
+        manifest (ExportManifest or None): Manifest of earlier exports.
+            Notebooks whose recorded export is up to date are skipped, the
+            others are exported and recorded; failed exports are removed from
+            it. The caller saves it. None exports every notebook. Defaults to
+            None.
+        force (bool): Export every notebook even if the manifest shows it is
+            up to date, still recording it. Defaults to False.
+        root (str or None): Folder whose layout is mirrored in ``output_dir``
+            (see :func:`input_root`). Defaults to None, the common parent
+            folder of the notebooks.
+
+    Yields:
+        (ExportResult): One result per notebook. Failed exports carry the
+            exception in ``error`` instead of raising.
+
+    Notes:
+        Workers are forked where the platform supports it and this process
+        runs no other thread, such as the event loop of a browser pool, whose
+        locks a forked worker could inherit in a held state. Otherwise they
+        are started with ``forkserver`` or ``spawn`` and each loads the
+        exporter once when it starts. The exporters
+        printing with a browser keep one browser pool per worker for the whole
+        batch.
+
+        Whether a notebook is up to date is decided in the workers, so the
+        notebooks and their dependencies are hashed in parallel too.
+
+    Examples:
+        >>> from jupyter_export_html_style.batch import export_notebooks, find_notebooks
+        >>> for result in export_notebooks(find_notebooks(["reports"]), jobs=8):
+        ...     if result.error is not None:
+        ...         print(result.source, result.error)
+    """
+    exporter_class = EXPORTERS[exporter] if isinstance(exporter, str) else exporter
+    settings = (exporter_class, Config(config or {}))
+    paths = [os.fspath(path) for path in paths]
+    build_directories = _build_directories(paths, output_dir, root)
+
+    def tasks():
+        for index, path in enumerate(paths):
+            build_directory = build_directories[index]
+            if manifest is None:
+                yield index, path, None, None, build_directory
+            else:
+                previous = None if force else manifest.get(path)
+                yield index, path, previous, manifest.directory, build_directory
+
+    def record(outcome):
+        result, entry, outputs = outcome
+        if manifest is not None:
+            if result.error is None and entry is not None:
+                # Also refreshes the file states of skipped notebooks.
+                manifest.record(result.source, entry, outputs)
+            else:
+                manifest.remove(result.source)
+        return result
+
+    if jobs == 0:
+        _start_worker(*settings)
+        for task in tasks():
+            yield record(_export_one(*task))
+        return
+
+    context = _batch_context()
+    if context.get_start_method() == "fork":
+        # Load the exporter and its template here so that forked workers inherit them.
+        _start_worker(*settings)
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, mp_context=context, initializer=_start_worker, initargs=settings
+    )
+    futures = {}
+    try:
+        for task in tasks():
+            futures[pool.submit(_export_one, *task)] = task
+
+        pending = {}
+        next_index = 0
+        for future in concurrent.futures.as_completed(futures):
+            task = futures[future]
+            index, path = task[:2]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # The result could not be sent back or the worker died.
+                outcome = ExportResult(index, path, None, None, e), None, None
+            result = record(outcome)
+            if not ordered:
+                yield result
+                continue
+            pending[index] = result
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def summarize(results, seconds):
+    """Summarize the results of a batch.
+
+    Args:
+        results (list): The :class:`ExportResult` of every notebook.
+        seconds (float): Wall-clock duration of the batch.
+
+    Returns:
+        (dict): The number of ``notebooks``, ``succeeded`` and ``failed``
+            exports and of notebooks ``skipped`` as up to date (counted as
+            succeeded), the wall-clock ``seconds``, the ``throughput`` in
+            notebooks per second, the ``mean_seconds`` spent per notebook and
+            the five ``slowest`` notebooks as ``(seconds, source)`` pairs.
+    """
+    timed = [
+        (result.seconds, result.source)
+        for result in results
+        if result.seconds is not None and not result.skipped
+    ]
+    failed = sum(result.error is not None for result in results)
+    return {
+        "notebooks": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "skipped": sum(result.skipped for result in results),
+        "seconds": seconds,
+        "throughput": len(results) / seconds if seconds > 0 else 0.0,
+        "mean_seconds": sum(t for t, _ in timed) / len(timed) if timed else 0.0,
+        "slowest": sorted(timed, reverse=True)[:5],
+    }
+
+
+def input_root(paths):
+    """Return the folder whose layout a batch mirrors in its output directory.
+
+    Args:
+        paths (iterable): Notebook files and directories, as given to
+            :func:`find_notebooks`.
+
+    Returns:
+        (str or None): The common parent folder of the directories and of the
+            folders of the notebook files, or None if there are no paths.
+
+    Raises:
+        ValueError: If the paths have no common parent folder, as on
+            different Windows drives.
+
+    Examples:
+        >>> input_root(["reports/", "extra/summary.ipynb"])
+        '/home/user/work'
+    """
+    folders = [
+        os.path.abspath(path) if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+        for path in map(os.fspath, paths)
+    ]
+    return os.path.commonpath(folders) if folders else None
+
+
+def _build_directories(paths, output_dir, root=None):
+    """Choose the directory each export of a batch is written to.
+
+    Args:
+        paths (list): Paths of the notebooks.
+        output_dir (str or None): Directory the exports are written to.
+
+    Keyword Parameters:
+        root (str or None): Folder whose layout is mirrored. Defaults to None,
+            the common parent folder of the notebooks.
+
+    Returns:
+        (list): For each notebook, ``output_dir`` joined with the notebook's
+            folder relative to ``root``, so that notebooks of the same name in
+            different folders do not overwrite each other's exports. None for
+            every notebook if ``output_dir`` is None.
+
+    Raises:
+        ValueError: If a notebook is outside ``root``, or the notebooks have
+            no common parent folder.
+    """
+    if output_dir is None or not paths:
+        return [None] * len(paths)
+    root = os.path.abspath(root) if root is not None else input_root(paths)
+    directories = []
+    for path in paths:
+        folder = os.path.relpath(os.path.dirname(os.path.abspath(path)), root)
+        if folder == os.pardir or folder.startswith(os.pardir + os.sep):
+            raise ValueError(f"{path} is outside {root}, whose layout the exports mirror")
+        directories.append(os.path.normpath(os.path.join(output_dir, folder)))
+    return directories
+
+
+def _start_worker(exporter_class, config):
+    """Create the exporter of this process and warm it up.
+
+    See :func:`_warm_up`. Does nothing if the process already has an
+    exporter, as forked workers do.
+
+    Args:
+        exporter_class (type): The exporter class.
+        config (Config): Configuration of the exporter.
+    """
+    global _WORKER
+    if multiprocessing.parent_process() is not None:
+        # Close the browsers of this worker when the pool shuts it down. Forked
+        # workers run no atexit handlers, and inherit _WORKER, so this comes first.
+        multiprocessing.util.Finalize(None, shutdown_browser_pools, exitpriority=10)
+    settings = (exporter_class, config)
+    if _WORKER is not None and _WORKER[0] == settings:
+        return
+    exporter = exporter_class(config=config)
+    _warm_up(exporter)
+    _WORKER = (settings, exporter, configuration_key(exporter))
+
+
+def _warm_up(exporter):
+    """Load everything an exporter only loads on its first conversion.
+
+    The exporter renders a small notebook with the common kinds of output to
+    HTML, which compiles the template and loads the stylesheets, Markdown
+    renderer, output renderers and highlighters.
+
+    Args:
+        exporter (Exporter): The exporter.
+    """
+    if isinstance(exporter, StyledHTMLExporter):
+        # Only the HTML stage: this must neither start a browser nor fill the export cache.
+        outputs = [
+            new_output("stream", name="stdout", text="1\n"),
+            new_output(
+                "execute_result",
+                data={"text/html": "<table><tr><td>1</td></tr></table>", "text/plain": "1"},
+                execution_count=1,
+            ),
+        ]
+        warmup = new_notebook(
+            cells=[
+                new_markdown_cell("# Warm-up\n\nSome *text*."),
+                new_code_cell("x = 1", execution_count=1, outputs=outputs),
+            ]
+        )
+        StyledHTMLExporter._from_notebook_node_uncached(exporter, warmup)
+    else:
+        exporter.template  # noqa: B018
+
+
+def _export_one(index, path, previous=None, directory=None, build_directory=None):
+    """Convert and write one notebook unless it is up to date; runs in a worker.
+
+    Args:
+        index (int): Position of the notebook in the batch.
+        path (str): Path of the notebook.
+
+    Keyword Parameters:
+        previous (dict or None): The notebook's manifest entry. Defaults to None.
+        directory (str or None): Directory of the manifest, or None to export
+            without one. Defaults to None.
+        build_directory (str or None): Directory the export is written to.
+            None writes it next to the notebook. Defaults to None.
+
+    Returns:
+        (tuple): The :class:`ExportResult`, with any error caught, the
+            notebook's new manifest entry (None without a manifest or if the
+            notebook could not be read) and the paths of the export's files.
+    """
+    _, exporter, config_key = _WORKER
+    start = time.perf_counter()
+    name = os.path.splitext(os.path.basename(path))[0]
+    entry = None
+    try:
+        if directory is not None:
+            entry = build_entry(exporter, path, directory, previous, config_key)
+            if is_current(previous, entry, directory) and _written_to(
+                previous, directory, build_directory or os.path.dirname(path)
+            ):
+                outputs = [
+                    os.path.normpath(os.path.join(directory, output))
+                    for output in previous["outputs"]
+                ]
+                seconds = time.perf_counter() - start
+                return ExportResult(index, path, outputs[0], seconds, None, True), entry, outputs
+        resources = {"unique_key": name, "output_files_dir": f"{name}_files"}
+        output, resources = exporter.from_filename(path, resources=resources)
+        writer = FilesWriter(build_directory=build_directory or "", parent=exporter)
+        written = os.fspath(writer.write(output, resources, notebook_name=name))
+    except Exception as e:
+        return ExportResult(index, path, None, time.perf_counter() - start, e), entry, None
+    support = [
+        os.path.join(os.path.dirname(written), filename) for filename in resources.get("outputs", {})
+    ]
+    result = ExportResult(index, path, written, time.perf_counter() - start, None)
+    return result, entry, [written, *support]
+
+
+def _written_to(previous, directory, build_directory):
+    """Check whether a recorded export was written to the expected directory.
+
+    Args:
+        previous (dict): The notebook's manifest entry.
+        directory (str): Directory of the manifest.
+        build_directory (str): Directory the export is written to now.
+
+    Returns:
+        (bool): True if the recorded main output is in ``build_directory``, so
+            a change of output layout re-exports the notebook.
+    """
+    output = os.path.join(directory, previous["outputs"][0])
+    return os.path.dirname(os.path.abspath(output)) == os.path.abspath(build_directory)
+
+
+def _load_config(path):
+    """Load a traitlets configuration file.
+
+    Args:
+        path (str): A ``.json`` or ``.py`` configuration file.
+
+    Returns:
+        (Config): The configuration.
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    loader_class = JSONFileConfigLoader if filename.endswith(".json") else PyFileConfigLoader
+    return loader_class(filename, path=directory).load_config()
+
+
+def _report(result, quiet=False):
+    """Print the result of one export; failures go to stderr.
+
+    Args:
+        result (ExportResult): The result.
+        quiet (bool): Only print failures. Defaults to False.
+    """
+    seconds = "-" if result.seconds is None else f"{result.seconds:.2f}s"
+    if result.error is not None:
+        print(f"FAILED {seconds:>8} {result.source}: {result.error!r}", file=sys.stderr)
+    elif not quiet:
+        status = "skip  " if result.skipped else "ok    "
+        print(f"{status} {seconds:>8} {result.source} -> {result.output}")
+
+
+def main(argv=None):
+    """Export notebooks in parallel from the command line.
+
+    Args:
+        argv (list or None): Command line arguments. Defaults to ``sys.argv[1:]``.
+
+    Returns:
+        (int): The exit status: 0 if every notebook was exported, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        prog="jupyter-export-batch",
+        description="Export many notebooks with styles in a pool of worker processes.",
+    )
+    parser.add_argument("paths", nargs="+", help="Notebooks, or directories to search for them.")
+    parser.add_argument(
+        "--to", default="styled_html", choices=sorted(EXPORTERS), help="Exporter to use."
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="Directory for the exports, in the folder layout of the inputs. "
+        "Defaults to next to each notebook."
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Number of worker processes; 0 exports in this process. Defaults to one per CPU.",
+    )
+    parser.add_argument(
+        "--ordered", action="store_true", help="Report notebooks in input order."
+    )
+    parser.add_argument("--config", help="A .json or .py traitlets configuration file.")
+    parser.add_argument(
+        "--manifest",
+        help=f"Manifest of the exports. Defaults to {MANIFEST_NAME} in the output directory "
+        "(or the current directory).",
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="Export every notebook and neither read nor write a manifest.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Export every notebook, then record the exports in the manifest.",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="Only report failures and the summary."
+    )
+    args = parser.parse_args(argv)
+
+    config = _load_config(args.config) if args.config else None
+    notebooks = find_notebooks(args.paths)
+    manifest = None
+    if not args.no_manifest:
+        manifest = ExportManifest(
+            args.manifest or os.path.join(args.output_dir or os.curdir, MANIFEST_NAME)
+        )
+    start = time.perf_counter()
+    results = []
+    try:
+        for result in export_notebooks(
+            notebooks,
+            args.to,
+            args.output_dir,
+            args.jobs,
+            args.ordered,
+            config,
+            manifest,
+            args.force,
+            input_root(args.paths),
+        ):
+            results.append(result)
+            _report(result, args.quiet)
+        pruned = manifest.prune() if manifest is not None else []
+    finally:
+        if manifest is not None:
+            # Keep what was exported even if the batch was interrupted.
+            manifest.save()
+
+    for source in pruned if not args.quiet else []:
+        print(f"pruned          {source}")
+    summary = summarize(results, time.perf_counter() - start)
+    print(
+        f"{summary['succeeded']} of {summary['notebooks']} notebooks exported, "
+        f"{summary['failed']} failed, {summary['skipped']} up to date, "
+        f"{len(pruned)} pruned, in {summary['seconds']:.2f}s "
+        f"({summary['throughput']:.1f} notebooks/s, {summary['mean_seconds']:.2f}s each)"
+    )
+    if summary["slowest"] and not args.quiet:
+        print("Slowest:")
+        for seconds, source in summary["slowest"]:
+            print(f"  {seconds:8.2f}s {source}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
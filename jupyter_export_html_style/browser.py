@@ -0,0 +1,459 @@
+"""
+A persistent pool of headless Chromium browsers for rendering exported HTML.
+
+Launching Chromium dominates the cost of printing a notebook to PDF. The pool
+in this module keeps browsers running for the lifetime of the process, drives
+them from one background event loop thread and hands out pages in reusable
+browser contexts. Browsers are recycled after a number of jobs or when they
+crash, and all pools are shut down when the interpreter exits.
+"""
+
+import asyncio
+import atexit
+import os
+import subprocess
+import sys
+import threading
+from importlib import util as importlib_util
+
+PLAYWRIGHT_INSTALLED = importlib_util.find_spec("playwright") is not None
+IS_WINDOWS = os.name == "nt"
+
+# Whether `playwright install chromium` has already been run in this process.
+_CHROMIUM_INSTALLED = False
+_CHROMIUM_INSTALL_LOCK = threading.Lock()
+
+
+def _default_playwright_factory():
+    """Return Playwright's asynchronous context manager.
+
+    Returns:
+        (PlaywrightContextManager):
+            The object returned by ``playwright.async_api.async_playwright()``.
+
+    Raises:
+        RuntimeError: If playwright is not installed.
+    """
+    try:
+        from playwright.async_api import async_playwright  # type: ignore[import-not-found]
+    except ModuleNotFoundError as e:
+        msg = (
+            "Playwright is not installed to support Web PDF conversion. "
+            "Please install `nbconvert[webpdf]` to enable."
+        )
+        raise RuntimeError(msg) from e
+    return async_playwright()
+
+
+def install_chromium():
+    """Download Playwright's Chromium, at most once per process.
+
+    Examples:
+        >>> from jupyter_export_html_style.browser import install_chromium
+        >>> install_chromium()
+    """
+    global _CHROMIUM_INSTALLED
+    with _CHROMIUM_INSTALL_LOCK:
+        if _CHROMIUM_INSTALLED:
+            return
+        cmd = [sys.executable, "-m", "playwright", "install", "chromium"]
+        subprocess.check_call(cmd)  # noqa: S603
+        _CHROMIUM_INSTALLED = True
+
+
+class _BrowserSlot:
+    """One browser of a pool with its shared context and job counters."""
+
+    __slots__ = ("browser", "context", "active", "jobs", "retiring", "lock")
+
+    def __init__(self):
+        self.browser = None
+        self.context = None
+        self.active = 0
+        self.jobs = 0
+        self.retiring = False
+        self.lock = asyncio.Lock()
+
+    def is_healthy(self):
+        """Check whether the browser is running and still connected."""
+        return self.browser is not None and self.browser.is_connected()
+
+
+class BrowserPool:
+    """A long-lived pool of headless Chromium browsers.
+
+    The pool owns a background thread running an asyncio event loop on which
+    Playwright and all browsers are driven. Jobs are coroutine functions that
+    receive a fresh page; each page is opened in a browser context that is
+    reused for all jobs on the same browser and closed when the job finishes.
+
+    Browsers are launched lazily. Each serves at most ``pages_per_browser``
+    jobs at a time, and is closed and replaced after ``max_jobs_per_browser``
+    jobs or as soon as it is found disconnected.
+
+    Keyword Parameters:
+        browsers (int):
+            Number of browsers to run. Defaults to 1.
+        pages_per_browser (int):
+            Number of pages each browser serves concurrently. Defaults to 4.
+        max_jobs_per_browser (int):
+            Number of jobs after which a browser is recycled. 0 never recycles.
+            Defaults to 100.
+        launch_args (sequence of str):
+            Extra command line arguments for Chromium. Defaults to none.
+        allow_chromium_download (bool):
+            Run ``playwright install chromium`` before the first launch. The
+            download is attempted once per process. Defaults to False.
+        playwright_factory (callable or None):
+            Returns an object whose ``start()`` coroutine yields a Playwright
+            instance, like ``playwright.async_api.async_playwright``. Defaults
+            to Playwright itself.
+
+    Raises:
+        RuntimeError: From :meth:`run` if playwright is not installed or no
+            suitable chromium executable is found.
+
+    Notes:
+        Pools returned by :func:`get_browser_pool` are shared process-wide and
+        closed at interpreter exit; pools created directly should be closed with
+        :meth:`close`.
+
+    Examples:
+        >>> from jupyter_export_html_style.browser import BrowserPool
+        >>> pool = BrowserPool(browsers=2, pages_per_browser=4)
+        >>> async def title(page):
+        ...     await page.goto("https://example.com")
+        ...     return await page.title()
+        >>> pool.run(title)
+        'Example Domain'
+        >>> pool.close()
+    """
+
+    def __init__(
+        self,
+        browsers=1,
+        pages_per_browser=4,
+        max_jobs_per_browser=100,
+        launch_args=(),
+        allow_chromium_download=False,
+        playwright_factory=None,
+    ):
+        self.browsers = max(1, browsers)
+        self.pages_per_browser = max(1, pages_per_browser)
+        self.max_jobs_per_browser = max_jobs_per_browser
+        self.launch_args = list(launch_args)
+        self.allow_chromium_download = allow_chromium_download
+        self.playwright_factory = playwright_factory or _default_playwright_factory
+        self.launches = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._slots = None
+        self._condition = None
+
+    @property
+    def loop(self):
+        """The event loop driving the browsers, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.ProactorEventLoop() if IS_WINDOWS else asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="styled-browser-pool", daemon=True
+                )
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def submit(self, job, timeout=None):
+        """Schedule a job on a pooled page.
+
+        Args:
+            job (callable):
+                Coroutine function called with a Playwright page.
+
+        Keyword Parameters:
+            timeout (float or None):
+                Seconds after which the job is cancelled. Defaults to None.
+
+        Returns:
+            (concurrent.futures.Future):
+                Future resolving to the job's result.
+        """
+        return asyncio.run_coroutine_threadsafe(self.run_async(job, timeout), self.loop)
+
+    def run(self, job, timeout=None):
+        """Run a job on a pooled page and wait for its result.
+
+        Args:
+            job (callable):
+                Coroutine function called with a Playwright page.
+
+        Keyword Parameters:
+            timeout (float or None):
+                Seconds after which the job is cancelled and
+                :class:`TimeoutError` is raised. Defaults to None.
+
+        Returns:
+            (object):
+                The job's result.
+
+        Raises:
+            RuntimeError: If called from the pool's own event loop thread.
+        """
+        if threading.current_thread() is self._thread:
+            msg = "BrowserPool.run() cannot be called from the pool's event loop; use run_async()."
+            raise RuntimeError(msg)
+        return self.submit(job, timeout).result()
+
+    async def run_async(self, job, timeout=None):
+        """Run a job on a pooled page; must be awaited on the pool's event loop.
+
+        Args:
+            job (callable):
+                Coroutine function called with a Playwright page.
+
+        Keyword Parameters:
+            timeout (float or None):
+                Seconds after which the job is cancelled and
+                :class:`TimeoutError` is raised. Defaults to None.
+
+        Returns:
+            (object):
+                The job's result.
+        """
+        slot = await self._acquire()
+        page = None
+        try:
+            page = await slot.context.new_page()
+            if timeout is None:
+                return await job(page)
+            return await asyncio.wait_for(job(page), timeout)
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    # The browser may have crashed while running the job.
+                    pass
+            await self._release(slot)
+
+    def stats(self):
+        """Report the state of the pool.
+
+        Returns:
+            (dict):
+                The number of browser launches so far, the browsers currently
+                running and the jobs currently in progress.
+
+        Examples:
+            >>> BrowserPool().stats()
+            {'launches': 0, 'running': 0, 'active': 0}
+        """
+        slots = self._slots or []
+        return {
+            "launches": self.launches,
+            "running": sum(1 for slot in slots if slot.browser is not None),
+            "active": sum(slot.active for slot in slots),
+        }
+
+    def close(self, timeout=30):
+        """Close all browsers, stop Playwright and the event loop thread.
+
+        The pool is also removed from the pools shared by
+        :func:`get_browser_pool`, which creates a new one on its next call. A
+        closed pool may still be used; it starts a fresh event loop and
+        relaunches its browsers.
+
+        Keyword Parameters:
+            timeout (float):
+                Seconds to wait for the browsers to close. Defaults to 30.
+        """
+        with _POOLS_LOCK:
+            for key, pool in list(_POOLS.items()):
+                if pool is self:
+                    del _POOLS[key]
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        except Exception:
+            # Shutting down at exit must not raise; the processes die with us.
+            pass
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            if not thread.is_alive():
+                loop.close()
+            # The slots, their condition and Playwright belong to the stopped loop.
+            self._slots = self._condition = self._playwright = None
+
+    async def _acquire(self):
+        """Wait for a healthy browser with a free page and reserve the page."""
+        if self._slots is None:
+            self._slots = [_BrowserSlot() for _ in range(self.browsers)]
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            while True:
+                candidates = [
+                    slot
+                    for slot in self._slots
+                    if not slot.retiring and slot.active < self.pages_per_browser
+                ]
+                if candidates:
+                    # Prefer browsers that are already running, then the least busy.
+                    slot = min(candidates, key=lambda s: (s.browser is None, s.active))
+                    slot.active += 1
+                    break
+                await self._condition.wait()
+        try:
+            async with slot.lock:
+                if not slot.is_healthy():
+                    await self._close_browser(slot)
+                    await self._launch(slot)
+        except BaseException:
+            await self._release(slot, completed=False)
+            raise
+        return slot
+
+    async def _release(self, slot, completed=True):
+        """Return a page reservation, recycling the browser when it is due."""
+        async with self._condition:
+            slot.active -= 1
+            if completed:
+                slot.jobs += 1
+            if slot.browser is not None and (
+                not slot.is_healthy()
+                or (self.max_jobs_per_browser and slot.jobs >= self.max_jobs_per_browser)
+            ):
+                slot.retiring = True
+            close = slot.retiring and slot.active == 0
+        if close:
+            async with slot.lock:
+                await self._close_browser(slot)
+        async with self._condition:
+            if close:
+                slot.retiring = False
+            self._condition.notify_all()
+
+    async def _launch(self, slot):
+        """Launch the browser of a slot and open its shared context."""
+        if self._playwright is None:
+            if self.allow_chromium_download:
+                await asyncio.to_thread(install_chromium)
+            self._playwright = await self.playwright_factory().start()
+        try:
+            browser = await self._playwright.chromium.launch(
+                handle_sigint=False,
+                handle_sigterm=False,
+                handle_sighup=False,
+                args=self.launch_args,
+            )
+        except Exception as e:
+            msg = (
+                "No suitable chromium executable found on the system. "
+                "Please use 'allow_chromium_download=True' to allow downloading one, "
+                "or install it using `playwright install chromium`."
+            )
+            raise RuntimeError(msg) from e
+        slot.browser = browser
+        slot.context = await browser.new_context()
+        slot.jobs = 0
+        self.launches += 1
+
+    async def _close_browser(self, slot):
+        """Close the browser of a slot, ignoring errors from a crashed browser."""
+        browser, slot.browser, slot.context = slot.browser, None, None
+        slot.jobs = 0
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def _shutdown(self):
+        """Close every browser and stop Playwright."""
+        for slot in self._slots or []:
+            await self._close_browser(slot)
+        if self._playwright is not None:
+            playwright, self._playwright = self._playwright, None
+            await playwright.stop()
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_browser_pool(
+    browsers=1,
+    pages_per_browser=4,
+    max_jobs_per_browser=100,
+    launch_args=(),
+    allow_chromium_download=False,
+):
+    """Return the process-wide browser pool for a set of settings.
+
+    Keyword Parameters:
+        browsers (int):
+            Number of browsers to run. Defaults to 1.
+        pages_per_browser (int):
+            Number of pages each browser serves concurrently. Defaults to 4.
+        max_jobs_per_browser (int):
+            Number of jobs after which a browser is recycled. Defaults to 100.
+        launch_args (sequence of str):
+            Extra command line arguments for Chromium. Defaults to none.
+        allow_chromium_download (bool):
+            Run ``playwright install chromium`` before the first launch.
+            Defaults to False.
+
+    Returns:
+        (BrowserPool):
+            The pool shared by all callers using the same settings. It is closed
+            automatically at interpreter exit.
+
+    Examples:
+        >>> from jupyter_export_html_style.browser import get_browser_pool
+        >>> pool = get_browser_pool(browsers=2, launch_args=["--no-sandbox"])
+    """
+    key = (
+        browsers,
+        pages_per_browser,
+        max_jobs_per_browser,
+        tuple(launch_args),
+        allow_chromium_download,
+    )
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = BrowserPool(
+                browsers=browsers,
+                pages_per_browser=pages_per_browser,
+                max_jobs_per_browser=max_jobs_per_browser,
+                launch_args=launch_args,
+                allow_chromium_download=allow_chromium_download,
+            )
+            _POOLS[key] = pool
+    return pool
+
+
+def shutdown_browser_pools():
+    """Close every pool returned by :func:`get_browser_pool`.
+
+    This runs automatically at interpreter exit. Later calls to
+    :func:`get_browser_pool` create new pools.
+
+    Examples:
+        >>> from jupyter_export_html_style.browser import shutdown_browser_pools
+        >>> shutdown_browser_pools()
+    """
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(shutdown_browser_pools)
@@ -0,0 +1,475 @@
+"""
+Caching of complete export results.
+
+An export cache maps a key describing everything that determines an export (the
+notebook, the exporter and its configuration, the templates, the package
+versions and the local files the notebook references) to the exported document
+and its resources. Three backends are provided: an in-memory LRU cache, a
+directory of files and a SQLite database. All of them are bounded by the total
+size of the stored results and keep hit, miss and eviction counters.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from traitlets.utils.importstring import import_item
+
+from .images import CacheInfo, LRUCache
+
+# Default bound on the total size of the stored results.
+DEFAULT_EXPORT_CACHE_SIZE = 1024 * 1024 * 1024
+
+
+def default_cache_dir():
+    """Return the directory used by the persistent backends when no path is configured.
+
+    Returns:
+        (str):
+            ``$XDG_CACHE_HOME/jupyter-export-html-style``, or
+            ``~/.cache/jupyter-export-html-style`` if ``XDG_CACHE_HOME`` is unset.
+
+    Examples:
+        >>> path = default_cache_dir()
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "jupyter-export-html-style")
+
+
+class ExportCache:
+    """Base class of the export result caches.
+
+    Results are pickled, so every lookup returns a fresh copy of the output and
+    resources that the caller may modify freely. Subclasses store the pickled
+    results by implementing :meth:`_load`, :meth:`_store`, :meth:`_clear` and
+    :meth:`_currsize`.
+
+    Keyword Parameters:
+        path (str or None):
+            Location of a persistent cache. Ignored by the in-memory backend.
+            Defaults to None.
+        maxsize (int):
+            Maximum total size, in bytes, of the pickled results. Results larger
+            than this are never stored. Defaults to 1 GiB.
+
+    Attributes:
+        path (str or None): Location of the cache.
+        maxsize (int): The current size bound.
+
+    Notes:
+        Persistent caches unpickle what they read, so they must only be pointed
+        at locations that are not writable by untrusted users.
+
+    Examples:
+        >>> cache = MemoryExportCache(maxsize=64 * 1024 * 1024)
+        >>> cache.put(key, output, resources)
+        True
+        >>> output, resources = cache.get(key)
+    """
+
+    def __init__(self, path=None, maxsize=DEFAULT_EXPORT_CACHE_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Look up a cached export.
+
+        Args:
+            key (str):
+                The export key.
+
+        Returns:
+            (tuple or None):
+                The cached ``(output, resources)``, or None if the export is not
+                cached.
+        """
+        try:
+            blob = self._load(key)
+            result = pickle.loads(blob) if blob is not None else None
+        except Exception:
+            # A corrupt or unreadable entry is treated as a miss and overwritten later.
+            result = None
+        with self._lock:
+            if result is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return result
+
+    def put(self, key, output, resources):
+        """Store the result of an export.
+
+        Args:
+            key (str):
+                The export key.
+            output (str or bytes):
+                The exported document.
+            resources (dict):
+                The resources returned with the document. Callable entries, such
+                as the template helpers nbconvert adds, are not stored.
+
+        Returns:
+            (bool):
+                True if the result was stored, False if it cannot be pickled or is
+                larger than the cache.
+        """
+        resources = {name: value for name, value in resources.items() if not callable(value)}
+        try:
+            blob = pickle.dumps((output, resources), protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+        if len(blob) > self.maxsize:
+            return False
+        self._store(key, blob)
+        return True
+
+    def resize(self, maxsize):
+        """Change the size bound, evicting results if the cache has become too large.
+
+        Args:
+            maxsize (int):
+                The new maximum total size of the stored results.
+        """
+        self.maxsize = maxsize
+        self._evict()
+
+    def clear(self):
+        """Remove all stored results and reset the statistics."""
+        self._clear()
+        with self._lock:
+            self._hits = self._misses = self._evictions = 0
+
+    def cache_info(self):
+        """Report cache statistics.
+
+        Returns:
+            (CacheInfo):
+                Named tuple of hits, misses, evictions, the current total size of
+                the stored results and the size bound. The counters cover this
+                process only.
+
+        Examples:
+            >>> MemoryExportCache(maxsize=10).cache_info()
+            CacheInfo(hits=0, misses=0, evictions=0, currsize=0, maxsize=10)
+        """
+        with self._lock:
+            hits, misses, evictions = self._hits, self._misses, self._evictions
+        return CacheInfo(hits, misses, evictions, self._currsize(), self.maxsize)
+
+    def _load(self, key):
+        """Return the pickled result stored under a key, or None."""
+        raise NotImplementedError
+
+    def _store(self, key, blob):
+        """Store a pickled result, evicting older results to stay within bounds."""
+        raise NotImplementedError
+
+    def _evict(self):
+        """Evict results until the cache fits its bound."""
+        raise NotImplementedError
+
+    def _clear(self):
+        """Remove all stored results."""
+        raise NotImplementedError
+
+    def _currsize(self):
+        """Return the total size of the stored results."""
+        raise NotImplementedError
+
+
+class MemoryExportCache(ExportCache):
+    """Export cache held in memory with least-recently-used eviction.
+
+    Keyword Parameters:
+        path (str or None):
+            Ignored. Defaults to None.
+        maxsize (int):
+            Maximum total size, in bytes, of the pickled results. Defaults to 1 GiB.
+
+    Examples:
+        >>> cache = MemoryExportCache(maxsize=256 * 1024 * 1024)
+    """
+
+    def __init__(self, path=None, maxsize=DEFAULT_EXPORT_CACHE_SIZE):
+        super().__init__(path, maxsize)
+        self._entries = LRUCache(maxsize)
+
+    def cache_info(self):
+        """Report cache statistics.
+
+        Returns:
+            (CacheInfo):
+                Named tuple of hits, misses, evictions, the current total size of
+                the stored results and the size bound.
+        """
+        info = super().cache_info()
+        return info._replace(evictions=self._entries.cache_info().evictions)
+
+    def _load(self, key):
+        return self._entries.get(key)
+
+    def _store(self, key, blob):
+        self._entries.put(key, blob)
+
+    def _evict(self):
+        self._entries.resize(self.maxsize)
+
+    def _clear(self):
+        self._entries.clear()
+
+    def _currsize(self):
+        return self._entries.cache_info().currsize
+
+
+class DirectoryExportCache(ExportCache):
+    """Export cache stored as one file per result in a directory.
+
+    Files are spread over subdirectories named after the first two characters of
+    their keys. Reading a result updates its modification time, and when the
+    directory grows beyond ``maxsize`` the least recently used files are deleted.
+    Several processes may share the directory.
+
+    Keyword Parameters:
+        path (str or None):
+            The cache directory, created if needed. Defaults to ``exports`` in
+            :func:`default_cache_dir`.
+        maxsize (int):
+            Maximum total size, in bytes, of the stored files. Defaults to 1 GiB.
+
+    Examples:
+        >>> cache = DirectoryExportCache(".export-cache", maxsize=2 * 1024**3)
+    """
+
+    _SUFFIX = ".pickle"
+
+    def __init__(self, path=None, maxsize=DEFAULT_EXPORT_CACHE_SIZE):
+        super().__init__(path or os.path.join(default_cache_dir(), "exports"), maxsize)
+        os.makedirs(self.path, exist_ok=True)
+        self._size = None
+
+    def _entry_path(self, key):
+        """Return the path of the file holding a key's result."""
+        return os.path.join(self.path, key[:2], key + self._SUFFIX)
+
+    def _entries(self):
+        """List the stored files as ``(mtime, size, path)`` tuples."""
+        entries = []
+        for directory, _, files in os.walk(self.path):
+            for name in files:
+                if not name.endswith(self._SUFFIX):
+                    continue
+                file_path = os.path.join(directory, name)
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, file_path))
+        return entries
+
+    def _load(self, key):
+        file_path = self._entry_path(key)
+        try:
+            with open(file_path, "rb") as f:
+                blob = f.read()
+            os.utime(file_path)
+        except OSError:
+            return None
+        return blob
+
+    def _store(self, key, blob):
+        file_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(blob)
+        os.replace(temp_path, file_path)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(blob)
+        if self._currsize() > self.maxsize:
+            self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, file_path in entries:
+            if total <= self.maxsize:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._size = total
+            self._evictions += evicted
+
+    def _clear(self):
+        for _, _, file_path in self._entries():
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        with self._lock:
+            self._size = 0
+
+    def _currsize(self):
+        with self._lock:
+            size = self._size
+        if size is None:
+            # Other processes may have written to the directory; count it once.
+            size = sum(size for _, size, _ in self._entries())
+            with self._lock:
+                self._size = size
+        return size
+
+
+class SQLiteExportCache(ExportCache):
+    """Export cache stored in a SQLite database.
+
+    Each result is one row holding the pickled result, its size and the time it
+    was last read. When the stored results grow beyond ``maxsize`` the least
+    recently used rows are deleted. The database uses write-ahead logging so that
+    several processes can share it.
+
+    Keyword Parameters:
+        path (str or None):
+            The database file, created if needed. Defaults to ``exports.sqlite3``
+            in :func:`default_cache_dir`.
+        maxsize (int):
+            Maximum total size, in bytes, of the stored results. Defaults to 1 GiB.
+
+    Examples:
+        >>> cache = SQLiteExportCache("export-cache.sqlite3")
+    """
+
+    def __init__(self, path=None, maxsize=DEFAULT_EXPORT_CACHE_SIZE):
+        super().__init__(path or os.path.join(default_cache_dir(), "exports.sqlite3"), maxsize)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._db_lock, self._connection as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS exports ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS exports_accessed ON exports (accessed)"
+            )
+
+    def _load(self, key):
+        with self._db_lock, self._connection as connection:
+            row = connection.execute("SELECT value FROM exports WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE exports SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        return row[0]
+
+    def _store(self, key, blob):
+        with self._db_lock, self._connection as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO exports (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(blob), len(blob), time.time()),
+            )
+        self._evict()
+
+    def _evict(self):
+        evicted = 0
+        with self._db_lock, self._connection as connection:
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM exports").fetchone()[0]
+            if total > self.maxsize:
+                rows = connection.execute(
+                    "SELECT key, size FROM exports ORDER BY accessed"
+                ).fetchall()
+                for key, size in rows:
+                    if total <= self.maxsize:
+                        break
+                    connection.execute("DELETE FROM exports WHERE key = ?", (key,))
+                    total -= size
+                    evicted += 1
+        with self._lock:
+            self._evictions += evicted
+
+    def _clear(self):
+        with self._db_lock, self._connection as connection:
+            connection.execute("DELETE FROM exports")
+
+    def _currsize(self):
+        with self._db_lock:
+            return self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM exports"
+            ).fetchone()[0]
+
+
+# Backends selectable by name with StyledHTMLExporter.export_cache.
+EXPORT_CACHE_BACKENDS = {
+    "memory": MemoryExportCache,
+    "directory": DirectoryExportCache,
+    "sqlite": SQLiteExportCache,
+}
+
+_EXPORT_CACHES = {}
+_EXPORT_CACHES_LOCK = threading.Lock()
+
+
+def get_export_cache(backend="memory", path=None, maxsize=DEFAULT_EXPORT_CACHE_SIZE):
+    """Return the process-wide export cache for a backend and location.
+
+    Args:
+        backend (str):
+            ``"memory"``, ``"directory"``, ``"sqlite"`` or the importable name of
+            an :class:`ExportCache` subclass, such as ``"mypackage.caches.S3Cache"``.
+
+    Keyword Parameters:
+        path (str or None):
+            Location of a persistent cache. Defaults to the backend's default
+            location.
+        maxsize (int):
+            Maximum total size, in bytes, of the stored results. An existing cache
+            is resized to this bound. Defaults to 1 GiB.
+
+    Returns:
+        (ExportCache):
+            The cache, shared by all exporters using the same backend and path.
+
+    Raises:
+        ValueError: If ``backend`` does not name a known backend or an
+            :class:`ExportCache` subclass.
+
+    Examples:
+        >>> from jupyter_export_html_style.cache import get_export_cache
+        >>> cache = get_export_cache("sqlite", "build/export-cache.sqlite3")
+        >>> hits, misses, evictions, currsize, maxsize = cache.cache_info()
+    """
+    cache_class = EXPORT_CACHE_BACKENDS.get(backend)
+    if cache_class is None:
+        try:
+            cache_class = import_item(backend)
+        except (ImportError, ValueError) as e:
+            msg = f"Unknown export cache backend {backend!r}."
+            raise ValueError(msg) from e
+        if not (isinstance(cache_class, type) and issubclass(cache_class, ExportCache)):
+            msg = f"Export cache backend {backend!r} is not an ExportCache subclass."
+            raise ValueError(msg)
+    location = os.path.abspath(path) if path else None
+    with _EXPORT_CACHES_LOCK:
+        cache = _EXPORT_CACHES.get((cache_class, location))
+        if cache is None:
+            cache = cache_class(path=location, maxsize=maxsize)
+            _EXPORT_CACHES[(cache_class, location)] = cache
+    if cache.maxsize != maxsize:
+        cache.resize(maxsize)
+    return cache
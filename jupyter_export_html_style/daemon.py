@@ -0,0 +1,726 @@
+"""
+Long-running export daemon with a local HTTP API.
+
+Converting a notebook in a fresh ``jupyter nbconvert`` process mostly costs
+importing nbconvert, compiling templates and launching Chromium.
+:class:`ExportDaemon` pays for these once: it keeps warm exporters, forks a
+pool of worker processes that inherit them, and keeps the browser pool of the
+PDF exporter running. Export jobs arrive over HTTP, on a local TCP port or a
+Unix socket:
+
+.. code-block:: text
+
+    POST /export/<exporter>?path=<directory>&timeout=<seconds>
+
+with the notebook JSON as the body. The response streams the export back,
+with ``Content-Type`` set from its format. ``GET /status`` reports the
+daemon's counters as JSON.
+
+Start it from the command line::
+
+    jupyter-export-daemon --unix-socket /run/export.sock --workers 8
+
+and drive it with ``jupyter-export-loadtest`` (see :mod:`.loadtest`).
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import mimetypes
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections import Counter, namedtuple
+from concurrent.futures.process import BrokenProcessPool
+
+import nbformat
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+from traitlets.config import Config
+
+from .batch import EXPORTERS, _load_config, _warm_up
+from .exporters import StyledWebPDFExporter
+from .exporters.webpdf import (
+    _batch_context,
+    _print_batch_pdf,
+    _render_batch_html,
+    _worker_exporter,
+)
+
+# Exporters the daemon serves by default.
+DAEMON_EXPORTERS = ("styled_html", "styled_slides", "styled_webpdf")
+
+# Size of the pieces in which exports are streamed to the client.
+_CHUNK_SIZE = 64 * 1024
+
+# Seconds between checks whether a queued job was taken by a worker.
+_PROGRESS_INTERVAL = 0.05
+
+_log = logging.getLogger(__name__)
+
+DaemonExport = namedtuple("DaemonExport", ["output", "resources", "queue_seconds", "seconds"])
+DaemonExport.__doc__ = """The outcome of one export job of the daemon.
+
+Attributes:
+    output (str or bytes): The exported document.
+    resources (dict): The resources of the export, without template helpers.
+    queue_seconds (float): Time the job waited for a worker.
+    seconds (float): Time from accepting the job to its completion.
+"""
+
+
+class DaemonBusy(Exception):
+    """Raised when the daemon refuses a job because its queue is full or it is draining."""
+
+
+class InvalidNotebook(ValueError):
+    """Raised when the body of an export job is not a notebook."""
+
+
+class ExportDaemon:
+    """Runs export jobs on warm exporters, worker processes and browsers.
+
+    Every job is converted in one of ``workers`` processes, forked after the
+    exporters were created and their templates compiled. PDFs printed with
+    Playwright are rendered to HTML there, then printed on the browser pool
+    of this process, which is launched when the daemon starts and stays
+    running.
+
+    Args:
+        exporters (iterable): Names of the exporters to serve (keys of
+            :data:`~.batch.EXPORTERS`). Defaults to :data:`DAEMON_EXPORTERS`.
+
+    Keyword Parameters:
+        config (Config, dict or None): Configuration of the exporters. Defaults
+            to None.
+        workers (int or None): Number of worker processes. None uses one per
+            CPU; 0 converts in one background thread of this process.
+            Defaults to None.
+        max_pending (int): Maximum number of jobs accepted and not yet
+            finished. Further jobs are refused with :class:`DaemonBusy`, so
+            clients back off instead of piling up. Defaults to 64.
+        timeout (float or None): Default deadline of a job in seconds, from
+            the moment it is accepted. None or 0 waits indefinitely. Defaults
+            to 120.
+        start_method (str or None): How worker processes are started
+            (``"fork"``, ``"spawn"`` or ``"forkserver"``). Forked workers
+            inherit the warm exporters; the others build and warm up their
+            own. Use ``"spawn"`` in processes running other threads. Defaults
+            to ``"fork"`` where available.
+
+    Attributes:
+        counts (Counter): Jobs ``accepted``, ``completed``, ``failed``,
+            ``rejected`` and ``timed_out``.
+        restarts (int): Number of times the worker processes were replaced
+            after one of them died.
+        draining (bool): True once :meth:`drain` was called; new jobs are
+            refused.
+
+    Notes:
+        A job whose deadline passes while it waits for a worker is dropped
+        without being converted. A conversion already running when its
+        deadline passes is abandoned: the client gets a timeout while the
+        worker finishes it and picks up the next job; printing is cancelled
+        in the browser.
+
+        If a worker process dies, for instance killed for using too much
+        memory, the pool of workers is replaced and the jobs it was running
+        or holding are submitted once more; a job that breaks the new pool
+        too fails. Replacement workers are only forked while this process
+        runs no other thread.
+
+        The HTML of PDF exports is handed to the browser from memory,
+        whatever ``html_handoff`` says.
+
+    Examples:
+        >>> daemon = ExportDaemon(workers=4)
+        >>> daemon.start()
+        >>> server, address = daemon.listen(unix_socket="/tmp/export.sock")
+        >>> # ... run the event loop, then
+        >>> await daemon.drain()
+    """
+
+    def __init__(
+        self,
+        exporters=DAEMON_EXPORTERS,
+        config=None,
+        workers=None,
+        max_pending=64,
+        timeout=120.0,
+        start_method=None,
+    ):
+        self.config = Config(config or {})
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self.start_method = start_method
+        self.counts = Counter()
+        self.restarts = 0
+        self.draining = False
+        self._names = list(exporters)
+        self._exporters = {}
+        self._settings = {}
+        self._render_pool = None
+        self._restarting = None
+        self._pending = 0
+        self._idle = None
+        self._started = None
+
+    def start(self):
+        """Warm up the exporters, start the worker processes and the browsers.
+
+        Raises:
+            KeyError: If an exporter name is unknown.
+        """
+        for name in self._names:
+            # Forked workers find the same exporter in their copy of the worker cache.
+            self._settings[name] = settings = (EXPORTERS[name], self.config)
+            self._exporters[name] = exporter = _worker_exporter(settings)
+            _warm_up(exporter)
+
+        if self.workers == 0:
+            self._render_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        else:
+            self._render_pool = self._start_workers()
+        self._warm_up_browsers()
+        self._started = time.time()
+
+    async def export(self, name, notebook, path=None, timeout=None, progress=None):
+        """Run one export job.
+
+        Args:
+            name (str): Name of the exporter.
+            notebook (str or bytes): The notebook JSON.
+
+        Keyword Parameters:
+            path (str or None): Directory the notebook's local stylesheets and
+                images are resolved against. Defaults to the daemon's working
+                directory.
+            timeout (float or None): Deadline of the job in seconds. Defaults
+                to the daemon's ``timeout``.
+            progress (callable or None): Called with the stage the job enters:
+                ``"queued"`` once accepted, ``"converting"`` when a worker
+                takes it and ``"printing"`` when PDF exporters print it.
+                Defaults to None.
+
+        Returns:
+            (DaemonExport): The export and its timings.
+
+        Raises:
+            DaemonBusy: If the queue is full or the daemon is draining.
+            KeyError: If the daemon does not serve the exporter.
+            InvalidNotebook: If ``notebook`` cannot be read as a notebook.
+            TimeoutError: If the deadline passed.
+        """
+        if self.draining:
+            self.counts["rejected"] += 1
+            raise DaemonBusy("The daemon is shutting down")
+        exporter = self._exporters[name]
+        if self._pending >= self.max_pending:
+            self.counts["rejected"] += 1
+            raise DaemonBusy(f"{self._pending} jobs are pending")
+
+        timeout = self.timeout if timeout is None else timeout
+        submitted = time.time()
+        deadline = submitted + timeout if timeout else None
+        resources = {
+            "unique_key": "notebook",
+            "metadata": {"name": "notebook", "path": path or os.getcwd()},
+        }
+        self.counts["accepted"] += 1
+        self._pending += 1
+        self._get_idle().clear()
+        try:
+            if progress is not None:
+                progress("queued")
+            output, resources, started = await self._convert(
+                name, notebook, resources, deadline, progress
+            )
+            if isinstance(exporter, StyledWebPDFExporter):
+                if exporter.pdf_engine == "playwright":
+                    if progress is not None:
+                        progress("printing")
+                    job = exporter._page_job(None, resources["metadata"].get("path"), output)
+                    pool = exporter._get_browser_pool()
+                    output = await asyncio.wrap_future(pool.submit(job, _remaining(deadline)))
+                output = await asyncio.get_running_loop().run_in_executor(
+                    None, exporter._finish_output, output, resources
+                )
+        except TimeoutError:
+            self.counts["timed_out"] += 1
+            raise
+        except Exception:
+            self.counts["failed"] += 1
+            raise
+        finally:
+            self._pending -= 1
+            if not self._pending:
+                self._get_idle().set()
+        self.counts["completed"] += 1
+        return DaemonExport(output, resources, started - submitted, time.time() - submitted)
+
+    async def _convert(self, name, notebook, resources, deadline, progress):
+        """Convert a notebook in a worker, replacing the workers if one died.
+
+        Args:
+            name (str): Name of the exporter.
+            notebook (str or bytes): The notebook JSON.
+            resources (dict): Resources of the conversion.
+            deadline (float or None): Time by which the job must be done.
+            progress (callable or None): See :meth:`export`.
+
+        Returns:
+            (tuple): The result of :func:`_render`.
+
+        Raises:
+            BrokenProcessPool: If the job also broke the replacement workers.
+        """
+        for attempt in range(2):
+            pool = await self._get_render_pool()
+            try:
+                future = pool.submit(_render, self._settings[name], notebook, resources, deadline)
+                try:
+                    return await asyncio.wait_for(_result(future, progress), _remaining(deadline))
+                finally:
+                    future.cancel()
+            except BrokenProcessPool:
+                await self._replace_workers(pool)
+                if attempt:
+                    raise
+
+    async def _get_render_pool(self):
+        """Return the workers, waiting for them if they are being replaced."""
+        if self._restarting is not None:
+            return await asyncio.shield(self._restarting)
+        return self._render_pool
+
+    async def _replace_workers(self, broken):
+        """Replace a pool of workers one of which died, once for all its jobs.
+
+        Args:
+            broken (concurrent.futures.ProcessPoolExecutor): The broken pool.
+        """
+        if self._render_pool is not broken:
+            # Another job already replaced it.
+            await self._get_render_pool()
+            return
+        _log.warning("A worker process died; starting new workers")
+        self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+        start_method = self.start_method
+        if start_method in (None, "fork"):
+            start_method = _batch_context().get_start_method()
+        self._restarting = asyncio.get_running_loop().run_in_executor(
+            None, self._start_workers, start_method
+        )
+        try:
+            self._render_pool = await self._restarting
+        finally:
+            self._restarting = None
+        if self.draining and self._render_pool is not None:
+            self._render_pool.shutdown(wait=False, cancel_futures=True)
+            self._render_pool = None
+
+    def content_type(self, name, resources):
+        """Return the media type of an export.
+
+        Args:
+            name (str): Name of the exporter.
+            resources (dict): Resources of the export.
+
+        Returns:
+            (str): The media type, from the export's file extension.
+        """
+        extension = resources.get("output_extension") or ""
+        media_type = mimetypes.guess_type("export" + extension)[0]
+        media_type = media_type or self._exporters[name].output_mimetype
+        media_type = media_type or "application/octet-stream"
+        if media_type.startswith("text/"):
+            media_type += "; charset=UTF-8"
+        return media_type
+
+    def status(self):
+        """Report the state of the daemon.
+
+        Returns:
+            (dict): The served ``exporters``, the number of ``workers``, the
+                ``pending`` jobs and ``max_pending``, whether it is
+                ``draining``, its ``uptime`` in seconds, the job ``counts``,
+                the number of worker ``restarts`` and the ``browsers`` stats of
+                every browser pool it uses.
+        """
+        browsers = {
+            name: exporter._get_browser_pool().stats()
+            for name, exporter in self._exporters.items()
+            if isinstance(exporter, StyledWebPDFExporter) and exporter.pdf_engine == "playwright"
+        }
+        return {
+            "exporters": list(self._exporters),
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "draining": self.draining,
+            "uptime": time.time() - self._started if self._started else 0.0,
+            "counts": dict(self.counts),
+            "restarts": self.restarts,
+            "browsers": browsers,
+        }
+
+    async def drain(self, timeout=None):
+        """Stop accepting jobs, wait for the pending ones, then shut down.
+
+        Keyword Parameters:
+            timeout (float or None): Seconds to wait for pending jobs. Defaults
+                to None, waiting for all of them.
+
+        Returns:
+            (bool): True if every pending job finished in time.
+        """
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._get_idle().wait(), timeout)
+            finished = True
+        except TimeoutError:
+            finished = False
+        self.close()
+        return finished
+
+    def close(self):
+        """Stop the worker processes and close the browsers.
+
+        The closed browser pools are dropped from the process-wide pools, so
+        exporters used elsewhere in the process start new ones.
+        """
+        self.draining = True
+        if self._render_pool is not None:
+            self._render_pool.shutdown(wait=False, cancel_futures=True)
+            self._render_pool = None
+        for exporter in self._exporters.values():
+            if isinstance(exporter, StyledWebPDFExporter) and exporter.pdf_engine == "playwright":
+                exporter._get_browser_pool().close()
+
+    def make_app(self):
+        """Create the web application serving the daemon's API.
+
+        Returns:
+            (tornado.web.Application): The application.
+        """
+        return tornado.web.Application(
+            [
+                (r"/export/([^/]+)", _ExportHandler, {"daemon": self}),
+                (r"/status", _StatusHandler, {"daemon": self}),
+            ]
+        )
+
+    def listen(self, port=0, address="127.0.0.1", unix_socket=None):
+        """Serve the API on a local TCP port or a Unix socket.
+
+        Must be called from the event loop that serves the requests.
+
+        Keyword Parameters:
+            port (int): TCP port; 0 picks a free one. Defaults to 0.
+            address (str): Address to bind the port to. Defaults to
+                ``"127.0.0.1"``.
+            unix_socket (str or None): Path of a Unix socket to serve on
+                instead of a port. Defaults to None.
+
+        Returns:
+            (tuple): The ``tornado.httpserver.HTTPServer`` and the address it
+                listens on: the socket path or a ``(host, port)`` pair.
+        """
+        if unix_socket is not None:
+            sockets = [tornado.netutil.bind_unix_socket(unix_socket)]
+            bound = unix_socket
+        else:
+            sockets = tornado.netutil.bind_sockets(port, address)
+            bound = sockets[0].getsockname()[:2]
+        server = tornado.httpserver.HTTPServer(self.make_app())
+        server.add_sockets(sockets)
+        return server, bound
+
+    def _start_workers(self, start_method=None):
+        """Start the worker processes; forked ones inherit the warm exporters.
+
+        Keyword Parameters:
+            start_method (str or None): How the processes are started. Defaults
+                to the daemon's ``start_method``.
+
+        Returns:
+            (concurrent.futures.ProcessPoolExecutor): The running workers.
+        """
+        start_method = start_method or self.start_method
+        if start_method is None and "fork" in multiprocessing.get_all_start_methods():
+            start_method = "fork"
+        context = multiprocessing.get_context(start_method)
+        if context.get_start_method() == "fork":
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context
+            )
+        else:
+            # Other workers build and warm up their exporters as they start.
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_start_worker,
+                initargs=(list(self._settings.values()),),
+            )
+        # Forked pools start all their processes on the first job, before any
+        # other thread of this process exists.
+        pool.submit(int).result()
+        return pool
+
+    def _warm_up_browsers(self):
+        """Launch the browsers of the PDF exporters, so that no job waits for them."""
+
+        async def open_page(page):
+            return None
+
+        for name, exporter in self._exporters.items():
+            if isinstance(exporter, StyledWebPDFExporter) and exporter.pdf_engine == "playwright":
+                try:
+                    exporter._get_browser_pool().run(open_page)
+                except Exception as e:
+                    _log.warning("Cannot start the browsers of %s: %s", name, e)
+
+    def _get_idle(self):
+        """Return the event set while no job is pending, created on the serving loop."""
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            if not self._pending:
+                self._idle.set()
+        return self._idle
+
+
+class _DaemonHandler(tornado.web.RequestHandler):
+    """Base of the handlers of the daemon's API."""
+
+    def initialize(self, daemon):
+        self.daemon = daemon
+
+    def write_error(self, status_code, **kwargs):
+        """Report errors as JSON."""
+        self._fail(status_code, self._reason)
+
+    def _fail(self, status_code, message, headers=None):
+        """Finish the request with an error status and a JSON body."""
+        self.clear()
+        self.set_status(status_code)
+        for name, value in (headers or {}).items():
+            self.set_header(name, value)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"status": status_code, "message": message}))
+
+
+class _ExportHandler(_DaemonHandler):
+    """Runs an export job and streams the export back."""
+
+    async def post(self, name):
+        timeout = self.get_query_argument("timeout", None)
+        try:
+            job = await self.daemon.export(
+                name,
+                self.request.body,
+                path=self.get_query_argument("path", None),
+                timeout=float(timeout) if timeout is not None else None,
+            )
+        except DaemonBusy as e:
+            return self._fail(503, str(e), {"Retry-After": "1"})
+        except KeyError:
+            return self._fail(404, f"Unknown exporter {name!r}")
+        except InvalidNotebook as e:
+            return self._fail(400, str(e))
+        except TimeoutError:
+            return self._fail(504, "The export missed its deadline")
+        except Exception as e:
+            _log.exception("Export with %s failed", name)
+            return self._fail(500, f"{type(e).__name__}: {e}")
+
+        output = job.output.encode("utf-8") if isinstance(job.output, str) else job.output
+        self.set_header("Content-Type", self.daemon.content_type(name, job.resources))
+        self.set_header("X-Export-Queue-Seconds", f"{job.queue_seconds:.4f}")
+        self.set_header("X-Export-Seconds", f"{job.seconds:.4f}")
+        for start in range(0, len(output), _CHUNK_SIZE):
+            self.write(output[start : start + _CHUNK_SIZE])
+            # Waits for slow clients, so that exports are not all buffered at once.
+            await self.flush()
+
+
+class _StatusHandler(_DaemonHandler):
+    """Reports the state of the daemon."""
+
+    def get(self):
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(self.daemon.status()))
+
+
+async def _result(future, progress):
+    """Wait for the result of a worker job, reporting when a worker takes it.
+
+    Args:
+        future (concurrent.futures.Future): The job.
+        progress (callable or None): Called with ``"converting"`` once the job
+            runs.
+
+    Returns:
+        (object): The job's result.
+    """
+    waiter = asyncio.wrap_future(future)
+    if progress is None:
+        return await waiter
+    while not future.running() and not waiter.done():
+        await asyncio.wait([waiter], timeout=_PROGRESS_INTERVAL)
+    progress("converting")
+    return await waiter
+
+
+def _remaining(deadline):
+    """Return the seconds left until a deadline, or None without one."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+def _start_worker(settings):
+    """Build and warm up the exporters of a spawned worker.
+
+    Args:
+        settings (list): Exporter class and config of every served exporter.
+    """
+    for exporter_settings in settings:
+        _warm_up(_worker_exporter(exporter_settings))
+
+
+def _render(settings, notebook, resources, deadline):
+    """Convert one notebook; runs in a worker.
+
+    Args:
+        settings (tuple): Exporter class and config.
+        notebook (str or bytes): The notebook JSON.
+        resources (dict): Resources of the conversion.
+        deadline (float or None): Time after which the job is not started.
+
+    Returns:
+        (tuple): The export, or the HTML to print for PDF exporters printing
+            with Playwright, its resources without template helpers, and the
+            time the conversion started.
+
+    Raises:
+        TimeoutError: If the deadline passed before the job started.
+        InvalidNotebook: If ``notebook`` cannot be read.
+    """
+    started = time.time()
+    if deadline is not None and started > deadline:
+        raise TimeoutError("The deadline passed before the export started")
+    try:
+        nb = nbformat.reads(notebook, as_version=4)
+    except Exception as e:
+        raise InvalidNotebook(f"Cannot read the notebook: {e}") from None
+
+    exporter = _worker_exporter(settings)
+    if isinstance(exporter, StyledWebPDFExporter):
+        task = _print_batch_pdf if exporter.pdf_engine == "weasyprint" else _render_batch_html
+        output, resources = task(settings, nb, resources)
+    else:
+        output, resources = exporter.from_notebook_node(nb, resources)
+        resources = {name: value for name, value in resources.items() if not callable(value)}
+    return output, resources, started
+
+
+def main(argv=None):
+    """Run the export daemon from the command line until it is interrupted.
+
+    ``SIGINT`` and ``SIGTERM`` stop accepting connections and drain the
+    pending jobs before exiting.
+
+    Args:
+        argv (list or None): Command line arguments. Defaults to ``sys.argv[1:]``.
+
+    Returns:
+        (int): The exit status: 0 if every pending job finished while draining.
+    """
+    parser = argparse.ArgumentParser(
+        prog="jupyter-export-daemon",
+        description="Serve styled notebook exports from warm exporters over a local HTTP API.",
+    )
+    parser.add_argument(
+        "--to",
+        action="append",
+        choices=sorted(EXPORTERS),
+        help="Exporter to serve; repeat for several. Defaults to "
+        + ", ".join(DAEMON_EXPORTERS)
+        + ".",
+    )
+    parser.add_argument("--port", type=int, default=8765, help="TCP port. Defaults to 8765.")
+    parser.add_argument(
+        "--address", default="127.0.0.1", help="Address to bind. Defaults to 127.0.0.1."
+    )
+    parser.add_argument("--unix-socket", help="Serve on this Unix socket instead of a port.")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        help="Number of worker processes; 0 converts in a thread. Defaults to one per CPU.",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=64,
+        help="Jobs accepted before new ones are refused with 503. Defaults to 64.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=120.0,
+        help="Default deadline of a job in seconds; 0 for none. Defaults to 120.",
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=60.0,
+        help="Seconds to wait for pending jobs when stopping. Defaults to 60.",
+    )
+    parser.add_argument("--config", help="A .json or .py traitlets configuration file.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    daemon = ExportDaemon(
+        args.to or DAEMON_EXPORTERS,
+        _load_config(args.config) if args.config else None,
+        args.workers,
+        args.max_pending,
+        args.timeout,
+    )
+    daemon.start()
+
+    async def serve():
+        server, address = daemon.listen(args.port, args.address, args.unix_socket)
+        _log.info("Serving %s on %s", ", ".join(daemon.status()["exporters"]), address)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # Not available on Windows; Ctrl+C raises KeyboardInterrupt there.
+                pass
+        try:
+            await stop.wait()
+        finally:
+            _log.info("Draining %d pending jobs", daemon.status()["pending"])
+            server.stop()
+            finished = await daemon.drain(args.drain_timeout)
+            await server.close_all_connections()
+            if args.unix_socket:
+                os.unlink(args.unix_socket)
+        return finished
+
+    return 0 if asyncio.run(serve()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
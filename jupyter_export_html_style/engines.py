@@ -0,0 +1,94 @@
+"""
+PDF engines that print exported HTML without a browser.
+
+:class:`~jupyter_export_html_style.StyledWebPDFExporter` prints with headless
+Chromium through Playwright by default. WeasyPrint is a pure-Python HTML/CSS
+layout engine that prints in-process instead: it needs no browser binary and
+starts in milliseconds, but runs no JavaScript, so MathJax, widgets and other
+scripted output are printed as their static fallbacks.
+"""
+
+from importlib import util as importlib_util
+
+# The engines StyledWebPDFExporter can print with.
+PDF_ENGINES = ("playwright", "weasyprint")
+
+WEASYPRINT_INSTALLED = importlib_util.find_spec("weasyprint") is not None
+
+# Page setup matching Playwright's page.pdf() defaults, so that both engines
+# produce pages of the same size.
+_PAGE_CSS = "@page { size: letter; margin: 0 }"
+
+
+def _require_weasyprint():
+    """Import WeasyPrint, reporting how to install it if it is missing.
+
+    Returns:
+        (module): The ``weasyprint`` module.
+
+    Raises:
+        RuntimeError: If WeasyPrint or the Pango library it uses is not installed.
+    """
+    try:
+        import weasyprint  # type: ignore[import-not-found]
+    except ModuleNotFoundError as e:
+        msg = (
+            "WeasyPrint is not installed to support browser-free PDF conversion. "
+            "Please install `jupyter-export-html-style[weasyprint]` to enable."
+        )
+        raise RuntimeError(msg) from e
+    except OSError as e:
+        msg = (
+            "WeasyPrint cannot load the Pango library it needs to support "
+            "browser-free PDF conversion. Please install Pango to enable, see "
+            "https://doc.courtbouillon.org/weasyprint/stable/first_steps.html"
+        )
+        raise RuntimeError(msg) from e
+    return weasyprint
+
+
+def weasyprint_pdf(router, stream=None):
+    """Print a document to PDF with WeasyPrint.
+
+    The document and every resource it references are requested through
+    ``router``, exactly as a browser page would request them, so local images
+    are read from the notebook's directory and CDN assets come from the asset
+    store under the same ``remote_assets`` policy.
+
+    Args:
+        router (AssetRouter): Router serving the document at ``router.url``.
+
+    Keyword Parameters:
+        stream (file-like or None): Binary stream that receives the PDF. If
+            None, the PDF is returned. Defaults to None.
+
+    Returns:
+        (bytes or None): PDF data, or None if it was written to ``stream``.
+
+    Raises:
+        RuntimeError: If WeasyPrint is not installed.
+
+    Examples:
+        >>> router = AssetRouter(None, notebook_dir, store, html=html)
+        >>> pdf = weasyprint_pdf(router)
+    """
+    weasyprint = _require_weasyprint()
+    from weasyprint.urls import URLFetcher, URLFetcherResponse  # type: ignore[import-not-found]
+
+    class RouterFetcher(URLFetcher):
+        """Fetches every URL of the document through the router."""
+
+        def fetch(self, url, headers=None):
+            body, content_type = router.fetch(url, self.fetch_remote)
+            headers = {"Content-Type": content_type} if content_type else None
+            return URLFetcherResponse(url, body, headers)
+
+        def fetch_remote(self, url):
+            response = super().fetch(url)
+            try:
+                return response.read(), response.headers.get("Content-Type")
+            finally:
+                response.close()
+
+    document = weasyprint.HTML(url=router.url, url_fetcher=RouterFetcher())
+    return document.write_pdf(target=stream, stylesheets=[weasyprint.CSS(string=_PAGE_CSS)])
@@ -6,11 +6,13 @@ custom cell-level styling when exporting notebooks to different formats.
 """
 
 from .html import StyledHTMLExporter
+from .screenshot import StyledScreenshotExporter
 from .slides import StyledSlidesExporter
 from .webpdf import StyledWebPDFExporter
 
 __all__ = [
     "StyledHTMLExporter",
+    "StyledScreenshotExporter",
     "StyledSlidesExporter",
     "StyledWebPDFExporter",
 ]
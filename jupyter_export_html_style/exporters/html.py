@@ -2,15 +2,97 @@
 Custom HTML exporter with style support.
 """
 
-import base64
-import mimetypes
+import io
 import os
 
-import bs4
-from nbconvert.exporters import HTMLExporter
-from traitlets import Unicode
-
+import nbconvert
+from jinja2 import pass_context
+from nbconvert.exporters import HTMLExporter, TemplateExporter
+from nbconvert.filters.highlight import Highlight2HTML
+from nbconvert.filters.markdown_mistune import IPythonRenderer, MarkdownWithMath
+from nbconvert.filters.widgetsdatatypefilter import WidgetsDataTypeFilter
+from traitlets import Bool, Int, Unicode
+
+from .. import __version__
+from ..cache import DEFAULT_EXPORT_CACHE_SIZE, get_export_cache
+from ..fragments import (
+    FragmentStore,
+    cell_dom_id,
+    cell_fragment_key,
+    fingerprint,
+    get_fragment_cache,
+)
+from ..image_optimizer import ImageOptimizer
+from ..images import ImageEmbedder, find_image_references, get_image_cache
 from ..preprocessor import StylePreprocessor
+from ..streaming import AccessibilityRewriter
+
+# Size of the pieces in which rendered HTML is post-processed and written out.
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Template filters whose behaviour depends on the notebook being converted.
+_NOTEBOOK_FILTERS = ("highlight_code", "filter_data_type", "cached_fragment", "cache_fragment")
+
+
+def _coalesce(chunks, size=_STREAM_CHUNK_SIZE):
+    """Join the many small pieces produced by a template into larger chunks.
+
+    Args:
+        chunks (iterable of str): Pieces of a document.
+
+    Keyword Parameters:
+        size (int): Minimum length of the chunks produced, except the last.
+            Defaults to 64 KiB.
+
+    Yields:
+        (str): Chunks of at least ``size`` characters.
+    """
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _lstrip_document(chunks):
+    """Strip leading line breaks from a chunked document, as nbconvert does.
+
+    Args:
+        chunks (iterable of str): Pieces of a document.
+
+    Yields:
+        (str): The same pieces, without the document's leading line breaks.
+    """
+    chunks = iter(chunks)
+    for chunk in chunks:
+        chunk = chunk.lstrip("\r\n")
+        if chunk:
+            yield chunk
+            break
+    yield from chunks
+
+
+def _file_fingerprint(path):
+    """Describe the current state of a file for a cache key.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        (list): ``[path, mtime_ns, size]``, or ``[path, None, None]`` if the file
+            does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return [path, None, None]
+    return [path, st.st_mtime_ns, st.st_size]
 
 
 class StyledHTMLExporter(HTMLExporter):
@@ -29,6 +111,28 @@ class StyledHTMLExporter(HTMLExporter):
         export_from_notebook (str): Label for the export option.
         template_name (Unicode): Name of the template to use. Defaults to
             "styled". Can be configured via traitlets config system.
+        image_cache_size (Int): Maximum size in bytes of the process-wide cache
+            of encoded images shared by all styled exporters. Set to 0 to
+            disable caching. Defaults to 64 MiB.
+        deduplicate_images (Bool): Store each distinct image payload only once
+            in the exported document. Defaults to False.
+        external_images (Bool): Write images to a sidecar directory instead of
+            embedding them. Defaults to False.
+        external_images_threshold (Int): Size in bytes below which images stay
+            embedded when ``external_images`` is enabled. Defaults to 0.
+        optimize_images (Bool): Downscale and recompress images before they are
+            embedded or externalized. Defaults to False.
+        incremental (Bool): Cache the rendered HTML of each cell and render only
+            cells that changed since a previous export. Defaults to False.
+        fragment_cache_size (Int): Maximum total length of the process-wide
+            cache of rendered cell fragments. Defaults to 256 MiB.
+        export_cache (Unicode): Backend of the cache of complete exports:
+            ``"memory"``, ``"directory"``, ``"sqlite"`` or the importable name of
+            an ``ExportCache`` subclass. Empty to disable. Defaults to "".
+        export_cache_path (Unicode): Directory or database file of a persistent
+            export cache. Defaults to the backend's default location.
+        export_cache_size (Int): Maximum total size in bytes of the cached
+            exports. Defaults to 1 GiB.
 
     Notes:
         The exporter supports multiple types of styles:
@@ -49,6 +153,54 @@ class StyledHTMLExporter(HTMLExporter):
         HTML elements (such as <div> tags) in markdown cells are preserved
         correctly without having their content stripped.
 
+        Encoded images are kept in a process-wide LRU cache keyed by the resolved
+        file path, modification time and size, so exporting many notebooks that
+        share the same images reads and encodes each image only once. Cache
+        statistics are available from
+        ``jupyter_export_html_style.images.get_image_cache().cache_info()``.
+
+        With ``deduplicate_images`` enabled, an image that appears several times
+        in a notebook (as a file reference, an attachment or an ``image/png`` or
+        ``image/jpeg`` output) is written into the document once; the other
+        ``<img>`` tags reference it and a small script restores their sources
+        when the page loads. Viewers without JavaScript show those tags as blank
+        placeholders, so documents rendered without scripts
+        (``resources["javascript"] = False``) keep every copy.
+
+        With ``external_images`` enabled, markdown images, attachments and output
+        images are instead written to a sidecar directory (``output_files_dir``
+        from the resources, or ``<notebook name>_files``) under content-hashed
+        file names, and the HTML points at them. The files are listed in
+        ``resources["outputs"]`` so that nbconvert's ``FilesWriter`` saves them
+        next to the HTML. Images smaller than ``external_images_threshold`` bytes
+        stay embedded. This mode takes precedence over ``embed_images``.
+
+        With ``optimize_images`` enabled, images pass through an
+        :class:`~jupyter_export_html_style.image_optimizer.ImageOptimizer` (configured
+        through its own ``ImageOptimizer`` config section) before they are encoded,
+        and a report of the bytes saved is stored in
+        ``resources["image_optimization"]``. This requires Pillow.
+
+        With ``incremental`` enabled, each cell is rendered once and its HTML is
+        kept in a process-wide cache under a key derived from the preprocessed
+        cell and from everything else that affects its rendering: the exporter
+        configuration, the template files, the notebook's language and widget
+        state and the package versions. Re-exporting a notebook renders only the
+        cells whose key changed; the numbers of cached and rendered cells are
+        reported in ``resources["fragment_cache"]``. In this mode cells get DOM
+        ids derived from their nbformat cell ids (``cell-<id>``) instead of their
+        position, so inserting a cell does not invalidate the cells after it.
+
+        With ``export_cache`` set, :meth:`from_notebook_node` first looks the
+        export up in a cache of complete results (see
+        :mod:`jupyter_export_html_style.cache`). The key covers the notebook
+        content, the exporter class and its effective configuration, the template
+        files, the package versions, the input resources and the modification
+        times of the local stylesheets and images the notebook references. A hit
+        returns a copy of the cached document and resources without converting
+        anything; for ``StyledWebPDFExporter`` this skips the browser entirely.
+        The streaming methods always convert.
+
     Examples:
         >>> from jupyter_export_html_style import StyledHTMLExporter
         >>> exporter = StyledHTMLExporter()
@@ -56,6 +208,15 @@ class StyledHTMLExporter(HTMLExporter):
 
         >>> # Disable image embedding if needed
         >>> exporter = StyledHTMLExporter(embed_images=False)
+
+        >>> # Keep small images inline and write the rest to a sidecar directory
+        >>> exporter = StyledHTMLExporter(external_images=True, external_images_threshold=8192)
+
+        >>> # Re-render only the cells that changed since the last export
+        >>> exporter = StyledHTMLExporter(incremental=True)
+
+        >>> # Reuse exports across CI builds
+        >>> exporter = StyledHTMLExporter(export_cache="sqlite", export_cache_path="build/cache.db")
     """
 
     export_from_notebook = "HTML (with styles)"
@@ -63,6 +224,103 @@ class StyledHTMLExporter(HTMLExporter):
     # Custom template file (can be overridden)
     template_name = Unicode("styled", help="Name of the template to use").tag(config=True)
 
+    image_cache_size = Int(
+        64 * 1024 * 1024,
+        help="""
+        Maximum size in bytes of the process-wide cache of encoded images.
+
+        The cache is shared by all styled exporters in the process. Set to 0 to
+        disable caching.
+        """,
+    ).tag(config=True)
+
+    deduplicate_images = Bool(
+        False,
+        help="""
+        Store each distinct image payload only once in the exported document.
+
+        Repeated images reference the stored copy and are restored by a small
+        script when the page loads, so they need a viewer that runs JavaScript.
+        Documents rendered with ``resources["javascript"] = False`` (such as PDFs
+        printed by WeasyPrint) embed every copy instead.
+        """,
+    ).tag(config=True)
+
+    external_images = Bool(
+        False,
+        help="""
+        Write images to a sidecar directory instead of embedding them.
+
+        Markdown images, attachments and output images are saved under
+        content-hashed file names in ``output_files_dir`` (or
+        ``<notebook name>_files``) and listed in ``resources["outputs"]``.
+        Takes precedence over ``embed_images``.
+        """,
+    ).tag(config=True)
+
+    external_images_threshold = Int(
+        0,
+        help="""
+        Size in bytes below which images stay embedded as data URIs when
+        ``external_images`` is enabled.
+        """,
+    ).tag(config=True)
+
+    optimize_images = Bool(
+        False,
+        help="""
+        Downscale and recompress images before they are embedded or externalized.
+
+        The optimizer is configured through the ``ImageOptimizer`` config section.
+        Requires Pillow.
+        """,
+    ).tag(config=True)
+
+    incremental = Bool(
+        False,
+        help="""
+        Cache the rendered HTML of each cell and render only cells that changed.
+
+        Cells are identified by their nbformat cell ids, which also become their
+        DOM ids (``cell-<id>``), so inserting or moving a cell does not
+        invalidate the others.
+        """,
+    ).tag(config=True)
+
+    fragment_cache_size = Int(
+        256 * 1024 * 1024,
+        help="""
+        Maximum total length of the process-wide cache of rendered cell fragments.
+
+        The cache is shared by all styled exporters in the process and is only
+        used when ``incremental`` is enabled. Set to 0 to disable caching.
+        """,
+    ).tag(config=True)
+
+    export_cache = Unicode(
+        "",
+        help="""
+        Backend of the cache of complete exports.
+
+        One of "memory", "directory" or "sqlite", or the importable name of a
+        jupyter_export_html_style.cache.ExportCache subclass. Leave empty to
+        disable the cache.
+        """,
+    ).tag(config=True)
+
+    export_cache_path = Unicode(
+        "",
+        help="""
+        Directory (directory backend) or database file (sqlite backend) of the
+        export cache. Defaults to a location under $XDG_CACHE_HOME.
+        """,
+    ).tag(config=True)
+
+    export_cache_size = Int(
+        DEFAULT_EXPORT_CACHE_SIZE,
+        help="Maximum total size in bytes of the cached exports.",
+    ).tag(config=True)
+
     def __init__(self, **kw):
         """Initialize the exporter and register the style preprocessor.
 
@@ -88,6 +346,23 @@ class StyledHTMLExporter(HTMLExporter):
         # Register the style preprocessor
         self.register_preprocessor(StylePreprocessor, enabled=True)
 
+    def _preprocess(self, nb, resources):
+        """Run the preprocessors and compile the collected styles into CSS.
+
+        Args:
+            nb (NotebookNode): The notebook to preprocess.
+            resources (dict): Additional resources used in the conversion process.
+
+        Returns:
+            (tuple): A tuple containing:
+                - nb (NotebookNode): The processed notebook.
+                - resources (dict): Updated resources with the compiled CSS in
+                    ``resources["styled_css"]``.
+        """
+        nb, resources = super()._preprocess(nb, resources)
+        resources["styled_css"] = self._generate_css(resources)
+        return nb, resources
+
     def from_notebook_node(self, nb, resources=None, **kw):
         """Convert a notebook node to HTML with style support.
 
@@ -104,40 +379,128 @@ class StyledHTMLExporter(HTMLExporter):
 
         Returns:
             (tuple): A tuple containing:
-                - output (str): The HTML output with injected style blocks.
+                - output (str): The HTML output with styles.
                 - resources (dict): Updated resources dictionary.
 
         Notes:
+            Cell and notebook styles are compiled once, after preprocessing, and
+            rendered by the template from ``resources["styled_css"]``.
+
             The notebook metadata 'anchors' field controls whether anchor links
             (¶) are added to headers in markdown cells. If set to False, anchor
             links are excluded. By default (or if set to True), anchor links are
             included. This setting is temporary and does not affect subsequent
             exports with the same exporter instance.
+
+            The document is produced by :meth:`iter_from_notebook_node` and
+            joined into a single string.
+
+            If ``export_cache`` is set, a cached result for the same inputs is
+            returned instead of converting the notebook.
         """
-        # Save original exclude_anchor_links setting
-        original_exclude_anchor_links = self.exclude_anchor_links
+        cache = self._get_export_cache()
+        if cache is None:
+            return self._from_notebook_node_uncached(nb, resources, **kw)
+
+        key = self._export_cache_key(nb, resources)
+        cached = cache.get(key)
+        if cached is not None:
+            self.log.debug("Using cached export %s", key)
+            return cached
+        output, resources = self._from_notebook_node_uncached(nb, resources, **kw)
+        if not cache.put(key, output, resources):
+            self.log.debug("Export result could not be cached")
+        return output, resources
 
-        # Check notebook metadata for anchor links preference
-        # If metadata.anchors is False, exclude anchor links
-        # Default is to include anchor links (backward compatible)
-        if "anchors" in nb.metadata:
-            self.exclude_anchor_links = not nb.metadata["anchors"]
+    def _from_notebook_node_uncached(self, nb, resources=None, **kw):
+        """Convert a notebook node without consulting the export cache.
 
-        # Save the user's embed_images preference
-        should_embed = self.embed_images
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            resources (dict, optional): Additional resources used in the conversion
+                process. Defaults to None.
+            **kw (dict): Additional keyword arguments passed to
+                :meth:`iter_from_notebook_node`.
 
-        # Temporarily disable parent's embed_images to avoid the bug where
-        # BeautifulSoup auto-closes incomplete HTML fragments during markdown rendering
-        self.embed_images = False
+        Returns:
+            (tuple): The output (str) and the updated resources (dict).
+        """
+        chunks, resources = self.iter_from_notebook_node(nb, resources, **kw)
+        return "".join(chunks), resources
+
+    def iter_from_notebook_node(self, nb, resources=None, **kw):
+        """Convert a notebook node to HTML, producing the document as a stream of chunks.
 
-        try:
-            # Process the notebook with our preprocessor
-            output, resources = super().from_notebook_node(nb, resources, **kw)
-        finally:
-            # Restore embed_images setting
-            self.embed_images = should_embed
-            # Restore original exclude_anchor_links setting
-            self.exclude_anchor_links = original_exclude_anchor_links
+        The notebook is preprocessed immediately; the template is then rendered
+        lazily with Jinja's streaming ``generate()``, and the accessibility and
+        image post-processing are applied chunk by chunk as the document is
+        consumed. The full document is never held in memory.
+
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            resources (dict, optional): Additional resources used in the conversion
+                process. If None, an empty dictionary is created. Defaults to None.
+            **kw (dict): Additional keyword arguments passed to the parent
+                from_notebook_node method.
+
+        Returns:
+            (tuple): A tuple containing:
+                - chunks (iterator): Iterator over the pieces (str) of the HTML
+                    document.
+                - resources (dict): Updated resources dictionary. Entries that
+                    depend on the rendered document, such as externalized
+                    images in ``resources["outputs"]`` and the
+                    ``image_optimization`` report, are complete once the
+                    iterator is exhausted.
+
+        Notes:
+            Nothing that depends on the notebook is set on the exporter: the
+            markdown settings travel in ``resources["markdown_render"]`` and the
+            notebook's code highlighter, output filter and fragment store are
+            passed to the template as ``render_filters`` (see
+            :meth:`_notebook_filters`). Several streams may therefore be open on
+            one exporter at once, and a stream that is abandoned part way
+            leaves the exporter unchanged.
+
+            The filter and resource setup mirrors
+            ``HTMLExporter.from_notebook_node`` and
+            ``TemplateExporter.from_notebook_node`` of nbconvert 7, which is the
+            range the package's dependency pins.
+
+        Examples:
+            >>> exporter = StyledHTMLExporter()
+            >>> chunks, resources = exporter.iter_from_notebook_node(notebook)
+            >>> with open("notebook.html", "w", encoding="utf-8") as f:
+            ...     f.writelines(chunks)
+        """
+        resources = self._init_resources(resources)
+
+        # Preprocess eagerly, as TemplateExporter.from_notebook_node does, so that
+        # the resources are populated before the first chunk is requested. The
+        # template rendering of TemplateExporter is skipped in favour of streaming.
+        nb_copy, resources = super(TemplateExporter, self).from_notebook_node(
+            nb, resources, **kw
+        )
+        resources.setdefault("raw_mimetypes", self.raw_mimetypes)
+        resources.setdefault("output_mimetype", self.output_mimetype)
+        resources["global_content_filter"] = {
+            "include_code": not self.exclude_code_cell,
+            "include_markdown": not self.exclude_markdown,
+            "include_raw": not self.exclude_raw,
+            "include_unknown": not self.exclude_unknown,
+            "include_input": not self.exclude_input,
+            "include_output": not self.exclude_output,
+            "include_output_stdin": not self.exclude_output_stdin,
+            "include_input_prompt": not self.exclude_input_prompt,
+            "include_output_prompt": not self.exclude_output_prompt,
+            "no_prompt": self.exclude_input_prompt and self.exclude_output_prompt,
+        }
+        resources["markdown_render"] = self._markdown_render_options(nb)
+
+        fragments = FragmentStore(self._get_fragment_cache())
+        filters = self._notebook_filters(nb, resources, fragments)
+        if self.incremental:
+            self._assign_fragment_keys(nb_copy, resources)
 
         # Collect attachments from notebook cells for image embedding
         attachments = {}
@@ -145,63 +508,398 @@ class StyledHTMLExporter(HTMLExporter):
             if hasattr(cell, "attachments") and cell.attachments:
                 attachments.update(cell.attachments)
 
-        # Embed images in the final HTML if image embedding is enabled
-        # This processes the complete HTML document after all rendering is done,
-        # which avoids issues with BeautifulSoup auto-closing incomplete HTML fragments
-        if should_embed:
-            output = self._embed_images_in_html(output, attachments, resources)
-
-        # Prepare all custom style blocks to inject before </head>
-        style_blocks = []
-
-        # Add custom cell styling section if styles were collected
-        if resources and "styles" in resources and resources["styles"]:
-            style_block = self._generate_style_block(resources["styles"])
-            if style_block:
-                style_blocks.append(style_block)
-
-        # Add notebook-level styles and stylesheets
-        if resources and "notebook_styles" in resources:
-            notebook_style_block = self._generate_notebook_style_block(
-                resources["notebook_styles"], resources
+        chunks = self._iter_render(nb_copy, resources, attachments, fragments, filters)
+        return chunks, resources
+
+    def default_filters(self):
+        """Get the default filters, with the per-notebook ones dispatched per render.
+
+        Yields:
+            (tuple): ``(name, filter)`` pairs for the Jinja environment.
+        """
+        yield from super().default_filters()
+        for name in _NOTEBOOK_FILTERS:
+            yield (name, self._notebook_filter(name))
+
+    def _notebook_filter(self, name):
+        """Return a filter that calls the current render's implementation of ``name``.
+
+        The Jinja environment is shared by every export of the exporter, so
+        filters that depend on the notebook are looked up in the template's
+        ``render_filters`` variable instead of being registered per export.
+
+        Args:
+            name (str): One of the names in ``_NOTEBOOK_FILTERS``.
+
+        Returns:
+            (callable): The dispatching filter.
+        """
+
+        @pass_context
+        def dispatch(context, *args, **kwargs):
+            filters = context.get("render_filters")
+            if filters is None:
+                # Rendered outside iter_from_notebook_node, e.g. by nbconvert itself.
+                filters = self._notebook_filters(
+                    context.get("nb", {"metadata": {}}),
+                    context.get("resources", {}),
+                    FragmentStore(None),
+                )
+            return filters[name](*args, **kwargs)
+
+        return dispatch
+
+    def _notebook_filters(self, nb, resources, fragments):
+        """Build the filters that depend on the notebook being converted.
+
+        Mirrors the setup at the top of ``HTMLExporter.from_notebook_node``,
+        which cannot be reused because it also renders the whole document and
+        registers the filters on the shared environment.
+
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            resources (dict): Resources returned by ``_init_resources``.
+            fragments (FragmentStore): The fragment store of this export.
+
+        Returns:
+            (dict): The filters named in ``_NOTEBOOK_FILTERS``.
+        """
+        langinfo = nb["metadata"].get("language_info", {})
+        lexer = langinfo.get("pygments_lexer", langinfo.get("name", None))
+        return {
+            "highlight_code": self.filters.get(
+                "highlight_code", Highlight2HTML(pygments_lexer=lexer, parent=self)
+            ),
+            "filter_data_type": WidgetsDataTypeFilter(
+                notebook_metadata=self._nb_metadata, parent=self, resources=resources
+            ),
+            "cached_fragment": fragments.lookup,
+            "cache_fragment": fragments.store,
+        }
+
+    def _markdown_render_options(self, nb):
+        """Return the markdown renderer settings for one export.
+
+        Images are embedded in the finished document by
+        :meth:`_iter_embed_images`, so the markdown renderer's own embedding is
+        always off; this keeps explicit HTML in markdown cells intact. A
+        notebook's ``anchors`` metadata overrides ``exclude_anchor_links``.
+
+        Args:
+            nb (NotebookNode): The notebook being converted.
+
+        Returns:
+            (dict): ``embed_images`` and ``exclude_anchor_links`` for
+                :meth:`markdown2html`.
+        """
+        exclude_anchor_links = self.exclude_anchor_links
+        if "anchors" in nb.metadata:
+            exclude_anchor_links = not nb.metadata["anchors"]
+        return {"embed_images": False, "exclude_anchor_links": exclude_anchor_links}
+
+    @pass_context
+    def markdown2html(self, context, source):
+        """Convert markdown to HTML with the settings of the current export.
+
+        Reads ``resources["markdown_render"]`` from the template context and
+        falls back to the exporter's own settings, so the filter works the
+        same when a template is rendered outside :meth:`iter_from_notebook_node`.
+
+        Args:
+            context (jinja2.runtime.Context): The template context.
+            source (str): The markdown source of a cell.
+
+        Returns:
+            (str): The rendered HTML.
+        """
+        resources = context.get("resources", {})
+        options = resources.get("markdown_render", {})
+        cell = context.get("cell", {})
+        renderer = IPythonRenderer(
+            escape=False,
+            attachments=cell.get("attachments", {}),
+            embed_images=options.get("embed_images", self.embed_images),
+            path=resources.get("metadata", {}).get("path", ""),
+            anchor_link_text=self.anchor_link_text,
+            exclude_anchor_links=options.get(
+                "exclude_anchor_links", self.exclude_anchor_links
+            ),
+            **self.lexer_options,
+        )
+        return MarkdownWithMath(renderer=renderer).render(source)
+
+    def export_to_stream(self, nb, stream, resources=None, **kw):
+        """Convert a notebook node and write the document to a stream as it is produced.
+
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            stream (file-like): Destination with a ``write`` method, such as an
+                open file or a socket file. Binary streams receive UTF-8 bytes;
+                any other stream receives text.
+            resources (dict, optional): Additional resources used in the conversion
+                process. If None, an empty dictionary is created. Defaults to None.
+            **kw (dict): Additional keyword arguments passed to
+                :meth:`iter_from_notebook_node`.
+
+        Returns:
+            (dict): The updated resources dictionary.
+
+        Examples:
+            >>> exporter = StyledHTMLExporter()
+            >>> with open("notebook.html", "wb") as f:
+            ...     resources = exporter.export_to_stream(notebook, f)
+        """
+        chunks, resources = self.iter_from_notebook_node(nb, resources, **kw)
+        binary = isinstance(stream, (io.RawIOBase, io.BufferedIOBase)) or "b" in getattr(
+            stream, "mode", ""
+        )
+        for chunk in chunks:
+            stream.write(chunk.encode("utf-8") if binary else chunk)
+        return resources
+
+    def _iter_render(self, nb, resources, attachments, fragments=None, filters=None):
+        """Render the template and post-process the document chunk by chunk.
+
+        Args:
+            nb (NotebookNode): The preprocessed notebook.
+            resources (dict): Resources after preprocessing.
+            attachments (dict): Dictionary of attachments from notebook cells.
+
+        Keyword Parameters:
+            fragments (FragmentStore or None): The store serving cached cell
+                fragments in incremental mode. Its report is recorded in
+                ``resources["fragment_cache"]`` once the document is complete.
+                Defaults to None.
+            filters (dict or None): The filters of this export from
+                :meth:`_notebook_filters`, passed to the template as
+                ``render_filters``. Defaults to None.
+
+        Yields:
+            (str): Pieces of the finished HTML document.
+        """
+        should_embed = self.embed_images
+        chunks = _coalesce(
+            self.template.generate(nb=nb, resources=resources, render_filters=filters)
+        )
+        chunks = _lstrip_document(chunks)
+        # Same alt text and focusability fixes as HTMLExporter's BeautifulSoup pass
+        chunks = AccessibilityRewriter(log=self.log).iter_rewrite(chunks)
+        if self._rewrites_images(should_embed):
+            chunks = self._iter_embed_images(chunks, attachments, resources, embed=should_embed)
+        yield from chunks
+        if self.incremental and fragments is not None:
+            resources["fragment_cache"] = fragments.report()
+
+    def _assign_fragment_keys(self, nb, resources):
+        """Give every cell a stable DOM id and the key of its rendered fragment.
+
+        The keys are stored in ``cell.metadata["fragment_key"]``, where the
+        template's ``any_cell`` block picks them up, and the DOM ids in
+        ``cell.metadata["cell_dom_id"]``.
+
+        Args:
+            nb (NotebookNode): The preprocessed notebook.
+            resources (dict): Resources after preprocessing, including the
+                ``global_content_filter``.
+        """
+        context = self._fragment_context(nb, resources)
+        for index, cell in enumerate(nb.cells):
+            cell.metadata["cell_dom_id"] = cell_dom_id(cell, index)
+            cell.metadata["fragment_key"] = cell_fragment_key(cell, context)
+
+    def _fragment_context(self, nb, resources):
+        """Fingerprint everything outside a cell that affects its rendered HTML.
+
+        Args:
+            nb (NotebookNode): The preprocessed notebook.
+            resources (dict): Resources after preprocessing.
+
+        Returns:
+            (str): A hex digest covering the exporter class and configuration,
+                the template files, the package versions, the resources the cell
+                templates read and the notebook metadata used by the filters.
+        """
+        return fingerprint(
+            {
+                **self._configuration_fingerprint(),
+                "resources": {
+                    key: resources.get(key)
+                    for key in (
+                        "global_content_filter",
+                        "markdown_render",
+                        "output_mimetype",
+                        "raw_mimetypes",
+                        "should_sanitize_html",
+                        "should_not_encode_svg",
+                    )
+                },
+                "metadata": {
+                    key: nb.metadata.get(key) for key in ("anchors", "language_info", "widgets")
+                },
+            }
+        )
+
+    def _configuration_fingerprint(self):
+        """Describe the exporter, its effective configuration and its templates.
+
+        Returns:
+            (dict): JSON-like description of the exporter class, the package and
+                nbconvert versions, the values of all configurable traits, the
+                loaded config and the template files (see
+                :meth:`_template_files_fingerprint`).
+        """
+        return {
+            "exporter": f"{type(self).__module__}.{type(self).__qualname__}",
+            "versions": [__version__, nbconvert.__version__],
+            "traits": {name: getattr(self, name) for name in self.trait_names(config=True)},
+            "config": self.config,
+            "templates": self._template_files_fingerprint(),
+        }
+
+    def _export_cache_key(self, nb, resources=None):
+        """Compute the key of an export in the export cache.
+
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            resources (dict, optional): The resources passed to
+                :meth:`from_notebook_node`. Defaults to None.
+
+        Returns:
+            (str): A hex digest of the notebook content, the configuration (see
+                :meth:`_configuration_fingerprint`), the input resources and the
+                local files the notebook references.
+
+        Notes:
+            The notebook's modification date in ``resources["metadata"]`` is left
+            out, so that a fresh checkout of unchanged notebooks still hits.
+        """
+        resources = dict(resources or {})
+        metadata = dict(resources.get("metadata") or {})
+        metadata.pop("modified_date", None)
+        resources["metadata"] = metadata
+        return fingerprint(
+            {
+                **self._configuration_fingerprint(),
+                "notebook": nb,
+                "resources": resources,
+                "files": [
+                    _file_fingerprint(path) for path in self._local_dependencies(nb, resources)
+                ],
+            }
+        )
+
+    def _local_dependencies(self, nb, resources=None):
+        """List the local files an export of a notebook may read.
+
+        These are the notebook's local stylesheets (see
+        :meth:`_generate_notebook_style_block`) and the images referenced from
+        markdown cells and HTML outputs, which the image embedding stage reads.
+
+        Args:
+            nb (NotebookNode): The notebook.
+            resources (dict, optional): Resources containing the notebook's
+                directory in ``resources["metadata"]["path"]``. Defaults to None.
+
+        Returns:
+            (list): Sorted absolute paths. Files that do not exist are included,
+                so that creating them changes the export key.
+        """
+        base_path = (resources or {}).get("metadata", {}).get("path") or "."
+        references = set()
+
+        stylesheet = nb.metadata.get("stylesheet")
+        if stylesheet:
+            stylesheets = [stylesheet] if isinstance(stylesheet, str) else stylesheet
+            references.update(
+                ss for ss in stylesheets if not ss.startswith(("http://", "https://"))
             )
-            if notebook_style_block:
-                style_blocks.append(notebook_style_block)
 
-        # Insert all style blocks into HTML (before </head>)
-        if style_blocks and "</head>" in output:
-            combined_styles = "".join(style_blocks)
-            output = output.replace("</head>", f"{combined_styles}</head>")
+        for cell in nb.cells:
+            if cell.cell_type == "markdown":
+                references.update(find_image_references(cell.source))
+            for output in cell.get("outputs", []):
+                html = output.get("data", {}).get("text/html")
+                if html:
+                    text = html if isinstance(html, str) else "".join(html)
+                    references.update(find_image_references(text))
 
-        return output, resources
+        return sorted({os.path.abspath(os.path.join(base_path, ref)) for ref in references})
+
+    def _template_files_fingerprint(self):
+        """List the template files this exporter can load, with their modification times.
 
-    def _generate_style_block(self, styles):
-        """Generate a CSS style block from collected styles.
+        Returns:
+            (list): Sorted ``[path, mtime_ns, size]`` entries for the files in the
+                template search path, so editing a template changes the result.
+        """
+        files = []
+        for directory in dict.fromkeys(self.template_paths):
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_file():
+                    stat_result = entry.stat()
+                    files.append([entry.path, stat_result.st_mtime_ns, stat_result.st_size])
+        return sorted(files)
+
+    def _generate_css(self, resources):
+        """Generate the cell-style and notebook-style CSS for a document.
+
+        This is the single stage that turns the styles collected by the
+        StylePreprocessor into markup; the templates insert its result in the
+        document head.
 
         Args:
-            styles (dict): Dictionary mapping cell IDs to style definitions.
-                Style definitions can be either dictionaries of CSS properties
-                or strings containing CSS declarations.
+            resources (dict): Resources after preprocessing, containing
+                ``compiled_styles`` and ``notebook_styles``.
+
+        Returns:
+            (str): The <style> and <link> elements for the document head.
+                Returns an empty string if there are no styles.
+
+        Examples:
+            >>> exporter = StyledHTMLExporter()
+            >>> css = exporter._generate_css({"notebook_styles": {"style": "body { margin: 0; }"}})
+        """
+        blocks = []
+        if resources.get("compiled_styles"):
+            blocks.append(self._generate_compiled_style_block(resources["compiled_styles"]))
+        if resources.get("notebook_styles"):
+            blocks.append(
+                self._generate_notebook_style_block(resources["notebook_styles"], resources)
+            )
+        return "".join(blocks)
+
+    def _generate_compiled_style_block(self, compiled_styles):
+        """Generate a CSS style block with one rule per distinct cell style.
+
+        Args:
+            compiled_styles (dict): Dictionary mapping generated class names to
+                their declarations, as collected by the StylePreprocessor in
+                ``resources["compiled_styles"]``.
 
         Returns:
             (str): CSS style block wrapped in HTML <style> tags. Returns empty
                 string if no styles are provided.
 
+        Notes:
+            Each rule is selected by ``:is(#styled-..., .styled-...)``. It
+            matches the elements carrying the generated class, with the
+            specificity of an ID, like the per-cell ``#cell-N`` rules the
+            classes replace. Cell styles therefore still win over the
+            multi-class selectors of the JupyterLab stylesheets.
+
         Examples:
             >>> exporter = StyledHTMLExporter()
-            >>> styles = {"cell-0": {"color": "red"}, "cell-1": "padding: 10px"}
-            >>> style_block = exporter._generate_style_block(styles)
+            >>> compiled = {"styled-1a2b3c4d": ("color: red", "padding: 10px")}
+            >>> style_block = exporter._generate_compiled_style_block(compiled)
         """
-        css_rules = []
-        for cell_id, style in styles.items():
-            if isinstance(style, dict):
-                # Convert style dict to CSS
-                style_str = "; ".join(f"{k}: {v}" for k, v in style.items())
-                css_rules.append(f"#{cell_id} {{ {style_str} }}")
-            elif isinstance(style, str):
-                # Direct CSS string
-                css_rules.append(f"#{cell_id} {{ {style} }}")
-
+        css_rules = [
+            f":is(#{class_name}, .{class_name}) {{ {'; '.join(declarations)} }}"
+            for class_name, declarations in compiled_styles.items()
+        ]
         if css_rules:
             return "\n<style>\n/* Custom cell styles */\n" + "\n".join(css_rules) + "\n</style>\n"
         return ""
@@ -297,21 +995,26 @@ class StyledHTMLExporter(HTMLExporter):
 
         return "".join(blocks)
 
-    def _embed_images_in_html(self, html, attachments, resources):
-        """Embed images in the final HTML output.
+    def _iter_embed_images(self, chunks, attachments, resources, embed=True):
+        """Embed images in the HTML document as it streams past.
 
-        This method processes the complete HTML document after all rendering is done,
-        replacing image src attributes with base64 data URIs. This approach avoids
-        the issue where BeautifulSoup auto-closes incomplete HTML fragments when
-        processing individual block_html tokens during markdown rendering.
+        The document is scanned as a stream of tokens by
+        :class:`~jupyter_export_html_style.images.ImageEmbedder`, replacing image
+        src attributes with base64 data URIs. Only the rewritten ``src`` values
+        change; every other byte of the document is copied through unchanged.
 
         Args:
-            html (str): Complete HTML document.
+            chunks (iterable of str): Pieces of the HTML document.
             attachments (dict): Dictionary of attachments from notebook cells.
             resources (dict): Resources dictionary from the conversion process.
 
-        Returns:
-            (str): HTML with embedded images.
+        Keyword Parameters:
+            embed (bool): If False, only de-duplicate images that are already
+                embedded, leaving file and attachment references unchanged.
+                Ignored when ``external_images`` is enabled. Defaults to True.
+
+        Yields:
+            (str): Pieces of the HTML document with embedded images.
 
         Notes:
             This method handles:
@@ -320,56 +1023,101 @@ class StyledHTMLExporter(HTMLExporter):
             - Already embedded data URIs (skipped)
             - HTTP/HTTPS URLs (skipped for security and performance)
         """
-        try:
-            soup = bs4.BeautifulSoup(html, features="html.parser")
-            imgs = soup.find_all("img")
+        base_path = resources.get("metadata", {}).get("path", ".")
+        external_dir = None
+        if self.external_images:
+            external_dir = resources.get("output_files_dir") or (
+                f"{resources.get('unique_key') or 'output'}_files"
+            )
+        optimizer = ImageOptimizer(parent=self) if self.optimize_images else None
+        deduplicate = self.deduplicate_images
+        if deduplicate and resources.get("javascript") is False:
+            # Repeated images are restored by a script the document will not run.
+            self.log.warning(
+                "deduplicate_images needs JavaScript, which this document does not run; "
+                "every copy of a repeated image is embedded"
+            )
+            deduplicate = False
+        embedder = ImageEmbedder(
+            attachments,
+            base_path,
+            cache=self._get_image_cache(),
+            embed=embed,
+            deduplicate=deduplicate,
+            external_dir=external_dir,
+            external_threshold=self.external_images_threshold,
+            outputs=resources.setdefault("outputs", {}) if external_dir else None,
+            optimizer=optimizer,
+            served_dir=self._served_image_dir(resources),
+        )
+        yield from embedder.iter_embed(chunks)
+        if optimizer is not None:
+            resources["image_optimization"] = optimizer.report()
+
+    def _served_image_dir(self, resources):
+        """Return the directory whose images the document's reader loads itself.
 
-            # Get the base path from resources if available
-            base_path = resources.get("metadata", {}).get("path", ".")
+        Args:
+            resources (dict): Resources dictionary from the conversion process.
 
-            for img in imgs:
-                src = img.attrs.get("src")
-                if src is None or not src:
-                    continue
-
-                # Skip already embedded data URIs
-                if src.startswith("data:"):
-                    continue
-
-                # Skip HTTP/HTTPS URLs
-                if src.startswith(("http://", "https://")):
-                    continue
-
-                try:
-                    # Handle attachment: URLs
-                    if src.startswith("attachment:"):
-                        img_name = src[len("attachment:") :]
-                        if img_name in attachments:
-                            # Attachments can have multiple mime types, pick the first available
-                            attachment_data = attachments[img_name]
-                            for mime_type, data in attachment_data.items():
-                                # Data is already base64 encoded in attachments
-                                img.attrs["src"] = f"data:{mime_type};base64,{data}"
-                                break
-                    # Handle file path references
-                    else:
-                        file_path = os.path.join(base_path, src)
-                        if os.path.isfile(file_path):
-                            with open(file_path, "rb") as f:
-                                file_data = f.read()
-                                # Guess MIME type from file extension
-                                mime_type, _ = mimetypes.guess_type(file_path)
-                                if mime_type is None:
-                                    # Default to png if we can't determine type
-                                    mime_type = "image/png"
-                                b64_data = base64.b64encode(file_data).decode("utf-8")
-                                img.attrs["src"] = f"data:{mime_type};base64,{b64_data}"
-                except Exception:
-                    # If embedding fails for any reason, leave the src unchanged
-                    # This ensures that individual image failures don't break the entire export
-                    pass
-
-            return str(soup)
-        except Exception:
-            # If HTML parsing fails, return the original HTML unchanged
-            return html
+        Returns:
+            (str or None): A directory whose image files are referenced instead
+                of embedded. None for HTML documents, which must be self-contained.
+        """
+        return None
+
+    def _rewrites_images(self, embed):
+        """Check whether the image post-processing stage has anything to do.
+
+        Args:
+            embed (bool): The user's ``embed_images`` preference.
+
+        Returns:
+            (bool): True if images need to be embedded, de-duplicated,
+                externalized or optimized.
+        """
+        return embed or self.deduplicate_images or self.external_images or self.optimize_images
+
+    def _get_export_cache(self):
+        """Return the export cache selected by ``export_cache``.
+
+        Returns:
+            (ExportCache or None): The process-wide cache for the configured
+                backend and path, or None if the export cache is disabled.
+
+        Raises:
+            ValueError: If ``export_cache`` does not name a known backend.
+        """
+        if not self.export_cache:
+            return None
+        return get_export_cache(
+            self.export_cache, self.export_cache_path or None, self.export_cache_size
+        )
+
+    def _get_fragment_cache(self):
+        """Return the shared fragment cache sized according to ``fragment_cache_size``.
+
+        Returns:
+            (LRUCache or None): The process-wide fragment cache, or None if
+                incremental mode or caching is disabled.
+        """
+        if not self.incremental or self.fragment_cache_size <= 0:
+            return None
+        cache = get_fragment_cache()
+        if cache.maxsize != self.fragment_cache_size:
+            cache.resize(self.fragment_cache_size)
+        return cache
+
+    def _get_image_cache(self):
+        """Return the shared image cache sized according to ``image_cache_size``.
+
+        Returns:
+            (LRUCache or None): The process-wide image cache, or None if caching
+                is disabled.
+        """
+        if self.image_cache_size <= 0:
+            return None
+        cache = get_image_cache()
+        if cache.maxsize != self.image_cache_size:
+            cache.resize(self.image_cache_size)
+        return cache
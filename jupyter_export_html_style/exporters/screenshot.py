@@ -0,0 +1,303 @@
+"""Screenshot exporter with style support."""
+
+import base64
+import os
+import tempfile
+
+from traitlets import Bool, Enum, Float, Int
+
+from ..assets import AssetRouter
+from .html import StyledHTMLExporter
+from .webpdf import StyledWebPDFExporter, _unlink_quietly
+
+# Measures what a screenshot captures, in CSS pixels: the whole document, the
+# first screen, and the box of every cell with a DOM id.
+_MEASURE_SCRIPT = """() => {
+  const root = document.documentElement;
+  const box = (element) => {
+    const rect = element.getBoundingClientRect();
+    return {
+      x: rect.left + window.scrollX,
+      y: rect.top + window.scrollY,
+      width: Math.ceil(rect.width),
+      height: Math.ceil(rect.height),
+    };
+  };
+  return {
+    page: {
+      x: 0,
+      y: 0,
+      width: Math.max(root.scrollWidth, document.body.scrollWidth),
+      height: Math.max(root.scrollHeight, document.body.scrollHeight),
+    },
+    screen: { x: 0, y: 0, width: window.innerWidth, height: window.innerHeight },
+    cells: Array.from(document.querySelectorAll(".jp-Notebook-cell[id]"), (cell) => [
+      cell.id,
+      box(cell),
+    ]),
+  };
+}"""
+
+
+class StyledScreenshotExporter(StyledWebPDFExporter):
+    """Exports screenshots of notebooks rendered with styles.
+
+    The notebook is rendered like :class:`StyledWebPDFExporter` renders it and
+    loaded on a page of the same process-wide browser pool, then captured as
+    an image instead of printed. Screenshots are cheap enough for preview
+    thumbnails of whole catalogues: the browsers stay running between
+    exports and :meth:`iter_batch` captures up to ``browser_count *
+    pages_per_browser`` notebooks at once.
+
+    Attributes:
+        export_from_notebook (str): Label for the export option.
+        screenshot_format (Enum): Image format, ``"png"``, ``"webp"`` or
+            ``"jpeg"``. Defaults to ``"png"``.
+        screenshot_quality (Int): Quality of WebP and JPEG images (0-100).
+            Defaults to 80.
+        screenshot_area (Enum): What the image shows: the whole document
+            (``"page"``) or the first screen (``"screen"``). Defaults to
+            ``"page"``.
+        cell_screenshots (Bool): Also capture every cell on its own. Defaults
+            to False.
+        viewport_width (Int): Width of the page in CSS pixels. Defaults to 1200.
+        viewport_height (Int): Height of the page, and of the first screen, in
+            CSS pixels. Defaults to 800.
+        screenshot_scale (Float): Image pixels per CSS pixel; below 1 for
+            thumbnails, 2 for high-density displays. Defaults to 1.
+
+    Notes:
+        The main output is a single image. With ``cell_screenshots`` enabled,
+        each cell is also captured by its DOM id (``cell-<index>``, or
+        ``cell-<cell id>`` in incremental mode) and stored in
+        ``resources["outputs"]`` under ``output_files_dir`` (or
+        ``<notebook name>_files``), where nbconvert's ``FilesWriter`` saves
+        them; ``resources["cell_screenshots"]`` maps each DOM id to its file
+        name.
+
+        Images are captured through the Chrome DevTools Protocol, which
+        encodes WebP itself and scales the capture without resizing the page,
+        so the page is laid out at ``viewport_width`` whatever the scale.
+
+        The browser pool, asset routing, readiness and handoff settings
+        behave as for :class:`StyledWebPDFExporter`. The PDF settings
+        (``paginate``, ``segment_size``, ``optimize_pdf``) are unused and
+        ``pdf_engine`` can only be ``"playwright"``, as screenshots need a
+        browser.
+
+    Examples:
+        >>> from jupyter_export_html_style import StyledScreenshotExporter
+        >>> exporter = StyledScreenshotExporter(
+        ...     screenshot_area="screen", screenshot_scale=0.25, screenshot_format="webp"
+        ... )
+        >>> thumbnail, resources = exporter.from_notebook_node(notebook)
+
+        >>> # Thumbnails for a whole catalogue, several pages at a time
+        >>> for result in exporter.iter_batch(glob.glob("catalog/*.ipynb")):
+        ...     pathlib.Path(result.source).with_suffix(".webp").write_bytes(result.output)
+    """
+
+    export_from_notebook = "Screenshot (with styles)"
+
+    pdf_engine = Enum(
+        ["playwright"],
+        default_value="playwright",
+        help="Screenshots are always taken with a headless Chromium.",
+    ).tag(config=True)
+
+    screenshot_format = Enum(
+        ["png", "webp", "jpeg"], default_value="png", help="Image format of the screenshots."
+    ).tag(config=True)
+
+    screenshot_quality = Int(
+        80, min=0, max=100, help="Quality of WebP and JPEG screenshots (0-100)."
+    ).tag(config=True)
+
+    screenshot_area = Enum(
+        ["page", "screen"],
+        default_value="page",
+        help="""
+        What the screenshot shows.
+
+        "page" captures the whole document, "screen" only the first
+        ``viewport_height`` pixels, as a visitor would first see it.
+        """,
+    ).tag(config=True)
+
+    cell_screenshots = Bool(
+        False,
+        help="""
+        Also capture every cell on its own, by its ``#cell-N`` DOM id.
+
+        The images are added to ``resources["outputs"]``.
+        """,
+    ).tag(config=True)
+
+    viewport_width = Int(1200, min=1, help="Width of the page in CSS pixels.").tag(config=True)
+
+    viewport_height = Int(
+        800, min=1, help="Height of the page, and of the first screen, in CSS pixels."
+    ).tag(config=True)
+
+    screenshot_scale = Float(
+        1.0,
+        min=0.01,
+        help="Image pixels per CSS pixel. Below 1 for thumbnails, 2 for high-density displays.",
+    ).tag(config=True)
+
+    def _from_notebook_node_uncached(self, nb, resources=None, **kw):
+        """Convert a notebook node to a screenshot.
+
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            resources (dict, optional): Additional resources used in the conversion
+                process. If None, an empty dictionary is created. Defaults to None.
+            **kw (dict): Additional keyword arguments passed to the HTML conversion.
+
+        Returns:
+            (tuple): The image (bytes) and the resources, with
+                ``output_extension`` set to the image format and the cell
+                screenshots in ``outputs``.
+
+        Raises:
+            RuntimeError: If playwright is not installed or no suitable
+                chromium executable is found.
+        """
+        html, resources = StyledHTMLExporter._from_notebook_node_uncached(
+            self, nb, resources=resources, **kw
+        )
+
+        self.log.info("Taking screenshot with styles")
+        html_path = None
+        if self.html_handoff == "file":
+            # See StyledWebPDFExporter.run_playwright for why the file is closed first.
+            with tempfile.NamedTemporaryFile(suffix=".html", delete=False) as f:
+                f.write(html.encode("utf-8"))
+            html_path, html = f.name, None
+        try:
+            job = self._page_job(html_path, resources["metadata"].get("path"), html)
+            shots = self._get_browser_pool().run(job)
+        finally:
+            _unlink_quietly(html_path)
+        self.log.info("Screenshot successfully created")
+        return self._finish_output(shots, resources), resources
+
+    def export_to_stream(self, nb, stream, resources=None, **kw):
+        """Convert a notebook node to a screenshot and write it to a binary stream.
+
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            stream (file-like): Binary stream that receives the image.
+            resources (dict, optional): Additional resources used in the conversion
+                process. If None, an empty dictionary is created. Defaults to None.
+            **kw (dict): Additional keyword arguments passed to
+                :meth:`from_notebook_node`.
+
+        Returns:
+            (dict): The updated resources dictionary; cell screenshots are in
+                ``resources["outputs"]`` and are not written.
+
+        Raises:
+            RuntimeError: If playwright is not installed or no suitable
+                chromium executable is found.
+        """
+        output, resources = self.from_notebook_node(nb, resources, **kw)
+        stream.write(output)
+        return resources
+
+    def _page_job(self, html_path, base_dir=None, html=None):
+        """Create a browser pool job that takes the screenshots of a document.
+
+        Args:
+            html_path (str or None): Path of the HTML file. Unused if ``html`` is
+                given.
+
+        Keyword Parameters:
+            base_dir (str or None): Directory relative references in the
+                document are resolved against. Defaults to the current working
+                directory.
+            html (str or None): The HTML document, served to the page from
+                memory. Defaults to None.
+
+        Returns:
+            (callable): Coroutine function taking a Playwright page and
+                returning the screenshot and a dict of cell screenshots by DOM
+                id, or None if ``cell_screenshots`` is disabled.
+        """
+        router = AssetRouter(
+            html_path, base_dir, self._get_asset_store(), self.remote_assets, html=html
+        )
+        document = html_path or router.url
+
+        async def capture_page(page):
+            """Load the document in a pooled page and capture it."""
+            await page.set_viewport_size(
+                {"width": self.viewport_width, "height": self.viewport_height}
+            )
+            await self._load_document(page, router, document)
+            boxes = await page.evaluate(_MEASURE_SCRIPT)
+
+            session = await page.context.new_cdp_session(page)
+            try:
+                image = await self._capture(session, boxes[self.screenshot_area])
+                cells = None
+                if self.cell_screenshots:
+                    cells = {}
+                    for dom_id, box in boxes["cells"]:
+                        if box["width"] > 0 and box["height"] > 0:
+                            cells[dom_id] = await self._capture(session, box)
+            finally:
+                await session.detach()
+            self.log.debug("Requests of %s: %s", document, router.counts)
+            return image, cells
+
+        return capture_page
+
+    async def _capture(self, session, box):
+        """Capture one area of a loaded page.
+
+        Args:
+            session (playwright.async_api.CDPSession): DevTools session of the page.
+            box (dict): The area, with ``x``, ``y``, ``width`` and ``height`` in
+                CSS pixels relative to the document.
+
+        Returns:
+            (bytes): The image.
+        """
+        params = {
+            "format": self.screenshot_format,
+            "clip": {**box, "scale": self.screenshot_scale},
+            "captureBeyondViewport": True,
+        }
+        if self.screenshot_format != "png":
+            params["quality"] = self.screenshot_quality
+        result = await session.send("Page.captureScreenshot", params)
+        return base64.b64decode(result["data"])
+
+    def _finish_output(self, output, resources):
+        """Store the cell screenshots of a page job in the resources.
+
+        Args:
+            output (tuple): The screenshot and the cell screenshots from
+                :meth:`_page_job`.
+            resources (dict): Resources of the export, which receive the output
+                extension, the cell screenshots in ``outputs`` and their file
+                names in ``cell_screenshots``.
+
+        Returns:
+            (bytes): The screenshot.
+        """
+        image, cells = output
+        extension = "." + self.screenshot_format
+        resources["output_extension"] = extension
+        if cells is not None:
+            files_dir = resources.get("output_files_dir") or (
+                f"{resources.get('unique_key') or 'output'}_files"
+            )
+            outputs = resources.setdefault("outputs", {})
+            names = {}
+            for dom_id, data in cells.items():
+                names[dom_id] = os.path.join(files_dir, dom_id + extension)
+                outputs[names[dom_id]] = data
+            resources["cell_screenshots"] = names
+        return image
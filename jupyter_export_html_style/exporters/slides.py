@@ -185,61 +185,3 @@ class StyledSlidesExporter(StyledHTMLExporter):
         resources["reveal"]["width"] = self.reveal_width
         resources["reveal"]["font_awesome_url"] = self.font_awesome_url
         return resources
-
-    def from_notebook_node(self, nb, resources=None, **kw):
-        """Convert a notebook node to reveal.js slides with style support.
-
-        This method overrides the parent's from_notebook_node to prevent
-        duplicate style injection. The styled_reveal template handles style
-        injection in the html_head_css block, so we don't need the post-
-        processing style injection from StyledHTMLExporter.
-
-        Args:
-            nb (NotebookNode): The notebook to convert.
-            resources (dict, optional): Additional resources used in the conversion
-                process. If None, an empty dictionary is created. Defaults to None.
-            **kw (dict): Additional keyword arguments passed to the parent
-                from_notebook_node method.
-
-        Returns:
-            (tuple): A tuple containing:
-                - output (str): The HTML slides output with styles.
-                - resources (dict): Updated resources dictionary.
-        """
-        # Save the user's embed_images preference
-        should_embed = self.embed_images
-
-        # Temporarily disable parent's embed_images to avoid the bug where
-        # BeautifulSoup auto-closes incomplete HTML fragments during markdown rendering
-        self.embed_images = False
-
-        try:
-            # Process the notebook with our preprocessor
-            # Use HTMLExporter's from_notebook_node to skip StyledHTMLExporter's
-            # post-processing since the template handles it
-            from nbconvert.exporters import HTMLExporter
-
-            output, resources = HTMLExporter.from_notebook_node(self, nb, resources, **kw)
-        finally:
-            # Restore embed_images setting
-            self.embed_images = should_embed
-
-        # Collect attachments from notebook cells for image embedding
-        attachments = {}
-        for cell in nb.cells:
-            if hasattr(cell, "attachments") and cell.attachments:
-                attachments.update(cell.attachments)
-
-        # Embed images in the final HTML if image embedding is enabled
-        if should_embed:
-            output = self._embed_images_in_html(output, attachments, resources)
-
-        # Add notebook-level styles (the template doesn't handle these)
-        if resources and "notebook_styles" in resources:
-            notebook_style_block = self._generate_notebook_style_block(
-                resources["notebook_styles"], resources
-            )
-            if notebook_style_block and "</head>" in output:
-                output = output.replace("</head>", f"{notebook_style_block}</head>")
-
-        return output, resources
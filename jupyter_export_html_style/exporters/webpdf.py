@@ -1,19 +1,71 @@
 """WebPDF exporter with style support."""
 
 import asyncio
+import base64
 import concurrent.futures
+import copy
+import json
+import multiprocessing
 import os
-import subprocess
-import sys
 import tempfile
-from importlib import util as importlib_util
+import threading
+import time
+from collections import deque, namedtuple
 
-from traitlets import Bool, default
+import nbformat
+from traitlets import Bool, Enum, Float, Int, Unicode, default
+from traitlets.config import Config
 
+from ..assets import REMOTE_ASSET_POLICIES, AssetRouter, AssetStore, default_asset_store_dir
+from ..browser import IS_WINDOWS, PLAYWRIGHT_INSTALLED, get_browser_pool  # noqa: F401
+from ..engines import PDF_ENGINES, WEASYPRINT_INSTALLED, weasyprint_pdf  # noqa: F401
+from ..fragments import fingerprint
+from ..pdf import PYPDF_INSTALLED, PDFOptimizer, heading_levels, merge_pdfs  # noqa: F401
 from .html import StyledHTMLExporter
 
-PLAYWRIGHT_INSTALLED = importlib_util.find_spec("playwright") is not None
-IS_WINDOWS = os.name == "nt"
+# Size of the pieces in which a streamed PDF is read from the browser.
+_PDF_READ_SIZE = 1024 * 1024
+
+# Resolves once the document is ready for printing: "signal" when the readiness
+# script of the webpdf template has finished, or "load" after the load event for
+# documents rendered by templates without the script.
+_READY_SCRIPT = """() => new Promise((resolve) => {
+  const check = () => {
+    const state = document.documentElement && document.documentElement.dataset.exportReady;
+    if (state === "ready") {
+      resolve("signal");
+    } else if (state === undefined && document.readyState === "complete") {
+      resolve("load");
+    }
+  };
+  document.addEventListener("jupyter-export-ready", check);
+  window.addEventListener("load", () => setTimeout(check));
+  document.addEventListener("readystatechange", check);
+  check();
+})"""
+
+# Log messages naming the wait that ended the page load.
+_READY_REASONS = {
+    "signal": "the document signalled it is ready",
+    "load": "the load event (the template sends no readiness signal)",
+}
+
+BatchResult = namedtuple("BatchResult", ["index", "source", "output", "resources", "error"])
+BatchResult.__doc__ = """The outcome of one notebook of a batch PDF export.
+
+Attributes:
+    index (int): Position of the notebook in the batch.
+    source (str or NotebookNode): The notebook path or node as passed in.
+    output (bytes or None): The PDF, or None if the export failed.
+    resources (dict or None): The resources of the export, or None if it failed.
+    error (Exception or None): The exception that made the export fail.
+"""
+
+# Exporters created by HTML rendering workers, keyed by class and settings.
+_WORKER_EXPORTERS = {}
+
+# Output mime types that only display through JavaScript.
+_SCRIPT_MIMETYPES = ("application/javascript", "application/vnd.jupyter.widget-view+json")
 
 
 class StyledWebPDFExporter(StyledHTMLExporter):
@@ -21,7 +73,7 @@ class StyledWebPDFExporter(StyledHTMLExporter):
 
     This inherits from :class:`StyledHTMLExporter`. It creates the HTML using the
     StyledHTMLExporter (which includes custom styles and embedded images), and then
-    runs playwright to create a pdf.
+    runs playwright (or WeasyPrint, see ``pdf_engine``) to create a pdf.
 
     This exporter extends the standard WebPDFExporter to use StyledHTMLExporter
     instead of the basic HTMLExporter, allowing cell-level styles and embedded
@@ -37,11 +89,124 @@ class StyledWebPDFExporter(StyledHTMLExporter):
             to PDF. WARNING: This could cause arbitrary code execution in specific
             circumstances. This is required for webpdf to work inside most
             container environments.
+        browser_count (Int): Number of Chromium browsers in the process-wide
+            pool. Defaults to 1.
+        pages_per_browser (Int): Number of pages each pooled browser prints
+            concurrently. Defaults to 4.
+        browser_max_jobs (Int): Number of PDFs after which a pooled browser is
+            replaced by a fresh one. 0 never recycles. Defaults to 100.
+        ready_timeout (Float): Maximum number of seconds to wait for a page to
+            become ready before printing it anyway. Defaults to 30.
+        remote_assets (Enum): What to do with requests for remote assets that
+            are not in the asset store: ``"offline"`` aborts them,
+            ``"network"`` fetches them and ``"record"`` fetches and stores
+            them. Defaults to ``"offline"``.
+        asset_store_path (Unicode): Directory of the asset store. Defaults to
+            the ``assets`` directory of the user cache directory.
+        serve_local_images (Bool): Let the browser load local image files from
+            disk instead of embedding them in the HTML. Defaults to True.
+        html_handoff (Enum): How the HTML reaches the browser: ``"memory"``
+            serves it from memory, ``"file"`` through a temporary file.
+            Defaults to ``"memory"``.
+        segment_size (Int): Maximum size in bytes of the cells printed on one
+            browser page. 0 prints the whole notebook at once. Defaults to 0.
+        optimize_pdf (Bool): Shrink the printed PDF with a
+            :class:`~jupyter_export_html_style.pdf.PDFOptimizer`. Defaults to
+            False.
+        pdf_engine (Enum): What prints the HTML: ``"playwright"`` (headless
+            Chromium) or ``"weasyprint"`` (in-process, without JavaScript).
+            Defaults to ``"playwright"``.
+
+    Notes:
+        :meth:`export_to_stream` and :meth:`export_to_file` stream the HTML to
+        the browser through a temporary file and copy the PDF to its destination
+        in chunks, so the PDF bytes are never held in memory. The inherited
+        :meth:`iter_from_notebook_node` yields the intermediate HTML document.
+
+        With ``export_cache`` set, :meth:`from_notebook_node` returns cached PDF
+        bytes for unchanged inputs without launching the browser.
+
+        Chromium is not launched per export. PDFs are printed by a process-wide
+        :class:`~jupyter_export_html_style.browser.BrowserPool` that keeps the
+        browsers (and one browser context per browser) running until the
+        interpreter exits, health-checks them before each job and recycles them
+        after ``browser_max_jobs`` PDFs or when they crash. Exporters with the
+        same pool settings share the pool.
+
+        Pages are printed as soon as they are ready rather than after fixed
+        sleeps and network idle. The webpdf template marks the document ready
+        once it has loaded, MathJax has typeset and all images are decoded;
+        documents without the signal are printed after their load event. Each
+        print logs which of these ended the wait, or that ``ready_timeout``
+        expired.
+
+        Every request of the printed page goes through an
+        :class:`~jupyter_export_html_style.assets.AssetRouter`. The document is
+        served from a virtual origin that mirrors the notebook's directory, so
+        relative image references are read straight from disk; CDN assets such
+        as MathJax, require.js and fonts are served from the asset store; with
+        the default ``remote_assets = "offline"`` everything else is aborted
+        immediately and printing needs no network at all. Populate the store
+        once with ``python -m jupyter_export_html_style.assets``, which also
+        stores the files MathJax loads on demand, or print once with
+        ``remote_assets = "record"``; until then math is left untypeset.
+
+        Because the browser can read the notebook's directory, local images
+        inside it are not base64-encoded into the HTML (``serve_local_images``):
+        the document only references them and the router streams the files to
+        Chromium, which saves encoding and decoding every image and keeps the
+        temporary HTML file small. Attachments, images outside the notebook's
+        directory and the image options that need the image data
+        (``deduplicate_images``, ``external_images``, ``optimize_images``) still
+        embed as for HTML.
+
+        The HTML is handed to Chromium from memory: the router serves it at a
+        stable URL in the notebook's directory on the virtual origin, so no
+        temporary file is written, read back or left behind when a worker is
+        killed. ``html_handoff = "file"`` restores the temporary file.
+        :meth:`export_to_stream` always uses a temporary file, since it exists to
+        keep the document out of memory.
+
+        With ``segment_size`` set, :meth:`from_notebook_node` splits large
+        notebooks at cell boundaries into segments of at most that many bytes of
+        cell JSON (a single larger cell forms its own segment). Each segment is
+        rendered to its own HTML document and printed on its own browser page,
+        up to ``browser_count * pages_per_browser`` at once, and the PDFs are
+        merged into one document whose outline continues across the segments.
+        This bounds the memory Chromium needs for very large notebooks, and with
+        ``paginate`` disabled gives each segment its own page instead of
+        clipping the document at 200 inches. Merging requires pypdf.
+
+        With ``optimize_pdf`` enabled, the PDFs returned by
+        :meth:`from_notebook_node` and :meth:`iter_batch` pass through a
+        :class:`~jupyter_export_html_style.pdf.PDFOptimizer` (configured through
+        its own ``PDFOptimizer`` config section), which merges duplicated images
+        and fonts, recompresses streams and can downsample images and linearize
+        the document. The sizes before and after are reported in
+        ``resources["pdf_optimization"]``. :meth:`export_to_stream` writes the
+        PDF as Chromium produces it.
+
+        With ``pdf_engine = "weasyprint"`` the HTML is laid out and printed
+        in-process by WeasyPrint, a pure-Python HTML/CSS engine: no browser is
+        installed, launched or pooled, which suits high-volume, text-heavy
+        reports. Requests still go through the asset router, so local images
+        and the asset store work as with Chromium. As no JavaScript runs, the
+        template leaves out its scripts, outputs with a static representation
+        next to their JavaScript one print the static one, and math is printed
+        as its TeX source. Repeated images are embedded in full, as
+        ``deduplicate_images`` relies on a script to restore them. Every
+        document is paginated (``paginate`` is ignored) and
+        ``ready_timeout`` and the browser pool settings are
+        unused; :meth:`iter_batch` prints in its rendering workers. Requires
+        the ``weasyprint`` extra and the Pango library.
 
     Examples:
         >>> from jupyter_export_html_style import StyledWebPDFExporter
         >>> exporter = StyledWebPDFExporter()
         >>> output, resources = exporter.from_notebook_node(notebook)
+
+        >>> # Write the PDF straight to disk
+        >>> resources = exporter.export_to_file(notebook, "notebook.pdf")
     """
 
     export_from_notebook = "PDF via HTML (with styles)"
@@ -86,59 +251,508 @@ class StyledWebPDFExporter(StyledHTMLExporter):
         """,
     ).tag(config=True)
 
-    def run_playwright(self, html):
+    browser_count = Int(
+        1, help="Number of Chromium browsers in the process-wide browser pool."
+    ).tag(config=True)
+
+    pages_per_browser = Int(
+        4, help="Number of pages each pooled browser prints concurrently."
+    ).tag(config=True)
+
+    browser_max_jobs = Int(
+        100,
+        help="""
+        Number of PDFs after which a pooled browser is closed and replaced.
+
+        Recycling bounds the memory a long-lived browser accumulates. Set to 0
+        to never recycle browsers.
+        """,
+    ).tag(config=True)
+
+    ready_timeout = Float(
+        30.0,
+        min=0.0,
+        help="""
+        Maximum number of seconds to wait for a page to become ready for printing.
+
+        The webpdf template signals readiness once MathJax has typeset and all
+        images are decoded, so this bound only matters for documents whose
+        assets hang, for example CDN scripts on machines without network
+        access. When it expires the page is printed as it is.
+        """,
+    ).tag(config=True)
+
+    remote_assets = Enum(
+        list(REMOTE_ASSET_POLICIES),
+        default_value="offline",
+        help="""
+        What to do with requests for remote assets missing from the asset store.
+
+        "offline" aborts them immediately so printing is deterministic and never
+        waits for the network, "network" fetches them, and "record" fetches them
+        and adds them to the store, which populates it for later offline runs.
+        """,
+    ).tag(config=True)
+
+    asset_store_path = Unicode(
+        "",
+        help="""
+        Directory of the store of CDN assets (MathJax, require.js, fonts) served
+        to the browser instead of fetching them.
+
+        Defaults to the assets directory of the user cache directory. Populate it
+        with ``python -m jupyter_export_html_style.assets``.
+        """,
+    ).tag(config=True)
+
+    serve_local_images = Bool(
+        True,
+        help="""
+        Let the browser load local image files from disk instead of embedding them.
+
+        Images inside the notebook's directory are referenced by path and served
+        to Chromium by the asset router, which avoids base64-encoding them into
+        the HTML only for the browser to decode them again. Set to False to
+        always embed them.
+        """,
+    ).tag(config=True)
+
+    html_handoff = Enum(
+        ["memory", "file"],
+        default_value="memory",
+        help="""
+        How the rendered HTML is handed to the browser.
+
+        "memory" serves it from memory through the asset router, so printing does
+        no disk I/O. "file" writes it to a temporary file first.
+        """,
+    ).tag(config=True)
+
+    segment_size = Int(
+        0,
+        help="""
+        Maximum size in bytes of the cells printed on one browser page.
+
+        Larger notebooks are split at cell boundaries, the segments are printed
+        in parallel and the PDFs are merged, which bounds Chromium's memory use.
+        0 prints the whole notebook at once. Requires pypdf.
+        """,
+    ).tag(config=True)
+
+    optimize_pdf = Bool(
+        False,
+        help="""
+        Shrink printed PDFs: merge duplicated images and fonts, recompress streams
+        and optionally downsample images and linearize.
+
+        The optimizer is configured through the ``PDFOptimizer`` config section.
+        Requires pypdf.
+        """,
+    ).tag(config=True)
+
+    pdf_engine = Enum(
+        list(PDF_ENGINES),
+        default_value="playwright",
+        help="""
+        What prints the HTML to PDF.
+
+        "playwright" prints with a pooled headless Chromium and runs the
+        document's JavaScript. "weasyprint" lays the document out in-process
+        without a browser or JavaScript, which starts much faster and needs no
+        Chromium binary. Requires WeasyPrint.
+        """,
+    ).tag(config=True)
+
+    def iter_batch(
+        self,
+        notebooks,
+        resources=None,
+        workers=None,
+        concurrency=None,
+        timeout=None,
+        start_method=None,
+    ):
+        """Convert many notebooks to PDF, yielding the results as they complete.
+
+        The HTML documents are rendered in a pool of worker processes while the
+        PDFs are printed concurrently on the pages of the shared browser pool, so
+        both stages keep busy at the same time.
+
+        Args:
+            notebooks (iterable): Notebook file paths or ``NotebookNode`` objects.
+            resources (dict, optional): Resources passed to every conversion. For
+                notebook paths, ``metadata.name`` and ``metadata.path`` are filled
+                in from the file name. Defaults to None.
+            workers (int or None): Number of processes rendering HTML. None uses
+                one per CPU; 0 renders in a background thread of this process.
+                Defaults to None.
+            concurrency (int or None): Maximum number of PDFs printed at once.
+                Defaults to the capacity of the browser pool
+                (``browser_count * pages_per_browser``). Unused with the
+                ``weasyprint`` engine, which prints in the rendering workers.
+            timeout (float or None): Seconds allowed for printing each PDF.
+                Defaults to None.
+            start_method (str or None): How worker processes are started
+                (``"fork"``, ``"spawn"`` or ``"forkserver"``). Defaults to
+                ``"fork"`` where available while this process runs no other
+                thread, such as the event loop of a running browser pool, and
+                to ``"forkserver"`` or ``"spawn"`` otherwise.
+
+        Yields:
+            (BatchResult): One result per notebook, in order of completion. Failed
+                conversions carry the exception in ``error`` instead of raising.
+
+        Notes:
+            Worker processes build their own exporter from this exporter's class,
+            config and configurable trait values, so these must be picklable.
+            Results are served from and stored in the export cache when
+            ``export_cache`` is set.
+
+        Examples:
+            >>> exporter = StyledWebPDFExporter(browser_count=4)
+            >>> for result in exporter.iter_batch(glob.glob("reports/*.ipynb"), timeout=120):
+            ...     if result.error is None:
+            ...         pathlib.Path(result.source).with_suffix(".pdf").write_bytes(result.output)
+        """
+        if concurrency is None:
+            concurrency = max(1, self.browser_count * self.pages_per_browser)
+        if workers == 0:
+            render_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        else:
+            context = _batch_context(start_method)
+            render_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=context
+            )
+            if context.get_start_method() == "fork":
+                # Fork every worker now, before printing starts the browser pool's thread.
+                render_pool.submit(int).result()
+        cache = self._get_export_cache()
+        settings = self._batch_settings()
+        rendering = {}
+        printing = {}
+        ready = deque()
+
+        try:
+            for index, source in enumerate(notebooks):
+                key = None
+                notebook = source
+                if cache is not None:
+                    # The key needs the notebook, so read it here rather than in the worker.
+                    notebook, job_resources = _load_batch_notebook(source, resources)
+                    key = self._export_cache_key(notebook, job_resources)
+                    cached = cache.get(key)
+                    if cached is not None:
+                        yield BatchResult(index, source, cached[0], cached[1], None)
+                        continue
+                # WeasyPrint prints in the worker that rendered the HTML.
+                task = _print_batch_pdf if self.pdf_engine == "weasyprint" else _render_batch_html
+                future = render_pool.submit(task, settings, notebook, resources)
+                rendering[future] = (index, source, key)
+
+            while rendering or printing or ready:
+                while ready and len(printing) < concurrency:
+                    index, source, key, html_path, html, job_resources = ready.popleft()
+                    job = self._page_job(html_path, job_resources["metadata"].get("path"), html)
+                    future = self._get_browser_pool().submit(job, timeout)
+                    printing[future] = (index, source, key, html_path, job_resources)
+
+                done, _ = concurrent.futures.wait(
+                    [*rendering, *printing], return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    if future in rendering:
+                        index, source, key = rendering.pop(future)
+                        try:
+                            output, job_resources = future.result()
+                            if self.pdf_engine == "weasyprint":
+                                output = self._finish_output(output, job_resources)
+                        except Exception as e:
+                            yield BatchResult(index, source, None, None, e)
+                            continue
+                        if self.pdf_engine == "weasyprint":
+                            yield self._batch_result(cache, key, index, source, output, job_resources)
+                            continue
+                        html, html_path = output, None
+                        if self.html_handoff == "file":
+                            with tempfile.NamedTemporaryFile(suffix=".html", delete=False) as f:
+                                f.write(html.encode("utf-8"))
+                            html_path, html = f.name, None
+                        ready.append((index, source, key, html_path, html, job_resources))
+                        continue
+
+                    index, source, key, html_path, job_resources = printing.pop(future)
+                    _unlink_quietly(html_path)
+                    try:
+                        output = self._finish_output(future.result(), job_resources)
+                    except Exception as e:
+                        yield BatchResult(index, source, None, None, e)
+                        continue
+                    yield self._batch_result(cache, key, index, source, output, job_resources)
+        finally:
+            for future in rendering:
+                future.cancel()
+            for future, (*_, html_path, _) in printing.items():
+                future.cancel()
+                _unlink_quietly(html_path)
+            for *_, html_path, _, _ in ready:
+                _unlink_quietly(html_path)
+            render_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _page_job(self, html_path, base_dir=None, html=None):
+        """Create the browser pool job that turns one batch document into output.
+
+        Args:
+            html_path (str or None): Path of the HTML file. Unused if ``html`` is
+                given.
+
+        Keyword Parameters:
+            base_dir (str or None): Directory relative references in the
+                document are resolved against. Defaults to None.
+            html (str or None): The HTML document. Defaults to None.
+
+        Returns:
+            (callable): Coroutine function taking a Playwright page; here
+                :meth:`_print_job`.
+        """
+        return self._print_job(html_path, base_dir=base_dir, html=html)
+
+    def _finish_output(self, output, resources):
+        """Complete the output of a page job.
+
+        Args:
+            output (bytes): The printed PDF.
+            resources (dict): Resources of the export, which receive the output
+                extension and the optimizer's report.
+
+        Returns:
+            (bytes): The PDF, optimized if ``optimize_pdf`` is enabled.
+        """
+        resources["output_extension"] = ".pdf"
+        return self._optimize_pdf(output, resources)
+
+    @staticmethod
+    def _batch_result(cache, key, index, source, output, job_resources):
+        """Complete a successful batch export and store it in the export cache.
+
+        Args:
+            cache (ExportCache or None): The export cache, if enabled.
+            key (str or None): The export cache key of the notebook.
+            index (int): Position of the notebook in the batch.
+            source (str or NotebookNode): The notebook path or node as passed in.
+            output (bytes): The output document.
+            job_resources (dict): The resources of the export.
+
+        Returns:
+            (BatchResult): The result to yield.
+        """
+        if cache is not None:
+            cache.put(key, output, job_resources)
+        return BatchResult(index, source, output, job_resources, None)
+
+    def _batch_settings(self):
+        """Describe this exporter so that a worker process can rebuild it.
+
+        Returns:
+            (tuple): The exporter class and a Config holding this exporter's
+                config plus the current values of its configurable traits.
+        """
+        config = Config(self.config)
+        section = config[type(self).__name__]
+        for name in self.trait_names(config=True):
+            section[name] = getattr(self, name)
+        return type(self), config
+
+    def _get_browser_pool(self):
+        """Return the process-wide browser pool matching this exporter's settings.
+
+        Returns:
+            (BrowserPool): The shared pool.
+        """
+        return get_browser_pool(
+            browsers=self.browser_count,
+            pages_per_browser=self.pages_per_browser,
+            max_jobs_per_browser=self.browser_max_jobs,
+            launch_args=["--no-sandbox"] if self.disable_sandbox else [],
+            allow_chromium_download=self.allow_chromium_download,
+        )
+
+    def run_playwright(self, html, stream=None, base_dir=None):
         """Run playwright to convert HTML to PDF.
 
         Args:
             html (str): The HTML content to convert to PDF.
 
+        Keyword Parameters:
+            stream (file-like or None): Binary stream that receives the PDF as it
+                is read from the browser. If None, the PDF is returned instead.
+                Defaults to None.
+            base_dir (str or None): Directory relative references in the HTML
+                are resolved against. Defaults to the directory of the notebook
+                being converted by :meth:`from_notebook_node`, or else the
+                current working directory.
+
         Returns:
-            (bytes): PDF data.
+            (bytes or None): PDF data, or None if it was written to ``stream``.
 
         Raises:
             RuntimeError: If playwright is not installed or no suitable
                 chromium executable is found.
         """
+        base_dir = base_dir or self._notebook_dir
+        if self.html_handoff == "memory":
+            return self._print_pdf(None, stream, base_dir, html=html)
 
-        async def main(temp_file):
-            """Run main playwright script."""
-            args = ["--no-sandbox"] if self.disable_sandbox else []
-            try:
-                from playwright.async_api import async_playwright  # type: ignore[import-not-found]
-            except ModuleNotFoundError as e:
-                msg = (
-                    "Playwright is not installed to support Web PDF conversion. "
-                    "Please install `nbconvert[webpdf]` to enable."
-                )
-                raise RuntimeError(msg) from e
+        # Create a temporary file to pass the HTML code to Chromium:
+        # Unfortunately, tempfile on Windows does not allow for an already open
+        # file to be opened by a separate process. So we must close it first
+        # before calling Chromium. We also specify delete=False to ensure the
+        # file is not deleted after closing (the default behavior).
+        temp_file = tempfile.NamedTemporaryFile(suffix=".html", delete=False)
+        with temp_file:
+            temp_file.write(html.encode("utf-8"))
+        try:
+            return self._print_pdf(temp_file.name, stream, base_dir)
+        finally:
+            # Ensure the file is deleted even if playwright raises an exception
+            os.unlink(temp_file.name)
 
-            if self.allow_chromium_download:
-                cmd = [sys.executable, "-m", "playwright", "install", "chromium"]
-                subprocess.check_call(cmd)  # noqa: S603
+    def run_weasyprint(self, html, stream=None, base_dir=None):
+        """Run WeasyPrint to convert HTML to PDF in-process.
 
-            playwright = await async_playwright().start()
-            chromium = playwright.chromium
+        Args:
+            html (str): The HTML content to convert to PDF.
 
-            try:
-                browser = await chromium.launch(
-                    handle_sigint=False, handle_sigterm=False, handle_sighup=False, args=args
-                )
-            except Exception as e:
-                msg = (
-                    "No suitable chromium executable found on the system. "
-                    "Please use 'allow_chromium_download=True' to allow downloading one, "
-                    "or install it using `playwright install chromium`."
-                )
-                await playwright.stop()
-                raise RuntimeError(msg) from e
+        Keyword Parameters:
+            stream (file-like or None): Binary stream that receives the PDF. If
+                None, the PDF is returned instead. Defaults to None.
+            base_dir (str or None): Directory relative references in the HTML
+                are resolved against. Defaults to the directory of the notebook
+                being converted by :meth:`from_notebook_node`, or else the
+                current working directory.
+
+        Returns:
+            (bytes or None): PDF data, or None if it was written to ``stream``.
+
+        Raises:
+            RuntimeError: If WeasyPrint is not installed.
+        """
+        return self._print_weasyprint(None, stream, base_dir or self._notebook_dir, html=html)
+
+    def _print_weasyprint(self, html_path, stream=None, base_dir=None, html=None):
+        """Print an HTML document to PDF with WeasyPrint.
+
+        Args:
+            html_path (str or None): Path of the HTML file to print. Unused if
+                ``html`` is given.
+
+        Keyword Parameters:
+            stream (file-like or None): Binary stream that receives the PDF. If
+                None, the PDF is returned. Defaults to None.
+            base_dir (str or None): Directory relative references in the
+                document are resolved against. Defaults to the current working
+                directory.
+            html (str or None): The HTML document. Defaults to None.
 
-            page = await browser.new_page()
+        Returns:
+            (bytes or None): PDF data, or None if it was written to ``stream``.
+
+        Raises:
+            RuntimeError: If WeasyPrint is not installed.
+        """
+        router = AssetRouter(
+            html_path, base_dir, self._get_asset_store(), self.remote_assets, html=html
+        )
+        if not self.paginate:
+            self.log.warning("The weasyprint engine always paginates; paginate is ignored")
+        pdf = weasyprint_pdf(router, stream)
+        self.log.debug("Requests of %s: %s", html_path or router.url, router.counts)
+        return pdf
+
+    def _print_pdf(self, html_path, stream=None, base_dir=None, html=None):
+        """Print an HTML document to PDF with the configured ``pdf_engine``.
+
+        Args:
+            html_path (str or None): Path of the HTML file to print. Unused if
+                ``html`` is given.
+
+        Keyword Parameters:
+            stream (file-like or None): Binary stream that receives the PDF. If
+                None, the PDF is returned. Defaults to None.
+            base_dir (str or None): Directory relative references in the
+                document are resolved against. Defaults to the current working
+                directory.
+            html (str or None): The HTML document, handed to the browser from
+                memory. Defaults to None.
+
+        Returns:
+            (bytes or None): PDF data, or None if it was written to ``stream``.
+
+        Raises:
+            RuntimeError: If the engine is not installed or no suitable
+                chromium executable is found.
+        """
+        if self.pdf_engine == "weasyprint":
+            return self._print_weasyprint(html_path, stream, base_dir, html)
+        return self._get_browser_pool().run(self._print_job(html_path, stream, base_dir, html))
+
+    def _served_image_dir(self, resources):
+        """Return the notebook directory, whose images the asset router serves.
+
+        Args:
+            resources (dict): Resources dictionary from the conversion process.
+
+        Returns:
+            (str or None): The directory relative image references are resolved
+                against, or None if ``serve_local_images`` is disabled.
+        """
+        if not self.serve_local_images:
+            return None
+        return resources.get("metadata", {}).get("path") or os.getcwd()
+
+    # Directory of the notebook converted by from_notebook_node, see run_playwright.
+    _notebook_dir = None
+
+    def _get_asset_store(self):
+        """Return the store of remote assets.
+
+        Returns:
+            (AssetStore): The store at ``asset_store_path``.
+        """
+        return AssetStore(self.asset_store_path or default_asset_store_dir())
+
+    def _print_job(self, html_path, stream=None, base_dir=None, html=None, outline=False):
+        """Create a browser pool job that prints an HTML document to PDF.
+
+        Args:
+            html_path (str or None): Path of the HTML file to print. Unused if
+                ``html`` is given.
+
+        Keyword Parameters:
+            stream (file-like or None): Binary stream that receives the PDF. If
+                None, the job returns the PDF. Defaults to None.
+            base_dir (str or None): Directory relative references in the
+                document are resolved against. Defaults to the current working
+                directory.
+            html (str or None): The HTML document, served to the page from
+                memory. Defaults to None.
+            outline (bool): Generate the PDF outline from the document's
+                headings. Defaults to False.
+
+        Returns:
+            (callable): Coroutine function taking a Playwright page.
+        """
+        store = self._get_asset_store()
+        router = AssetRouter(html_path, base_dir, store, self.remote_assets, html=html)
+        document = html_path or router.url
+
+        async def print_page(page):
+            """Load the document in a pooled page and print it."""
             await page.emulate_media(media="print")
-            await page.wait_for_timeout(100)
-            await page.goto(f"file://{temp_file.name}", wait_until="networkidle")
-            await page.wait_for_timeout(100)
+            await self._load_document(page, router, document)
 
             pdf_params = {"print_background": True, "tagged": True}
+            if outline:
+                pdf_params["outline"] = True
             if not self.paginate:
                 # Floating point precision errors cause the printed
                 # PDF from spilling over a new page by a pixel fraction.
@@ -153,6 +767,12 @@ class StyledWebPDFExporter(StyledHTMLExporter):
                 )
                 width = dimensions["width"]
                 height = dimensions["height"]
+                if max(width, height) > 200 * 72:
+                    self.log.warning(
+                        "%s is larger than 200 inches and is clipped; "
+                        "set segment_size to print it on several pages",
+                        document,
+                    )
                 # 200 inches is the maximum size for Adobe Acrobat Reader.
                 pdf_params.update(
                     {
@@ -160,46 +780,59 @@ class StyledWebPDFExporter(StyledHTMLExporter):
                         "height": min(height, 200 * 72),
                     }
                 )
-            pdf_data = await page.pdf(**pdf_params)
+            if stream is None:
+                pdf = await page.pdf(**pdf_params)
+            else:
+                pdf = await _stream_pdf(page, pdf_params, stream)
+            self.log.debug("Requests of %s: %s", document, router.counts)
+            return pdf
 
-            await browser.close()
-            await playwright.stop()
-            return pdf_data
+        return print_page
 
-        pool = concurrent.futures.ThreadPoolExecutor()
-        # Create a temporary file to pass the HTML code to Chromium:
-        # Unfortunately, tempfile on Windows does not allow for an already open
-        # file to be opened by a separate process. So we must close it first
-        # before calling Chromium. We also specify delete=False to ensure the
-        # file is not deleted after closing (the default behavior).
-        temp_file = tempfile.NamedTemporaryFile(suffix=".html", delete=False)
-        with temp_file:
-            temp_file.write(html.encode("utf-8"))
-        try:
+    async def _load_document(self, page, router, document):
+        """Route a page through an asset router, load the document and wait until it is ready.
 
-            def run_coroutine(coro):
-                """Run an internal coroutine."""
-                if IS_WINDOWS:
-                    # For Windows, explicitly set WindowsProactorEventLoopPolicy for subprocess support
-                    # This is required when running asyncio in a thread pool on Windows
-                    # See: https://docs.python.org/3/library/asyncio-platforms.html#windows
-                    asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
-                    loop = asyncio.new_event_loop()
-                else:
-                    loop = asyncio.new_event_loop()
+        Args:
+            page (playwright.async_api.Page): The pooled page.
+            router (AssetRouter): Router serving the document at ``router.url``.
+            document (str): Path or URL of the document, for the log.
+        """
+        await page.route("**/*", router.handle)
+        await page.goto(router.url, wait_until="commit")
+        await self._wait_until_ready(page, document)
 
-                asyncio.set_event_loop(loop)
-                return loop.run_until_complete(coro)
+    async def _wait_until_ready(self, page, document):
+        """Wait until a loaded page is ready for printing, at most ``ready_timeout``.
 
-            pdf_data = pool.submit(run_coroutine, main(temp_file)).result()
-        finally:
-            # Ensure the file is deleted even if playwright raises an exception
-            os.unlink(temp_file.name)
-        return pdf_data
+        Args:
+            page (playwright.async_api.Page): The page loading the document.
+            document (str): Path or URL of the document, for the log.
+
+        Returns:
+            (str): What ended the wait: ``"signal"``, ``"load"`` or ``"timeout"``.
+        """
+        start = time.monotonic()
+        try:
+            reason = await asyncio.wait_for(page.evaluate(_READY_SCRIPT), self.ready_timeout)
+        except asyncio.TimeoutError:
+            self.log.warning(
+                "%s was not ready after %.1fs, printing it anyway", document, self.ready_timeout
+            )
+            return "timeout"
+        self.log.info(
+            "%s ready after %.0fms: %s",
+            document,
+            (time.monotonic() - start) * 1000,
+            _READY_REASONS.get(reason, reason),
+        )
+        return reason
 
-    def from_notebook_node(self, nb, resources=None, **kw):
+    def _from_notebook_node_uncached(self, nb, resources=None, **kw):
         """Convert from a notebook node to PDF with styles.
 
+        This is called by :meth:`from_notebook_node` when the export is not
+        served from the export cache, so a cache hit never starts the browser.
+
         Args:
             nb (NotebookNode): The notebook to convert.
             resources (dict, optional): Additional resources used in the conversion
@@ -213,15 +846,434 @@ class StyledWebPDFExporter(StyledHTMLExporter):
                 - resources (dict): Updated resources dictionary with
                     output_extension set to ".pdf".
         """
-        # Use the parent StyledHTMLExporter to generate HTML with styles
-        html, resources = super().from_notebook_node(nb, resources=resources, **kw)
+        segments = self._segment_cells(nb) if self.segment_size > 0 else []
+        if len(segments) > 1:
+            pdf_data, resources = self._from_segments(nb, segments, resources, **kw)
+        else:
+            # Use the parent StyledHTMLExporter to generate HTML with styles
+            html, resources = super()._from_notebook_node_uncached(nb, resources=resources, **kw)
+
+            self.log.info("Building PDF with styles")
+            # Passed to run_playwright this way so that overrides taking only the
+            # HTML keep working.
+            self._notebook_dir = resources["metadata"].get("path")
+            try:
+                if self.pdf_engine == "weasyprint":
+                    pdf_data = self.run_weasyprint(html)
+                else:
+                    pdf_data = self.run_playwright(html)
+            finally:
+                self._notebook_dir = None
+            self.log.info("PDF successfully created")
+
+            # convert output extension to pdf
+            # the writer above required it to be html
+            resources["output_extension"] = ".pdf"
+
+        return self._optimize_pdf(pdf_data, resources), resources
+
+    def _preprocess(self, nb, resources):
+        """Run the preprocessors and adapt the notebook to the PDF engine.
+
+        Args:
+            nb (NotebookNode): The notebook to preprocess.
+            resources (dict): Additional resources used in the conversion process.
+
+        Returns:
+            (tuple): The processed notebook and the resources, with
+                ``resources["javascript"]`` telling the template whether the
+                engine runs scripts.
+
+        Notes:
+            Without JavaScript, outputs that have a static representation as
+            well lose their JavaScript and widget representations, so that the
+            static one is printed instead of an empty script.
+        """
+        nb, resources = super()._preprocess(nb, resources)
+        resources["javascript"] = self.pdf_engine == "playwright"
+        if not resources["javascript"]:
+            for cell in nb.cells:
+                for output in cell.get("outputs", []):
+                    data = output.get("data", {})
+                    if any(mimetype not in _SCRIPT_MIMETYPES for mimetype in data):
+                        for mimetype in _SCRIPT_MIMETYPES:
+                            data.pop(mimetype, None)
+        return nb, resources
+
+    def _optimize_pdf(self, pdf_data, resources):
+        """Optimize a printed PDF if ``optimize_pdf`` is enabled.
+
+        Args:
+            pdf_data (bytes): The PDF.
+            resources (dict): Resources of the export, which receive the
+                optimizer's report in ``pdf_optimization``.
+
+        Returns:
+            (bytes): The optimized PDF, or ``pdf_data`` if optimization is disabled.
+
+        Raises:
+            RuntimeError: If pypdf is not installed.
+        """
+        if not self.optimize_pdf:
+            return pdf_data
+        optimizer = PDFOptimizer(parent=self)
+        pdf_data = optimizer.optimize(pdf_data)
+        resources["pdf_optimization"] = optimizer.report()
+        report = resources["pdf_optimization"]
+        self.log.info(
+            "PDF optimized from %d to %d bytes", report["bytes_before"], report["bytes_after"]
+        )
+        return pdf_data
+
+    def _segment_cells(self, nb):
+        """Split the cells of a notebook into segments of at most ``segment_size`` bytes.
+
+        Args:
+            nb (NotebookNode): The notebook to split.
+
+        Returns:
+            (list): Lists of consecutive cells. A cell larger than
+                ``segment_size`` forms a segment of its own.
+        """
+        segments = [[]]
+        size = 0
+        for cell in nb.cells:
+            cell_size = len(json.dumps(cell, default=str))
+            if segments[-1] and size + cell_size > self.segment_size:
+                segments.append([])
+                size = 0
+            segments[-1].append(cell)
+            size += cell_size
+        return segments
+
+    def _from_segments(self, nb, segments, resources=None, **kw):
+        """Print a notebook segment by segment and merge the PDFs.
+
+        Segments are rendered one after the other and printed concurrently, with
+        at most ``browser_count * pages_per_browser`` documents held at once.
+        With the ``weasyprint`` engine each segment is printed as soon as it is
+        rendered.
+
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            segments (list): Lists of consecutive cells, from :meth:`_segment_cells`.
+            resources (dict, optional): Additional resources used in the conversion
+                process. Defaults to None.
+            **kw (dict): Additional keyword arguments passed to the HTML conversion.
+
+        Returns:
+            (tuple): The merged PDF (bytes) and the resources of the first
+                segment, with ``output_extension`` set to ".pdf" and the number
+                of segments in ``pdf_segments``.
+
+        Raises:
+            RuntimeError: If pypdf or the PDF engine is not installed.
+        """
+        if not PYPDF_INSTALLED:
+            msg = (
+                "pypdf is not installed to support segmented PDF rendering. "
+                "Please install `jupyter-export-html-style[pdf]` to enable."
+            )
+            raise RuntimeError(msg)
+
+        pool = self._get_browser_pool() if self.pdf_engine == "playwright" else None
+        limit = max(1, self.browser_count * self.pages_per_browser)
+        pdfs = [None] * len(segments)
+        levels = [None] * len(segments)
+        printing = {}
+        first_resources = None
+        self.log.info("Building PDF with styles in %d segments", len(segments))
+        try:
+            for index, cells in enumerate(segments):
+                while len(printing) >= limit:
+                    self._collect_segments(printing, pdfs, concurrent.futures.FIRST_COMPLETED)
+
+                segment = copy.copy(nb)
+                segment.cells = cells
+                html, segment_resources = super()._from_notebook_node_uncached(
+                    segment, resources=copy.deepcopy(resources), **kw
+                )
+                if first_resources is None:
+                    first_resources = segment_resources
+                levels[index] = heading_levels(html)
+
+                base_dir = segment_resources["metadata"].get("path")
+                if pool is None:
+                    pdfs[index] = self._print_weasyprint(None, base_dir=base_dir, html=html)
+                    continue
+                html_path = None
+                if self.html_handoff == "file":
+                    with tempfile.NamedTemporaryFile(suffix=".html", delete=False) as f:
+                        f.write(html.encode("utf-8"))
+                    html_path, html = f.name, None
+                job = self._print_job(html_path, base_dir=base_dir, html=html, outline=True)
+                printing[pool.submit(job)] = (index, html_path)
+                del html
 
-        self.log.info("Building PDF with styles")
-        pdf_data = self.run_playwright(html)
+            while printing:
+                self._collect_segments(printing, pdfs, concurrent.futures.ALL_COMPLETED)
+        finally:
+            for future, (_, html_path) in printing.items():
+                future.cancel()
+                _unlink_quietly(html_path)
+
+        pdf_data = merge_pdfs(pdfs, heading_levels=levels)
         self.log.info("PDF successfully created")
+        first_resources["output_extension"] = ".pdf"
+        first_resources["pdf_segments"] = len(segments)
+        return pdf_data, first_resources
+
+    @staticmethod
+    def _collect_segments(printing, pdfs, return_when):
+        """Wait for segment print jobs and store their PDFs.
+
+        Args:
+            printing (dict): Futures of the running print jobs, mapped to the
+                segment index and temporary HTML file. Finished jobs are removed.
+            pdfs (list): PDFs of the segments by index, filled in as jobs finish.
+            return_when (str): When to stop waiting, as for
+                :func:`concurrent.futures.wait`.
+
+        Raises:
+            Exception: The first error raised by a finished print job.
+        """
+        done, _ = concurrent.futures.wait(printing, return_when=return_when)
+        for future in done:
+            index, html_path = printing.pop(future)
+            _unlink_quietly(html_path)
+            pdfs[index] = future.result()
+
+    def export_to_stream(self, nb, stream, resources=None, **kw):
+        """Convert a notebook node to PDF and write it to a binary stream.
+
+        The HTML is streamed into a temporary file and the PDF is copied from the
+        browser to ``stream`` in chunks, so neither document is held in memory
+        as a whole.
+
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            stream (file-like): Binary stream that receives the PDF.
+            resources (dict, optional): Additional resources used in the conversion
+                process. If None, an empty dictionary is created. Defaults to None.
+            **kw (dict): Additional keyword arguments passed to
+                :meth:`iter_from_notebook_node`.
+
+        Returns:
+            (dict): The updated resources dictionary with output_extension set
+                to ".pdf".
+
+        Raises:
+            RuntimeError: If the PDF engine is not installed or no suitable
+                chromium executable is found.
+
+        Examples:
+            >>> exporter = StyledWebPDFExporter()
+            >>> with open("notebook.pdf", "wb") as f:
+            ...     resources = exporter.export_to_stream(notebook, f)
+        """
+        # See run_playwright for why the file is closed before Chromium opens it.
+        temp_file = tempfile.NamedTemporaryFile(suffix=".html", delete=False)
+        try:
+            with temp_file:
+                resources = super().export_to_stream(nb, temp_file, resources, **kw)
+
+            self.log.info("Building PDF with styles")
+            self._print_pdf(temp_file.name, stream, resources["metadata"].get("path"))
+            self.log.info("PDF successfully created")
+        finally:
+            os.unlink(temp_file.name)
 
-        # convert output extension to pdf
-        # the writer above required it to be html
         resources["output_extension"] = ".pdf"
+        return resources
+
+    def export_to_file(self, nb, output_path, resources=None, **kw):
+        """Convert a notebook node to PDF and write it to a file.
 
-        return pdf_data, resources
+        Args:
+            nb (NotebookNode): The notebook to convert.
+            output_path (str or os.PathLike): Path of the PDF file to write.
+            resources (dict, optional): Additional resources used in the conversion
+                process. If None, an empty dictionary is created. Defaults to None.
+            **kw (dict): Additional keyword arguments passed to
+                :meth:`iter_from_notebook_node`.
+
+        Returns:
+            (dict): The updated resources dictionary with output_extension set
+                to ".pdf".
+
+        Raises:
+            RuntimeError: If playwright is not installed or no suitable
+                chromium executable is found.
+
+        Examples:
+            >>> exporter = StyledWebPDFExporter()
+            >>> resources = exporter.export_to_file(notebook, "notebook.pdf")
+        """
+        with open(output_path, "wb") as f:
+            return self.export_to_stream(nb, f, resources, **kw)
+
+
+def _batch_context(start_method=None):
+    """Return the multiprocessing context for the batch rendering workers.
+
+    Forking a process that runs other threads can deadlock the child on a lock
+    held by one of them, so fork is only the default while this is the only
+    thread.
+
+    Args:
+        start_method (str or None): The requested start method, or None to
+            choose one.
+
+    Returns:
+        (multiprocessing.context.BaseContext): The context.
+    """
+    if start_method is None:
+        methods = multiprocessing.get_all_start_methods()
+        if "fork" in methods and threading.active_count() == 1:
+            start_method = "fork"
+        elif "forkserver" in methods:
+            start_method = "forkserver"
+        else:
+            start_method = "spawn"
+    return multiprocessing.get_context(start_method)
+
+
+def _load_batch_notebook(source, resources=None):
+    """Prepare a notebook of a batch and its resources.
+
+    Args:
+        source (str, os.PathLike or NotebookNode): A notebook path or node.
+
+    Keyword Parameters:
+        resources (dict or None): Resources shared by the batch. Defaults to None.
+
+    Returns:
+        (tuple): The notebook node and a copy of the resources, with the
+            notebook's name and directory filled in for paths.
+    """
+    job_resources = dict(resources or {})
+    job_resources["metadata"] = dict(job_resources.get("metadata") or {})
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        nb = nbformat.read(path, as_version=4)
+        job_resources["metadata"]["name"] = os.path.splitext(os.path.basename(path))[0]
+        job_resources["metadata"]["path"] = os.path.dirname(path) or "."
+        return nb, job_resources
+    return source, job_resources
+
+
+def _render_batch_html(settings, source, resources):
+    """Render the HTML of one batch notebook; runs in a worker.
+
+    Args:
+        settings (tuple): Exporter class and config from
+            :meth:`StyledWebPDFExporter._batch_settings`.
+        source (str, os.PathLike or NotebookNode): The notebook path or node.
+        resources (dict or None): Resources shared by the batch.
+
+    Returns:
+        (tuple): The HTML (str) and the resources without their callable
+            template helpers, so that they can be sent back to the parent.
+    """
+    exporter = _worker_exporter(settings)
+    nb, resources = _load_batch_notebook(source, resources)
+    html, resources = StyledHTMLExporter._from_notebook_node_uncached(exporter, nb, resources)
+    return html, {name: value for name, value in resources.items() if not callable(value)}
+
+
+def _print_batch_pdf(settings, source, resources):
+    """Render and print one batch notebook in-process; runs in a worker.
+
+    Args:
+        settings (tuple): Exporter class and config from
+            :meth:`StyledWebPDFExporter._batch_settings`.
+        source (str, os.PathLike or NotebookNode): The notebook path or node.
+        resources (dict or None): Resources shared by the batch.
+
+    Returns:
+        (tuple): The PDF (bytes) and the resources, as for
+            :func:`_render_batch_html`.
+    """
+    html, resources = _render_batch_html(settings, source, resources)
+    pdf_data = _worker_exporter(settings).run_weasyprint(
+        html, base_dir=resources["metadata"].get("path")
+    )
+    return pdf_data, resources
+
+
+def _worker_exporter(settings):
+    """Return the exporter of a worker, creating it on first use.
+
+    Args:
+        settings (tuple): Exporter class and config from
+            :meth:`StyledWebPDFExporter._batch_settings`.
+
+    Returns:
+        (StyledWebPDFExporter): The exporter built from ``settings``.
+    """
+    exporter_class, config = settings
+    key = (exporter_class, fingerprint(config))
+    exporter = _WORKER_EXPORTERS.get(key)
+    if exporter is None:
+        exporter = _WORKER_EXPORTERS[key] = exporter_class(config=config)
+    return exporter
+
+
+def _unlink_quietly(path):
+    """Delete a file, if there is one, ignoring errors."""
+    if path is None:
+        return
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+async def _stream_pdf(page, pdf_params, stream):
+    """Print a page to PDF and copy it to a stream in chunks.
+
+    Uses the Chrome DevTools Protocol ``Page.printToPDF`` command with
+    ``transferMode: ReturnAsStream`` so the PDF is read from the browser in
+    chunks instead of being returned as a single base64 string.
+
+    Args:
+        page (playwright.async_api.Page): The page to print.
+        pdf_params (dict): Playwright ``page.pdf()`` keyword arguments.
+        stream (file-like): Binary stream that receives the PDF.
+    """
+    params = {
+        "printBackground": pdf_params.get("print_background", False),
+        "generateTaggedPDF": pdf_params.get("tagged", False),
+        "generateDocumentOutline": pdf_params.get("outline", False),
+        # Playwright prints without margins by default; Chromium does not.
+        "marginTop": 0,
+        "marginBottom": 0,
+        "marginLeft": 0,
+        "marginRight": 0,
+        "transferMode": "ReturnAsStream",
+    }
+    # Playwright takes sizes in CSS pixels, the protocol in inches.
+    if "width" in pdf_params:
+        params["paperWidth"] = pdf_params["width"] / 96
+    if "height" in pdf_params:
+        params["paperHeight"] = pdf_params["height"] / 96
+
+    session = await page.context.new_cdp_session(page)
+    try:
+        result = await session.send("Page.printToPDF", params)
+        handle = result["stream"]
+        try:
+            while True:
+                chunk = await session.send("IO.read", {"handle": handle, "size": _PDF_READ_SIZE})
+                data = chunk.get("data", "")
+                if data:
+                    if chunk.get("base64Encoded"):
+                        stream.write(base64.b64decode(data))
+                    else:
+                        stream.write(data.encode("latin-1"))
+                if chunk.get("eof"):
+                    break
+        finally:
+            await session.send("IO.close", {"handle": handle})
+    finally:
+        await session.detach()
@@ -0,0 +1,190 @@
+"""
+Caching of rendered cell fragments for incremental re-export.
+
+In incremental mode every cell is given a fragment key: a hash of the
+preprocessed cell (source, outputs, metadata and attachments) and of everything
+else its rendering depends on, such as the exporter configuration, the template
+files and the notebook's language and widget state. The template looks each key
+up before rendering a cell and stores the fragments it had to render, so
+re-exporting a notebook after editing one cell renders only that cell.
+"""
+
+import hashlib
+import json
+
+from .images import LRUCache
+
+# Prefix of the DOM ids given to cells.
+CELL_DOM_ID_PREFIX = "cell-"
+
+# Process-wide cache of rendered cell fragments keyed by fragment key.
+_FRAGMENT_CACHE = LRUCache(maxsize=256 * 1024 * 1024)
+
+
+def get_fragment_cache():
+    """Return the process-wide cache of rendered cell fragments.
+
+    Returns:
+        (LRUCache):
+            The cache shared by all styled exporters. Keys are fragment keys as
+            computed by :func:`cell_fragment_key`; values are the rendered HTML
+            of one cell, bounded by their total length.
+
+    Examples:
+        >>> from jupyter_export_html_style.fragments import get_fragment_cache
+        >>> hits, misses, evictions, currsize, maxsize = get_fragment_cache().cache_info()
+    """
+    return _FRAGMENT_CACHE
+
+
+def cell_dom_id(cell, index):
+    """Return a DOM id for a cell that does not change when other cells move.
+
+    Args:
+        cell (NotebookNode):
+            The cell.
+        index (int):
+            Position of the cell in the notebook, used only for cells without an
+            nbformat cell id (notebooks older than nbformat 4.5).
+
+    Returns:
+        (str):
+            ``cell-<cell id>``, or ``cell-<index>`` if the cell has no id.
+
+    Examples:
+        >>> from nbformat.v4 import new_markdown_cell
+        >>> cell_dom_id(new_markdown_cell("Hi", id="intro"), 3)
+        'cell-intro'
+    """
+    cell_id = cell.get("id")
+    return f"{CELL_DOM_ID_PREFIX}{cell_id if cell_id else index}"
+
+
+def fingerprint(value):
+    """Hash a JSON-like value, such as configuration or notebook metadata.
+
+    Args:
+        value (object):
+            The value to hash. Dictionaries are hashed independently of key order.
+            Classes and functions are identified by their qualified names, any
+            other object that is not JSON serializable by its ``repr``.
+
+    Returns:
+        (str):
+            The hex SHA-256 digest of the value.
+
+    Examples:
+        >>> fingerprint({"b": 1, "a": [1, 2]}) == fingerprint({"a": [1, 2], "b": 1})
+        True
+    """
+    text = json.dumps(value, sort_keys=True, default=_describe, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cell_fragment_key(cell, context):
+    """Compute the fragment key of a preprocessed cell.
+
+    Args:
+        cell (NotebookNode):
+            The preprocessed cell, including its metadata and outputs.
+        context (str):
+            Fingerprint of everything outside the cell that affects how it is
+            rendered.
+
+    Returns:
+        (str):
+            The hex SHA-256 digest identifying the rendered fragment.
+
+    Examples:
+        >>> from nbformat.v4 import new_code_cell
+        >>> key = cell_fragment_key(new_code_cell("1 + 1", id="a"), fingerprint({}))
+    """
+    return fingerprint([context, cell])
+
+
+class FragmentStore:
+    """Per-export access to the fragment cache for the template filters.
+
+    The exporter registers :meth:`lookup` as the ``cached_fragment`` filter and
+    :meth:`store` as the ``cache_fragment`` filter.
+
+    Args:
+        cache (LRUCache or None):
+            The cache to read and fill. None disables caching; every lookup misses.
+
+    Attributes:
+        hits (int): Number of cells served from the cache in this export.
+        misses (int): Number of cells rendered in this export.
+
+    Examples:
+        >>> store = FragmentStore(LRUCache(maxsize=1024))
+        >>> store.lookup("key") is None
+        True
+        >>> store.store("<div>...</div>", "key")
+        '<div>...</div>'
+        >>> store.lookup("key")
+        '<div>...</div>'
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """Return the cached fragment for a key.
+
+        Args:
+            key (str):
+                The fragment key.
+
+        Returns:
+            (str or None):
+                The cached HTML, or None if the cell has to be rendered.
+        """
+        fragment = self.cache.get(key) if self.cache is not None else None
+        if fragment is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return fragment
+
+    def store(self, fragment, key):
+        """Cache a freshly rendered fragment.
+
+        Args:
+            fragment (str):
+                The rendered HTML of the cell.
+            key (str):
+                The fragment key.
+
+        Returns:
+            (str):
+                ``fragment``, so the filter can be used inline in the template.
+        """
+        if self.cache is not None:
+            self.cache.put(key, str(fragment))
+        return fragment
+
+    def report(self):
+        """Summarize the cache use of this export.
+
+        Returns:
+            (dict):
+                The number of cells served from the cache and rendered.
+
+        Examples:
+            >>> FragmentStore(None).report()
+            {'hits': 0, 'misses': 0}
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def _describe(value):
+    """Return a stable JSON-serializable stand-in for a value json cannot encode."""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    name = getattr(value, "__qualname__", None)
+    if name is not None:
+        return f"{getattr(value, '__module__', '')}.{name}"
+    return repr(value)
@@ -0,0 +1,299 @@
+"""
+Downscaling and recompression of images before they are embedded.
+"""
+
+import hashlib
+import io
+from importlib import util as importlib_util
+
+from traitlets import Bool, Int, List
+from traitlets.config import LoggingConfigurable
+
+from .images import LRUCache
+
+PILLOW_INSTALLED = importlib_util.find_spec("PIL") is not None
+
+# Image types the optimizer knows how to decode and re-encode.
+_OPTIMIZABLE_TYPES = {"image/png", "image/jpeg"}
+
+
+class OptimizedImage:
+    """The result of optimizing one image.
+
+    Args:
+        mime_type (str):
+            Mime type of the optimized image.
+        data (bytes):
+            Content of the optimized image.
+        width (int or None):
+            Pixel width of the optimized image, or None if it was not decoded.
+        variants (tuple):
+            Smaller ``(width, mime_type, data)`` renditions for a ``srcset``,
+            narrowest first.
+
+    Attributes:
+        mime_type (str): Mime type of the optimized image.
+        data (bytes): Content of the optimized image.
+        width (int or None): Pixel width of the optimized image.
+        variants (tuple): Smaller renditions for a ``srcset``.
+
+    Examples:
+        >>> image = OptimizedImage("image/png", b"...", 640, ())
+        >>> len(image)
+        3
+    """
+
+    __slots__ = ("mime_type", "data", "width", "variants")
+
+    def __init__(self, mime_type, data, width, variants):
+        self.mime_type = mime_type
+        self.data = data
+        self.width = width
+        self.variants = variants
+
+    def __len__(self):
+        """Total size in bytes of the image and its variants, used to bound caches."""
+        return len(self.data) + sum(len(data) for _, _, data in self.variants)
+
+
+# Process-wide cache of optimization results keyed by content hash and settings.
+_OPTIMIZED_CACHE = LRUCache(maxsize=128 * 1024 * 1024)
+
+
+def get_optimized_image_cache():
+    """Return the process-wide cache of optimized images.
+
+    Returns:
+        (LRUCache):
+            The cache shared by all :class:`ImageOptimizer` instances. Keys are the
+            SHA-256 of the original image plus the optimizer settings.
+
+    Examples:
+        >>> from jupyter_export_html_style.image_optimizer import get_optimized_image_cache
+        >>> info = get_optimized_image_cache().cache_info()
+    """
+    return _OPTIMIZED_CACHE
+
+
+class ImageOptimizer(LoggingConfigurable):
+    """Downscale and recompress PNG and JPEG images.
+
+    The optimizer caps pixel dimensions, recompresses PNG and JPEG data,
+    optionally converts to WebP and optionally produces narrower renditions for
+    an ``srcset``. Results are cached process-wide by content hash so that
+    re-exporting the same images is cheap. Each instance keeps a running report
+    of the bytes saved.
+
+    Attributes:
+        max_width (Int): Maximum pixel width; wider images are downscaled.
+            0 disables the limit. Defaults to 1920.
+        max_height (Int): Maximum pixel height; taller images are downscaled.
+            0 disables the limit. Defaults to 1920.
+        jpeg_quality (Int): JPEG quality (1-95). Defaults to 85.
+        png_compress_level (Int): zlib compression level for PNG (0-9).
+            Defaults to 9.
+        convert_to_webp (Bool): Re-encode images as WebP. Defaults to False.
+        webp_quality (Int): WebP quality (1-100). Defaults to 80.
+        srcset_widths (List): Pixel widths of additional renditions to generate
+            for a ``srcset``. Widths not smaller than the image are skipped.
+            Defaults to no renditions.
+
+    Raises:
+        RuntimeError: If Pillow is not installed.
+
+    Notes:
+        Other image types (SVG, GIF, ...) are passed through unchanged. If
+        recompressing an image that did not need downscaling makes it larger,
+        the original is kept. JPEG EXIF orientation is applied before resizing
+        because metadata is not carried over to the recompressed image.
+
+        Requires Pillow, installable with
+        ``pip install jupyter-export-html-style[images]``.
+
+    Examples:
+        >>> from jupyter_export_html_style.image_optimizer import ImageOptimizer
+        >>> optimizer = ImageOptimizer(max_width=1200, jpeg_quality=80)
+        >>> result = optimizer.optimize("image/png", png_bytes)
+        >>> saved = optimizer.report()["bytes_saved"]
+    """
+
+    max_width = Int(1920, help="Maximum pixel width of images. 0 for no limit.").tag(config=True)
+
+    max_height = Int(1920, help="Maximum pixel height of images. 0 for no limit.").tag(config=True)
+
+    jpeg_quality = Int(85, help="Quality used when re-encoding JPEG images (1-95).").tag(
+        config=True
+    )
+
+    png_compress_level = Int(9, help="zlib compression level used for PNG images (0-9).").tag(
+        config=True
+    )
+
+    convert_to_webp = Bool(False, help="Re-encode PNG and JPEG images as WebP.").tag(config=True)
+
+    webp_quality = Int(80, help="Quality used when encoding WebP images (1-100).").tag(config=True)
+
+    srcset_widths = List(
+        Int(),
+        [],
+        help="""
+        Pixel widths of narrower renditions to generate for a srcset attribute.
+
+        With embedded images every rendition is embedded as well, so this is most
+        useful together with external images.
+        """,
+    ).tag(config=True)
+
+    def __init__(self, **kw):
+        if not PILLOW_INSTALLED:
+            msg = (
+                "Pillow is not installed to support image optimization. "
+                "Please install `jupyter-export-html-style[images]` to enable."
+            )
+            raise RuntimeError(msg)
+        super().__init__(**kw)
+        self.images = 0
+        self.optimized = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    @property
+    def fingerprint(self):
+        """Tuple of the settings that affect the optimized output."""
+        return (
+            self.max_width,
+            self.max_height,
+            self.jpeg_quality,
+            self.png_compress_level,
+            self.convert_to_webp,
+            self.webp_quality,
+            tuple(sorted(self.srcset_widths)),
+        )
+
+    def optimize(self, mime_type, data):
+        """Optimize a single image.
+
+        Args:
+            mime_type (str):
+                Mime type of the image.
+            data (bytes):
+                Content of the image.
+
+        Returns:
+            (OptimizedImage):
+                The optimized image. Its ``data`` is the original ``data`` object
+                when the image was left unchanged.
+
+        Examples:
+            >>> optimizer = ImageOptimizer()
+            >>> optimizer.optimize("image/svg+xml", b"<svg/>").data
+            b'<svg/>'
+        """
+        self.images += 1
+        self.bytes_before += len(data)
+        if mime_type not in _OPTIMIZABLE_TYPES:
+            self.bytes_after += len(data)
+            return OptimizedImage(mime_type, data, None, ())
+
+        cache = get_optimized_image_cache()
+        key = (hashlib.sha256(data).hexdigest(), mime_type, self.fingerprint)
+        result = cache.get(key)
+        if result is None:
+            try:
+                result = self._optimize_uncached(mime_type, data)
+            except Exception as e:
+                # Undecodable images are embedded exactly as they are.
+                self.log.warning("Could not optimize %s image: %s", mime_type, e)
+                result = OptimizedImage(mime_type, data, None, ())
+            cache.put(key, result)
+        if result.data is not data and result.data != data:
+            self.optimized += 1
+        self.bytes_after += len(result.data)
+        return result
+
+    def report(self):
+        """Summarize the images processed by this optimizer.
+
+        Returns:
+            (dict):
+                Counts of images seen and changed, and their total size before and
+                after optimization, in bytes.
+
+        Examples:
+            >>> ImageOptimizer().report()
+            {'images': 0, 'optimized': 0, 'bytes_before': 0, 'bytes_after': 0, 'bytes_saved': 0}
+        """
+        return {
+            "images": self.images,
+            "optimized": self.optimized,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "bytes_saved": self.bytes_before - self.bytes_after,
+        }
+
+    def _optimize_uncached(self, mime_type, data):
+        """Decode, downscale and re-encode an image.
+
+        Args:
+            mime_type (str):
+                Mime type of the image, either ``image/png`` or ``image/jpeg``.
+            data (bytes):
+                Content of the image.
+
+        Returns:
+            (OptimizedImage):
+                The optimized image.
+        """
+        from PIL import Image, ImageOps
+
+        with Image.open(io.BytesIO(data)) as source:
+            image = ImageOps.exif_transpose(source) if mime_type == "image/jpeg" else source
+            image.load()
+            width, height = image.size
+            scale = 1.0
+            if self.max_width > 0:
+                scale = min(scale, self.max_width / width)
+            if self.max_height > 0:
+                scale = min(scale, self.max_height / height)
+            if scale < 1.0:
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                image = image.resize(size, Image.Resampling.LANCZOS)
+
+            target_type = "image/webp" if self.convert_to_webp else mime_type
+            encoded = self._encode(image, target_type)
+            if scale == 1.0 and len(encoded) >= len(data):
+                target_type, encoded = mime_type, data
+
+            variants = []
+            for variant_width in sorted(set(self.srcset_widths)):
+                if variant_width <= 0 or variant_width >= image.width:
+                    continue
+                variant_height = max(1, round(image.height * variant_width / image.width))
+                variant = image.resize((variant_width, variant_height), Image.Resampling.LANCZOS)
+                variants.append((variant_width, target_type, self._encode(variant, target_type)))
+
+            return OptimizedImage(target_type, encoded, image.width, tuple(variants))
+
+    def _encode(self, image, mime_type):
+        """Encode a Pillow image.
+
+        Args:
+            image (PIL.Image.Image):
+                The image to encode.
+            mime_type (str):
+                The target mime type.
+
+        Returns:
+            (bytes):
+                The encoded image.
+        """
+        buffer = io.BytesIO()
+        if mime_type == "image/webp":
+            image.save(buffer, "WEBP", quality=self.webp_quality, method=6)
+        elif mime_type == "image/jpeg":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(buffer, "JPEG", quality=self.jpeg_quality, optimize=True, progressive=True)
+        else:
+            image.save(buffer, "PNG", optimize=True, compress_level=self.png_compress_level)
+        return buffer.getvalue()
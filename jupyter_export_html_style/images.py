@@ -0,0 +1,732 @@
+"""
+Image embedding for exported HTML documents.
+
+This module rewrites the ``src`` attribute of ``<img>`` tags in rendered HTML
+without building a document tree. The HTML is scanned as a stream of tokens and
+only the attribute values that change are rewritten; every other character is
+copied through unchanged.
+"""
+
+import base64
+import hashlib
+import html as html_lib
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+import threading
+from collections import OrderedDict, namedtuple
+from urllib.parse import quote
+
+from .streaming import _ATTR_RE, TagRewriter, add_attributes
+
+_IMG_HINT_RE = re.compile(r"<img\b", re.IGNORECASE)
+
+# Cheap check for at least one <img> whose src is not already a data URI.
+_EXTERNAL_IMG_HINT_RE = re.compile(
+    r"""<img\b(?:[^>"']|"[^"]*"|'[^']*')*?\ssrc\s*=\s*(?!["']?data:)""", re.IGNORECASE
+)
+
+# Image references in markdown source and HTML: ![alt](path), [label]: path and src="path".
+_IMAGE_REFERENCE_RES = (
+    re.compile(r"!\[[^\]]*\]\(\s*(?:<([^>]*)>|([^)\s]+))"),
+    re.compile(r"^\s{0,3}\[[^\]]+\]:\s*(?:<([^>]*)>|(\S+))", re.MULTILINE),
+    re.compile(r"""\bsrc\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE),
+)
+
+# 1x1 transparent GIF shown by de-duplicated images until their source is restored.
+_PLACEHOLDER_SRC = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+
+# Copies the source of the single stored copy of each image to its other uses.
+_DEDUPLICATION_SCRIPT = """
+<script>
+(function () {
+  var sources = {};
+  document.querySelectorAll("img[data-styled-image-id]").forEach(function (img) {
+    sources[img.getAttribute("data-styled-image-id")] = img.getAttribute("src");
+  });
+  document.querySelectorAll("img[data-styled-image-ref]").forEach(function (img) {
+    var src = sources[img.getAttribute("data-styled-image-ref")];
+    if (src) {
+      img.setAttribute("src", src);
+    }
+  });
+})();
+</script>
+"""
+
+# Preferred file extensions for image types that mimetypes maps ambiguously.
+_IMAGE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/svg+xml": ".svg",
+    "image/webp": ".webp",
+}
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "currsize", "maxsize"])
+
+
+class LRUCache:
+    """A thread-safe least-recently-used cache bounded by the total size of its values.
+
+    Args:
+        maxsize (int):
+            Maximum total size, in bytes, of the cached values. The size of a value
+            is its ``len()``. Values larger than ``maxsize`` are never stored.
+
+    Attributes:
+        maxsize (int):
+            The current size bound. Use :meth:`resize` to change it.
+
+    Notes:
+        The cache keeps hit, miss and eviction counters which are reported by
+        :meth:`cache_info` in the same style as :func:`functools.lru_cache`.
+
+    Examples:
+        >>> cache = LRUCache(maxsize=10)
+        >>> cache.put("a", "12345")
+        >>> cache.get("a")
+        '12345'
+        >>> cache.cache_info()
+        CacheInfo(hits=1, misses=0, evictions=0, currsize=5, maxsize=10)
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Look up a key, marking it as most recently used.
+
+        Args:
+            key (hashable):
+                The cache key.
+
+        Keyword Parameters:
+            default (object):
+                Value returned when the key is not cached. Defaults to None.
+
+        Returns:
+            (object):
+                The cached value or ``default``.
+
+        Examples:
+            >>> LRUCache(maxsize=10).get("missing", "fallback")
+            'fallback'
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries to stay within bounds.
+
+        Args:
+            key (hashable):
+                The cache key.
+            value (sized):
+                The value to store.
+
+        Examples:
+            >>> cache = LRUCache(maxsize=4)
+            >>> cache.put("a", "xx")
+            >>> cache.put("b", "yyy")
+            >>> "a" in cache
+            False
+        """
+        size = len(value)
+        with self._lock:
+            if key in self._data:
+                self._size -= len(self._data.pop(key))
+            if size > self.maxsize:
+                return
+            self._data[key] = value
+            self._size += size
+            self._evict()
+
+    def resize(self, maxsize):
+        """Change the size bound, evicting entries if the cache has become too large.
+
+        Args:
+            maxsize (int):
+                The new maximum total size of the cached values.
+
+        Examples:
+            >>> cache = LRUCache(maxsize=10)
+            >>> cache.resize(100)
+            >>> cache.maxsize
+            100
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Remove all entries and reset the statistics.
+
+        Examples:
+            >>> cache = LRUCache(maxsize=10)
+            >>> cache.put("a", "1")
+            >>> cache.clear()
+            >>> len(cache)
+            0
+        """
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+            self._hits = self._misses = self._evictions = 0
+
+    def cache_info(self):
+        """Report cache statistics.
+
+        Returns:
+            (CacheInfo):
+                Named tuple of hits, misses, evictions, the current total size of
+                the cached values and the size bound.
+
+        Examples:
+            >>> LRUCache(maxsize=10).cache_info()
+            CacheInfo(hits=0, misses=0, evictions=0, currsize=0, maxsize=10)
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self._size, self.maxsize)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its bound."""
+        while self._size > self.maxsize and self._data:
+            _, value = self._data.popitem(last=False)
+            self._size -= len(value)
+            self._evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+# Process-wide cache of encoded data URIs, shared by every exporter.
+_IMAGE_CACHE = LRUCache(maxsize=64 * 1024 * 1024)
+
+
+def get_image_cache():
+    """Return the process-wide cache of encoded image data URIs.
+
+    Returns:
+        (LRUCache):
+            The cache shared by all styled exporters. Keys are tuples of the
+            resolved file path, its modification time in nanoseconds and its size,
+            so an edited file is never served stale.
+
+    Examples:
+        >>> from jupyter_export_html_style.images import get_image_cache
+        >>> hits, misses, evictions, currsize, maxsize = get_image_cache().cache_info()
+    """
+    return _IMAGE_CACHE
+
+
+def find_image_references(text):
+    """Find the local files an image embedder may read for a piece of markdown or HTML.
+
+    Args:
+        text (str):
+            Markdown cell source or HTML output.
+
+    Returns:
+        (set of str):
+            Image references as written in ``text``, excluding remote URLs, data
+            URIs and attachments. The scan is deliberately generous: it may
+            include references that are not images.
+
+    Examples:
+        >>> sorted(find_image_references('![a](a.png) <img src="https://x/b.png">'))
+        ['a.png']
+    """
+    references = set()
+    for pattern in _IMAGE_REFERENCE_RES:
+        for match in pattern.finditer(text):
+            src = next(group for group in match.groups() if group is not None)
+            src = html_lib.unescape(src)
+            if src and not src.startswith(("data:", "http://", "https://", "attachment:", "#")):
+                references.add(src)
+    return references
+
+
+class ImageSrcRewriter(TagRewriter):
+    """Incrementally rewrite the ``src`` attribute of ``<img>`` tags in HTML text.
+
+    This is a :class:`~jupyter_export_html_style.streaming.TagRewriter` for
+    ``<img>`` start tags: comments and raw text elements are skipped, and
+    everything other than the rewritten ``src`` values is copied through
+    verbatim. HTML may be fed in arbitrary chunks.
+
+    Args:
+        rewrite_src (callable):
+            Called with the (entity-decoded) value of each ``src`` attribute.
+            Returns the replacement value, None to leave the tag unchanged, or a
+            dict of attributes to set on the tag. The dict must contain ``src``;
+            any other attributes are added to the tag.
+
+    Keyword Parameters:
+        before_body_end (callable or None):
+            Called once, with no arguments, when the ``</body>`` end tag is
+            reached (or at the end of the stream if there is none). The text it
+            returns is inserted before the end tag. Defaults to None.
+
+    Examples:
+        >>> rewriter = ImageSrcRewriter(lambda src: src.upper())
+        >>> rewriter.feed('<p><img src="a.png"></p>') + rewriter.close()
+        '<p><img src="A.PNG"></p>'
+    """
+
+    def __init__(self, rewrite_src, before_body_end=None):
+        super().__init__({"img": self._rewrite_tag}, before_body_end=before_body_end)
+        self.rewrite_src = rewrite_src
+
+    def _rewrite_tag(self, tag):
+        """Rewrite the ``src`` attribute of a single ``<img>`` start tag.
+
+        Args:
+            tag (str):
+                The complete start tag, from ``<img`` to the closing ``>``.
+
+        Returns:
+            (str):
+                The tag with its ``src`` value replaced, or the original tag if
+                there is nothing to rewrite.
+        """
+        for attr in _ATTR_RE.finditer(tag, 4):
+            if attr.group(1).lower() != "src" or attr.group(2) is None:
+                continue
+            raw = attr.group(2)
+            quote = raw[0] if raw[0] in "\"'" else ""
+            value = html_lib.unescape(raw[1:-1] if quote else raw)
+            new_value = self.rewrite_src(value)
+            if new_value is None:
+                return tag
+            extra = {}
+            if isinstance(new_value, dict):
+                extra = dict(new_value)
+                new_value = extra.pop("src")
+            new_raw = f'"{html_lib.escape(new_value, quote=True)}"'
+            tag = tag[: attr.start(2)] + new_raw + tag[attr.end(2) :]
+            if extra:
+                tag = add_attributes(tag, extra)
+            return tag
+        return tag
+
+
+class ImageEmbedder:
+    """Embed images referenced from exported HTML as base64 data URIs.
+
+    Local file references (resolved relative to ``base_path``) and
+    ``attachment:`` references are replaced by data URIs. Remote URLs and
+    existing data URIs are left alone unless de-duplication or externalization
+    is enabled.
+
+    Args:
+        attachments (dict):
+            Mapping of attachment names to mime bundles, as collected from the
+            notebook cells.
+        base_path (str):
+            Directory against which relative file references are resolved.
+
+    Keyword Parameters:
+        cache (LRUCache or None):
+            Cache of encoded data URIs for local files, keyed by resolved path,
+            modification time and size. None disables caching. Defaults to None.
+        embed (bool):
+            If False, file and attachment references are left as they are and
+            only de-duplication of existing data URIs is performed. Defaults to
+            True.
+        deduplicate (bool):
+            If True, each distinct image payload is stored in the document only
+            once. Defaults to False.
+        external_dir (str or None):
+            If given, images are written to this sidecar directory (relative to
+            the output document) instead of being embedded, and the ``<img>``
+            tags point at the written files. Defaults to None.
+        external_threshold (int):
+            In externalization mode, images smaller than this many bytes are
+            embedded as data URIs instead. Defaults to 0.
+        outputs (dict or None):
+            Mapping that receives the externalized files, from their path
+            relative to the output document to their contents. This is normally
+            ``resources["outputs"]`` so that nbconvert's ``FilesWriter`` saves
+            them. Defaults to a new dict.
+        optimizer (ImageOptimizer or None):
+            If given, every image is passed through this optimizer before it is
+            encoded or externalized, and ``srcset`` attributes are added for any
+            renditions it produces. Defaults to None.
+        served_dir (str or None):
+            Directory whose files are served to the reader of the document by
+            other means, such as the request routing of a browser printing it.
+            References to files inside it are left unchanged instead of being
+            embedded. Ignored with de-duplication, externalization or an
+            optimizer, which need the image data. Defaults to None.
+
+    Notes:
+        With de-duplication enabled, the first ``<img>`` carrying a given payload
+        keeps it and is marked with a ``data-styled-image-id`` attribute. Later
+        ``<img>`` tags with the same payload get a tiny placeholder ``src`` and a
+        ``data-styled-image-ref`` attribute, and a short script inserted before
+        ``</body>`` copies the stored source to them when the page loads. This
+        covers file references, ``attachment:`` references and the data URIs
+        nbconvert writes for ``image/png`` and ``image/jpeg`` outputs. Viewers
+        that do not run the script show the placeholders, so de-duplication is
+        only for documents read in a browser with JavaScript.
+
+        Externalized files are named after a hash of their content, so an image
+        used several times (or by several notebooks sharing a sidecar directory)
+        is stored once.
+
+    Examples:
+        >>> embedder = ImageEmbedder({}, base_path="notebooks")
+        >>> html = embedder.embed('<img src="figure.png">')
+
+        >>> # Store a repeated header image only once
+        >>> embedder = ImageEmbedder({}, base_path="notebooks", deduplicate=True)
+
+        >>> # Write images larger than 8 KiB next to the document
+        >>> outputs = {}
+        >>> embedder = ImageEmbedder(
+        ...     {}, external_dir="report_files", external_threshold=8192, outputs=outputs
+        ... )
+    """
+
+    def __init__(
+        self,
+        attachments=None,
+        base_path=".",
+        cache=None,
+        embed=True,
+        deduplicate=False,
+        external_dir=None,
+        external_threshold=0,
+        outputs=None,
+        optimizer=None,
+        served_dir=None,
+    ):
+        self.attachments = attachments or {}
+        self.base_path = base_path
+        self.cache = cache
+        self.embed_images = embed
+        self.deduplicate = deduplicate
+        self.external_dir = external_dir
+        self.external_threshold = external_threshold
+        self.outputs = outputs if outputs is not None else {}
+        self.optimizer = optimizer
+        self.served_dir = os.path.realpath(served_dir) if served_dir is not None else None
+        self._image_ids = {}
+        self._references = 0
+
+    def resolve(self, src):
+        """Compute the data URI for a single image reference.
+
+        Args:
+            src (str):
+                The value of an ``<img>`` tag's ``src`` attribute.
+
+        Returns:
+            (str or None):
+                The data URI to use instead, or None if the reference should be
+                left unchanged.
+
+        Notes:
+            Any failure to read or encode an image leaves that reference
+            unchanged, so that a single broken image never breaks an export.
+
+        Examples:
+            >>> ImageEmbedder().resolve("https://example.com/logo.png") is None
+            True
+        """
+        if not self.embed_images or not src or src.startswith(("data:", "http://", "https://")):
+            return None
+        try:
+            if src.startswith("attachment:"):
+                bundle = self.attachments.get(src[len("attachment:") :])
+                if not bundle:
+                    return None
+                # Attachments can have multiple mime types, pick the first available.
+                # Their data is already base64 encoded.
+                mime_type, data = next(iter(bundle.items()))
+                return f"data:{mime_type};base64,{data}"
+
+            file_path = os.path.join(self.base_path, src)
+            if self._is_served(file_path):
+                return None
+            return self._encode_file(file_path)
+        except Exception:
+            return None
+
+    def _is_served(self, file_path):
+        """Check whether a local file is served without embedding it.
+
+        Args:
+            file_path (str):
+                Path of the image file.
+
+        Returns:
+            (bool):
+                True if the file is inside ``served_dir`` and no option needs
+                its data.
+        """
+        if self.served_dir is None or self.deduplicate:
+            return False
+        if self.external_dir is not None or self.optimizer is not None:
+            return False
+        path = os.path.realpath(file_path)
+        return os.path.commonpath([path, self.served_dir]) == self.served_dir
+
+    def _encode_file(self, file_path):
+        """Read and encode a local image file, consulting the cache first.
+
+        Args:
+            file_path (str):
+                Path of the image file.
+
+        Returns:
+            (str or None):
+                The data URI, or None if the path is not a regular file.
+        """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        key = (os.path.realpath(file_path), st.st_mtime_ns, st.st_size)
+        if self.cache is not None:
+            data_uri = self.cache.get(key)
+            if data_uri is not None:
+                return data_uri
+
+        with open(file_path, "rb") as f:
+            file_data = f.read()
+        # Default to png if the type cannot be guessed from the extension.
+        mime_type = mimetypes.guess_type(file_path)[0] or "image/png"
+        b64_data = base64.b64encode(file_data).decode("ascii")
+        data_uri = f"data:{mime_type};base64,{b64_data}"
+        if self.cache is not None:
+            self.cache.put(key, data_uri)
+        return data_uri
+
+    def embed(self, html):
+        """Embed images in a complete HTML document.
+
+        Args:
+            html (str):
+                The HTML document.
+
+        Returns:
+            (str):
+                The HTML with image references replaced by data URIs. If the
+                document has no image that needs rewriting it is returned
+                unchanged without being tokenized.
+
+        Examples:
+            >>> ImageEmbedder().embed("<p>No images</p>")
+            '<p>No images</p>'
+        """
+        rewrites_data_uris = (
+            self.deduplicate or self.external_dir is not None or self.optimizer is not None
+        )
+        hint = _IMG_HINT_RE if rewrites_data_uris else _EXTERNAL_IMG_HINT_RE
+        if not hint.search(html):
+            return html
+        rewriter = self._make_rewriter()
+        return rewriter.feed(html) + rewriter.close()
+
+    def iter_embed(self, chunks):
+        """Embed images in an HTML document supplied as a stream of chunks.
+
+        Args:
+            chunks (iterable of str):
+                Successive pieces of the HTML document.
+
+        Yields:
+            (str):
+                Rewritten pieces of the document. Empty pieces are skipped.
+
+        Examples:
+            >>> "".join(ImageEmbedder().iter_embed(["<p>a", "b</p>"]))
+            '<p>ab</p>'
+        """
+        yield from self._make_rewriter().iter_rewrite(chunks)
+
+    def _make_rewriter(self):
+        """Create a rewriter for one document, resetting per-document state.
+
+        Returns:
+            (ImageSrcRewriter):
+                A rewriter bound to this embedder.
+        """
+        if self.external_dir is None and self.optimizer is None and not self.deduplicate:
+            return ImageSrcRewriter(self.resolve)
+        self._image_ids = {}
+        self._references = 0
+        before_body_end = self._bootstrap_script if self.deduplicate else None
+        return ImageSrcRewriter(self._rewrite, before_body_end=before_body_end)
+
+    def _rewrite(self, src):
+        """Rewrite a single image reference according to the embedder's options.
+
+        Args:
+            src (str):
+                The value of an ``<img>`` tag's ``src`` attribute.
+
+        Returns:
+            (str, dict or None):
+                The new ``src``, a dict of attributes for the tag, or None to
+                leave it unchanged.
+        """
+        if self.external_dir is None and self.optimizer is None:
+            new_src, attrs = self.resolve(src), {}
+        else:
+            new_src, attrs = self._process(src)
+        current = src if new_src is None else new_src
+        if self.deduplicate and current.startswith("data:"):
+            return {**self._deduplicate(current), **attrs}
+        if attrs:
+            return {"src": current, **attrs}
+        return new_src
+
+    def _deduplicate(self, data_uri):
+        """Point repeated uses of the same image payload at a single stored copy.
+
+        Args:
+            data_uri (str):
+                The data URI of the image.
+
+        Returns:
+            (dict):
+                Attributes for the ``<img>`` tag.
+        """
+        image_id = self._image_ids.get(data_uri)
+        if image_id is None:
+            image_id = self._image_ids[data_uri] = f"image-{len(self._image_ids)}"
+            return {"src": data_uri, "data-styled-image-id": image_id}
+        self._references += 1
+        return {"src": _PLACEHOLDER_SRC, "data-styled-image-ref": image_id}
+
+    def _bootstrap_script(self):
+        """Return the script that restores de-duplicated images, if any were made."""
+        return _DEDUPLICATION_SCRIPT if self._references else ""
+
+    def _load(self, src):
+        """Load the raw bytes behind an image reference.
+
+        Args:
+            src (str):
+                The value of an ``<img>`` tag's ``src`` attribute.
+
+        Returns:
+            (tuple or None):
+                The mime type and content of the image, or None if it cannot be
+                loaded (remote URLs, missing files, non-base64 data URIs).
+        """
+        if not src or src.startswith(("http://", "https://")):
+            return None
+        try:
+            if src.startswith("data:"):
+                header, sep, data = src.partition(",")
+                if not sep or not header.endswith(";base64"):
+                    return None
+                return header[len("data:") : -len(";base64")] or "image/png", base64.b64decode(data)
+            if src.startswith("attachment:"):
+                bundle = self.attachments.get(src[len("attachment:") :])
+                if not bundle:
+                    return None
+                mime_type, data = next(iter(bundle.items()))
+                return mime_type, base64.b64decode(data)
+            file_path = os.path.join(self.base_path, src)
+            if not os.path.isfile(file_path):
+                return None
+            with open(file_path, "rb") as f:
+                return mimetypes.guess_type(file_path)[0] or "image/png", f.read()
+        except Exception:
+            return None
+
+    def _process(self, src):
+        """Load, optimize and re-encode or externalize a single image.
+
+        Args:
+            src (str):
+                The value of an ``<img>`` tag's ``src`` attribute.
+
+        Returns:
+            (tuple):
+                The new ``src`` (or None to keep the current one) and a dict of
+                extra attributes for the tag.
+        """
+        is_data_uri = src.startswith("data:")
+        if not is_data_uri and not self.embed_images and self.external_dir is None:
+            return None, {}
+        loaded = self._load(src)
+        if loaded is None:
+            return None, {}
+        mime_type, payload = loaded
+
+        attrs = {}
+        if self.optimizer is not None:
+            optimized = self.optimizer.optimize(mime_type, payload)
+            unchanged = optimized.mime_type == mime_type and optimized.data == payload
+            mime_type, payload = optimized.mime_type, optimized.data
+        else:
+            optimized, unchanged = None, True
+
+        new_src = self._emit(mime_type, payload, keep=src if unchanged and is_data_uri else None)
+        if optimized is not None and optimized.variants:
+            candidates = [
+                f"{self._emit(variant_type, data)} {width}w"
+                for width, variant_type, data in optimized.variants
+            ]
+            candidates.append(f"{src if new_src is None else new_src} {optimized.width}w")
+            attrs["srcset"] = ", ".join(candidates)
+        return new_src, attrs
+
+    def _emit(self, mime_type, payload, keep=None):
+        """Encode an image as a data URI or write it to the sidecar directory.
+
+        Args:
+            mime_type (str):
+                Mime type of the image.
+            payload (bytes):
+                Content of the image.
+
+        Keyword Parameters:
+            keep (str or None):
+                An existing data URI for exactly this payload. If the image is to
+                stay embedded, None is returned so that it is left unchanged.
+                Defaults to None.
+
+        Returns:
+            (str or None):
+                The new ``src`` (a relative URL or a data URI), or None if ``keep``
+                can be used as it is.
+        """
+        if self.external_dir is None or len(payload) < self.external_threshold:
+            if keep is not None:
+                return None
+            return f"data:{mime_type};base64,{base64.b64encode(payload).decode('ascii')}"
+        digest = hashlib.sha256(payload).hexdigest()[:16]
+        extension = _IMAGE_EXTENSIONS.get(mime_type) or mimetypes.guess_extension(mime_type) or ""
+        filename = posixpath.join(self.external_dir, digest + extension)
+        self.outputs[filename] = payload
+        return quote(filename)
@@ -0,0 +1,328 @@
+"""
+Load testing of the export daemon with synthetic notebooks.
+
+:func:`run_load_test` sends a number of export jobs to a running
+:class:`~.daemon.ExportDaemon`, keeping a fixed number in flight, and
+summarizes the latencies, throughput and response statuses. The notebooks
+are generated by :func:`synthetic_notebook`, so no test data is needed.
+
+Everything runs on one machine: with ``--spawn`` the command starts its own
+daemon on a temporary Unix socket (or port) and stops it afterwards::
+
+    jupyter-export-loadtest --spawn --workers 4 --requests 500 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import nbformat
+import tornado.httpclient
+import tornado.netutil
+import tornado.simple_httpclient
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook, new_output
+
+# Seconds a client waits after the daemon refused a job.
+_BACKOFF = 0.05
+
+# Words the synthetic notebooks are written with.
+_WORDS = (
+    "sample mean variance signal filter model fit residual peak field current "
+    "voltage phase spectrum noise baseline temperature sweep magnet lattice"
+).split()
+
+
+def synthetic_notebook(cells=20, seed=0):
+    """Generate a notebook resembling a typical analysis notebook.
+
+    Args:
+        cells (int): Number of cells. Defaults to 20.
+        seed (int): Seed of the random content, so that equal seeds give equal
+            notebooks. Defaults to 0.
+
+    Returns:
+        (NotebookNode): Alternating markdown and code cells; code cells have
+            stream, HTML table and plain text outputs.
+    """
+    rng = random.Random(seed)
+
+    def sentence(words):
+        return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+    nb_cells = []
+    for index in range(cells):
+        if index % 2 == 0:
+            text = f"## {sentence(3)}\n\n" + " ".join(sentence(12) for _ in range(4))
+            nb_cells.append(new_markdown_cell(text, id=f"cell-{index}"))
+            continue
+        rows = "".join(
+            f"<tr><td>{rng.choice(_WORDS)}</td><td>{rng.random():.4f}</td></tr>"
+            for _ in range(10)
+        )
+        outputs = [
+            new_output("stream", name="stdout", text=f"{sentence(6)}\n" * 3),
+            new_output(
+                "execute_result",
+                data={"text/html": f"<table>{rows}</table>", "text/plain": "<table>"},
+                execution_count=index,
+            ),
+        ]
+        source = "\n".join(
+            f"{rng.choice(_WORDS)} = fit({rng.choice(_WORDS)}, {rng.randint(1, 99)})"
+            for _ in range(5)
+        )
+        nb_cells.append(
+            new_code_cell(source, id=f"cell-{index}", execution_count=index, outputs=outputs)
+        )
+    return new_notebook(cells=nb_cells, metadata={"title": sentence(3)})
+
+
+class _UnixSocketResolver(tornado.netutil.Resolver):
+    """Resolves every host name to one Unix socket."""
+
+    def initialize(self, path):
+        self.path = path
+
+    async def resolve(self, host, port, family=socket.AF_UNSPEC):
+        return [(socket.AF_UNIX, self.path)]
+
+
+def _client(unix_socket=None, connections=10):
+    """Create an HTTP client, connecting to a Unix socket if given."""
+    if unix_socket is None:
+        return tornado.httpclient.AsyncHTTPClient(force_instance=True, max_clients=connections)
+    return tornado.simple_httpclient.SimpleAsyncHTTPClient(
+        force_instance=True,
+        max_clients=connections,
+        resolver=_UnixSocketResolver(path=unix_socket),
+    )
+
+
+async def run_load_test(
+    url="http://127.0.0.1:8765",
+    unix_socket=None,
+    exporter="styled_html",
+    requests=100,
+    concurrency=8,
+    cells=20,
+    distinct=10,
+    timeout=None,
+):
+    """Send export jobs to a daemon and measure how it copes.
+
+    Keyword Parameters:
+        url (str): Base URL of the daemon. The host is ignored with
+            ``unix_socket``. Defaults to ``"http://127.0.0.1:8765"``.
+        unix_socket (str or None): Unix socket of the daemon. Defaults to None.
+        exporter (str): Exporter to request. Defaults to ``"styled_html"``.
+        requests (int): Number of jobs to send. Defaults to 100.
+        concurrency (int): Number of jobs kept in flight. Defaults to 8.
+        cells (int): Cells per synthetic notebook. Defaults to 20.
+        distinct (int): Number of different notebooks sent in turn. Defaults
+            to 10.
+        timeout (float or None): Deadline requested for every job. Defaults to
+            the daemon's.
+
+    Returns:
+        (dict): The number of ``requests``, the count of every HTTP
+            ``statuses`` (0 for connection errors), the wall-clock
+            ``seconds``, the ``throughput`` of successful jobs per second, the
+            ``bytes`` received, and the ``latency`` and daemon-reported
+            ``queue`` time percentiles (``p50``, ``p95``, ``p99``, ``max``) of
+            successful jobs, in seconds.
+    """
+    bodies = [nbformat.writes(synthetic_notebook(cells, seed)) for seed in range(max(1, distinct))]
+    query = f"?timeout={timeout}" if timeout is not None else ""
+    endpoint = f"{url.rstrip('/')}/export/{exporter}{query}"
+    concurrency = max(1, concurrency)
+    client = _client(unix_socket, concurrency)
+    statuses = Counter()
+    latencies = []
+    queue_times = []
+    received = 0
+    jobs = iter(range(requests))
+
+    async def send():
+        nonlocal received
+        for index in jobs:
+            start = time.perf_counter()
+            try:
+                response = await client.fetch(
+                    endpoint,
+                    method="POST",
+                    body=bodies[index % len(bodies)],
+                    raise_error=False,
+                    request_timeout=0,
+                )
+            except Exception:
+                statuses[0] += 1
+                continue
+            statuses[response.code] += 1
+            if response.code == 200:
+                latencies.append(time.perf_counter() - start)
+                queue_times.append(float(response.headers.get("X-Export-Queue-Seconds", 0)))
+                received += len(response.body)
+            elif response.code == 503:
+                # Refused for backpressure: back off briefly before the next job.
+                await asyncio.sleep(_BACKOFF)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(send() for _ in range(concurrency)))
+    finally:
+        client.close()
+    seconds = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "statuses": dict(statuses),
+        "seconds": seconds,
+        "throughput": statuses[200] / seconds if seconds > 0 else 0.0,
+        "bytes": received,
+        "latency": _percentiles(latencies),
+        "queue": _percentiles(queue_times),
+    }
+
+
+def _percentiles(values):
+    """Return the 50th, 95th and 99th percentiles and the maximum of some values."""
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def percentile(fraction):
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    return {
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": values[-1],
+    }
+
+
+async def _wait_for_daemon(url, unix_socket, process, timeout=60):
+    """Wait until a spawned daemon answers its status endpoint."""
+    client = _client(unix_socket)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"The daemon exited with status {process.returncode}")
+            try:
+                response = await client.fetch(f"{url}/status", raise_error=False)
+                if response.code == 200:
+                    return json.loads(response.body)
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"The daemon did not start within {timeout}s")
+            await asyncio.sleep(0.1)
+    finally:
+        client.close()
+
+
+def main(argv=None):
+    """Load test the export daemon from the command line.
+
+    Args:
+        argv (list or None): Command line arguments. Defaults to ``sys.argv[1:]``.
+
+    Returns:
+        (int): The exit status: 0 if every job succeeded.
+    """
+    parser = argparse.ArgumentParser(
+        prog="jupyter-export-loadtest",
+        description="Drive the export daemon with synthetic notebooks and report latencies.",
+    )
+    parser.add_argument(
+        "--url", default="http://127.0.0.1:8765", help="Base URL of the daemon."
+    )
+    parser.add_argument("--unix-socket", help="Unix socket of the daemon.")
+    parser.add_argument(
+        "--spawn",
+        action="store_true",
+        help="Start a daemon on a temporary Unix socket for the test and stop it afterwards.",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Worker processes of a spawned daemon."
+    )
+    parser.add_argument(
+        "--max-pending", type=int, default=64, help="Queue bound of a spawned daemon."
+    )
+    parser.add_argument("--to", default="styled_html", help="Exporter to request.")
+    parser.add_argument("-n", "--requests", type=int, default=100, help="Number of jobs.")
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=8, help="Number of jobs kept in flight."
+    )
+    parser.add_argument("--cells", type=int, default=20, help="Cells per notebook.")
+    parser.add_argument("--timeout", type=float, help="Deadline requested for every job.")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args(argv)
+
+    process = None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url, unix_socket = args.url, args.unix_socket
+        if args.spawn:
+            url, unix_socket = "http://daemon", os.path.join(tmpdir, "daemon.sock")
+            command = [
+                sys.executable,
+                "-m",
+                "jupyter_export_html_style.daemon",
+                "--to",
+                args.to,
+                "--unix-socket",
+                unix_socket,
+                "--max-pending",
+                str(args.max_pending),
+            ]
+            if args.workers is not None:
+                command += ["--workers", str(args.workers)]
+            process = subprocess.Popen(command)
+        try:
+            if process is not None:
+                asyncio.run(_wait_for_daemon(url, unix_socket, process))
+            summary = asyncio.run(
+                run_load_test(
+                    url,
+                    unix_socket,
+                    args.to,
+                    args.requests,
+                    args.concurrency,
+                    args.cells,
+                    timeout=args.timeout,
+                )
+            )
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(60)
+
+    if args.json:
+        print(json.dumps(summary, indent=1))
+    else:
+        statuses = ", ".join(
+            f"{code}: {count}" for code, count in sorted(summary["statuses"].items())
+        )
+        print(
+            f"{summary['requests']} requests in {summary['seconds']:.2f}s, "
+            f"{summary['throughput']:.1f} exports/s, {summary['bytes'] / 1e6:.1f} MB ({statuses})"
+        )
+        for label in ("latency", "queue"):
+            if summary[label]:
+                values = "  ".join(
+                    f"{key} {value * 1000:.1f}ms" for key, value in summary[label].items()
+                )
+                print(f"{label:>8}: {values}")
+    return 0 if summary["statuses"] == {200: args.requests} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
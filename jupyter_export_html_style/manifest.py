@@ -0,0 +1,311 @@
+"""
+Make-style manifest of batch exports.
+
+The manifest is a JSON file written next to the outputs of a batch run. For
+every exported notebook it records what the export was made from: the
+content hash of the notebook, the exporter and a fingerprint of its
+configuration and templates, and the content hashes of the local stylesheets
+and images the export read. A later run re-exports a notebook only if one of
+these changed or one of its outputs is missing, and deletes the outputs of
+notebooks that no longer exist.
+
+Content hashes are reused while a file's size and modification time are
+unchanged, so checking an up-to-date notebook costs a few ``stat`` calls.
+"""
+
+import hashlib
+import json
+import os
+
+import nbformat
+
+from .assets import _write_atomically
+from .fragments import fingerprint
+
+# File name of the manifest in the output directory.
+MANIFEST_NAME = ".jupyter-export-manifest.json"
+
+# Version of the manifest format; manifests of other versions are ignored.
+MANIFEST_VERSION = 1
+
+# Size of the pieces in which files are read for hashing.
+_HASH_READ_SIZE = 1024 * 1024
+
+
+def file_state(path, previous=None):
+    """Describe the content of a file.
+
+    Args:
+        path (str): Path of the file.
+
+    Keyword Parameters:
+        previous (dict or None): A state returned earlier for the same file. Its
+            hash is reused if the size and modification time are unchanged.
+            Defaults to None.
+
+    Returns:
+        (dict or None): The ``size``, ``mtime_ns`` and ``sha256`` of the file,
+            or None if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    state = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if previous and all(previous.get(key) == value for key, value in state.items()):
+        state["sha256"] = previous["sha256"]
+        return state
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_READ_SIZE), b""):
+            digest.update(chunk)
+    state["sha256"] = digest.hexdigest()
+    return state
+
+
+def configuration_key(exporter):
+    """Fingerprint an exporter for the manifest.
+
+    Args:
+        exporter (Exporter): The exporter.
+
+    Returns:
+        (str): A hex digest of the exporter class, its configuration and its
+            templates (see ``StyledHTMLExporter._configuration_fingerprint``),
+            or of the class and config for other exporters.
+    """
+    describe = getattr(exporter, "_configuration_fingerprint", None)
+    if describe is not None:
+        return fingerprint(describe())
+    return fingerprint([f"{type(exporter).__module__}.{type(exporter).__qualname__}", exporter.config])
+
+
+def build_entry(exporter, source, directory, previous=None, config_key=None):
+    """Describe the current inputs of a notebook's export.
+
+    Args:
+        exporter (Exporter): The exporter.
+        source (str): Path of the notebook.
+        directory (str): Directory the recorded paths are relative to.
+
+    Keyword Parameters:
+        previous (dict or None): The notebook's previous manifest entry, whose
+            hashes are reused for unchanged files. Defaults to None.
+        config_key (str or None): The :func:`configuration_key` of
+            ``exporter``, if already computed. Defaults to None.
+
+    Returns:
+        (dict): The entry, without ``outputs``.
+
+    Notes:
+        The notebook is only parsed if its content changed: otherwise it
+        references the same local files as before.
+    """
+    previous = previous or {}
+    notebook = file_state(source, previous.get("notebook"))
+    old_dependencies = previous.get("dependencies") or {}
+    if notebook is not None and notebook["sha256"] == (previous.get("notebook") or {}).get("sha256"):
+        dependencies = [os.path.join(directory, path) for path in old_dependencies]
+    else:
+        dependencies = _local_dependencies(exporter, source)
+    entry_dependencies = {}
+    for path in dependencies:
+        key = _relative(path, directory)
+        entry_dependencies[key] = file_state(path, old_dependencies.get(key))
+    return {
+        "notebook": notebook,
+        "config": config_key or configuration_key(exporter),
+        "dependencies": entry_dependencies,
+    }
+
+
+def _local_dependencies(exporter, source):
+    """List the local files an export of a notebook reads.
+
+    Args:
+        exporter (Exporter): The exporter.
+        source (str): Path of the notebook.
+
+    Returns:
+        (list): Absolute paths of the notebook's stylesheets and images; empty
+            for exporters that do not report them.
+    """
+    dependencies = getattr(exporter, "_local_dependencies", None)
+    if dependencies is None:
+        return []
+    nb = nbformat.read(source, as_version=4)
+    return dependencies(nb, {"metadata": {"path": os.path.dirname(source) or "."}})
+
+
+def _relative(path, directory):
+    """Return a path relative to a directory, in the manifest's format."""
+    return os.path.relpath(os.path.abspath(path), directory).replace(os.sep, "/")
+
+
+class ExportManifest:
+    """The manifest of the exports in an output directory.
+
+    Args:
+        path (str or os.PathLike): Path of the manifest file. It is read if it
+            exists and written by :meth:`save`.
+
+    Attributes:
+        path (str): Absolute path of the manifest file.
+        directory (str): Directory all recorded paths are relative to.
+        entries (dict): Manifest entries by notebook path.
+
+    Examples:
+        >>> manifest = ExportManifest("site/.jupyter-export-manifest.json")
+        >>> entry = build_entry(exporter, "intro.ipynb", manifest.directory, manifest.get("intro.ipynb"))
+        >>> if not manifest.is_current("intro.ipynb", entry):
+        ...     ...  # export, then
+        ...     manifest.record("intro.ipynb", entry, ["site/intro.html"])
+        >>> manifest.prune()
+        >>> manifest.save()
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.fspath(path))
+        self.directory = os.path.dirname(self.path)
+        self.entries = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.entries = data.get("notebooks") or {}
+
+    def key(self, source):
+        """Return the key of a notebook in the manifest.
+
+        Args:
+            source (str): Path of the notebook.
+
+        Returns:
+            (str): The path relative to the manifest's directory.
+        """
+        return _relative(source, self.directory)
+
+    def get(self, source):
+        """Return the entry of a notebook.
+
+        Args:
+            source (str): Path of the notebook.
+
+        Returns:
+            (dict or None): The entry, or None if the notebook is not recorded.
+        """
+        return self.entries.get(self.key(source))
+
+    def is_current(self, source, entry):
+        """Check whether a notebook's recorded export is up to date.
+
+        Args:
+            source (str): Path of the notebook.
+            entry (dict): The notebook's current inputs, from :func:`build_entry`.
+
+        Returns:
+            (bool): True if the recorded export was made from the same
+                notebook, configuration and dependencies and all its outputs
+                exist.
+        """
+        return is_current(self.get(source), entry, self.directory)
+
+    def record(self, source, entry, outputs):
+        """Record a completed export.
+
+        Args:
+            source (str): Path of the notebook.
+            entry (dict): The inputs of the export, from :func:`build_entry`.
+            outputs (list): Paths of the files the export wrote.
+        """
+        self.entries[self.key(source)] = {
+            **entry,
+            "outputs": [_relative(path, self.directory) for path in outputs],
+        }
+
+    def outputs(self, source):
+        """Return the recorded outputs of a notebook.
+
+        Args:
+            source (str): Path of the notebook.
+
+        Returns:
+            (list): Absolute paths of the files its last export wrote.
+        """
+        entry = self.get(source) or {}
+        return [os.path.join(self.directory, path) for path in entry.get("outputs", [])]
+
+    def remove(self, source):
+        """Forget a notebook, so that it is exported again by the next run.
+
+        Args:
+            source (str): Path of the notebook.
+        """
+        self.entries.pop(self.key(source), None)
+
+    def prune(self):
+        """Delete the outputs of notebooks that no longer exist.
+
+        Returns:
+            (list): Absolute paths of the deleted notebooks whose entries
+                were removed.
+        """
+        pruned = []
+        for key in sorted(self.entries):
+            source = os.path.join(self.directory, key)
+            if os.path.exists(source):
+                continue
+            for path in self.outputs(source):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                else:
+                    _remove_empty_dirs(os.path.dirname(path), self.directory)
+            del self.entries[key]
+            pruned.append(os.path.normpath(source))
+        return pruned
+
+    def save(self):
+        """Write the manifest file atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        data = {"version": MANIFEST_VERSION, "notebooks": self.entries}
+        _write_atomically(self.path, json.dumps(data, indent=1, sort_keys=True).encode("utf-8"))
+
+
+def is_current(previous, entry, directory):
+    """Check whether a recorded export matches the current inputs.
+
+    Args:
+        previous (dict or None): The recorded entry.
+        entry (dict): The current inputs, from :func:`build_entry`.
+        directory (str): Directory the recorded paths are relative to.
+
+    Returns:
+        (bool): True if the export is up to date and all its outputs exist.
+    """
+    if not previous or entry["notebook"] is None:
+        return False
+
+    def hashes(states):
+        return {key: state and state["sha256"] for key, state in states.items()}
+
+    return (
+        previous.get("notebook", {}).get("sha256") == entry["notebook"]["sha256"]
+        and previous.get("config") == entry["config"]
+        and hashes(previous.get("dependencies") or {}) == hashes(entry["dependencies"])
+        and bool(previous.get("outputs"))
+        and all(os.path.isfile(os.path.join(directory, path)) for path in previous["outputs"])
+    )
+
+
+def _remove_empty_dirs(path, stop):
+    """Remove a directory and its parents while they are empty, up to ``stop``."""
+    while os.path.normpath(path) != os.path.normpath(stop):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
@@ -0,0 +1,332 @@
+"""
+Post-processing of the PDF documents printed by the browser.
+"""
+
+import io
+import math
+import re
+from importlib import util as importlib_util
+
+from traitlets import Bool, Int
+from traitlets.config import LoggingConfigurable
+
+from .image_optimizer import PILLOW_INSTALLED
+
+PYPDF_INSTALLED = importlib_util.find_spec("pypdf") is not None
+
+_HEADING_RE = re.compile(r"<h([1-6])[\s>]", re.IGNORECASE)
+
+
+def _require_pypdf(purpose):
+    """Import pypdf, reporting how to install it if it is missing.
+
+    Args:
+        purpose (str): What pypdf is needed for, for the error message.
+
+    Returns:
+        (module): The ``pypdf`` module.
+
+    Raises:
+        RuntimeError: If pypdf is not installed.
+    """
+    try:
+        import pypdf  # type: ignore[import-not-found]
+    except ModuleNotFoundError as e:
+        msg = (
+            f"pypdf is not installed to support {purpose}. "
+            "Please install `jupyter-export-html-style[pdf]` to enable."
+        )
+        raise RuntimeError(msg) from e
+    return pypdf
+
+
+def heading_levels(html):
+    """List the levels of the headings in the body of an HTML document.
+
+    Chromium generates the outline of a printed PDF from these headings, so the
+    list matches the outline entries of the document printed from ``html``.
+
+    Args:
+        html (str): The HTML document.
+
+    Returns:
+        (list): The level (1 to 6) of every heading, in document order.
+
+    Examples:
+        >>> heading_levels("<body><h1>A</h1><h3 id='b'>B</h3></body>")
+        [1, 3]
+    """
+    body = html.find("<body")
+    return [int(level) for level in _HEADING_RE.findall(html, max(body, 0))]
+
+
+def iter_outline(reader):
+    """List the outline (bookmarks) of a PDF with the depth of each entry.
+
+    Args:
+        reader (pypdf.PdfReader): The PDF.
+
+    Yields:
+        (tuple): The depth (0 for top-level entries), title and zero-based page
+            index of each outline entry, in document order.
+    """
+    stack = [(0, iter(reader.outline))]
+    while stack:
+        depth, items = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+        elif isinstance(item, list):
+            # A list holds the children of the preceding entry.
+            stack.append((depth + 1, iter(item)))
+        else:
+            page = reader.get_destination_page_number(item)
+            if page is not None:
+                yield depth, item.title, page
+
+
+def merge_pdfs(pdfs, heading_levels=None):
+    """Concatenate PDF documents into one with a continuous outline.
+
+    The outline entries of every document are appended in order, each nested
+    under the last preceding entry of a lower level, even when that entry
+    belongs to an earlier document. Sections that continue across document
+    boundaries therefore stay in one tree.
+
+    Args:
+        pdfs (iterable of bytes): The documents, in order.
+
+    Keyword Parameters:
+        heading_levels (list or None): For each document, the levels (1 to 6)
+            of the headings its outline was generated from, in order. Without
+            them, or if they do not match a document's outline, the nesting
+            depth within that document is used, which restarts at the top
+            level for every document. Defaults to None.
+
+    Returns:
+        (bytes): The merged document.
+
+    Raises:
+        RuntimeError: If pypdf is not installed.
+
+    Examples:
+        >>> merged = merge_pdfs([first_pdf, second_pdf], heading_levels=[[1, 2], [2, 3]])
+    """
+    pypdf = _require_pypdf("merging segmented PDFs")
+    writer = pypdf.PdfWriter()
+    parents = []
+    for index, data in enumerate(pdfs):
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        offset = len(writer.pages)
+        writer.append(reader, import_outline=False)
+        entries = list(iter_outline(reader))
+        levels = heading_levels[index] if heading_levels is not None else None
+        if levels is None or len(levels) != len(entries):
+            levels = [depth + 1 for depth, _, _ in entries]
+        for level, (_, title, page) in zip(levels, entries):
+            while parents and parents[-1][0] >= level:
+                parents.pop()
+            parent = parents[-1][1] if parents else None
+            item = writer.add_outline_item(title, offset + page, parent=parent)
+            parents.append((level, item))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+class PDFOptimizer(LoggingConfigurable):
+    """Shrink printed PDFs.
+
+    Chromium writes a separate copy of an image or font for every place it is
+    used and does not compress every stream as tightly as it could. The
+    optimizer merges identical objects (images, fonts and anything else),
+    recompresses the page content streams, optionally downsamples images whose
+    resolution exceeds a DPI threshold and optionally linearizes the document
+    for fast web view. Each instance keeps a running report of the bytes saved.
+
+    Attributes:
+        deduplicate (Bool): Merge identical objects such as repeated images
+            and fonts, and drop unreferenced ones. Defaults to True.
+        compress_streams (Bool): Recompress page content streams. Defaults to
+            True.
+        compression_level (Int): zlib compression level for recompressed
+            streams (0-9). Defaults to 9.
+        downsample_dpi (Int): Downsample images whose resolution exceeds this
+            many pixels per inch at the full page width. 0 disables
+            downsampling. Defaults to 0.
+        image_quality (Int): JPEG quality used for downsampled images (1-95).
+            Defaults to 85.
+        linearize (Bool): Linearize the document for fast web view. Defaults
+            to False.
+
+    Raises:
+        RuntimeError: If pypdf is not installed.
+
+    Notes:
+        An image is never displayed wider than its page, so downsampling it to
+        ``downsample_dpi`` times the page width keeps at least that resolution
+        wherever it is placed. Images with a transparency mask or an unusual
+        color space are left alone, and downsampled images are re-encoded as
+        JPEG, which requires Pillow. Linearization requires pikepdf. If the
+        optimized document would be larger than the original, the original is
+        kept.
+
+        Requires pypdf, installable with
+        ``pip install jupyter-export-html-style[pdf]``.
+
+    Examples:
+        >>> from jupyter_export_html_style.pdf import PDFOptimizer
+        >>> optimizer = PDFOptimizer(downsample_dpi=150)
+        >>> smaller = optimizer.optimize(pdf_bytes)
+        >>> saved = optimizer.report()["bytes_saved"]
+    """
+
+    deduplicate = Bool(
+        True, help="Merge identical objects such as repeated images and fonts."
+    ).tag(config=True)
+
+    compress_streams = Bool(True, help="Recompress page content streams.").tag(config=True)
+
+    compression_level = Int(
+        9, help="zlib compression level used for recompressed streams (0-9)."
+    ).tag(config=True)
+
+    downsample_dpi = Int(
+        0,
+        help="""
+        Downsample images whose resolution exceeds this many pixels per inch at
+        the full page width. 0 disables downsampling. Requires Pillow.
+        """,
+    ).tag(config=True)
+
+    image_quality = Int(85, help="JPEG quality used for downsampled images (1-95).").tag(
+        config=True
+    )
+
+    linearize = Bool(
+        False, help="Linearize the document for fast web view. Requires pikepdf."
+    ).tag(config=True)
+
+    def __init__(self, **kw):
+        _require_pypdf("PDF optimization")
+        super().__init__(**kw)
+        self.documents = 0
+        self.images_downsampled = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def optimize(self, data):
+        """Optimize one PDF document.
+
+        Args:
+            data (bytes): The PDF.
+
+        Returns:
+            (bytes): The optimized PDF, or ``data`` if optimizing did not make
+                it smaller.
+
+        Raises:
+            RuntimeError: If downsampling without Pillow or linearizing without
+                pikepdf.
+        """
+        pypdf = _require_pypdf("PDF optimization")
+        writer = pypdf.PdfWriter(clone_from=pypdf.PdfReader(io.BytesIO(data)))
+        if self.downsample_dpi > 0:
+            self._downsample_images(writer)
+        if self.compress_streams:
+            for page in writer.pages:
+                page.compress_content_streams(level=self.compression_level)
+        if self.deduplicate:
+            writer.compress_identical_objects()
+        output = io.BytesIO()
+        writer.write(output)
+        optimized = output.getvalue()
+        if len(optimized) >= len(data):
+            optimized = data
+        if self.linearize:
+            optimized = _linearize(optimized)
+
+        self.documents += 1
+        self.bytes_before += len(data)
+        self.bytes_after += len(optimized)
+        return optimized
+
+    def report(self):
+        """Summarize the documents processed by this optimizer.
+
+        Returns:
+            (dict): Counts of documents and downsampled images, and the total
+                size of the documents before and after optimization, in bytes.
+
+        Examples:
+            >>> PDFOptimizer().report()
+            {'documents': 0, 'images_downsampled': 0, 'bytes_before': 0, 'bytes_after': 0, 'bytes_saved': 0}
+        """
+        return {
+            "documents": self.documents,
+            "images_downsampled": self.images_downsampled,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "bytes_saved": self.bytes_before - self.bytes_after,
+        }
+
+    def _downsample_images(self, writer):
+        """Downsample the images of a document above ``downsample_dpi``.
+
+        Args:
+            writer (pypdf.PdfWriter): The document, modified in place.
+
+        Raises:
+            RuntimeError: If Pillow is not installed.
+        """
+        if not PILLOW_INSTALLED:
+            msg = (
+                "Pillow is not installed to support PDF image downsampling. "
+                "Please install `jupyter-export-html-style[images]` to enable."
+            )
+            raise RuntimeError(msg)
+        from PIL import Image  # type: ignore[import-not-found]
+
+        done = set()
+        for page in writer.pages:
+            max_width = math.ceil(self.downsample_dpi * float(page.mediabox.width) / 72)
+            for image_file in page.images:
+                reference = image_file.indirect_reference
+                if reference is None or reference.idnum in done:
+                    continue
+                done.add(reference.idnum)
+                if "/SMask" in reference.get_object() or "/Mask" in reference.get_object():
+                    continue
+                image = image_file.image
+                if image.width <= max_width or image.mode not in ("RGB", "L"):
+                    continue
+                height = max(1, round(image.height * max_width / image.width))
+                resized = image.resize((max_width, height), Image.LANCZOS)
+                image_file.replace(resized, quality=self.image_quality)
+                self.images_downsampled += 1
+
+
+def _linearize(data):
+    """Linearize a PDF for fast web view with pikepdf.
+
+    Args:
+        data (bytes): The PDF.
+
+    Returns:
+        (bytes): The linearized PDF.
+
+    Raises:
+        RuntimeError: If pikepdf is not installed.
+    """
+    try:
+        import pikepdf  # type: ignore[import-not-found]
+    except ModuleNotFoundError as e:
+        msg = (
+            "pikepdf is not installed to support PDF linearization. "
+            "Please install `jupyter-export-html-style[pdf]` to enable."
+        )
+        raise RuntimeError(msg) from e
+    output = io.BytesIO()
+    with pikepdf.open(io.BytesIO(data)) as pdf:
+        pdf.save(output, linearize=True)
+    return output.getvalue()
@@ -2,9 +2,88 @@
 Preprocessor for handling cell style metadata in notebooks.
 """
 
+import hashlib
+
 from nbconvert.preprocessors import Preprocessor
 from traitlets import Unicode
 
+# Cell metadata keys that make a cell need any style processing at all.
+_STYLE_KEYS = ("input-style", "output-style", "class", "input-class", "output-class")
+
+# Prefix of the generated class names shared by cells with identical styles.
+STYLE_CLASS_PREFIX = "styled-"
+
+
+def _split_declarations(style):
+    """Split a CSS declaration string on semicolons outside of parentheses and quotes.
+
+    Args:
+        style (str): Declarations such as ``"color: red; background: url(a;b)"``.
+
+    Returns:
+        (list): The individual, stripped, non-empty declarations.
+    """
+    declarations = []
+    depth = 0
+    quote = None
+    start = 0
+    for i, char in enumerate(style):
+        if quote:
+            if char == quote and style[i - 1] != "\\":
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        elif char == ";" and depth == 0:
+            declarations.append(style[start:i])
+            start = i + 1
+    declarations.append(style[start:])
+    return [d.strip() for d in declarations if d.strip()]
+
+
+def normalize_style(style):
+    """Normalize a dict or string cell style into a canonical declaration tuple.
+
+    Args:
+        style (dict or str): Style metadata, either a mapping of property to
+            value or a string of CSS declarations.
+
+    Returns:
+        (tuple): The declarations as ``"property: value"`` strings in source
+            order. Empty for empty or unsupported styles.
+
+    Examples:
+        >>> normalize_style({"color": "red", "padding": "10px"})
+        ('color: red', 'padding: 10px')
+        >>> normalize_style("color: red;  padding: 10px;")
+        ('color: red', 'padding: 10px')
+    """
+    if isinstance(style, dict):
+        return tuple(f"{k}: {v}".strip() for k, v in style.items() if str(v).strip())
+    if isinstance(style, str):
+        return tuple(_split_declarations(style))
+    return ()
+
+
+def style_class_name(declarations):
+    """Return the generated class name shared by every use of a style.
+
+    Args:
+        declarations (tuple): Canonical declarations from :func:`normalize_style`.
+
+    Returns:
+        (str): A stable class name derived from the declarations.
+
+    Examples:
+        >>> style_class_name(("color: red",))
+        'styled-...'
+    """
+    digest = hashlib.sha1("; ".join(declarations).encode("utf-8")).hexdigest()
+    return f"{STYLE_CLASS_PREFIX}{digest[:8]}"
+
 
 class StylePreprocessor(Preprocessor):
     """A preprocessor that extracts and processes style metadata from notebook cells.
@@ -14,6 +93,11 @@ class StylePreprocessor(Preprocessor):
     specific, and output-specific), custom CSS classes, as well as notebook-level
     styles.
 
+    Cell styles are normalized into canonical declaration lists and interned:
+    every distinct style is given one generated class name, which is assigned
+    to all cells (or input/output areas) using it. The resulting stylesheet has
+    one rule per distinct style rather than one per cell.
+
     Attributes:
         style_metadata_key (Unicode): The metadata key to look for cell styles.
             Defaults to "style". Can be configured via traitlets config system.
@@ -28,6 +112,13 @@ class StylePreprocessor(Preprocessor):
         - Cell-level 'output-class' metadata: Custom CSS classes added to the output area
         - Notebook-level 'style' and 'stylesheet' metadata: Applied globally
 
+        Besides the raw ``resources["styles"]`` (keyed by cell-N, cell-N-input and
+        cell-N-output) the preprocessor fills ``resources["style_classes"]``, which
+        maps the same keys to generated class names, and
+        ``resources["compiled_styles"]``, which maps each generated class name to
+        its declarations. Notebooks without any style or class metadata skip
+        per-cell processing entirely.
+
     Examples:
         >>> from jupyter_export_html_style import StylePreprocessor
         >>> preprocessor = StylePreprocessor()
@@ -49,12 +140,16 @@ class StylePreprocessor(Preprocessor):
         Returns:
             (tuple): A tuple containing:
                 - nb (NotebookNode): The processed notebook.
-                - resources (dict): Updated resources with collected styles and
-                    notebook-level style information.
+                - resources (dict): Updated resources with collected styles,
+                    compiled style classes and notebook-level style information.
         """
         # Initialize style collection in resources
         if "styles" not in resources:
             resources["styles"] = {}
+        if "style_classes" not in resources:
+            resources["style_classes"] = {}
+        if "compiled_styles" not in resources:
+            resources["compiled_styles"] = {}
         if "notebook_styles" not in resources:
             resources["notebook_styles"] = {}
 
@@ -65,8 +160,10 @@ class StylePreprocessor(Preprocessor):
             if "stylesheet" in nb.metadata:
                 resources["notebook_styles"]["stylesheet"] = nb.metadata["stylesheet"]
 
-        # Process each cell
-        nb, resources = super().preprocess(nb, resources)
+        # Process each cell, unless no cell carries any style metadata
+        keys = (self.style_metadata_key, *_STYLE_KEYS)
+        if any(key in cell.get("metadata", {}) for cell in nb.cells for key in keys):
+            nb, resources = super().preprocess(nb, resources)
 
         return nb, resources
 
@@ -83,10 +180,12 @@ class StylePreprocessor(Preprocessor):
                 - cell (NotebookNode): The processed cell with style metadata
                     stored in cell_style, input_cell_style, and output_cell_style
                     attributes, and custom CSS classes in cell_class,
-                    input_cell_class, and output_cell_class attributes.
+                    input_cell_class, and output_cell_class attributes, and the
+                    generated style classes in cell_style_class,
+                    input_cell_style_class, and output_cell_style_class.
                 - resources (dict): Updated resources with collected cell styles
-                    indexed by cell-{index}, cell-{index}-input, and
-                    cell-{index}-output keys.
+                    and style classes indexed by cell-{index},
+                    cell-{index}-input, and cell-{index}-output keys.
         """
         cell_id = f"cell-{index}"
 
@@ -99,6 +198,7 @@ class StylePreprocessor(Preprocessor):
 
             # Also collect in resources for global style processing
             resources["styles"][cell_id] = style
+            self._intern_style(cell, "cell_style_class", cell_id, style, resources)
 
         # Check for input-style metadata
         if "metadata" in cell and "input-style" in cell.metadata:
@@ -108,6 +208,7 @@ class StylePreprocessor(Preprocessor):
             # Collect in resources for CSS generation
             input_id = f"{cell_id}-input"
             resources["styles"][input_id] = input_style
+            self._intern_style(cell, "input_cell_style_class", input_id, input_style, resources)
 
         # Check for output-style metadata
         if "metadata" in cell and "output-style" in cell.metadata:
@@ -117,6 +218,9 @@ class StylePreprocessor(Preprocessor):
             # Collect in resources for CSS generation
             output_id = f"{cell_id}-output"
             resources["styles"][output_id] = output_style
+            self._intern_style(
+                cell, "output_cell_style_class", output_id, output_style, resources
+            )
 
         # Check for custom class metadata
         if "metadata" in cell and "class" in cell.metadata:
@@ -134,3 +238,21 @@ class StylePreprocessor(Preprocessor):
             cell.metadata["output_cell_class"] = output_class
 
         return cell, resources
+
+    def _intern_style(self, cell, metadata_key, style_id, style, resources):
+        """Assign the shared generated class for a style to a cell.
+
+        Args:
+            cell (NotebookNode): The cell being processed.
+            metadata_key (str): Cell metadata key that receives the class name.
+            style_id (str): Key of the style in ``resources["styles"]``.
+            style (dict or str): The raw style metadata.
+            resources (dict): Additional resources used in the conversion process.
+        """
+        declarations = normalize_style(style)
+        if not declarations:
+            return
+        class_name = style_class_name(declarations)
+        resources.setdefault("compiled_styles", {}).setdefault(class_name, declarations)
+        resources.setdefault("style_classes", {})[style_id] = class_name
+        cell.metadata[metadata_key] = class_name
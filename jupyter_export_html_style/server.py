@@ -0,0 +1,209 @@
+"""
+Jupyter Server extension serving styled exports from warm worker pools.
+
+The extension runs a :class:`~.service.StyledExportService` inside Jupyter
+Server, so that exporting a notebook neither blocks the server's event loop
+nor pays for a fresh exporter and browser on every request. It adds these
+endpoints under the server's base URL:
+
+.. code-block:: text
+
+    POST /jupyter-export-html-style/exports               {"path": ..., "exporter": ...}
+    GET  /jupyter-export-html-style/exports               state of the service
+    GET  /jupyter-export-html-style/exports/<id>          progress of a job
+    GET  /jupyter-export-html-style/exports/<id>/download the finished export
+    GET  /jupyter-export-html-style/nbconvert/<exporter>/<path>
+
+``POST`` answers ``202 Accepted`` with the job, whose ``stage`` and
+``progress`` clients poll until it is ``finished`` and can be downloaded. The
+``nbconvert`` endpoint waits for the export and returns it in one response,
+like Jupyter Server's own ``/nbconvert`` handler. Notebooks are read through
+the server's contents manager, with the permissions of the ``contents``
+resource.
+
+The extension is enabled when the package is installed. It is configured like
+any other, e.g. in ``jupyter_server_config.py``::
+
+    c.StyledExportService.workers = 4
+    c.StyledExportService.exporters = ["styled_html", "styled_webpdf"]
+    c.StyledHTMLExporter.incremental = True
+"""
+
+import json
+import os
+
+from jupyter_server.auth.decorator import authorized
+from jupyter_server.base.handlers import APIHandler, path_regex
+from jupyter_server.extension.application import ExtensionApp
+from jupyter_server.utils import ensure_async, url_path_join
+from tornado import web
+
+from .daemon import DaemonBusy
+from .service import StyledExportService
+
+# Prefix of the extension's endpoints.
+URL_PREFIX = "jupyter-export-html-style"
+
+# Seconds the extension waits for pending exports when the server stops.
+_DRAIN_TIMEOUT = 30
+
+_JOB_REGEX = r"(?P<job_id>[0-9a-f]{32})"
+
+
+def _notebook_directory(contents_manager, path):
+    """Return the local directory of a notebook, if it has one.
+
+    Like Jupyter Server's own ``/nbconvert`` handler, only contents managers
+    that keep notebooks in files on this machine are asked for a directory.
+
+    Args:
+        contents_manager (ContentsManager): The server's contents manager.
+        path (str): API path of the notebook.
+
+    Returns:
+        (str or None): The directory the notebook's local stylesheets and images
+            are resolved against, or None when its contents manager is not
+            file-backed.
+    """
+    if not hasattr(contents_manager, "_get_os_path"):
+        return None
+    return os.path.dirname(contents_manager._get_os_path(path))
+
+
+class _ExportHandler(APIHandler):
+    """Base of the extension's handlers."""
+
+    auth_resource = "contents"
+
+    @property
+    def service(self):
+        return self.settings["styled_export_service"]
+
+    async def _submit(self, path, exporter):
+        """Read a notebook through the contents manager and submit its export."""
+        path = path.strip("/")
+        if not path:
+            raise web.HTTPError(400, "No notebook path given")
+        if exporter not in self.service.exporters:
+            raise web.HTTPError(404, f"Unknown exporter {exporter!r}")
+        model = await ensure_async(
+            self.contents_manager.get(path=path, content=True, type="notebook")
+        )
+        directory = _notebook_directory(self.contents_manager, path)
+        try:
+            return await self.service.submit(model["content"], path, exporter, directory)
+        except DaemonBusy as e:
+            self.set_header("Retry-After", "1")
+            raise web.HTTPError(503, str(e)) from e
+
+    def _job(self, job_id):
+        """Return a job by its identifier, or fail with 404."""
+        job = self.service.get(job_id)
+        if job is None:
+            raise web.HTTPError(404, f"No export job {job_id}")
+        return job
+
+    def _send(self, job):
+        """Send the export of a finished job as a file."""
+        resources = job.result.resources
+        name = os.path.splitext(os.path.basename(job.path))[0]
+        self.set_header("Content-Type", self.service.content_type(job))
+        self.set_attachment_header(name + resources.get("output_extension", ""))
+        self.finish(job.result.output)
+
+
+class ExportsHandler(_ExportHandler):
+    """Submits export jobs and reports the state of the service."""
+
+    @web.authenticated
+    @authorized(action="read")
+    async def post(self):
+        body = self.get_json_body() or {}
+        job = await self._submit(body.get("path", ""), body.get("exporter", "styled_html"))
+        self.set_status(202)
+        self.set_header("Location", url_path_join(self.request.path, job.id))
+        self.finish(json.dumps(job.describe()))
+
+    @web.authenticated
+    @authorized(action="read")
+    def get(self):
+        self.finish(json.dumps(self.service.status()))
+
+
+class JobHandler(_ExportHandler):
+    """Reports the progress of an export job."""
+
+    @web.authenticated
+    @authorized(action="read")
+    def get(self, job_id):
+        self.finish(json.dumps(self._job(job_id).describe()))
+
+
+class DownloadHandler(_ExportHandler):
+    """Sends the export of a finished job."""
+
+    @web.authenticated
+    @authorized(action="read")
+    def get(self, job_id):
+        job = self._job(job_id)
+        if job.stage == "failed":
+            raise web.HTTPError(500, job.describe()["error"])
+        if not job.done:
+            raise web.HTTPError(409, f"Export job {job_id} is still {job.stage}")
+        self._send(job)
+
+
+class NbconvertHandler(_ExportHandler):
+    """Exports a notebook and sends the result in one response."""
+
+    @web.authenticated
+    @authorized(action="read")
+    async def get(self, exporter, path):
+        job = await (await self._submit(path, exporter)).wait()
+        if job.stage == "failed":
+            raise web.HTTPError(500, job.describe()["error"])
+        self._send(job)
+
+
+class StyledExportExtension(ExtensionApp):
+    """Jupyter Server extension serving styled exports.
+
+    Attributes:
+        service (StyledExportService): Runs the exports, configured from the
+            server's configuration.
+    """
+
+    name = "jupyter_export_html_style"
+    description = "Styled notebook exports served from warm exporter pools."
+    classes = [StyledExportService]
+
+    def initialize_settings(self):
+        """Start the export service in the background."""
+        self.service = StyledExportService(parent=self)
+        self.service.start()
+        self.settings["styled_export_service"] = self.service
+
+    def initialize_handlers(self):
+        """Register the extension's endpoints."""
+        self.handlers.extend(
+            [
+                (rf"/{URL_PREFIX}/exports", ExportsHandler),
+                (rf"/{URL_PREFIX}/exports/{_JOB_REGEX}", JobHandler),
+                (rf"/{URL_PREFIX}/exports/{_JOB_REGEX}/download", DownloadHandler),
+                (rf"/{URL_PREFIX}/nbconvert/(?P<exporter>\w+){path_regex}", NbconvertHandler),
+            ]
+        )
+
+    async def stop_extension(self):
+        """Let pending exports finish and stop the workers."""
+        if not await self.service.drain(_DRAIN_TIMEOUT):
+            self.log.warning("Stopped with styled exports still pending")
+
+
+def _jupyter_server_extension_points():
+    """Declare the extension to Jupyter Server.
+
+    Returns:
+        (list): The extension's module and application.
+    """
+    return [{"module": "jupyter_export_html_style.server", "app": StyledExportExtension}]
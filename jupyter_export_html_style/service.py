@@ -0,0 +1,394 @@
+"""
+Export jobs served from warm exporter pools inside a long-running process.
+
+:class:`StyledExportService` runs styled exports for an application that must
+stay responsive while they run, such as Jupyter Server (see :mod:`.server`).
+Exports are converted by an :class:`~.daemon.ExportDaemon` in a bounded pool
+of worker processes that keep their exporters warm, and PDFs are printed on
+the process-wide browser pool, so the event loop only awaits the results.
+Concurrent requests for the same revision of a notebook share one job, and
+every job reports the stage it has reached.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import nbformat
+from traitlets import Enum, Float, Int, List, Unicode
+from traitlets.config import LoggingConfigurable
+
+from .daemon import DAEMON_EXPORTERS, ExportDaemon
+
+# Rough completion of a job at each stage, for progress bars.
+STAGE_PROGRESS = {
+    "queued": 0.0,
+    "converting": 0.2,
+    "printing": 0.7,
+    "finished": 1.0,
+    "failed": 1.0,
+}
+
+
+class ExportJob:
+    """An export requested from a :class:`StyledExportService`.
+
+    Args:
+        path (str): Path of the notebook, as the client named it.
+        exporter (str): Name of the exporter.
+        revision (str): Content hash of the notebook.
+
+    Attributes:
+        id (str): Unique identifier of the job.
+        stage (str): ``"queued"``, ``"converting"``, ``"printing"``,
+            ``"finished"`` or ``"failed"``.
+        created (float): Time the job was created.
+        finished (float or None): Time the job finished or failed.
+        requests (int): Number of requests the job serves.
+        result (DaemonExport or None): The export, once finished.
+        error (Exception or None): Why the job failed.
+    """
+
+    def __init__(self, path, exporter, revision):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.exporter = exporter
+        self.revision = revision
+        self.stage = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.requests = 1
+        self.result = None
+        self.error = None
+        self._done = asyncio.Event()
+
+    @property
+    def done(self):
+        """True once the job finished or failed."""
+        return self._done.is_set()
+
+    async def wait(self):
+        """Wait until the job finished or failed.
+
+        Returns:
+            (ExportJob): The job.
+        """
+        await self._done.wait()
+        return self
+
+    def describe(self):
+        """Describe the job for clients.
+
+        Returns:
+            (dict): The job's ``id``, ``path``, ``exporter``, ``revision``,
+                ``stage``, ``progress`` (0 to 1), ``requests`` served,
+                ``elapsed`` seconds, and once finished the ``output_extension``
+                and ``size`` of the export, or the ``error`` if it failed.
+        """
+        description = {
+            "id": self.id,
+            "path": self.path,
+            "exporter": self.exporter,
+            "revision": self.revision,
+            "stage": self.stage,
+            "progress": STAGE_PROGRESS[self.stage],
+            "requests": self.requests,
+            "elapsed": (self.finished or time.time()) - self.created,
+        }
+        if self.result is not None:
+            description["output_extension"] = self.result.resources.get("output_extension")
+            description["size"] = len(self.result.output)
+        if self.error is not None:
+            description["error"] = f"{type(self.error).__name__}: {self.error}"
+        return description
+
+
+class StyledExportService(LoggingConfigurable):
+    """Runs styled exports off the event loop on warm exporter pools.
+
+    Attributes:
+        exporters (List): Names of the exporters served. Defaults to
+            ``styled_html``, ``styled_slides`` and ``styled_webpdf``.
+        workers (Int): Number of worker processes converting notebooks. 0
+            converts in one background thread. Defaults to 2.
+        max_pending (Int): Maximum number of jobs queued or running; further
+            requests are refused. Defaults to 32.
+        timeout (Float): Deadline of every job in seconds. Defaults to 300.
+        job_ttl (Float): Seconds a finished job, and its export, is kept for
+            download and for identical requests. Defaults to 600.
+        max_retained_bytes (Int): Maximum total size in bytes of the exports
+            of finished jobs kept in memory; the oldest jobs are dropped first
+            to stay below it. Defaults to 256 MiB.
+        start_method (Enum): How worker processes are started. Defaults to
+            ``"spawn"``, as forking a process with running threads is unsafe.
+
+    Notes:
+        The exporters are configured from the configuration of the service's
+        parent, like exporters created by nbconvert, e.g. with
+        ``c.StyledHTMLExporter.incremental = True``.
+
+        Two requests share a job if they ask the same exporter for the same
+        notebook path with the same content, while the first is pending or
+        finished less than ``job_ttl`` seconds ago. Failed jobs are not
+        shared, so a retry starts afresh.
+
+        A finished job is dropped before ``job_ttl`` expires when newer
+        exports need its share of ``max_retained_bytes``; the newest finished
+        job is always kept, whatever its size.
+
+    Examples:
+        >>> service = StyledExportService(workers=2)
+        >>> service.start()
+        >>> job = await service.submit(notebook, "reports/summary.ipynb")
+        >>> await job.wait()
+        >>> job.result.output[:15]
+        '<!DOCTYPE html>'
+    """
+
+    exporters = List(
+        Unicode(), default_value=list(DAEMON_EXPORTERS), help="Names of the exporters served."
+    ).tag(config=True)
+
+    workers = Int(
+        2,
+        min=0,
+        help="Number of worker processes converting notebooks; 0 converts in a thread.",
+    ).tag(config=True)
+
+    max_pending = Int(
+        32, min=1, help="Maximum number of jobs queued or running before requests are refused."
+    ).tag(config=True)
+
+    timeout = Float(300.0, min=0, help="Deadline of every job in seconds; 0 for none.").tag(
+        config=True
+    )
+
+    job_ttl = Float(
+        600.0, min=0, help="Seconds a finished job and its export are kept for download."
+    ).tag(config=True)
+
+    max_retained_bytes = Int(
+        256 * 1024 * 1024,
+        min=0,
+        help="Maximum total size in bytes of the finished exports kept for download.",
+    ).tag(config=True)
+
+    start_method = Enum(
+        ["spawn", "forkserver", "fork"],
+        default_value="spawn",
+        help="How worker processes are started.",
+    ).tag(config=True)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._daemon = None
+        self._starting = None
+        self._jobs = {}
+        self._jobs_by_key = {}
+        self._retained = OrderedDict()
+        self._retained_bytes = 0
+        self._no_directory = None
+
+    def start(self):
+        """Start the workers and warm up the exporters in a background thread.
+
+        Returns:
+            (concurrent.futures.Future): Resolves once the service is ready.
+        """
+        if self._starting is None:
+            self._daemon = ExportDaemon(
+                self.exporters,
+                self.config,
+                self.workers,
+                self.max_pending,
+                self.timeout,
+                self.start_method,
+            )
+            self._starting = starting = concurrent.futures.Future()
+
+            def run():
+                try:
+                    self._daemon.start()
+                except BaseException as e:
+                    self.log.error("Styled exports are unavailable: %s", e)
+                    starting.set_exception(e)
+                else:
+                    self.log.info("Styled exports ready: %s", ", ".join(self.exporters))
+                    starting.set_result(None)
+
+            threading.Thread(target=run, name="styled-export-start", daemon=True).start()
+        return self._starting
+
+    async def submit(self, notebook, path, exporter="styled_html", directory=None):
+        """Start exporting a notebook, or join an identical job.
+
+        Args:
+            notebook (NotebookNode, str or bytes): The notebook or its JSON.
+            path (str): Path of the notebook, used to recognise identical
+                requests and reported back to clients.
+
+        Keyword Parameters:
+            exporter (str): Name of the exporter. Defaults to ``"styled_html"``.
+            directory (str or None): Directory the notebook's local stylesheets
+                and images are resolved against. Defaults to None, which leaves
+                them unresolved rather than reading them from the working
+                directory.
+
+        Returns:
+            (ExportJob): The job, accepted and queued.
+
+        Raises:
+            KeyError: If the service does not serve the exporter.
+            DaemonBusy: If too many jobs are pending or the service is stopping.
+            Exception: If the service failed to start.
+        """
+        if exporter not in self.exporters:
+            raise KeyError(exporter)
+        if not isinstance(notebook, (str, bytes)):
+            notebook = nbformat.writes(notebook)
+        text = notebook.encode("utf-8") if isinstance(notebook, str) else notebook
+        key = (exporter, path, hashlib.sha256(text).hexdigest())
+        job = self._jobs_by_key.get(key)
+        if job is not None and job.stage != "failed":
+            job.requests += 1
+            return job
+
+        job = ExportJob(path, exporter, key[2])
+        accepted = asyncio.get_running_loop().create_future()
+        self._jobs[job.id] = self._jobs_by_key[key] = job
+        asyncio.ensure_future(self._run(job, key, notebook, directory, accepted))
+        try:
+            await accepted
+        except Exception:
+            self._forget(job, key)
+            raise
+        return job
+
+    def get(self, job_id):
+        """Return a job by its identifier.
+
+        Args:
+            job_id (str): The job's ``id``.
+
+        Returns:
+            (ExportJob or None): The job, or None if it is unknown or expired.
+        """
+        return self._jobs.get(job_id)
+
+    def content_type(self, job):
+        """Return the media type of a finished job's export.
+
+        Args:
+            job (ExportJob): The job.
+
+        Returns:
+            (str): The ``Content-Type`` of the export.
+        """
+        return self._daemon.content_type(job.exporter, job.result.resources)
+
+    def status(self):
+        """Report the state of the service.
+
+        Returns:
+            (dict): Whether the service is ``ready``, the number of known
+                ``jobs`` by stage, the ``retained_bytes`` of the finished
+                exports kept for download and the state of its export daemon
+                (see :meth:`~.daemon.ExportDaemon.status`).
+        """
+        ready = self._starting is not None and self._starting.done()
+        stages = {}
+        for job in self._jobs.values():
+            stages[job.stage] = stages.get(job.stage, 0) + 1
+        return {
+            "ready": ready and self._starting.exception() is None,
+            "jobs": stages,
+            "retained_bytes": self._retained_bytes,
+            "daemon": self._daemon.status() if ready else None,
+        }
+
+    async def drain(self, timeout=None):
+        """Stop accepting jobs, wait for the pending ones and shut down.
+
+        Keyword Parameters:
+            timeout (float or None): Seconds to wait for pending jobs. Defaults
+                to None, waiting for all of them.
+
+        Returns:
+            (bool): True if every pending job finished in time.
+        """
+        if self._starting is None:
+            return True
+        try:
+            await asyncio.wrap_future(self._starting)
+        except Exception:
+            return True
+        return await self._daemon.drain(timeout)
+
+    def _empty_directory(self):
+        """Return an empty directory for notebooks that have no local one.
+
+        Local references resolved against it are not found, so they are left
+        in the export as they are.
+
+        Returns:
+            (str): Path of the directory, removed when the service is collected.
+        """
+        if self._no_directory is None:
+            self._no_directory = tempfile.TemporaryDirectory(prefix="styled-export-")
+        return self._no_directory.name
+
+    async def _run(self, job, key, notebook, directory, accepted):
+        """Run a job on the daemon, recording its progress."""
+
+        def progress(stage):
+            job.stage = stage
+            if stage == "queued" and not accepted.done():
+                accepted.set_result(None)
+
+        try:
+            await asyncio.wrap_future(self.start())
+            if directory is None:
+                directory = self._empty_directory()
+            job.result = await self._daemon.export(
+                job.exporter, notebook, path=directory, progress=progress
+            )
+        except Exception as e:
+            job.error = e
+            job.stage = "failed"
+            if not accepted.done():
+                # Refused, or the service never started: the request fails instead.
+                accepted.set_exception(e)
+                return
+            self.log.warning("Styled export of %s failed: %s", job.path, job.describe()["error"])
+        else:
+            job.stage = "finished"
+        finally:
+            job.finished = time.time()
+            job._done.set()
+        asyncio.get_running_loop().call_later(self.job_ttl, self._forget, job, key)
+        if job.result is not None:
+            self._retain(job, key)
+
+    def _retain(self, job, key):
+        """Account for a finished export, dropping the oldest beyond the size limit."""
+        size = len(job.result.output)
+        self._retained[job.id] = (job, key, size)
+        self._retained_bytes += size
+        while self._retained_bytes > self.max_retained_bytes and len(self._retained) > 1:
+            oldest, oldest_key, _ = next(iter(self._retained.values()))
+            self.log.debug("Dropping the export of %s to stay within the limit", oldest.path)
+            self._forget(oldest, oldest_key)
+
+    def _forget(self, job, key):
+        """Drop an expired, evicted or refused job."""
+        self._jobs.pop(job.id, None)
+        if self._jobs_by_key.get(key) is job:
+            del self._jobs_by_key[key]
+        retained = self._retained.pop(job.id, None)
+        if retained is not None:
+            self._retained_bytes -= retained[2]
@@ -0,0 +1,344 @@
+"""
+Incremental rewriting of HTML documents supplied as a stream of chunks.
+
+The rewriters in this module never build a document tree. They scan the HTML
+as a stream of tokens, hand selected start tags to callbacks and copy every
+other character through unchanged, so a document can be post-processed while
+it is being rendered and written out.
+"""
+
+import html as html_lib
+import logging
+import re
+
+# A complete start tag, allowing ">" inside quoted attribute values.
+_START_TAG_RE = re.compile(r"""<[^\s/>"']+(?:[^>"']|"[^"]*"|'[^']*')*>""")
+
+# The "<name" prefix of a start tag.
+_TAG_NAME_RE = re.compile(r"<[^\s/>\"']*")
+
+# A single attribute inside a start tag.
+_ATTR_RE = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'>]+))?""")
+
+_RAW_TEXT_CLOSE_RE = {
+    name: re.compile(rf"</{name}\s*>", re.IGNORECASE)
+    for name in ("script", "style", "textarea", "title")
+}
+
+# Alternative text nbconvert gives images that have none.
+MISSING_ALT_TEXT = "No description has been provided for this image"
+
+# Classes of the elements nbconvert makes focusable inside a .jp-Notebook element.
+_FOCUSABLE_CLASSES = frozenset(("jp-Cell-inputWrapper", "jp-OutputArea-output"))
+
+
+class TagRewriter:
+    """Incrementally rewrite selected start tags in HTML text.
+
+    The rewriter is a small tokenizer: it recognises comments, raw text
+    elements (``script``, ``style``, ``textarea`` and ``title``) and the start
+    tags it was asked to rewrite, and copies everything else through verbatim.
+    HTML may be fed in arbitrary chunks; a token split across two chunks is
+    held back until it is complete.
+
+    Args:
+        rewrite_tags (dict):
+            Maps lower-case tag names to callables. Each callable receives a
+            complete start tag (from ``<`` to the closing ``>``) and returns the
+            text to emit in its place.
+
+    Keyword Parameters:
+        before_body_end (callable or None):
+            Called once, with no arguments, when the ``</body>`` end tag is
+            reached (or at the end of the stream if there is none). The text it
+            returns is inserted before the end tag. Defaults to None.
+
+    Examples:
+        >>> rewriter = TagRewriter({"p": lambda tag: '<p class="x">'})
+        >>> rewriter.feed("<div><p>Hi</p></div>") + rewriter.close()
+        '<div><p class="x">Hi</p></div>'
+    """
+
+    def __init__(self, rewrite_tags, before_body_end=None):
+        self.rewrite_tags = {name.lower(): func for name, func in rewrite_tags.items()}
+        self.before_body_end = before_body_end
+        names = "|".join(re.escape(name) for name in self.rewrite_tags) or "(?!)"
+        self._start_re = re.compile(
+            rf"<(?:(!--)|(script|style|textarea|title)\b|(/body)\b|({names})\b)", re.IGNORECASE
+        )
+        self._pending = ""
+        self._resume = 0
+
+    def feed(self, text):
+        """Feed a chunk of HTML to the rewriter.
+
+        Args:
+            text (str):
+                The next chunk of the HTML document.
+
+        Returns:
+            (str):
+                The rewritten HTML that is complete so far. Text belonging to a
+                token that has not been closed yet is held back.
+
+        Examples:
+            >>> rewriter = TagRewriter({"img": lambda tag: tag})
+            >>> rewriter.feed("<p>Hello <im")
+            '<p>Hello '
+        """
+        self._pending += text
+        return self._drain(final=False)
+
+    def close(self):
+        """Flush any text still held back by the rewriter.
+
+        Returns:
+            (str):
+                The remaining rewritten HTML.
+
+        Examples:
+            >>> rewriter = TagRewriter({"img": lambda tag: tag})
+            >>> rewriter.feed("<p>Hello <im") + rewriter.close()
+            '<p>Hello <im'
+        """
+        return self._drain(final=True)
+
+    def iter_rewrite(self, chunks):
+        """Rewrite an HTML document supplied as a stream of chunks.
+
+        Args:
+            chunks (iterable of str):
+                Successive pieces of the HTML document.
+
+        Yields:
+            (str):
+                Rewritten pieces of the document. Empty pieces are skipped.
+
+        Examples:
+            >>> rewriter = TagRewriter({"b": lambda tag: "<strong>"})
+            >>> "".join(rewriter.iter_rewrite(["<b>bo", "ld</b>"]))
+            '<strong>bold</b>'
+        """
+        for chunk in chunks:
+            text = self.feed(chunk)
+            if text:
+                yield text
+        text = self.close()
+        if text:
+            yield text
+
+    def _drain(self, final):
+        """Rewrite as much of the pending text as possible.
+
+        Args:
+            final (bool):
+                If True, no more input will follow, so incomplete tokens are
+                emitted unchanged.
+
+        Returns:
+            (str):
+                The rewritten text.
+        """
+        data = self._pending
+        out = []
+        pos = 0
+        hold = None
+        while True:
+            match = self._start_re.search(data, pos)
+            if match is None:
+                break
+            start = match.start()
+            # Resume a search for the end of a long comment or raw text element
+            # where the previous chunk left off instead of rescanning it.
+            search_from = max(match.end(), self._resume) if start == 0 else match.end()
+            if match.group(1):
+                end = data.find("-->", search_from)
+                end = end + 3 if end >= 0 else -1
+            elif match.group(2):
+                close = _RAW_TEXT_CLOSE_RE[match.group(2).lower()].search(data, search_from)
+                end = close.end() if close else -1
+            elif match.group(3):
+                out.append(data[pos:start])
+                out.append(self._body_end())
+                pos = start
+                end = match.end()
+            else:
+                tag = _START_TAG_RE.match(data, start)
+                if tag is not None:
+                    out.append(data[pos:start])
+                    out.append(self.rewrite_tags[match.group(4).lower()](tag.group(0)))
+                    pos = tag.end()
+                    continue
+                end = -1
+            if end < 0:
+                hold = start
+                break
+            out.append(data[pos:end])
+            pos = end
+
+        if final:
+            out.append(data[pos:])
+            out.append(self._body_end())
+            self._pending = ""
+            self._resume = 0
+        elif hold is not None:
+            out.append(data[pos:hold])
+            self._pending = data[hold:]
+            # The closing marker may straddle the chunk boundary, so back off a little.
+            self._resume = max(len(self._pending) - 16, 0)
+        else:
+            # Hold back a trailing partial tag such as "<im" until more input arrives.
+            rest = data[pos:]
+            lt = rest.rfind("<")
+            if lt >= 0 and ">" not in rest[lt:]:
+                out.append(rest[:lt])
+                self._pending = rest[lt:]
+            else:
+                out.append(rest)
+                self._pending = ""
+            self._resume = 0
+        return "".join(out)
+
+    def _body_end(self):
+        """Return the text to insert before ``</body>``, at most once per document."""
+        if self.before_body_end is None:
+            return ""
+        callback, self.before_body_end = self.before_body_end, None
+        return callback() or ""
+
+
+class AccessibilityRewriter(TagRewriter):
+    """Apply nbconvert's accessibility fixes to a streamed HTML document.
+
+    nbconvert's ``HTMLExporter`` parses the finished document with
+    BeautifulSoup to give images without an ``alt`` attribute a placeholder
+    description and to make input and output areas focusable. This rewriter
+    makes the same changes token by token, so the document never has to be
+    materialized or re-serialized.
+
+    Keyword Parameters:
+        log (logging.Logger or None):
+            Logger that receives nbconvert's warning about images without
+            alternative text. Defaults to this module's logger.
+
+    Attributes:
+        missing_alt (int): Number of images that were given a placeholder
+            description so far.
+
+    Notes:
+        ``tabindex="0"`` is added to ``div.jp-Cell-inputWrapper`` and
+        ``div.jp-OutputArea-output`` elements that follow an element with the
+        ``jp-Notebook`` class, which in nbconvert's templates is the ``<body>``.
+
+    Examples:
+        >>> rewriter = AccessibilityRewriter()
+        >>> html = '<body class="jp-Notebook"><div class="jp-OutputArea-output">'
+        >>> rewriter.feed(html)
+        '<body class="jp-Notebook"><div class="jp-OutputArea-output" tabindex="0">'
+    """
+
+    def __init__(self, log=None):
+        super().__init__(
+            {"img": self._rewrite_img, "div": self._rewrite_div, "body": self._rewrite_body}
+        )
+        self.log = log or logging.getLogger(__name__)
+        self.missing_alt = 0
+        self._in_notebook = False
+
+    def close(self):
+        """Flush any held back text and report images without alternative text.
+
+        Returns:
+            (str):
+                The remaining rewritten HTML.
+        """
+        text = super().close()
+        if self.missing_alt:
+            self.log.warning("Alternative text is missing on %s image(s).", self.missing_alt)
+        return text
+
+    def _rewrite_img(self, tag):
+        """Give an ``<img>`` tag without an ``alt`` attribute a placeholder description."""
+        if "alt" in _attributes(tag):
+            return tag
+        self.missing_alt += 1
+        return add_attributes(tag, {"alt": MISSING_ALT_TEXT})
+
+    def _rewrite_div(self, tag):
+        """Make input and output areas focusable."""
+        attrs = _attributes(tag)
+        classes = set(attrs.get("class", "").split())
+        if not self._in_notebook:
+            self._in_notebook = "jp-Notebook" in classes
+            return tag
+        if classes & _FOCUSABLE_CLASSES and attrs.get("tabindex") != "0":
+            return add_attributes(tag, {"tabindex": "0"}, replace=True)
+        return tag
+
+    def _rewrite_body(self, tag):
+        """Track whether the document body is the ``.jp-Notebook`` element."""
+        if not self._in_notebook:
+            self._in_notebook = "jp-Notebook" in _attributes(tag).get("class", "").split()
+        return tag
+
+
+def _attributes(tag):
+    """Parse the attributes of a start tag.
+
+    Args:
+        tag (str):
+            A complete start tag.
+
+    Returns:
+        (dict):
+            Lower-case attribute names mapped to their entity-decoded values.
+            Attributes without a value map to an empty string.
+    """
+    attrs = {}
+    for attr in _ATTR_RE.finditer(tag, _TAG_NAME_RE.match(tag).end()):
+        raw = attr.group(2)
+        if raw is None:
+            value = ""
+        elif raw[0] in "\"'":
+            value = html_lib.unescape(raw[1:-1])
+        else:
+            value = html_lib.unescape(raw)
+        attrs.setdefault(attr.group(1).lower(), value)
+    return attrs
+
+
+def add_attributes(tag, attrs, replace=False):
+    """Append attributes to a start tag.
+
+    Args:
+        tag (str):
+            A complete start tag.
+        attrs (dict):
+            Attribute names and (unescaped) values to add.
+
+    Keyword Parameters:
+        replace (bool):
+            If True, existing attributes with the same names are removed first.
+            Defaults to False.
+
+    Returns:
+        (str):
+            The start tag with the attributes inserted before its closing ``>``
+            or ``/>``.
+
+    Examples:
+        >>> add_attributes('<img src="a.png"/>', {"alt": "A"})
+        '<img src="a.png" alt="A"/>'
+    """
+    if replace:
+        names = {name.lower() for name in attrs}
+        start = _TAG_NAME_RE.match(tag).end()
+        for attr in reversed(list(_ATTR_RE.finditer(tag, start))):
+            if attr.group(1).lower() in names:
+                tag = tag[: attr.start()].rstrip() + tag[attr.end() :]
+    end = len(tag) - 2 if tag.endswith("/>") else len(tag) - 1
+    head = tag[:end].rstrip()
+    extra = "".join(
+        f' {name}="{html_lib.escape(value, quote=True)}"' for name, value in attrs.items()
+    )
+    return head + extra + tag[len(head) :]
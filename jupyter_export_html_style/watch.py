@@ -0,0 +1,312 @@
+"""
+Watch notebooks and re-export them when they or their local files change.
+
+:class:`NotebookWatcher` polls the notebooks, and the local stylesheets and
+images each of them references, for changes. It waits until a burst of saves
+is over, then re-exports only the notebooks whose inputs changed, with one
+exporter kept warm in memory for the whole session. Re-exporting a notebook
+after an edit therefore costs a conversion, not an nbconvert start-up.
+
+From the command line::
+
+    jupyter-export-watch --output-dir preview notebooks/
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from .batch import (
+    EXPORTERS,
+    _load_config,
+    _report,
+    export_notebooks,
+    find_notebooks,
+    input_root,
+)
+from .manifest import MANIFEST_NAME, ExportManifest
+
+
+class NotebookWatcher:
+    """Re-export notebooks whenever they or the local files they use change.
+
+    The exports are recorded in an :class:`~.manifest.ExportManifest`, which
+    lists the stylesheets and images every notebook reads: these are watched
+    along with the notebooks, and a notebook is re-exported only if its
+    content, one of its files or one of its outputs changed. Directories are
+    searched for new notebooks on every poll, and the outputs of deleted
+    notebooks are removed.
+
+    Args:
+        paths (iterable): Notebook files and directories to watch (see
+            :func:`~.batch.find_notebooks`).
+
+    Keyword Parameters:
+        exporter (str or type): Name of the exporter (a key of
+            :data:`~.batch.EXPORTERS`) or an exporter class. Defaults to
+            ``"styled_html"``.
+        output_dir (str or None): Directory the exports are written to, in
+            the folder layout of ``paths`` (see :func:`~.batch.input_root`).
+            None writes each export next to its notebook. Defaults to None.
+        config (Config, dict or None): Configuration of the exporter. Defaults
+            to None.
+        manifest (str or None): Path of the manifest. Defaults to
+            ``.jupyter-export-manifest.json`` in the output directory, or in
+            the current directory.
+        debounce (float): Seconds without further changes to wait for before
+            re-exporting, so that a burst of saves triggers a single export.
+            Defaults to 0.2.
+        interval (float): Seconds between two polls. Defaults to 0.1.
+
+    Attributes:
+        manifest (ExportManifest): The manifest of the exports.
+
+    Notes:
+        Changes are detected by polling file sizes and modification times,
+        which works on every platform and file system, network mounts
+        included, and costs one ``stat`` per watched file and poll.
+
+        The exporter is created once and reused, so its templates stay
+        compiled and its image and fragment caches stay filled; with
+        ``StyledHTMLExporter.incremental`` enabled, only the edited cells of
+        a notebook are rendered again.
+
+    Examples:
+        >>> watcher = NotebookWatcher(["notebooks"], output_dir="preview")
+        >>> for results in watcher.watch():
+        ...     for result in results:
+        ...         print(result.source, result.error or result.output)
+    """
+
+    def __init__(
+        self,
+        paths,
+        exporter="styled_html",
+        output_dir=None,
+        config=None,
+        manifest=None,
+        debounce=0.2,
+        interval=0.1,
+    ):
+        self.paths = [os.fspath(path) for path in paths]
+        self.exporter = exporter
+        self.output_dir = output_dir
+        self.config = config
+        self.manifest = ExportManifest(
+            manifest or os.path.join(output_dir or os.curdir, MANIFEST_NAME)
+        )
+        self.debounce = debounce
+        self.interval = interval
+        self._states = {}
+
+    def export(self, notebooks=None, jobs=0):
+        """Export the notebooks that are not up to date and record them.
+
+        Args:
+            notebooks (list or None): The notebooks to consider. Defaults to
+                all watched notebooks.
+            jobs (int or None): Number of worker processes, see
+                :func:`~.batch.export_notebooks`. Defaults to 0, exporting
+                with the warm exporter of this process.
+
+        Returns:
+            (list): The :class:`~.batch.ExportResult` of every notebook,
+                including the skipped ones.
+        """
+        if notebooks is None:
+            notebooks = find_notebooks(self.paths)
+        try:
+            results = list(
+                export_notebooks(
+                    notebooks,
+                    self.exporter,
+                    self.output_dir,
+                    jobs=jobs,
+                    ordered=True,
+                    config=self.config,
+                    manifest=self.manifest,
+                    root=input_root(self.paths),
+                )
+            )
+        finally:
+            self.manifest.save()
+        # Watch the files the exports read, but keep the states seen before
+        # exporting, so that edits made meanwhile are still noticed.
+        states = self._snapshot()
+        self._states = {path: self._states.get(path, state) for path, state in states.items()}
+        return results
+
+    def poll(self):
+        """Look for changed files since the last poll or export.
+
+        Returns:
+            (set): Paths of the watched files that were created, modified or
+                deleted.
+        """
+        states = self._snapshot()
+        changed = {
+            path
+            for path in states.keys() | self._states.keys()
+            if states.get(path) != self._states.get(path)
+        }
+        self._states = states
+        return changed
+
+    def affected(self, changed):
+        """Find the notebooks to re-export after some files changed.
+
+        Args:
+            changed (set): Paths of changed files, as returned by :meth:`poll`.
+
+        Returns:
+            (list): The existing notebooks that are among the changed files or
+                read one of them, in watch order.
+        """
+        changed = {os.path.abspath(path) for path in changed}
+        notebooks = []
+        for notebook in find_notebooks(self.paths):
+            if not os.path.isfile(notebook):
+                continue
+            if os.path.abspath(notebook) in changed or changed & self._dependencies(notebook):
+                notebooks.append(notebook)
+        return notebooks
+
+    def watch(self, stop=None, jobs=0):
+        """Export the notebooks, then re-export them as they change.
+
+        Keyword Parameters:
+            stop (threading.Event or None): Ends the loop when set. Defaults to
+                None, watching until interrupted.
+            jobs (int or None): Number of worker processes for the initial
+                export (see :func:`~.batch.export_notebooks`); re-exports always
+                use the warm exporter of this process. Defaults to 0.
+
+        Yields:
+            (list): The results of the initial export, then of every
+                re-export. Each re-export covers the notebooks affected by a
+                burst of changes and removes the outputs of deleted notebooks.
+        """
+        stop = stop or threading.Event()
+        yield self._export_and_prune(jobs=jobs)
+        pending = set()
+        last_change = 0.0
+        while not stop.wait(self.interval):
+            changed = self.poll()
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+                continue
+            if pending and time.monotonic() - last_change >= self.debounce:
+                yield self._export_and_prune(self.affected(pending))
+                pending = set()
+
+    def _export_and_prune(self, notebooks=None, jobs=0):
+        """Export notebooks, then remove the outputs of deleted notebooks."""
+        try:
+            results = self.export(notebooks, jobs)
+        finally:
+            if self.manifest.prune():
+                self.manifest.save()
+        return results
+
+    def _dependencies(self, notebook):
+        """Return the absolute paths of the local files a notebook's last export read."""
+        entry = self.manifest.get(notebook) or {}
+        return {
+            os.path.normpath(os.path.join(self.manifest.directory, path))
+            for path in entry.get("dependencies", {})
+        }
+
+    def _snapshot(self):
+        """Stat the watched notebooks and their recorded dependencies."""
+        states = {}
+        for notebook in find_notebooks(self.paths):
+            for path in {os.path.abspath(notebook), *self._dependencies(notebook)}:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    states[path] = None
+                else:
+                    states[path] = (st.st_size, st.st_mtime_ns)
+        return states
+
+
+def main(argv=None):
+    """Watch notebooks and re-export them from the command line.
+
+    Args:
+        argv (list or None): Command line arguments. Defaults to ``sys.argv[1:]``.
+
+    Returns:
+        (int): The exit status, 0 once interrupted.
+    """
+    parser = argparse.ArgumentParser(
+        prog="jupyter-export-watch",
+        description="Export notebooks with styles and re-export them whenever they, "
+        "or the stylesheets and images they use, change.",
+    )
+    parser.add_argument("paths", nargs="+", help="Notebooks, or directories to search for them.")
+    parser.add_argument(
+        "--to", default="styled_html", choices=sorted(EXPORTERS), help="Exporter to use."
+    )
+    parser.add_argument(
+        "--output-dir", help="Directory for the exports. Defaults to next to each notebook."
+    )
+    parser.add_argument("--config", help="A .json or .py traitlets configuration file.")
+    parser.add_argument(
+        "--manifest",
+        help=f"Manifest of the exports. Defaults to {MANIFEST_NAME} in the output directory "
+        "(or the current directory).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of worker processes for the initial export. Defaults to 0, "
+        "exporting in this process.",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.2,
+        help="Seconds without changes to wait for before re-exporting.",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=0.1, help="Seconds between two polls."
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="Only report failures and the totals."
+    )
+    args = parser.parse_args(argv)
+
+    watcher = NotebookWatcher(
+        args.paths,
+        args.to,
+        args.output_dir,
+        _load_config(args.config) if args.config else None,
+        args.manifest,
+        args.debounce,
+        args.interval,
+    )
+    try:
+        for results in watcher.watch(jobs=args.jobs):
+            for result in results:
+                _report(result, args.quiet)
+            exported = sum(result.error is None and not result.skipped for result in results)
+            failed = sum(result.error is not None for result in results)
+            seconds = sum(result.seconds or 0.0 for result in results)
+            print(
+                f"{exported} exported, {failed} failed in {seconds:.2f}s; "
+                "watching for changes...",
+                flush=True,
+            )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
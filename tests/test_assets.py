@@ -0,0 +1,256 @@
+"""
+Tests for the asset store and the request routing of printed documents.
+"""
+
+import asyncio
+import io
+import os
+import pathlib
+import tarfile
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from jupyter_export_html_style.assets import (
+    ASSET_ORIGIN,
+    DOCUMENT_NAME,
+    AssetRouter,
+    AssetStore,
+    document_url,
+    main,
+)
+
+MATHJAX_URL = "https://cdnjs.cloudflare.com/ajax/libs/mathjax/2.7.7/latest.js?config=TeX"
+
+
+class FakeResponse:
+    """A response fetched from the network by a route."""
+
+    ok = True
+    headers = {"content-type": "text/css"}
+
+    async def body(self):
+        return b"body { margin: 0 }"
+
+
+class FakeRoute:
+    """A route recording how it was handled."""
+
+    def __init__(self, url):
+        self.request = self
+        self.url = url
+        self.action = None
+
+    async def fulfill(self, path=None, content_type=None, response=None, body=None):
+        self.action = ("fulfill", path, content_type, body)
+
+    async def abort(self):
+        self.action = ("abort",)
+
+    async def continue_(self):
+        self.action = ("continue",)
+
+    async def fetch(self):
+        if "unreachable" in self.url:
+            raise OSError("net::ERR_NAME_NOT_RESOLVED")
+        return FakeResponse()
+
+
+def _route(router, url):
+    """Pass one request through a router and return what it did."""
+    route = FakeRoute(url)
+    asyncio.run(router.handle(route))
+    return route.action
+
+
+def test_store_keys_assets_by_url():
+    """Test that assets are stored by host and path, with queries kept apart."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = AssetStore(tmpdir)
+        path = store.path_for("https://cdn.example.com/lib/1.0/lib.js")
+
+        assert path == os.path.join(tmpdir, "cdn.example.com", "lib", "1.0", "lib.js")
+        assert store.path_for(MATHJAX_URL) != store.path_for(MATHJAX_URL.split("?")[0])
+        assert store.path_for("https://cdn.example.com/a/../../etc/passwd") is None
+        assert store.path_for("file:///etc/passwd") is None
+
+        assert store.get("https://cdn.example.com/lib/1.0/lib.js") is None
+        store.put("https://cdn.example.com/lib/1.0/lib.js", b"lib()")
+        store.put("https://fonts.example.com/css2?family=Roboto", b"@font-face {}", "text/css")
+
+        assert store.get("https://cdn.example.com/lib/1.0/lib.js") == (path, "text/javascript")
+        assert store.get("https://fonts.example.com/css2?family=Roboto")[1] == "text/css"
+        assert "https://fonts.example.com/css2?family=Lato" not in store
+
+
+def _write_package(path, files):
+    """Write an npm package archive holding some files."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tarfile.open(path, "w:gz") as archive:
+        for name, body in files.items():
+            info = tarfile.TarInfo(f"package/{name}")
+            info.size = len(body)
+            archive.addfile(info, io.BytesIO(body))
+
+
+def test_store_populate_stores_the_mathjax_distribution():
+    """Test that a MathJax URL stores the files MathJax loads on demand."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        registry = os.path.join(tmpdir, "registry")
+        _write_package(
+            os.path.join(registry, "mathjax", "-", "mathjax-2.7.7.tgz"),
+            {
+                "MathJax.js": b"MathJax = {}",
+                "config/TeX-AMS_CHTML-full.js": b"config()",
+                "fonts/HTML-CSS/TeX/woff/MathJax_Main-Regular.woff": b"wOFF",
+                "fonts/HTML-CSS/TeX/png/Main/a.png": b"\x89PNG",
+                "unpacked/MathJax.js": b"MathJax = {}",
+            },
+        )
+        store = AssetStore(os.path.join(tmpdir, "assets"))
+        store.put(MATHJAX_URL, b"latest()")
+        registry_url = pathlib.Path(registry).as_uri()
+
+        assert store.populate([MATHJAX_URL], registry=registry_url) == [
+            f"{registry_url}/mathjax/-/mathjax-2.7.7.tgz"
+        ]
+        assert store.populate([MATHJAX_URL], registry=registry_url) == []
+
+        base = MATHJAX_URL.split("latest.js")[0]
+        assert store.get(base + "config/TeX-AMS_CHTML-full.js?V=2.7.7")[1] == "text/javascript"
+        assert base + "fonts/HTML-CSS/TeX/woff/MathJax_Main-Regular.woff?V=2.7.7" in store
+        assert base + "fonts/HTML-CSS/TeX/png/Main/a.png" not in store
+        assert base + "unpacked/MathJax.js" not in store
+
+
+def test_store_populate_downloads_missing_assets_only():
+    """Test that populating skips stored assets unless refreshing."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = AssetStore(tmpdir)
+        store.put("https://cdn.example.com/a.js", b"a()")
+
+        with patch.object(AssetStore, "fetch") as fetch:
+            urls = ["https://cdn.example.com/a.js", "https://cdn.example.com/b.js"]
+            assert store.populate(urls) == ["https://cdn.example.com/b.js"]
+            assert store.populate(urls, refresh=True) == urls
+            assert main(["--store", tmpdir, "https://cdn.example.com/c.js"]) == 0
+
+        assert fetch.call_count == 4
+
+
+@pytest.mark.parametrize(
+    "remote, expected",
+    [("network", ("continue",)), ("offline", ("abort",)), ("record", None)],
+)
+def test_router_serves_document_local_files_and_store(remote, expected):
+    """Test that requests are served from disk or the store and others follow the policy."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = os.path.realpath(tmpdir)
+        notebook_dir = os.path.join(tmpdir, "notebooks")
+        os.makedirs(os.path.join(notebook_dir, "images"))
+        image = os.path.join(notebook_dir, "images", "plot.png")
+        with open(image, "wb") as f:
+            f.write(b"\x89PNG")
+        html_path = os.path.join(tmpdir, "export.html")
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write("<html></html>")
+        store = AssetStore(os.path.join(tmpdir, "assets"))
+        store.put(MATHJAX_URL, b"MathJax = {}")
+        router = AssetRouter(html_path, notebook_dir, store, remote=remote)
+
+        assert router.url == document_url(os.path.join(notebook_dir, "export.html"))
+        assert _route(router, router.url)[:2] == ("fulfill", html_path)
+        assert _route(router, document_url(image))[:2] == ("fulfill", image)
+        assert _route(router, document_url(html_path)) == ("abort",)
+        assert _route(router, f"{ASSET_ORIGIN}/missing.png") == ("abort",)
+        assert _route(router, MATHJAX_URL)[:3] == (
+            "fulfill",
+            store.path_for(MATHJAX_URL),
+            "text/javascript",
+        )
+
+        action = _route(router, "https://fonts.example.com/roboto.css")
+        if expected is None:
+            assert action == ("fulfill", None, None, b"body { margin: 0 }")
+            assert store.get("https://fonts.example.com/roboto.css")[1] == "text/css"
+            assert router.counts["recorded"] == 1
+        else:
+            assert action == expected
+        assert router.counts["file"] == 2
+        assert router.counts["store"] == 1
+
+
+def test_router_serves_document_from_memory():
+    """Test that an in-memory document is served next to the notebook's files."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = os.path.realpath(tmpdir)
+        with open(os.path.join(tmpdir, "plot.png"), "wb") as f:
+            f.write(b"\x89PNG")
+        router = AssetRouter(None, tmpdir, html="<p>\u00e9</p>")
+
+        assert router.url == document_url(os.path.join(tmpdir, DOCUMENT_NAME))
+        assert _route(router, router.url + "#cell-0") == (
+            "fulfill",
+            None,
+            "text/html; charset=utf-8",
+            "<p>\u00e9</p>".encode(),
+        )
+        image_url = router.url[: -len(DOCUMENT_NAME)] + "plot.png"
+        assert _route(router, image_url)[:2] == ("fulfill", os.path.join(tmpdir, "plot.png"))
+
+
+@pytest.mark.parametrize("remote", ["network", "offline", "record"])
+def test_router_fetch_applies_the_policy_in_process(remote):
+    """Test that synchronous fetches follow the same rules as routed requests."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = os.path.realpath(tmpdir)
+        with open(os.path.join(tmpdir, "plot.png"), "wb") as f:
+            f.write(b"\x89PNG")
+        store = AssetStore(os.path.join(tmpdir, "assets"))
+        store.put(MATHJAX_URL, b"MathJax = {}")
+        router = AssetRouter(None, tmpdir, store, remote=remote, html="<p>Hi</p>")
+        fetched = []
+
+        def fetch_remote(url):
+            fetched.append(url)
+            return b"body { margin: 0 }", "text/css"
+
+        assert router.fetch(router.url, fetch_remote)[0] == b"<p>Hi</p>"
+        image_url = router.url[: -len(DOCUMENT_NAME)] + "plot.png"
+        assert router.fetch(image_url, fetch_remote) == (b"\x89PNG", "image/png")
+        assert router.fetch(MATHJAX_URL, fetch_remote) == (b"MathJax = {}", "text/javascript")
+        with pytest.raises(FileNotFoundError):
+            router.fetch(f"{ASSET_ORIGIN}/etc/passwd", fetch_remote)
+
+        font_url = "https://fonts.example.com/roboto.css"
+        if remote == "offline":
+            with pytest.raises(FileNotFoundError):
+                router.fetch(font_url, fetch_remote)
+            assert fetched == []
+        else:
+            assert router.fetch(font_url, fetch_remote) == (b"body { margin: 0 }", "text/css")
+            assert fetched == [font_url]
+            assert (font_url in store) == (remote == "record")
+        assert router.counts["file"] == 1
+        assert router.counts["store"] == 1
+
+
+def test_router_rejects_unknown_policy():
+    """Test that an unknown remote asset policy is reported."""
+    with pytest.raises(ValueError, match="remote asset policy"):
+        AssetRouter("export.html", remote="sometimes")
+
+
+def test_router_aborts_by_default_and_when_recording_fails():
+    """Test that remote assets are aborted offline and failed recordings are aborted."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = AssetStore(tmpdir)
+        offline = AssetRouter("export.html", tmpdir, store)
+        recording = AssetRouter("export.html", tmpdir, store, remote="record")
+
+        assert offline.remote == "offline"
+        assert _route(offline, "https://fonts.example.com/roboto.css") == ("abort",)
+        assert _route(recording, "https://unreachable.example.com/a.css") == ("abort",)
+        assert recording.counts["aborted"] == 1
+        assert "https://unreachable.example.com/a.css" not in store
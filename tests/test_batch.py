@@ -0,0 +1,161 @@
+"""
+Tests for the parallel batch export command.
+"""
+
+import concurrent.futures
+import multiprocessing
+import multiprocessing.util
+import os
+import tempfile
+import threading
+
+import nbformat
+import pytest
+from nbformat.v4 import new_markdown_cell, new_notebook
+from traitlets.config import Config
+
+from jupyter_export_html_style import batch
+from jupyter_export_html_style.batch import (
+    ExportResult,
+    _start_worker,
+    export_notebooks,
+    find_notebooks,
+    main,
+    summarize,
+)
+from jupyter_export_html_style.browser import shutdown_browser_pools
+from jupyter_export_html_style.exporters import StyledHTMLExporter
+from jupyter_export_html_style.manifest import MANIFEST_NAME
+
+
+def _write_notebooks(tmpdir):
+    """Write three notebooks, one in a subdirectory, and a broken one."""
+    os.makedirs(os.path.join(tmpdir, "nbs", "sub"))
+    os.makedirs(os.path.join(tmpdir, "nbs", ".ipynb_checkpoints"))
+    for path in ["a.ipynb", "c.ipynb", os.path.join("sub", "b.ipynb")]:
+        title = os.path.splitext(os.path.basename(path))[0]
+        nb = new_notebook(cells=[new_markdown_cell(f"# Title {title}")])
+        nbformat.write(nb, os.path.join(tmpdir, "nbs", path))
+    for path in ["broken.ipynb", os.path.join(".ipynb_checkpoints", "a-checkpoint.ipynb")]:
+        with open(os.path.join(tmpdir, "nbs", path), "w", encoding="utf-8") as f:
+            f.write("{not json")
+    return os.path.join(tmpdir, "nbs")
+
+
+def test_find_notebooks_searches_directories():
+    """Test that directories are searched recursively, skipping checkpoints."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = _write_notebooks(tmpdir)
+        found = find_notebooks([directory, "extra.ipynb"])
+
+    assert [os.path.relpath(path, directory) for path in found[:-1]] == [
+        "a.ipynb",
+        "broken.ipynb",
+        "c.ipynb",
+        os.path.join("sub", "b.ipynb"),
+    ]
+    assert found[-1] == "extra.ipynb"
+
+
+@pytest.mark.parametrize("jobs", [0, 2])
+def test_export_notebooks_isolates_failures(jobs):
+    """Test that every notebook is exported in order and a broken one is reported."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = find_notebooks([_write_notebooks(tmpdir)])
+        output_dir = os.path.join(tmpdir, "out")
+        results = list(export_notebooks(paths, output_dir=output_dir, jobs=jobs, ordered=True))
+
+        assert [result.source for result in results] == paths
+        assert [result.error is None for result in results] == [True, False, True, True]
+        assert isinstance(results[1].error, nbformat.reader.NotJSONError)
+        with open(results[3].output, encoding="utf-8") as f:
+            assert "Title b" in f.read()
+        assert results[3].output == os.path.join(output_dir, "sub", "b.html")
+        assert all(result.seconds >= 0 for result in results)
+
+
+def test_summarize_reports_throughput_and_slowest():
+    """Test that the summary counts failures and ranks the slowest notebooks."""
+    results = [
+        ExportResult(0, "a.ipynb", "a.html", 1.0, None),
+        ExportResult(1, "b.ipynb", "b.html", 2.0, None),
+        ExportResult(2, "c.ipynb", None, None, RuntimeError("worker died")),
+    ]
+    summary = summarize(results, 2.0)
+
+    assert summary["notebooks"] == 3
+    assert summary["succeeded"] == 2
+    assert summary["failed"] == 1
+    assert summary["throughput"] == 1.5
+    assert summary["mean_seconds"] == 1.5
+    assert summary["slowest"] == [(2.0, "b.ipynb"), (1.0, "a.ipynb")]
+
+
+def test_main_prints_results_and_summary(capsys):
+    """Test that the command reports every notebook, a summary and the exit status."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = _write_notebooks(tmpdir)
+        status = main([directory, "--jobs", "0", "--output-dir", os.path.join(tmpdir, "out")])
+        assert sorted(os.listdir(os.path.join(tmpdir, "out"))) == [
+            MANIFEST_NAME,
+            "a.html",
+            "c.html",
+            "sub",
+        ]
+        assert os.listdir(os.path.join(tmpdir, "out", "sub")) == ["b.html"]
+
+    captured = capsys.readouterr()
+    assert status == 1
+    assert "FAILED" in captured.err and "broken.ipynb" in captured.err
+    assert captured.out.count("ok ") == 3
+    assert "3 of 4 notebooks exported, 1 failed" in captured.out
+    assert "notebooks/s" in captured.out
+
+
+def _worker_finalizers():
+    """Return the callbacks the worker running this will call when it exits."""
+    return [finalizer._callback for finalizer in multiprocessing.util._finalizer_registry.values()]
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs the fork start method"
+)
+def test_forked_workers_close_their_browser_pools():
+    """Test that forked workers, which inherit the exporter, still close their browsers."""
+    settings = (StyledHTMLExporter, Config())
+    _start_worker(*settings)
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_start_worker,
+        initargs=settings,
+    )
+    with pool:
+        callbacks = pool.submit(_worker_finalizers).result()
+
+    assert shutdown_browser_pools in callbacks
+
+
+def test_export_notebooks_does_not_fork_while_threads_run(monkeypatch):
+    """Test that a batch started beside another thread uses workers that are not forked."""
+    contexts = []
+    choose_context = batch._batch_context
+
+    def spy():
+        contexts.append(choose_context())
+        return contexts[-1]
+
+    monkeypatch.setattr(batch, "_batch_context", spy)
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = find_notebooks([_write_notebooks(tmpdir)])
+            results = list(export_notebooks(paths, output_dir=tmpdir, jobs=1, ordered=True))
+    finally:
+        stop.set()
+        thread.join()
+
+    assert [result.error is None for result in results] == [True, False, True, True]
+    assert contexts[0].get_start_method() != "fork"
@@ -0,0 +1,274 @@
+"""
+Tests for the persistent browser pool, using a fake Playwright.
+"""
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from jupyter_export_html_style import StyledWebPDFExporter
+from jupyter_export_html_style.assets import ASSET_ORIGIN, document_url
+from jupyter_export_html_style.browser import (
+    BrowserPool,
+    get_browser_pool,
+    shutdown_browser_pools,
+)
+
+
+class FakePage:
+    """A page that records what was loaded and prints a fake PDF."""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.url = None
+        self.closed = False
+        self.routes = []
+
+    async def emulate_media(self, media):
+        self.media = media
+
+    async def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    async def goto(self, url, wait_until=None):
+        if not self.browser.connected:
+            raise RuntimeError("Target closed")
+        self.url = url
+
+    async def evaluate(self, script):
+        if "exportReady" in script:
+            return "signal"
+        return {"width": 800, "height": 600}
+
+    async def pdf(self, **params):
+        self.browser.printed.append(params)
+        return b"%PDF " + self.url.encode()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    """A browser context that opens fake pages."""
+
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def new_page(self):
+        return FakePage(self.browser)
+
+
+class FakeBrowser:
+    """A browser that can be disconnected to simulate a crash."""
+
+    def __init__(self, args):
+        self.args = args
+        self.connected = True
+        self.contexts = 0
+        self.printed = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self):
+        self.contexts += 1
+        return FakeContext(self)
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    """Stands in for both async_playwright() and the started Playwright instance."""
+
+    def __init__(self):
+        self.browsers = []
+        self.started = 0
+        self.stopped = 0
+        self.chromium = self
+
+    async def start(self):
+        self.started += 1
+        return self
+
+    async def stop(self):
+        self.stopped += 1
+
+    async def launch(self, **kw):
+        browser = FakeBrowser(kw["args"])
+        self.browsers.append(browser)
+        return browser
+
+
+def _make_pool(**kw):
+    """Create a pool driving a fresh fake Playwright."""
+    playwright = FakePlaywright()
+    return BrowserPool(playwright_factory=lambda: playwright, **kw), playwright
+
+
+async def _get_url(page):
+    """Job that loads a page and returns the browser and url."""
+    await page.goto("file:///x.html")
+    return page.browser, page.url
+
+
+def test_pool_reuses_browser_and_context():
+    """Test that consecutive jobs share one browser launch and context."""
+    pool, playwright = _make_pool(launch_args=["--no-sandbox"])
+    try:
+        first = pool.run(_get_url)
+        second = pool.run(_get_url)
+    finally:
+        pool.close()
+
+    assert first == second == (playwright.browsers[0], "file:///x.html")
+    assert len(playwright.browsers) == 1
+    assert playwright.browsers[0].contexts == 1
+    assert playwright.browsers[0].args == ["--no-sandbox"]
+    assert playwright.started == playwright.stopped == 1
+    assert not playwright.browsers[0].connected
+
+
+def test_pool_recycles_browsers_after_max_jobs():
+    """Test that a browser is replaced after serving the maximum number of jobs."""
+    pool, playwright = _make_pool(max_jobs_per_browser=2)
+    try:
+        browsers = [pool.run(_get_url)[0] for _ in range(5)]
+    finally:
+        pool.close()
+
+    assert browsers[0] is browsers[1]
+    assert browsers[2] is browsers[3] is not browsers[0]
+    assert not browsers[0].connected
+    assert pool.launches == 3
+
+
+def test_pool_replaces_crashed_browser():
+    """Test that a disconnected browser is detected and relaunched."""
+    pool, playwright = _make_pool()
+    try:
+        browser, _ = pool.run(_get_url)
+        browser.connected = False
+        replacement, _ = pool.run(_get_url)
+    finally:
+        pool.close()
+
+    assert replacement is not browser
+    assert pool.launches == 2
+
+
+def test_pool_limits_concurrent_pages():
+    """Test that no browser serves more pages at once than configured."""
+    pool, playwright = _make_pool(browsers=2, pages_per_browser=2)
+    peak = []
+
+    async def job(page):
+        peak.append(pool.stats()["active"])
+        await asyncio.sleep(0.01)
+        return page.browser
+
+    try:
+        futures = [pool.submit(job) for _ in range(10)]
+        browsers = {future.result() for future in futures}
+    finally:
+        pool.close()
+
+    assert max(peak) == 4
+    assert len(browsers) == 2
+
+
+def test_pool_job_timeout_and_errors_release_pages():
+    """Test that failing and timed out jobs do not leak page reservations."""
+    pool, playwright = _make_pool(pages_per_browser=1)
+
+    async def slow(page):
+        await asyncio.sleep(10)
+
+    async def failing(page):
+        raise ValueError("boom")
+
+    try:
+        with pytest.raises(TimeoutError):
+            pool.run(slow, timeout=0.01)
+        with pytest.raises(ValueError, match="boom"):
+            pool.run(failing)
+        assert pool.run(_get_url)[1] == "file:///x.html"
+        assert pool.stats()["active"] == 0
+    finally:
+        pool.close()
+
+
+def test_pool_reports_missing_playwright():
+    """Test that a pool without Playwright raises the usual RuntimeError."""
+
+    def factory():
+        raise RuntimeError("Playwright is not installed to support Web PDF conversion.")
+
+    pool = BrowserPool(playwright_factory=factory)
+    try:
+        with pytest.raises(RuntimeError, match="Playwright is not installed"):
+            pool.run(_get_url)
+        assert pool.stats()["active"] == 0
+    finally:
+        pool.close()
+
+
+def test_get_browser_pool_shares_pools_until_shutdown():
+    """Test that pools are shared per settings and replaced after shutdown."""
+    pool = get_browser_pool(browsers=3)
+    assert get_browser_pool(browsers=3) is pool
+    assert get_browser_pool(browsers=2) is not pool
+    shutdown_browser_pools()
+    assert get_browser_pool(browsers=3) is not pool
+    shutdown_browser_pools()
+
+
+def test_closed_pool_is_unshared_and_restarts_cleanly():
+    """Test that a closed pool leaves get_browser_pool and can be used again."""
+    shared = get_browser_pool(browsers=3)
+    shared.close()
+    try:
+        assert get_browser_pool(browsers=3) is not shared
+    finally:
+        shutdown_browser_pools()
+
+    pool, playwright = _make_pool()
+    try:
+        first_browser, _ = pool.run(_get_url)
+        pool.close()
+        assert pool.stats() == {"launches": 1, "running": 0, "active": 0}
+        second_browser, _ = pool.run(_get_url)
+    finally:
+        pool.close()
+
+    assert second_browser is not first_browser
+    assert playwright.started == playwright.stopped == 2
+
+
+def test_webpdf_exporter_prints_through_pool():
+    """Test that the WebPDF exporter prints pages through its browser pool."""
+    pool, playwright = _make_pool()
+    exporter = StyledWebPDFExporter(paginate=False)
+    exporter._get_browser_pool = lambda: pool
+
+    with tempfile.NamedTemporaryFile(suffix=".html", delete=False) as f:
+        f.write(b"<html></html>")
+    try:
+        first = exporter._print_pdf(f.name)
+        second = exporter.run_playwright("<html><body>Hi</body></html>")
+    finally:
+        os.unlink(f.name)
+        pool.close()
+
+    assert first == f"%PDF {document_url(os.path.join(os.getcwd(), os.path.basename(f.name)))}".encode()
+    assert second.startswith(f"%PDF {ASSET_ORIGIN}/".encode())
+    assert len(playwright.browsers) == 1
+    assert playwright.browsers[0].printed[0] == {
+        "print_background": True,
+        "tagged": True,
+        "width": 800,
+        "height": 600,
+    }
+    assert pool.stats() == {"launches": 1, "running": 0, "active": 0}
@@ -0,0 +1,140 @@
+"""
+Tests for the export result cache and its backends.
+"""
+
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+from nbformat.v4 import new_markdown_cell, new_notebook
+
+from jupyter_export_html_style import StyledHTMLExporter, StyledWebPDFExporter
+from jupyter_export_html_style.cache import (
+    DirectoryExportCache,
+    MemoryExportCache,
+    SQLiteExportCache,
+    get_export_cache,
+)
+
+
+def _make_cache(backend, tmpdir, maxsize):
+    """Create an export cache of the given backend inside a temporary directory."""
+    if backend is MemoryExportCache:
+        return backend(maxsize=maxsize)
+    return backend(os.path.join(tmpdir, "cache"), maxsize=maxsize)
+
+
+@pytest.mark.parametrize("backend", [MemoryExportCache, DirectoryExportCache, SQLiteExportCache])
+def test_backend_round_trip_and_counters(backend):
+    """Test that every backend stores copies of results and counts hits and misses."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = _make_cache(backend, tmpdir, 1024 * 1024)
+
+        assert cache.get("a" * 64) is None
+        assert cache.put("a" * 64, "<html/>", {"outputs": {"x.png": b"123"}, "f": len})
+        output, resources = cache.get("a" * 64)
+        resources["outputs"].clear()
+
+        assert output == "<html/>"
+        assert cache.get("a" * 64)[1] == {"outputs": {"x.png": b"123"}}
+        info = cache.cache_info()
+        assert (info.hits, info.misses, info.evictions) == (2, 1, 0)
+        assert info.currsize > 0
+
+        cache.clear()
+        assert cache.get("a" * 64) is None
+        assert cache.cache_info().currsize == 0
+
+
+@pytest.mark.parametrize("backend", [MemoryExportCache, DirectoryExportCache, SQLiteExportCache])
+def test_backend_evicts_least_recently_used(backend):
+    """Test that every backend evicts the least recently used results when full."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        probe = _make_cache(MemoryExportCache, tmpdir, 1024 * 1024)
+        probe.put("probe", b"x" * 1000, {})
+        entry_size = probe.cache_info().currsize
+        cache = _make_cache(backend, tmpdir, 2 * entry_size + entry_size // 2)
+
+        cache.put("a" * 64, b"x" * 1000, {})
+        cache.put("b" * 64, b"x" * 1000, {})
+        if backend is DirectoryExportCache:
+            # Make the access order visible despite coarse file time resolution.
+            os.utime(cache._entry_path("a" * 64), (1, 1))
+            os.utime(cache._entry_path("b" * 64), (2, 2))
+        cache.put("c" * 64, b"x" * 1000, {})
+
+        assert cache.get("a" * 64) is None
+        assert cache.get("b" * 64) is not None
+        assert cache.get("c" * 64) is not None
+        assert cache.cache_info().evictions == 1
+
+
+def test_get_export_cache_shares_instances_and_rejects_unknown_backends():
+    """Test that caches are shared per backend and location."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "exports.sqlite3")
+        cache = get_export_cache("sqlite", path, maxsize=1024)
+        assert get_export_cache("sqlite", path, maxsize=2048) is cache
+        assert cache.maxsize == 2048
+        assert isinstance(
+            get_export_cache("jupyter_export_html_style.cache.MemoryExportCache"),
+            MemoryExportCache,
+        )
+        with pytest.raises(ValueError):
+            get_export_cache("jupyter_export_html_style.images.LRUCache")
+        with pytest.raises(ValueError):
+            get_export_cache("no-such-backend")
+
+
+def test_exporter_cache_key_tracks_referenced_files():
+    """Test that the exporter serves hits until a referenced image changes."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        image = os.path.join(tmpdir, "plot.png")
+        with open(image, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+        nb = new_notebook(cells=[new_markdown_cell("![plot](plot.png)")])
+        nb.metadata["stylesheet"] = ["theme.css", "https://example.com/remote.css"]
+        exporter = StyledHTMLExporter(
+            export_cache="directory", export_cache_path=os.path.join(tmpdir, "cache")
+        )
+        cache = exporter._get_export_cache()
+
+        assert exporter._local_dependencies(nb, {"metadata": {"path": tmpdir}}) == [
+            image,
+            os.path.join(tmpdir, "theme.css"),
+        ]
+
+        resources = {"metadata": {"path": tmpdir, "name": "nb", "modified_date": "today"}}
+        first, _ = exporter.from_notebook_node(nb, resources=resources)
+        resources = {"metadata": {"path": tmpdir, "name": "nb", "modified_date": "tomorrow"}}
+        second, _ = exporter.from_notebook_node(nb, resources=resources)
+        assert second == first
+        assert cache.cache_info().hits == 1
+
+        os.utime(image, ns=(1, 1))
+        exporter.from_notebook_node(nb, resources=resources)
+        with open(os.path.join(tmpdir, "theme.css"), "w", encoding="utf-8") as f:
+            f.write("body { color: red; }")
+        output, _ = exporter.from_notebook_node(nb, resources=resources)
+        assert cache.cache_info().misses == 3
+        assert "color: red" in output
+
+        exporter.exclude_input = True
+        exporter.from_notebook_node(nb, resources=resources)
+        assert cache.cache_info().misses == 4
+
+
+def test_webpdf_cache_hit_skips_browser():
+    """Test that a cached PDF is returned without running the browser."""
+    nb = new_notebook(cells=[new_markdown_cell("# PDF")])
+    exporter = StyledWebPDFExporter(export_cache="memory")
+    exporter._get_export_cache().clear()
+
+    with patch.object(exporter, "run_playwright", return_value=b"%PDF-1.7") as run:
+        first, resources = exporter.from_notebook_node(nb)
+        second, cached_resources = exporter.from_notebook_node(nb)
+
+    assert run.call_count == 1
+    assert first == second == b"%PDF-1.7"
+    assert cached_resources["output_extension"] == ".pdf"
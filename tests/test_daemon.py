@@ -0,0 +1,205 @@
+"""
+Tests for the export daemon and its load-test harness.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import signal
+import tempfile
+
+import nbformat
+import pytest
+from nbformat.v4 import new_markdown_cell, new_notebook
+
+from jupyter_export_html_style.daemon import DaemonBusy, ExportDaemon
+from jupyter_export_html_style.loadtest import _client, run_load_test, synthetic_notebook
+
+
+class FakePool:
+    """A browser pool that prints every page job to a fixed PDF."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, job, timeout=None):
+        self.jobs.append(timeout)
+        future = concurrent.futures.Future()
+        future.set_result(b"%PDF-1.7 fake")
+        return future
+
+    def close(self):
+        pass
+
+
+def _notebook(text="# Report"):
+    """Return the JSON of a one-cell notebook."""
+    return nbformat.writes(new_notebook(cells=[new_markdown_cell(text)]))
+
+
+async def _serve(daemon, coroutine):
+    """Serve a daemon on a temporary Unix socket while a coroutine drives it."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "daemon.sock")
+        server, _ = daemon.listen(unix_socket=path)
+        try:
+            return await coroutine(path)
+        finally:
+            server.stop()
+            await daemon.drain()
+            await server.close_all_connections()
+
+
+async def _request(path, url, body=None):
+    """Send one request to a daemon and return the response."""
+    client = _client(path)
+    try:
+        return await client.fetch(
+            f"http://daemon{url}",
+            method="GET" if body is None else "POST",
+            body=body,
+            raise_error=False,
+        )
+    finally:
+        client.close()
+
+
+def test_daemon_serves_load_over_unix_socket():
+    """Test that concurrent jobs are converted and streamed back over a Unix socket."""
+    daemon = ExportDaemon(["styled_html", "styled_slides"], workers=0)
+    daemon.start()
+
+    async def drive(path):
+        summary = await run_load_test(
+            unix_socket=path, requests=6, concurrency=3, cells=4, distinct=2
+        )
+        slides = await _request(path, "/export/styled_slides", _notebook())
+        status = await _request(path, "/status")
+        return summary, slides, json.loads(status.body)
+
+    summary, slides, status = asyncio.run(_serve(daemon, drive))
+
+    assert summary["statuses"] == {200: 6}
+    assert summary["bytes"] > 0 and summary["latency"]["max"] >= summary["latency"]["p50"]
+    assert slides.headers["Content-Type"] == "text/html; charset=UTF-8"
+    assert b"reveal" in slides.body
+    assert float(slides.headers["X-Export-Seconds"]) > 0
+    assert status["counts"] == {"accepted": 7, "completed": 7}
+    assert status["pending"] == 0
+
+
+def test_daemon_reports_errors_as_json():
+    """Test the status codes of unknown exporters, bad notebooks and missed deadlines."""
+    daemon = ExportDaemon(["styled_html"], workers=0)
+    daemon.start()
+
+    async def drive(path):
+        return [
+            await _request(path, "/export/styled_latex", _notebook()),
+            await _request(path, "/export/styled_html", "{not json"),
+            await _request(path, "/export/styled_html?timeout=0.000001", _notebook()),
+        ]
+
+    responses = asyncio.run(_serve(daemon, drive))
+
+    assert [response.code for response in responses] == [404, 400, 504]
+    assert "styled_latex" in json.loads(responses[0].body)["message"]
+    assert daemon.counts["timed_out"] == 1
+
+
+def test_daemon_applies_backpressure_and_drains():
+    """Test that a full queue refuses jobs and draining finishes the pending ones."""
+    daemon = ExportDaemon(["styled_html"], workers=0, max_pending=1)
+    daemon.start()
+
+    async def drive():
+        first = asyncio.ensure_future(daemon.export("styled_html", _notebook()))
+        await asyncio.sleep(0)
+        with pytest.raises(DaemonBusy):
+            await daemon.export("styled_html", _notebook())
+        drained = await daemon.drain()
+        with pytest.raises(DaemonBusy):
+            await daemon.export("styled_html", _notebook())
+        return await first, drained
+
+    job, drained = asyncio.run(drive())
+
+    assert drained
+    assert "Report" in job.output
+    assert daemon.counts["rejected"] == 2
+    assert daemon.counts["completed"] == 1
+
+
+def test_daemon_prints_pdf_on_browser_pool():
+    """Test that PDF jobs are rendered by a worker and printed on the warm pool."""
+    daemon = ExportDaemon(["styled_webpdf"], workers=0, timeout=30)
+    daemon.start()
+    pool = FakePool()
+    # The daemon's exporters are shared with worker code in this process.
+    exporter = daemon._exporters["styled_webpdf"]
+    exporter._get_browser_pool = lambda: pool
+    try:
+        stages = []
+        job = asyncio.run(daemon.export("styled_webpdf", _notebook(), progress=stages.append))
+        daemon.close()
+    finally:
+        del exporter._get_browser_pool
+
+    assert job.output == b"%PDF-1.7 fake"
+    assert job.resources["output_extension"] == ".pdf"
+    assert daemon.content_type("styled_webpdf", job.resources) == "application/pdf"
+    assert 0 < pool.jobs[0] <= 30
+    assert stages == ["queued", "converting", "printing"]
+
+
+def test_daemon_spawns_workers_that_warm_up_their_exporters():
+    """Test that spawned workers build their own exporters and report progress."""
+    daemon = ExportDaemon(["styled_html"], workers=1, start_method="spawn")
+    daemon.start()
+    stages = []
+    try:
+        job = asyncio.run(daemon.export("styled_html", _notebook(), progress=stages.append))
+    finally:
+        daemon.close()
+
+    assert "Report" in job.output
+    assert stages == ["queued", "converting"]
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs SIGKILL")
+def test_daemon_replaces_workers_after_one_dies():
+    """Test that a killed worker is replaced and the jobs it broke are run again."""
+    daemon = ExportDaemon(["styled_html"], workers=1)
+    daemon.start()
+
+    async def drive():
+        (worker,) = daemon._render_pool._processes.values()
+        os.kill(worker.pid, signal.SIGKILL)
+        worker.join(10)
+        jobs = await asyncio.gather(
+            daemon.export("styled_html", _notebook("# First")),
+            daemon.export("styled_html", _notebook("# Second")),
+        )
+        return jobs, await daemon.export("styled_html", _notebook("# Later"))
+
+    try:
+        (first, second), later = asyncio.run(drive())
+        status = daemon.status()
+    finally:
+        daemon.close()
+
+    assert "First" in first.output and "Second" in second.output and "Later" in later.output
+    assert status["restarts"] == 1
+    assert status["counts"] == {"accepted": 3, "completed": 3}
+
+
+def test_synthetic_notebook_is_reproducible():
+    """Test that synthetic notebooks are valid and depend only on their seed."""
+    nb = synthetic_notebook(cells=6, seed=3)
+    nbformat.validate(nb)
+
+    assert len(nb.cells) == 6
+    assert [cell.cell_type for cell in nb.cells[:2]] == ["markdown", "code"]
+    assert nbformat.writes(nb) == nbformat.writes(synthetic_notebook(cells=6, seed=3))
+    assert nbformat.writes(nb) != nbformat.writes(synthetic_notebook(cells=6, seed=4))
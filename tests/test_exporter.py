@@ -2,20 +2,11 @@
 Tests for the StyledHTMLExporter class.
 
 Note on Implementation:
-    The current implementation generates CSS rules (e.g., #cell-0, #cell-0-input,
-    #cell-0-output) and injects them into the HTML <head> section. However, the
-    actual HTML body generated by nbconvert's default templates does NOT include
-    elements with these IDs.
-
-    This means the CSS rules have no effect on the output. To make the styles
-    functional, the exporter would need to:
-    1. Override the cell template to add the appropriate id attributes to cell
-       container elements
-    2. Create a custom Jinja2 template that includes these IDs in the rendered HTML
-
-    These tests verify that the CSS is correctly generated and injected, but they
-    cannot verify that the styles are actually applied to elements since those
-    elements don't currently have the matching IDs.
+    Cell styles are interned by the StylePreprocessor into generated classes
+    (e.g., .styled-1a2b3c4d), one CSS rule per distinct style with the
+    specificity of an ID selector, and the styled
+    templates add those classes to the cell, input and output elements. Tests
+    look up the generated class for a cell through resources["style_classes"].
 """
 
 import base64
@@ -68,7 +59,7 @@ def _extract_css_rules(html_string):
         if style_content:
             # Parse CSS rules using regex
             # Matches patterns like: #cell-0 { background-color: #fff; padding: 10px }
-            rule_pattern = r"([#.\w-]+)\s*\{([^}]+)\}"
+            rule_pattern = r"(:is\([^)]*\)|[#.\w-]+)\s*\{([^}]+)\}"
             for match in re.finditer(rule_pattern, style_content):
                 selector = match.group(1).strip()
                 properties_str = match.group(2).strip()
@@ -86,6 +77,21 @@ def _extract_css_rules(html_string):
     return css_rules
 
 
+def _selector(resources, style_id):
+    """Return the CSS selector of the generated class assigned to a cell style.
+
+    Args:
+        resources (dict): Resources returned by the exporter.
+        style_id (str): Style key such as "cell-0" or "cell-0-input".
+
+    Returns:
+        (str): The selector of the generated rule, e.g.
+            ":is(#styled-1a2b3c4d, .styled-1a2b3c4d)".
+    """
+    class_name = resources["style_classes"][style_id]
+    return f":is(#{class_name}, .{class_name})"
+
+
 def _create_notebook_with_image(tmpdir, image_filename="test.png"):
     """Helper function to create a test notebook with an image reference.
 
@@ -165,72 +171,28 @@ def test_export_notebook_with_styles():
     assert has_custom_comment, "Custom cell styles comment not found"
 
     # Verify the specific CSS rule exists with correct property
-    assert "#cell-0" in css_rules, "CSS rule for #cell-0 not found"
-    assert "background-color" in css_rules["#cell-0"], "background-color property not found"
-    assert css_rules["#cell-0"]["background-color"] == "#f0f0f0"
-
-
-def test_generate_style_block_with_dict():
-    """Test generating style block from dictionary styles."""
-    exporter = StyledHTMLExporter()
-
-    styles = {"cell-0": {"background-color": "#fff", "padding": "10px"}, "cell-1": {"color": "red"}}
-
-    style_block = exporter._generate_style_block(styles)
-
-    # Parse the generated style block
-    css_rules = _extract_css_rules(style_block)
-
-    # Verify structure
-    assert "<style>" in style_block
-    assert "</style>" in style_block
-
-    # Verify specific CSS rules
-    assert "#cell-0" in css_rules
-    assert "#cell-1" in css_rules
-
-    # Check properties for cell-0
-    assert "background-color" in css_rules["#cell-0"]
-    assert css_rules["#cell-0"]["background-color"] == "#fff"
-    assert "padding" in css_rules["#cell-0"]
-    assert css_rules["#cell-0"]["padding"] == "10px"
-
-    # Check properties for cell-1
-    assert "color" in css_rules["#cell-1"]
-    assert css_rules["#cell-1"]["color"] == "red"
-
-
-def test_generate_style_block_with_string():
-    """Test generating style block from string styles."""
-    exporter = StyledHTMLExporter()
-
-    styles = {"cell-0": "background-color: #eee; padding: 5px;"}
-
-    style_block = exporter._generate_style_block(styles)
-
-    # Parse the generated style block
-    css_rules = _extract_css_rules(style_block)
-
-    # Verify structure
-    assert "<style>" in style_block
-
-    # Verify specific CSS rule and properties
-    assert "#cell-0" in css_rules
-    assert "background-color" in css_rules["#cell-0"]
-    assert css_rules["#cell-0"]["background-color"] == "#eee"
-    assert "padding" in css_rules["#cell-0"]
-    assert css_rules["#cell-0"]["padding"] == "5px"
+    assert _selector(resources, "cell-0") in css_rules, "CSS rule for cell-0 not found"
+    rule = css_rules[_selector(resources, "cell-0")]
+    assert "background-color" in rule, "background-color property not found"
+    assert css_rules[_selector(resources, "cell-0")]["background-color"] == "#f0f0f0"
 
 
-def test_generate_style_block_empty():
-    """Test generating style block with no styles."""
+def test_cell_and_notebook_styles_are_emitted_once():
+    """Test that the compiled CSS is rendered by the template exactly once."""
     exporter = StyledHTMLExporter()
 
-    styles = {}
+    cell = new_code_cell("x = 1")
+    cell.metadata["style"] = {"background-color": "#abcdef"}
+    nb = new_notebook(cells=[cell])
+    nb.metadata["style"] = ".jp-Cell { margin: 3px; }"
 
-    style_block = exporter._generate_style_block(styles)
+    output, resources = exporter.from_notebook_node(nb)
 
-    assert style_block == ""
+    assert "background-color: #abcdef" in resources["styled_css"]
+    assert ".jp-Cell { margin: 3px; }" in resources["styled_css"]
+    assert output.count("background-color: #abcdef") == 1
+    assert output.count(".jp-Cell { margin: 3px; }") == 1
+    assert output.index("margin: 3px") < output.index("</head>")
 
 
 def test_export_with_custom_template():
@@ -266,9 +228,9 @@ def test_export_notebook_with_input_style():
 
     # Verify the CSS rule for input styling
     assert output is not None
-    assert "#cell-0-input" in css_rules, "CSS rule for #cell-0-input not found"
-    assert "background-color" in css_rules["#cell-0-input"]
-    assert css_rules["#cell-0-input"]["background-color"] == "#ffe"
+    assert _selector(resources, "cell-0-input") in css_rules, "CSS rule for cell-0-input not found"
+    assert "background-color" in css_rules[_selector(resources, "cell-0-input")]
+    assert css_rules[_selector(resources, "cell-0-input")]["background-color"] == "#ffe"
 
 
 def test_export_notebook_with_output_style():
@@ -287,9 +249,9 @@ def test_export_notebook_with_output_style():
 
     # Verify the CSS rule for output styling
     assert output is not None
-    assert "#cell-0-output" in css_rules, "CSS rule for #cell-0-output not found"
-    assert "border" in css_rules["#cell-0-output"]
-    assert css_rules["#cell-0-output"]["border"] == "2px solid blue"
+    assert _selector(resources, "cell-0-output") in css_rules, "CSS rule for cell-0-output missing"
+    assert "border" in css_rules[_selector(resources, "cell-0-output")]
+    assert css_rules[_selector(resources, "cell-0-output")]["border"] == "2px solid blue"
 
 
 def test_export_notebook_with_all_cell_styles():
@@ -310,14 +272,14 @@ def test_export_notebook_with_all_cell_styles():
 
     # Verify all CSS rules are present
     assert output is not None
-    assert "#cell-0" in css_rules, "CSS rule for #cell-0 not found"
-    assert "#cell-0-input" in css_rules, "CSS rule for #cell-0-input not found"
-    assert "#cell-0-output" in css_rules, "CSS rule for #cell-0-output not found"
+    assert _selector(resources, "cell-0") in css_rules, "CSS rule for cell-0 not found"
+    assert _selector(resources, "cell-0-input") in css_rules, "CSS rule for cell-0-input not found"
+    assert _selector(resources, "cell-0-output") in css_rules, "CSS rule for cell-0-output missing"
 
     # Verify specific properties
-    assert css_rules["#cell-0"]["padding"] == "10px"
-    assert css_rules["#cell-0-input"]["color"] == "red"
-    assert css_rules["#cell-0-output"]["font-weight"] == "bold"
+    assert css_rules[_selector(resources, "cell-0")]["padding"] == "10px"
+    assert css_rules[_selector(resources, "cell-0-input")]["color"] == "red"
+    assert css_rules[_selector(resources, "cell-0-output")]["font-weight"] == "bold"
 
 
 def test_export_notebook_with_notebook_level_style():
@@ -780,9 +742,9 @@ def test_css_selectors_match_html_elements():
     css_rules = _extract_css_rules(output)
 
     # Verify CSS rules exist
-    assert "#cell-0" in css_rules, "CSS rule for #cell-0 not found"
-    assert "#cell-1-input" in css_rules, "CSS rule for #cell-1-input not found"
-    assert "#cell-2-output" in css_rules, "CSS rule for #cell-2-output not found"
+    assert _selector(resources, "cell-0") in css_rules, "CSS rule for cell-0 not found"
+    assert _selector(resources, "cell-1-input") in css_rules, "CSS rule for cell-1-input not found"
+    assert _selector(resources, "cell-2-output") in css_rules, "CSS rule for cell-2-output missing"
 
     # Verify matching HTML elements exist
     assert soup.find(id="cell-0") is not None, "HTML element with id='cell-0' not found"
@@ -792,9 +754,9 @@ def test_css_selectors_match_html_elements():
     # Note: cell-2-output element won't exist without actual output
 
     # Verify the styles are applied with correct values
-    assert css_rules["#cell-0"]["background-color"] == "#f0f0f0"
-    assert css_rules["#cell-1-input"]["color"] == "red"
-    assert css_rules["#cell-2-output"]["border"] == "1px solid blue"
+    assert css_rules[_selector(resources, "cell-0")]["background-color"] == "#f0f0f0"
+    assert css_rules[_selector(resources, "cell-1-input")]["color"] == "red"
+    assert css_rules[_selector(resources, "cell-2-output")]["border"] == "1px solid blue"
 
 
 def test_explicit_div_with_class_preserves_content():
@@ -1034,10 +996,10 @@ def test_custom_classes_and_styles_together():
 
     # Check that styles are in the CSS
     css_rules = _extract_css_rules(output)
-    assert "#cell-0" in css_rules
-    assert "background-color" in css_rules["#cell-0"]
-    assert "#cell-0-input" in css_rules
-    assert "border" in css_rules["#cell-0-input"]
+    assert _selector(resources, "cell-0") in css_rules
+    assert "background-color" in css_rules[_selector(resources, "cell-0")]
+    assert _selector(resources, "cell-0-input") in css_rules
+    assert "border" in css_rules[_selector(resources, "cell-0-input")]
 
 
 def test_anchor_links_included_by_default():
@@ -1111,3 +1073,49 @@ def test_anchor_links_metadata_multiple_exports():
     output3, _ = exporter.from_notebook_node(nb3)
     assert 'class="anchor-link"' in output3
     assert 'href="#Third-Header"' in output3
+
+
+def test_sanitize_html_cleans_styled_markdown_cells():
+    """Test that sanitize_html applies to markdown cells in the styled template."""
+    cells = [new_markdown_cell("<script>alert(1)</script>", metadata={"style": "color: navy"})]
+    nb = new_notebook(cells=cells)
+
+    output, _ = StyledHTMLExporter(sanitize_html=True).from_notebook_node(nb)
+
+    assert "<script>alert(1)</script>" not in output
+
+
+def _specificity(selector):
+    """Return the (ids, classes) specificity of a simple CSS selector.
+
+    Args:
+        selector (str): Selector made of IDs, classes and type names, possibly
+            in :is() or :not().
+
+    Returns:
+        (tuple): Number of ID and of class selectors; :is() counts as its most
+            specific argument.
+    """
+    match = re.fullmatch(r":is\((.*)\)", selector.strip())
+    if match:
+        return max(_specificity(argument) for argument in match.group(1).split(","))
+    selector = selector.replace(":not(", " ").replace(")", " ")
+    return selector.count("#"), selector.count(".")
+
+
+def test_cell_styles_outrank_lab_selectors():
+    """Test that generated rules win over multi-class JupyterLab rules on the same wrapper."""
+    cell = new_code_cell("x = 1")
+    cell.outputs = [nbf.v4.new_output("stream", name="stdout", text="1\n")]
+    cell.metadata["output-style"] = "margin-top: 0"
+    nb = new_notebook(cells=[cell])
+
+    output, resources = StyledHTMLExporter().from_notebook_node(nb)
+
+    lab_selector = ".jp-Cell:not(.jp-mod-noOutputs) .jp-Cell-outputWrapper"
+    assert lab_selector in output
+    rule = _selector(resources, "cell-0-output")
+    assert f"{rule} {{ margin-top: 0 }}" in output
+    assert _specificity(rule) > _specificity(lab_selector)
+    wrapper = _parse_html(output).find(class_="jp-Cell-outputWrapper")
+    assert resources["style_classes"]["cell-0-output"] in wrapper["class"]
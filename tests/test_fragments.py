@@ -0,0 +1,112 @@
+"""
+Tests for incremental re-export with the cell fragment cache.
+"""
+
+import re
+
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook, new_output
+
+from jupyter_export_html_style import StyledHTMLExporter
+from jupyter_export_html_style.fragments import (
+    FragmentStore,
+    cell_dom_id,
+    cell_fragment_key,
+    fingerprint,
+    get_fragment_cache,
+)
+from jupyter_export_html_style.images import LRUCache
+
+
+def _notebook():
+    """Create a notebook alternating styled markdown cells and code cells.
+
+    Returns:
+        (NotebookNode): The notebook.
+    """
+    cells = []
+    for i in range(3):
+        cells.append(new_markdown_cell(f"# Heading {i}", metadata={"style": "color: red"}))
+        cells.append(
+            new_code_cell(
+                f"print({i})", outputs=[new_output("stream", name="stdout", text=f"{i}\n")]
+            )
+        )
+    return new_notebook(cells=cells)
+
+
+def test_cell_dom_id_uses_nbformat_id_with_index_fallback():
+    """Test that DOM ids come from nbformat cell ids when the cell has one."""
+    cell = new_code_cell("1", id="abc")
+    assert cell_dom_id(cell, 5) == "cell-abc"
+    del cell["id"]
+    assert cell_dom_id(cell, 5) == "cell-5"
+
+
+def test_cell_fragment_key_depends_on_cell_and_context():
+    """Test that fragment keys change with the cell content and the context."""
+    cell = new_code_cell("1", id="abc")
+    context = fingerprint({"a": 1})
+    key = cell_fragment_key(cell, context)
+
+    assert cell_fragment_key(new_code_cell("1", id="abc"), context) == key
+    assert cell_fragment_key(new_code_cell("2", id="abc"), context) != key
+    assert cell_fragment_key(cell, fingerprint({"a": 2})) != key
+
+
+def test_fragment_store_counts_hits_and_misses():
+    """Test that the store serves stored fragments and counts lookups."""
+    store = FragmentStore(LRUCache(maxsize=1024))
+    assert store.lookup("k") is None
+    assert store.store("<p>x</p>", "k") == "<p>x</p>"
+    assert store.lookup("k") == "<p>x</p>"
+    assert store.report() == {"hits": 1, "misses": 1}
+
+
+def test_incremental_export_matches_full_render():
+    """Test that incremental mode only changes the cell ids of the document."""
+    nb = _notebook()
+    output, _ = StyledHTMLExporter().from_notebook_node(nb)
+    incremental, resources = StyledHTMLExporter(incremental=True).from_notebook_node(nb)
+
+    ids = {f"cell-{cell.id}": f"cell-{i}" for i, cell in enumerate(nb.cells)}
+    pattern = "|".join(ids)
+    normalized = re.sub(rf'id="({pattern})\b', lambda m: f'id="{ids[m.group(1)]}', incremental)
+    assert normalized == output
+    assert f'id="cell-{nb.cells[1].id}-input"' in incremental
+    assert resources["fragment_cache"]["misses"] + resources["fragment_cache"]["hits"] == 6
+    assert "fragment_cache" not in StyledHTMLExporter().from_notebook_node(nb)[1]
+
+
+def test_incremental_export_renders_only_changed_cells():
+    """Test that editing or inserting a cell re-renders only that cell."""
+    get_fragment_cache().clear()
+    exporter = StyledHTMLExporter(incremental=True)
+    nb = _notebook()
+
+    first, resources = exporter.from_notebook_node(nb)
+    assert resources["fragment_cache"] == {"hits": 0, "misses": 6}
+
+    second, resources = exporter.from_notebook_node(nb)
+    assert resources["fragment_cache"] == {"hits": 6, "misses": 0}
+    assert second == first
+
+    nb.cells.insert(1, new_markdown_cell("Inserted"))
+    nb.cells[4].source = "print('changed')"
+    output, resources = exporter.from_notebook_node(nb)
+    assert resources["fragment_cache"] == {"hits": 5, "misses": 2}
+    assert "Inserted" in output
+    assert "changed" in output
+
+
+def test_incremental_export_invalidates_on_configuration_change():
+    """Test that fragments are not shared between different configurations."""
+    get_fragment_cache().clear()
+    nb = _notebook()
+    StyledHTMLExporter(incremental=True).from_notebook_node(nb)
+
+    output, resources = StyledHTMLExporter(
+        incremental=True, exclude_output=True
+    ).from_notebook_node(nb)
+
+    assert resources["fragment_cache"] == {"hits": 0, "misses": 6}
+    assert "<pre>0\n</pre>" not in output
@@ -0,0 +1,161 @@
+"""
+Tests for the optional image optimization stage.
+"""
+
+import base64
+import io
+import os
+import tempfile
+from importlib import util as importlib_util
+
+import pytest
+from nbformat.v4 import new_markdown_cell, new_notebook
+
+from jupyter_export_html_style import StyledHTMLExporter
+from jupyter_export_html_style.images import ImageEmbedder
+
+# Check if Pillow is available
+PILLOW_AVAILABLE = importlib_util.find_spec("PIL") is not None
+
+pytestmark = pytest.mark.skipif(not PILLOW_AVAILABLE, reason="Pillow not installed")
+
+
+def _make_image(width, height, fmt="PNG"):
+    """Create an image with some detail so that it does not compress to nothing.
+
+    Args:
+        width (int): Pixel width.
+        height (int): Pixel height.
+
+    Keyword Parameters:
+        fmt (str): Pillow format name. Defaults to "PNG".
+
+    Returns:
+        (bytes): The encoded image.
+    """
+    from PIL import Image
+
+    image = Image.new("RGB", (width, height))
+    image.putdata(
+        [((x * 7) % 256, (y * 13) % 256, (x * y) % 256) for y in range(height) for x in range(width)]
+    )
+    buffer = io.BytesIO()
+    options = {"compress_level": 0} if fmt == "PNG" else {}
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _size(data):
+    """Return the pixel size of an encoded image."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size
+
+
+def test_optimizer_downscales_and_reports_savings():
+    """Test that oversized images are downscaled and the savings are reported."""
+    from jupyter_export_html_style.image_optimizer import ImageOptimizer
+
+    optimizer = ImageOptimizer(max_width=50, max_height=0)
+    original = _make_image(200, 100)
+
+    result = optimizer.optimize("image/png", original)
+
+    assert result.mime_type == "image/png"
+    assert _size(result.data) == (50, 25)
+    report = optimizer.report()
+    assert report["images"] == 1
+    assert report["optimized"] == 1
+    assert report["bytes_before"] == len(original)
+    assert report["bytes_saved"] == len(original) - len(result.data) > 0
+
+
+def test_optimizer_keeps_original_when_recompression_does_not_help():
+    """Test that small, already compact images and unknown types pass through."""
+    from jupyter_export_html_style.image_optimizer import ImageOptimizer
+
+    optimizer = ImageOptimizer()
+    svg = b"<svg xmlns='http://www.w3.org/2000/svg'/>"
+    tiny = bytes.fromhex(
+        "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+        "0000000d49444154789c63f8cfc03f00050201055fc8f1d20000000049454e44ae426082"
+    )
+
+    assert optimizer.optimize("image/svg+xml", svg).data is svg
+    assert optimizer.optimize("image/png", tiny).data == tiny
+    assert optimizer.report()["optimized"] == 0
+
+
+def test_optimizer_webp_and_srcset_variants():
+    """Test WebP conversion and generation of narrower srcset renditions."""
+    from jupyter_export_html_style.image_optimizer import ImageOptimizer
+
+    optimizer = ImageOptimizer(max_width=100, convert_to_webp=True, srcset_widths=[25, 50, 400])
+
+    result = optimizer.optimize("image/jpeg", _make_image(200, 100, "JPEG"))
+
+    assert result.mime_type == "image/webp"
+    assert result.width == 100
+    assert [(width, mime) for width, mime, _ in result.variants] == [
+        (25, "image/webp"),
+        (50, "image/webp"),
+    ]
+
+
+def test_optimizer_results_are_cached_by_content():
+    """Test that optimizing the same content twice hits the process-wide cache."""
+    from jupyter_export_html_style.image_optimizer import (
+        ImageOptimizer,
+        get_optimized_image_cache,
+    )
+
+    cache = get_optimized_image_cache()
+    cache.clear()
+    data = _make_image(120, 60)
+
+    first = ImageOptimizer(max_width=60).optimize("image/png", data)
+    second = ImageOptimizer(max_width=60).optimize("image/png", bytes(data))
+
+    assert first is second
+    assert cache.cache_info().hits == 1
+
+
+def test_embedder_adds_srcset_and_optimizes_output_images():
+    """Test that the embedder optimizes data URIs and writes srcset attributes."""
+    from jupyter_export_html_style.image_optimizer import ImageOptimizer
+
+    data = _make_image(200, 100)
+    b64 = base64.b64encode(data).decode("ascii")
+    embedder = ImageEmbedder(
+        external_dir="files",
+        outputs={},
+        optimizer=ImageOptimizer(max_width=100, srcset_widths=[50]),
+    )
+
+    output = embedder.embed(f'<img alt="plot" src="data:image/png;base64,{b64}">')
+
+    assert b64 not in output
+    assert len(embedder.outputs) == 2
+    full, half = sorted(embedder.outputs, key=lambda name: -len(embedder.outputs[name]))
+    assert f'src="{full}"' in output
+    assert f'srcset="{half} 50w, {full} 100w"' in output
+
+
+def test_exporter_optimize_images_reports_in_resources():
+    """Test that StyledHTMLExporter records the optimization report in resources."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "shot.png"), "wb") as f:
+            f.write(_make_image(300, 300))
+        nb = new_notebook(cells=[new_markdown_cell("![screenshot](shot.png)")])
+        exporter = StyledHTMLExporter(optimize_images=True)
+        exporter.config.ImageOptimizer.max_width = 100
+
+        output, resources = exporter.from_notebook_node(
+            nb, resources={"metadata": {"path": tmpdir}}
+        )
+
+    report = resources["image_optimization"]
+    assert report["images"] == 1
+    assert report["bytes_saved"] > 0
+    assert 'src="data:image/png;base64,' in output
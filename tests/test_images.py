@@ -0,0 +1,362 @@
+"""
+Tests for the streaming image embedding in jupyter_export_html_style.images.
+"""
+
+import base64
+import os
+import tempfile
+
+from nbformat.v4 import new_markdown_cell, new_notebook
+
+from jupyter_export_html_style import StyledHTMLExporter, StyledSlidesExporter
+from jupyter_export_html_style.images import (
+    ImageEmbedder,
+    ImageSrcRewriter,
+    LRUCache,
+    get_image_cache,
+)
+
+# 1x1 red pixel PNG
+TEST_IMAGE_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c63f8cfc03f00050201055fc8f1d20000000049454e44ae426082"
+)
+
+
+def _rewrite(html, rewrite_src, chunk_size=None):
+    """Run an ImageSrcRewriter over html, optionally feeding it in fixed size chunks.
+
+    Args:
+        html (str): The HTML to rewrite.
+        rewrite_src (callable): The src rewriting callback.
+
+    Keyword Parameters:
+        chunk_size (int or None): Size of the chunks to feed. None feeds everything at once.
+
+    Returns:
+        (str): The rewritten HTML.
+    """
+    rewriter = ImageSrcRewriter(rewrite_src)
+    if chunk_size is None:
+        return rewriter.feed(html) + rewriter.close()
+    parts = [rewriter.feed(html[i : i + chunk_size]) for i in range(0, len(html), chunk_size)]
+    return "".join(parts) + rewriter.close()
+
+
+def test_rewriter_only_changes_img_src():
+    """Test that everything except img src values is copied through byte for byte."""
+    html = (
+        "<!DOCTYPE html>\n<html><head><meta charset='utf-8'></head>\n"
+        "<body><p class=x>Text &amp; more<br></p>\n"
+        "<IMG alt='a > b' SRC='pic.png' width=10/>\n"
+        "<img src=other.png></body></html>"
+    )
+    output = _rewrite(html, lambda src: "new-" + src)
+
+    assert output == (
+        "<!DOCTYPE html>\n<html><head><meta charset='utf-8'></head>\n"
+        "<body><p class=x>Text &amp; more<br></p>\n"
+        "<IMG alt='a > b' SRC=\"new-pic.png\" width=10/>\n"
+        '<img src="new-other.png"></body></html>'
+    )
+
+
+def test_rewriter_skips_scripts_styles_and_comments():
+    """Test that img markup inside raw text elements and comments is not rewritten."""
+    html = (
+        '<script>var s = "<img src=\'a.png\'>";</script>'
+        "<style>/* <img src='b.png'> */</style>"
+        "<!-- <img src='c.png'> -->"
+        "<img src='d.png'>"
+    )
+    seen = []
+
+    def rewrite(src):
+        seen.append(src)
+        return None
+
+    output = _rewrite(html, rewrite)
+
+    assert output == html
+    assert seen == ["d.png"]
+
+
+def test_rewriter_handles_arbitrary_chunk_boundaries():
+    """Test that feeding the document in tiny chunks gives the same result."""
+    html = (
+        "<html><head><script>if (a < b) { x = '<img src=\"no.png\">'; }</script></head>"
+        "<body><!-- comment --><p>Hi</p><img alt=\"x\" src=\"yes.png\"><img src=\"data:x\">"
+        "<textarea><img src='no.png'></textarea></body></html>"
+    )
+
+    def rewrite(src):
+        return None if src.startswith("data:") else "r:" + src
+
+    expected = _rewrite(html, rewrite)
+    assert 'src="r:yes.png"' in expected
+    assert "r:no.png" not in expected
+    for chunk_size in (1, 2, 3, 7, 64):
+        assert _rewrite(html, rewrite, chunk_size) == expected
+
+
+def test_rewriter_decodes_and_escapes_attribute_values():
+    """Test that src values are entity-decoded before rewriting and escaped afterwards."""
+    output = _rewrite('<img src="a&amp;b.png">', lambda src: src + "?q=1&r=2")
+
+    assert output == '<img src="a&amp;b.png?q=1&amp;r=2">'
+
+
+def test_rewriter_flushes_incomplete_tokens_on_close():
+    """Test that an unterminated token is emitted unchanged when the stream ends."""
+    html = "<p>text</p><script>never closed <img src='a.png'>"
+
+    assert _rewrite(html, lambda src: "changed", chunk_size=5) == html
+
+
+def test_embedder_embeds_files_and_attachments():
+    """Test that local files and attachments are replaced with data URIs."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "pic.png"), "wb") as f:
+            f.write(TEST_IMAGE_PNG)
+        b64 = base64.b64encode(TEST_IMAGE_PNG).decode("ascii")
+        embedder = ImageEmbedder({"att.png": {"image/png": b64}}, base_path=tmpdir)
+
+        output = embedder.embed(
+            '<img src="pic.png"><img src="attachment:att.png">'
+            '<img src="missing.png"><img src="https://example.com/x.png">'
+        )
+
+    assert output.count(f'src="data:image/png;base64,{b64}"') == 2
+    assert 'src="missing.png"' in output
+    assert 'src="https://example.com/x.png"' in output
+
+
+def test_embedder_leaves_served_files_as_references():
+    """Test that files inside served_dir stay references while others are embedded."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        served = os.path.join(tmpdir, "notebooks")
+        os.makedirs(served)
+        for path in (os.path.join(served, "pic.png"), os.path.join(tmpdir, "shared.png")):
+            with open(path, "wb") as f:
+                f.write(TEST_IMAGE_PNG)
+        b64 = base64.b64encode(TEST_IMAGE_PNG).decode("ascii")
+        html = '<img src="pic.png"><img src="../shared.png"><img src="attachment:att.png">'
+        attachments = {"att.png": {"image/png": b64}}
+
+        output = ImageEmbedder(attachments, base_path=served, served_dir=served).embed(html)
+        deduplicated = ImageEmbedder(
+            attachments, base_path=served, served_dir=served, deduplicate=True
+        ).embed(html)
+
+    assert 'src="pic.png"' in output
+    assert output.count(f'src="data:image/png;base64,{b64}"') == 2
+    assert 'src="pic.png"' not in deduplicated
+
+
+def test_embedder_fast_path_returns_input_unchanged():
+    """Test that documents without embeddable images are returned as the same object."""
+    html = '<p>Hi</p><img src="data:image/png;base64,AAAA"><script src="x.js"></script>'
+
+    assert ImageEmbedder().embed(html) is html
+
+
+def test_embedder_iter_embed_matches_embed():
+    """Test that the streaming interface produces the same output as embed()."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "pic.png"), "wb") as f:
+            f.write(TEST_IMAGE_PNG)
+        embedder = ImageEmbedder(base_path=tmpdir)
+        html = "<html><body>" + '<p><img src="pic.png"></p>' * 20 + "</body></html>"
+        chunks = [html[i : i + 11] for i in range(0, len(html), 11)]
+
+        assert "".join(embedder.iter_embed(chunks)) == embedder.embed(html)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the cache stays within its size bound and counts evictions."""
+    cache = LRUCache(maxsize=10)
+    cache.put("a", "x" * 4)
+    cache.put("b", "x" * 4)
+    assert cache.get("a") is not None
+    cache.put("c", "x" * 4)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.cache_info() == (1, 0, 1, 8, 10)
+
+    cache.put("huge", "x" * 11)
+    assert "huge" not in cache
+
+
+def test_embedder_reuses_cached_data_uri_until_file_changes():
+    """Test that files are encoded once and re-encoded after they change."""
+    cache = LRUCache(maxsize=1024 * 1024)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        img_path = os.path.join(tmpdir, "pic.png")
+        with open(img_path, "wb") as f:
+            f.write(TEST_IMAGE_PNG)
+        embedder = ImageEmbedder(base_path=tmpdir, cache=cache)
+
+        first = embedder.resolve("pic.png")
+        second = embedder.resolve("pic.png")
+        assert first == second
+        assert cache.cache_info().hits == 1
+        assert cache.cache_info().misses == 1
+
+        with open(img_path, "wb") as f:
+            f.write(TEST_IMAGE_PNG + b"\0")
+        os.utime(img_path, ns=(0, 0))
+        third = embedder.resolve("pic.png")
+
+    assert third != first
+    assert cache.cache_info().misses == 2
+
+
+def test_exporters_share_the_process_wide_image_cache():
+    """Test that styled exporters share one image cache and honour image_cache_size."""
+    cache = get_image_cache()
+    cache.clear()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "logo.png"), "wb") as f:
+            f.write(TEST_IMAGE_PNG)
+        nb = new_notebook(cells=[new_markdown_cell('<img src="logo.png">')])
+        resources = {"metadata": {"path": tmpdir}}
+
+        StyledHTMLExporter().from_notebook_node(nb, resources=dict(resources))
+        StyledSlidesExporter().from_notebook_node(nb, resources=dict(resources))
+        assert cache.cache_info().misses == 1
+        assert cache.cache_info().hits == 1
+
+        cache.clear()
+        output, _ = StyledHTMLExporter(image_cache_size=0).from_notebook_node(
+            nb, resources=dict(resources)
+        )
+
+    assert "data:image/png;base64," in output
+    assert cache.cache_info() == (0, 0, 0, 0, 64 * 1024 * 1024)
+
+
+def test_embedder_deduplicates_repeated_images():
+    """Test that a repeated image payload is stored once and referenced elsewhere."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "logo.png"), "wb") as f:
+            f.write(TEST_IMAGE_PNG)
+        b64 = base64.b64encode(TEST_IMAGE_PNG).decode("ascii")
+        embedder = ImageEmbedder(
+            {"logo.png": {"image/png": b64}}, base_path=tmpdir, deduplicate=True
+        )
+
+        output = embedder.embed(
+            "<html><body>"
+            '<img src="logo.png"><img src="attachment:logo.png" />'
+            f'<img src="data:image/png;base64,{b64}">'
+            "</body></html>"
+        )
+
+    assert output.count(b64) == 1
+    assert 'data-styled-image-id="image-0"' in output
+    assert output.count('data-styled-image-ref="image-0"') == 2
+    assert '<img src="data:image/gif;base64,' in output
+    assert output.index("<script>") < output.index("</body>")
+    # Self-closing tags keep their trailing slash
+    assert 'data-styled-image-ref="image-0" />' in output
+
+
+def test_embedder_deduplication_without_repeats_adds_no_script():
+    """Test that no bootstrap script is added when every image is distinct."""
+    embedder = ImageEmbedder(deduplicate=True, embed=False)
+
+    output = embedder.embed(
+        '<body><img src="data:image/png;base64,AAAA"><img src="data:image/png;base64,BBBB">'
+        '<img src="plain.png"></body>'
+    )
+
+    assert "<script>" not in output
+    assert 'src="plain.png"' in output
+    assert output.count("data-styled-image-id") == 2
+
+
+def test_exporter_deduplicate_images_option():
+    """Test that StyledHTMLExporter stores a repeated image once when asked to."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "header.png"), "wb") as f:
+            f.write(TEST_IMAGE_PNG)
+        cells = [new_markdown_cell("![header](header.png)") for _ in range(5)]
+        nb = new_notebook(cells=cells)
+        b64 = base64.b64encode(TEST_IMAGE_PNG).decode("ascii")
+
+        plain, _ = StyledHTMLExporter().from_notebook_node(
+            nb, resources={"metadata": {"path": tmpdir}}
+        )
+        deduplicated, _ = StyledHTMLExporter(deduplicate_images=True).from_notebook_node(
+            nb, resources={"metadata": {"path": tmpdir}}
+        )
+
+    assert plain.count(b64) == 5
+    assert deduplicated.count(b64) == 1
+    assert deduplicated.count('data-styled-image-ref="image-0"') == 4
+
+
+def test_exporter_embeds_every_copy_without_javascript():
+    """Test that documents rendered without scripts do not rely on the restoring script."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "header.png"), "wb") as f:
+            f.write(TEST_IMAGE_PNG)
+        nb = new_notebook(cells=[new_markdown_cell("![header](header.png)") for _ in range(3)])
+        b64 = base64.b64encode(TEST_IMAGE_PNG).decode("ascii")
+
+        output, _ = StyledHTMLExporter(deduplicate_images=True).from_notebook_node(
+            nb, resources={"metadata": {"path": tmpdir}, "javascript": False}
+        )
+
+    assert output.count(b64) == 3
+    assert "data-styled-image-ref" not in output
+
+
+def test_embedder_externalizes_images_by_content_hash():
+    """Test that large images go to the sidecar directory and small ones stay inline."""
+    big = TEST_IMAGE_PNG + b"\0" * 100
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "big.png"), "wb") as f:
+            f.write(big)
+        with open(os.path.join(tmpdir, "small.png"), "wb") as f:
+            f.write(TEST_IMAGE_PNG)
+        big_b64 = base64.b64encode(big).decode("ascii")
+        outputs = {}
+        embedder = ImageEmbedder(
+            {"a.png": {"image/png": big_b64}},
+            base_path=tmpdir,
+            external_dir="my notebook_files",
+            external_threshold=len(TEST_IMAGE_PNG) + 1,
+            outputs=outputs,
+        )
+
+        output = embedder.embed(
+            '<img src="big.png"><img src="attachment:a.png">'
+            f'<img src="data:image/png;base64,{big_b64}"><img src="small.png">'
+        )
+
+    assert len(outputs) == 1
+    ((filename, payload),) = outputs.items()
+    assert filename.startswith("my notebook_files/") and filename.endswith(".png")
+    assert payload == big
+    assert output.count('src="my%20notebook_files/') == 3
+    assert "data:image/png;base64," + base64.b64encode(TEST_IMAGE_PNG).decode("ascii") in output
+
+
+def test_exporter_external_images_reported_in_outputs():
+    """Test that StyledHTMLExporter lists externalized images in resources["outputs"]."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "pic.png"), "wb") as f:
+            f.write(TEST_IMAGE_PNG)
+        nb = new_notebook(cells=[new_markdown_cell("![pic](pic.png)\n\n![again](pic.png)")])
+
+        output, resources = StyledHTMLExporter(external_images=True).from_notebook_node(
+            nb, resources={"metadata": {"path": tmpdir}, "unique_key": "report"}
+        )
+
+    assert list(resources["outputs"].values()) == [TEST_IMAGE_PNG]
+    (filename,) = resources["outputs"]
+    assert filename.startswith("report_files/")
+    assert output.count(f'src="{filename}"') == 2
+    assert 'src="data:image/png' not in output
@@ -7,6 +7,19 @@ from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook
 from jupyter_export_html_style import StyledHTMLExporter, StylePreprocessor
 
 
+def _rule(class_name, declarations):
+    """Return the CSS rule generated for a style class.
+
+    Args:
+        class_name (str): Generated class, e.g. "styled-1a2b3c4d".
+        declarations (str): The rule's declarations.
+
+    Returns:
+        (str): The rule as written to the style block.
+    """
+    return f":is(#{class_name}, .{class_name}) {{ {declarations} }}"
+
+
 def test_full_export_pipeline():
     """Test the complete export pipeline from notebook to HTML."""
     # Create a notebook with styled cells
@@ -118,10 +131,10 @@ def test_integration_input_output_styles():
     output, resources = exporter.from_notebook_node(nb)
 
     # Verify styles are present in output
-    assert "#cell-0-input" in output
-    assert "background-color: #f9f9f9" in output
-    assert "#cell-1-output" in output
-    assert "border: 1px dashed #999" in output
+    input_class = resources["style_classes"]["cell-0-input"]
+    output_class = resources["style_classes"]["cell-1-output"]
+    assert _rule(input_class, "background-color: #f9f9f9") in output
+    assert _rule(output_class, "border: 1px dashed #999") in output
 
 
 def test_integration_notebook_level_styles():
@@ -161,12 +174,10 @@ def test_integration_all_style_types():
     output, resources = exporter.from_notebook_node(nb)
 
     # Verify all styles are present
-    assert "#cell-0" in output
-    assert "margin: 10px" in output
-    assert "#cell-0-input" in output
-    assert "color: #333" in output
-    assert "#cell-0-output" in output
-    assert "font-family: monospace" in output
+    style_classes = resources["style_classes"]
+    assert _rule(style_classes["cell-0"], "margin: 10px") in output
+    assert _rule(style_classes["cell-0-input"], "color: #333") in output
+    assert _rule(style_classes["cell-0-output"], "font-family: monospace") in output
     assert "body { max-width: 1200px; }" in output
     assert '<link rel="stylesheet" href="style1.css">' in output
     assert '<link rel="stylesheet" href="style2.css">' in output
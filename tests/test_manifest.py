@@ -0,0 +1,166 @@
+"""
+Tests for the export manifest and incremental batch exports.
+"""
+
+import os
+import tempfile
+
+import nbformat
+from nbformat.v4 import new_markdown_cell, new_notebook
+
+from jupyter_export_html_style import StyledHTMLExporter
+from jupyter_export_html_style.batch import export_notebooks, main
+from jupyter_export_html_style.manifest import (
+    MANIFEST_NAME,
+    ExportManifest,
+    build_entry,
+    file_state,
+)
+
+_PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+def _write_notebook(directory, name, text):
+    """Write a notebook with one markdown cell."""
+    path = os.path.join(directory, name)
+    nbformat.write(new_notebook(cells=[new_markdown_cell(text)]), path)
+    return path
+
+
+def _export(paths, output_dir, **kw):
+    """Export notebooks in this process, recording them in the output directory's manifest."""
+    manifest = ExportManifest(os.path.join(output_dir, MANIFEST_NAME))
+    results = list(export_notebooks(paths, output_dir=output_dir, jobs=0, manifest=manifest, **kw))
+    pruned = manifest.prune()
+    manifest.save()
+    return results, pruned
+
+
+def test_file_state_reuses_hash_of_unchanged_file():
+    """Test that a file is only rehashed when its size or modification time changes."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "style.css")
+        with open(path, "w") as f:
+            f.write("h1 { color: red }")
+        state = file_state(path)
+        stale = {**state, "sha256": "reused"}
+
+        assert file_state(path, stale)["sha256"] == "reused"
+        os.utime(path, ns=(0, 0))
+        assert file_state(path, stale)["sha256"] == state["sha256"]
+        assert file_state(os.path.join(tmpdir, "missing.css")) is None
+
+
+def test_entry_records_local_images():
+    """Test that the images a notebook references are recorded with their hashes."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "logo.png"), "wb") as f:
+            f.write(_PIXEL)
+        path = _write_notebook(tmpdir, "a.ipynb", "![logo](logo.png)")
+        entry = build_entry(StyledHTMLExporter(), path, tmpdir)
+
+    assert list(entry["dependencies"]) == ["logo.png"]
+    assert entry["notebook"]["sha256"]
+    assert entry["config"]
+
+
+def test_batch_skips_unchanged_notebooks_and_prunes_deleted():
+    """Test that a second run only re-exports changed notebooks and removes stale outputs."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_dir = os.path.join(tmpdir, "out")
+        with open(os.path.join(tmpdir, "logo.png"), "wb") as f:
+            f.write(_PIXEL)
+        paths = [
+            _write_notebook(tmpdir, "a.ipynb", "# A"),
+            _write_notebook(tmpdir, "b.ipynb", "# B ![logo](logo.png)"),
+            _write_notebook(tmpdir, "c.ipynb", "# C"),
+        ]
+        results, _ = _export(paths, output_dir)
+        assert [result.skipped for result in results] == [False, False, False]
+
+        results, _ = _export(paths, output_dir)
+        assert [result.skipped for result in results] == [True, True, True]
+        assert results[0].output == os.path.join(output_dir, "a.html")
+
+        # A changed notebook, a changed image and a deleted output are re-exported.
+        _write_notebook(tmpdir, "a.ipynb", "# A, revised")
+        with open(os.path.join(tmpdir, "logo.png"), "ab") as f:
+            f.write(b"\0")
+        os.unlink(os.path.join(output_dir, "c.html"))
+        results, _ = _export(paths, output_dir)
+        assert [result.skipped for result in results] == [False, False, False]
+        with open(os.path.join(output_dir, "a.html"), encoding="utf-8") as f:
+            assert "A, revised" in f.read()
+
+        # Forcing re-exports everything; deleting a notebook prunes its output.
+        results, _ = _export(paths[:2], output_dir, force=True)
+        assert [result.skipped for result in results] == [False, False]
+        os.unlink(paths[2])
+        results, pruned = _export(paths[:2], output_dir)
+        assert [result.skipped for result in results] == [True, True]
+        assert pruned == [paths[2]]
+        assert sorted(os.listdir(output_dir)) == [MANIFEST_NAME, "a.html", "b.html"]
+
+
+def test_batch_keeps_notebooks_of_the_same_name_apart():
+    """Test that same-named notebooks in different folders get separate exports."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_dir = os.path.join(tmpdir, "out")
+        paths = []
+        for folder in ("a", "b"):
+            os.makedirs(os.path.join(tmpdir, folder))
+            paths.append(_write_notebook(os.path.join(tmpdir, folder), "index.ipynb", f"# {folder}"))
+        results, _ = _export(paths, output_dir)
+
+        outputs = [result.output for result in results]
+        assert outputs == [os.path.join(output_dir, folder, "index.html") for folder in "ab"]
+        for output, folder in zip(outputs, "ab"):
+            with open(output, encoding="utf-8") as f:
+                assert f">{folder}<" in f.read()
+
+        results, _ = _export(paths, output_dir)
+        assert [result.skipped for result in results] == [True, True]
+
+
+def test_batch_reexports_when_the_output_layout_changes():
+    """Test that an export recorded in another directory is not reported current."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_dir = os.path.join(tmpdir, "out")
+        os.makedirs(os.path.join(tmpdir, "a"))
+        first = _write_notebook(os.path.join(tmpdir, "a"), "index.ipynb", "# A")
+        second = _write_notebook(tmpdir, "other.ipynb", "# Other")
+        _export([first], output_dir)
+        results, _ = _export([first, second], output_dir)
+
+    assert results[0].output == os.path.join(output_dir, "a", "index.html")
+    assert not results[0].skipped
+
+
+def test_batch_changed_configuration_reexports():
+    """Test that changing the exporter configuration invalidates the manifest."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_dir = os.path.join(tmpdir, "out")
+        paths = [_write_notebook(tmpdir, "a.ipynb", "# A")]
+        _export(paths, output_dir)
+        config = {"StyledHTMLExporter": {"exclude_input_prompt": True}}
+        results, _ = _export(paths, output_dir, config=config)
+
+    assert not results[0].skipped
+
+
+def test_main_reports_skipped_notebooks(capsys):
+    """Test that the command keeps a manifest in the output directory."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_dir = os.path.join(tmpdir, "out")
+        _write_notebook(tmpdir, "a.ipynb", "# A")
+        assert main([tmpdir, "--jobs", "0", "--output-dir", output_dir]) == 0
+        assert os.path.exists(os.path.join(output_dir, MANIFEST_NAME))
+        capsys.readouterr()
+        assert main([tmpdir, "--jobs", "0", "--output-dir", output_dir]) == 0
+
+    captured = capsys.readouterr()
+    assert "skip" in captured.out
+    assert "1 of 1 notebooks exported, 0 failed, 1 up to date, 0 pruned" in captured.out
@@ -0,0 +1,264 @@
+"""
+Tests for merging and optimizing PDFs and the PDF modes of StyledWebPDFExporter.
+"""
+
+import importlib.util
+import io
+import re
+from unittest.mock import patch
+
+import pytest
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook
+
+from jupyter_export_html_style import StyledWebPDFExporter
+from jupyter_export_html_style.browser import BrowserPool
+from jupyter_export_html_style.image_optimizer import PILLOW_INSTALLED
+from jupyter_export_html_style.pdf import (
+    PYPDF_INSTALLED,
+    PDFOptimizer,
+    heading_levels,
+    merge_pdfs,
+)
+
+pytestmark = pytest.mark.skipif(not PYPDF_INSTALLED, reason="pypdf not installed")
+
+
+def _make_pdf(headings):
+    """Create a PDF with one page per heading and a nested outline.
+
+    Args:
+        headings (list): ``(depth, title)`` pairs; depth 0 is a top-level entry.
+
+    Returns:
+        (bytes): The PDF.
+    """
+    import pypdf
+
+    writer = pypdf.PdfWriter()
+    parents = []
+    for page, (depth, title) in enumerate(headings):
+        writer.add_blank_page(width=72, height=72)
+        del parents[depth:]
+        parent = parents[-1] if parents else None
+        parents.append(writer.add_outline_item(title, page, parent=parent))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def _outline(data):
+    """Return the outline of a PDF as nested ``(title, page, children)`` tuples."""
+    import pypdf
+
+    reader = pypdf.PdfReader(io.BytesIO(data))
+
+    def convert(items):
+        entries = []
+        for item in items:
+            if isinstance(item, list):
+                title, page, _ = entries[-1]
+                entries[-1] = (title, page, convert(item))
+            else:
+                entries.append((item.title, reader.get_destination_page_number(item), []))
+        return entries
+
+    return convert(reader.outline)
+
+
+def test_heading_levels_reads_the_body_only():
+    """Test that heading levels are read from the document body in order."""
+    html = "<head><style>h1 { color: red }</style></head><body><h2 id=x>A</h2><H4>B</H4></body>"
+    assert heading_levels(html) == [2, 4]
+
+
+def test_merge_pdfs_continues_the_outline_across_documents():
+    """Test that sections continuing into the next document stay in one tree."""
+    first = _make_pdf([(0, "Intro"), (1, "Setup")])
+    second = _make_pdf([(0, "Details"), (0, "Results")])
+
+    merged = merge_pdfs([first, second], heading_levels=[[1, 2], [3, 1]])
+    by_depth = merge_pdfs([first, second])
+
+    assert _outline(merged) == [
+        ("Intro", 0, [("Setup", 1, [("Details", 2, [])])]),
+        ("Results", 3, []),
+    ]
+    assert _outline(by_depth) == [
+        ("Intro", 0, [("Setup", 1, [])]),
+        ("Details", 2, []),
+        ("Results", 3, []),
+    ]
+
+
+class FakePage:
+    """A page printing one PDF page per heading of the routed document."""
+
+    async def emulate_media(self, media):
+        pass
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+    async def goto(self, url, wait_until=None):
+        page = self
+
+        class Route:
+            request = self
+
+            async def fulfill(self, body=None, **kw):
+                page.html = body.decode("utf-8")
+
+        self.url = url
+        await self.handler(Route())
+
+    async def evaluate(self, script):
+        return "signal"
+
+    async def pdf(self, **params):
+        assert params["outline"] is True
+        titles = re.findall(r"<h[1-6][^>]*>([^<]*)", self.html)
+        return _make_pdf([(0, title) for title in titles])
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    """A browser whose context hands out fake pages."""
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self):
+        return self
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    """Stands in for async_playwright() and the started Playwright instance."""
+
+    def __init__(self):
+        self.chromium = self
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+    async def launch(self, **kw):
+        return FakeBrowser()
+
+
+def test_segmented_export_merges_segments_in_order():
+    """Test that a large notebook is printed in segments and merged in order."""
+    cells = []
+    for i in range(6):
+        cells.append(new_markdown_cell(f"## Section {i}"))
+        cells.append(new_code_cell("x = 1\n" * 50))
+    nb = new_notebook(cells=cells)
+    exporter = StyledWebPDFExporter(segment_size=2500)
+    pool = BrowserPool(pages_per_browser=2, playwright_factory=FakePlaywright)
+    exporter._get_browser_pool = lambda: pool
+
+    segments = exporter._segment_cells(nb)
+    try:
+        output, resources = exporter.from_notebook_node(nb)
+    finally:
+        pool.close()
+
+    assert 1 < len(segments) < len(cells)
+    assert sum(len(segment) for segment in segments) == len(cells)
+    assert resources["pdf_segments"] == len(segments)
+    assert resources["output_extension"] == ".pdf"
+    assert [title for title, _, _ in _outline(output)] == [f"Section {i}" for i in range(6)]
+    assert len(nb.cells) == len(cells)
+
+
+def _image_pdf(copies=1, resolution=72.0):
+    """Create a PDF with one page per copy of the same photo-sized image.
+
+    Args:
+        copies (int): Number of pages, each with its own copy of the image.
+        resolution (float): Pixels per inch of the image on its page.
+
+    Returns:
+        (bytes): The PDF.
+    """
+    import pypdf
+    from PIL import Image
+
+    image = io.BytesIO()
+    Image.new("RGB", (600, 400), (200, 10, 10)).save(image, "PDF", resolution=resolution)
+    writer = pypdf.PdfWriter()
+    for _ in range(copies):
+        writer.append(pypdf.PdfReader(io.BytesIO(image.getvalue())))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+@pytest.mark.skipif(not PILLOW_INSTALLED, reason="Pillow not installed")
+def test_pdf_optimizer_merges_duplicate_images():
+    """Test that repeated image copies are merged and the savings reported."""
+    import pypdf
+
+    data = _image_pdf(copies=3)
+    optimizer = PDFOptimizer()
+    optimized = optimizer.optimize(data)
+
+    reader = pypdf.PdfReader(io.BytesIO(optimized))
+    assert len(reader.pages) == 3
+    references = {page.images[0].indirect_reference.idnum for page in reader.pages}
+    assert len(references) == 1
+    report = optimizer.report()
+    assert report["bytes_before"] == len(data)
+    assert report["bytes_after"] == len(optimized) < len(data)
+    assert report["images_downsampled"] == 0
+
+
+@pytest.mark.skipif(not PILLOW_INSTALLED, reason="Pillow not installed")
+def test_pdf_optimizer_downsamples_images_above_the_dpi_threshold():
+    """Test that only images above the DPI threshold at page width are downsampled."""
+    import pypdf
+
+    optimizer = PDFOptimizer(downsample_dpi=150)
+    sharp = optimizer.optimize(_image_pdf(resolution=300))
+    normal = optimizer.optimize(_image_pdf(resolution=100))
+
+    assert pypdf.PdfReader(io.BytesIO(sharp)).pages[0].images[0].image.size == (300, 200)
+    assert pypdf.PdfReader(io.BytesIO(normal)).pages[0].images[0].image.size == (600, 400)
+    assert optimizer.report()["images_downsampled"] == 1
+    assert optimizer.report()["documents"] == 2
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("pikepdf") is not None, reason="pikepdf installed"
+)
+def test_pdf_optimizer_linearize_requires_pikepdf():
+    """Test that linearizing without pikepdf reports how to install it."""
+    with pytest.raises(RuntimeError, match="pikepdf is not installed"):
+        PDFOptimizer(linearize=True).optimize(_make_pdf([(0, "A")]))
+
+
+@pytest.mark.skipif(not PILLOW_INSTALLED, reason="Pillow not installed")
+def test_webpdf_optimize_pdf_reports_sizes():
+    """Test that the exporter optimizes printed PDFs and reports the sizes."""
+    data = _image_pdf(copies=2)
+    nb = new_notebook(cells=[new_markdown_cell("# Report")])
+    exporter = StyledWebPDFExporter(optimize_pdf=True)
+
+    with patch.object(exporter, "run_playwright", return_value=data):
+        output, resources = exporter.from_notebook_node(nb)
+    with patch.object(exporter, "run_playwright", return_value=data):
+        exporter.optimize_pdf = False
+        unoptimized, plain_resources = exporter.from_notebook_node(nb)
+
+    assert len(output) < len(data) == len(unoptimized)
+    assert resources["pdf_optimization"]["bytes_after"] == len(output)
+    assert "pdf_optimization" not in plain_resources
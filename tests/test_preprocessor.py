@@ -5,6 +5,7 @@ Tests for the StylePreprocessor class.
 from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook
 
 from jupyter_export_html_style import StylePreprocessor
+from jupyter_export_html_style.preprocessor import normalize_style
 
 
 def test_style_preprocessor_initialization():
@@ -281,3 +282,71 @@ def test_preprocess_cell_with_classes_and_styles():
     assert processed_cell.metadata["input_cell_class"] == "code-highlight"
     assert "input_cell_style" in processed_cell.metadata
     assert "cell-0-input" in resources["styles"]
+
+
+def test_normalize_style_dict_and_string():
+    """Test that dict and string styles normalize to the same declarations."""
+    assert normalize_style({"color": "red", "padding": "10px"}) == (
+        "color: red",
+        "padding: 10px",
+    )
+    assert normalize_style("  color: red;;padding: 10px; ") == ("color: red", "padding: 10px")
+    assert normalize_style("background: url(data:image/png;base64,AAA=); content: ';'") == (
+        "background: url(data:image/png;base64,AAA=)",
+        "content: ';'",
+    )
+    assert normalize_style("") == ()
+    assert normalize_style(None) == ()
+
+
+def test_identical_styles_share_one_class():
+    """Test that identical styles are interned into a single generated class."""
+    preprocessor = StylePreprocessor()
+    cells = [new_code_cell(f"x = {i}") for i in range(4)]
+    cells[0].metadata["style"] = {"color": "red", "padding": "10px"}
+    cells[1].metadata["style"] = "color: red; padding: 10px;"
+    cells[2].metadata["output-style"] = {"color": "red", "padding": "10px"}
+    cells[3].metadata["input-style"] = "color: blue"
+
+    nb, resources = preprocessor.preprocess(new_notebook(cells=cells), {})
+
+    style_classes = resources["style_classes"]
+    shared = style_classes["cell-0"]
+    assert style_classes["cell-1"] == shared
+    assert style_classes["cell-2-output"] == shared
+    assert style_classes["cell-3-input"] != shared
+    assert resources["compiled_styles"] == {
+        shared: ("color: red", "padding: 10px"),
+        style_classes["cell-3-input"]: ("color: blue",),
+    }
+    assert nb.cells[1].metadata["cell_style_class"] == shared
+    assert nb.cells[2].metadata["output_cell_style_class"] == shared
+    assert nb.cells[3].metadata["input_cell_style_class"] == style_classes["cell-3-input"]
+
+
+def test_empty_style_gets_no_class():
+    """Test that styles without declarations do not produce a CSS rule."""
+    preprocessor = StylePreprocessor()
+    cell = new_code_cell("x = 1")
+    cell.metadata["style"] = " ; "
+
+    nb, resources = preprocessor.preprocess(new_notebook(cells=[cell]), {})
+
+    assert resources["styles"] == {"cell-0": " ; "}
+    assert resources["compiled_styles"] == {}
+    assert "cell_style_class" not in nb.cells[0].metadata
+
+
+def test_notebook_without_style_metadata_skips_cells():
+    """Test the fast path for notebooks without any style or class metadata."""
+    preprocessor = StylePreprocessor()
+    nb = new_notebook(cells=[new_code_cell("x = 1"), new_markdown_cell("# Title")])
+    visited = []
+    preprocessor.preprocess_cell = lambda cell, resources, index: visited.append(index)
+
+    nb, resources = preprocessor.preprocess(nb, {})
+
+    assert visited == []
+    assert resources["styles"] == {}
+    assert resources["style_classes"] == {}
+    assert resources["compiled_styles"] == {}
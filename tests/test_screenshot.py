@@ -0,0 +1,189 @@
+"""
+Tests for StyledScreenshotExporter, using a fake browser pool.
+"""
+
+import base64
+import json
+import os
+import re
+import tempfile
+
+import nbformat
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook
+
+from jupyter_export_html_style import StyledScreenshotExporter
+from jupyter_export_html_style.browser import BrowserPool
+
+
+class FakeSession:
+    """A DevTools session returning the capture parameters as the image."""
+
+    def __init__(self, page):
+        self.page = page
+
+    async def send(self, method, params):
+        assert method == "Page.captureScreenshot"
+        self.page.captures.append(params)
+        data = json.dumps([self.page.title, params]).encode()
+        return {"data": base64.b64encode(data).decode()}
+
+    async def detach(self):
+        pass
+
+
+class FakePage:
+    """A page that loads the routed document and measures one box per cell."""
+
+    def __init__(self):
+        self.context = self
+        self.captures = []
+
+    async def new_cdp_session(self, page):
+        return FakeSession(page)
+
+    async def set_viewport_size(self, size):
+        self.viewport = size
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+    async def goto(self, url, wait_until=None):
+        page = self
+
+        class Route:
+            request = self
+
+            async def fulfill(self, body=None, **kw):
+                page.html = body.decode("utf-8")
+
+        self.url = url
+        await self.handler(Route())
+
+    async def evaluate(self, script):
+        if "exportReady" in script:
+            return "signal"
+        self.title = re.search(r"<h1[^>]*>([^<]*)", self.html).group(1)
+        cells = re.findall(r'id="(cell-\d+)" class="jp-Cell', self.html)
+        return {
+            "page": {"x": 0, "y": 0, "width": self.viewport["width"], "height": 3000},
+            "screen": {"x": 0, "y": 0, **self.viewport},
+            "cells": [
+                [dom_id, {"x": 0, "y": 100 * i, "width": 500, "height": 90}]
+                for i, dom_id in enumerate(cells)
+            ],
+        }
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    """A browser whose context hands out fake pages."""
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self):
+        return self
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    """Stands in for async_playwright() and the started Playwright instance."""
+
+    def __init__(self):
+        self.chromium = self
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+    async def launch(self, **kw):
+        return FakeBrowser()
+
+
+def _exporter(**kw):
+    """Create a screenshot exporter capturing through a fake browser pool."""
+    exporter = StyledScreenshotExporter(**kw)
+    pool = BrowserPool(pages_per_browser=4, playwright_factory=FakePlaywright)
+    exporter._get_browser_pool = lambda: pool
+    return exporter, pool
+
+
+def _decode(image):
+    """Return the notebook title and capture parameters a fake image was made from."""
+    return json.loads(image)
+
+
+def test_screenshot_captures_first_screen_at_scale():
+    """Test that a thumbnail captures the first screen in the chosen format and scale."""
+    nb = new_notebook(cells=[new_markdown_cell("# Report")])
+    exporter, pool = _exporter(
+        screenshot_area="screen",
+        screenshot_format="webp",
+        screenshot_scale=0.25,
+        viewport_width=1000,
+        viewport_height=600,
+    )
+    try:
+        image, resources = exporter.from_notebook_node(nb)
+    finally:
+        pool.close()
+
+    title, params = _decode(image)
+    assert title == "Report"
+    assert params["format"] == "webp"
+    assert params["quality"] == 80
+    assert params["clip"] == {"x": 0, "y": 0, "width": 1000, "height": 600, "scale": 0.25}
+    assert resources["output_extension"] == ".webp"
+    assert "cell_screenshots" not in resources
+
+
+def test_screenshot_captures_full_page_and_cells():
+    """Test that cells are captured by their DOM ids and added to the outputs."""
+    nb = new_notebook(cells=[new_markdown_cell("# Report"), new_code_cell("x = 1")])
+    exporter, pool = _exporter(cell_screenshots=True)
+    try:
+        image, resources = exporter.from_notebook_node(
+            nb, resources={"unique_key": "report", "metadata": {"path": "."}}
+        )
+    finally:
+        pool.close()
+
+    _, params = _decode(image)
+    assert params["clip"]["height"] == 3000
+    assert "quality" not in params
+    assert resources["output_extension"] == ".png"
+    assert resources["cell_screenshots"] == {
+        "cell-0": os.path.join("report_files", "cell-0.png"),
+        "cell-1": os.path.join("report_files", "cell-1.png"),
+    }
+    _, cell_params = _decode(resources["outputs"][resources["cell_screenshots"]["cell-1"]])
+    assert cell_params["clip"]["y"] == 100
+
+
+def test_screenshot_batch_shares_the_pool():
+    """Test that batch thumbnails are captured on the pages of one pool."""
+    exporter, pool = _exporter(screenshot_area="screen")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        for title in ["alpha", "beta", "gamma"]:
+            path = os.path.join(tmpdir, f"{title}.ipynb")
+            nbformat.write(new_notebook(cells=[new_markdown_cell(f"# {title}")]), path)
+            paths.append(path)
+        try:
+            results = sorted(exporter.iter_batch(paths, workers=0))
+        finally:
+            pool.close()
+
+    assert [result.error for result in results] == [None, None, None]
+    assert [_decode(result.output)[0] for result in results] == ["alpha", "beta", "gamma"]
+    assert results[0].resources["output_extension"] == ".png"
+    assert pool.launches == 1
@@ -0,0 +1,124 @@
+"""
+Tests for the Jupyter Server extension.
+"""
+
+import asyncio
+import json
+import re
+
+import nbformat
+import pytest
+from nbformat.v4 import new_markdown_cell, new_notebook
+
+pytest.importorskip("jupyter_server")
+pytest.importorskip("pytest_jupyter")
+
+from tornado.httpclient import HTTPClientError  # noqa: E402
+
+from jupyter_export_html_style import server  # noqa: E402
+
+pytest_plugins = ["pytest_jupyter.jupyter_server"]
+
+
+@pytest.fixture
+def jp_server_config():
+    """Enable the extension with exports converted in a thread of the server."""
+    return {
+        "ServerApp": {"jpserver_extensions": {"jupyter_export_html_style.server": True}},
+        "StyledExportService": {"exporters": ["styled_html"], "workers": 0},
+    }
+
+
+@pytest.fixture
+def notebook_path(jp_root_dir):
+    """Write a notebook with a local stylesheet into the server's root directory."""
+    reports = jp_root_dir / "reports"
+    reports.mkdir()
+    (reports / "style.css").write_text("h1 { color: rebeccapurple; }")
+    nb = new_notebook(cells=[new_markdown_cell("# Summary")])
+    nb.metadata["stylesheet"] = "style.css"
+    nbformat.write(nb, str(reports / "summary.ipynb"))
+    return "reports/summary.ipynb"
+
+
+def test_extension_points_declare_the_app():
+    """Test that Jupyter Server finds the extension application."""
+    (point,) = server._jupyter_server_extension_points()
+
+    assert point["module"] == "jupyter_export_html_style.server"
+    assert point["app"] is server.StyledExportExtension
+    assert server.StyledExportExtension.name == "jupyter_export_html_style"
+
+
+def test_extension_routes_match_export_urls():
+    """Test that the endpoints route job ids, exporters and notebook paths."""
+    app = server.StyledExportExtension()
+    app.initialize_handlers()
+    routes = {handler: re.compile(pattern + "$") for pattern, handler in app.handlers}
+    job_id = "0123456789abcdef0123456789abcdef"
+
+    assert routes[server.ExportsHandler].match("/jupyter-export-html-style/exports")
+    assert routes[server.JobHandler].match(f"/jupyter-export-html-style/exports/{job_id}")
+    assert routes[server.DownloadHandler].match(
+        f"/jupyter-export-html-style/exports/{job_id}/download"
+    )
+    match = routes[server.NbconvertHandler].match(
+        "/jupyter-export-html-style/nbconvert/styled_webpdf/reports/summary.ipynb"
+    )
+    assert match.group("exporter") == "styled_webpdf"
+    assert match.group("path") == "/reports/summary.ipynb"
+
+
+async def test_export_job_is_polled_and_downloaded(jp_fetch, notebook_path):
+    """Test submitting an export, polling its progress and downloading it."""
+    response = await jp_fetch(
+        server.URL_PREFIX,
+        "exports",
+        method="POST",
+        body=json.dumps({"path": notebook_path, "exporter": "styled_html"}),
+    )
+    assert response.code == 202
+    job = json.loads(response.body)
+    assert response.headers["Location"].endswith(job["id"])
+
+    for _ in range(300):
+        response = await jp_fetch(server.URL_PREFIX, "exports", job["id"])
+        job = json.loads(response.body)
+        if job["stage"] in ("finished", "failed"):
+            break
+        await asyncio.sleep(0.05)
+    assert job["stage"] == "finished"
+
+    response = await jp_fetch(server.URL_PREFIX, "exports", job["id"], "download")
+    assert response.headers["Content-Type"] == "text/html; charset=UTF-8"
+    assert "summary.html" in response.headers["Content-Disposition"]
+    assert "rebeccapurple" in response.body.decode("utf-8")
+
+
+async def test_nbconvert_endpoint_returns_the_export(jp_fetch, notebook_path):
+    """Test that the nbconvert endpoint waits for the export and returns it."""
+    response = await jp_fetch(server.URL_PREFIX, "nbconvert", "styled_html", notebook_path)
+
+    assert response.code == 200
+    assert "Summary" in response.body.decode("utf-8")
+
+
+async def test_unknown_exporters_and_jobs_are_not_found(jp_fetch, notebook_path):
+    """Test that unknown exporters and job ids answer 404."""
+    with pytest.raises(HTTPClientError) as e:
+        await jp_fetch(server.URL_PREFIX, "nbconvert", "styled_latex", notebook_path)
+    assert e.value.code == 404
+    with pytest.raises(HTTPClientError) as e:
+        await jp_fetch(server.URL_PREFIX, "exports", "0" * 32)
+    assert e.value.code == 404
+
+
+def test_notebook_directory_needs_a_file_backed_contents_manager(tmp_path):
+    """Test that only file-backed contents managers give notebooks a directory."""
+    from jupyter_server.services.contents.filemanager import FileContentsManager
+    from jupyter_server.services.contents.manager import ContentsManager
+
+    files = FileContentsManager(root_dir=str(tmp_path))
+
+    assert server._notebook_directory(files, "reports/summary.ipynb") == str(tmp_path / "reports")
+    assert server._notebook_directory(ContentsManager(), "reports/summary.ipynb") is None
@@ -0,0 +1,119 @@
+"""
+Tests for the export service behind the Jupyter Server extension.
+"""
+
+import asyncio
+
+import nbformat
+import pytest
+from nbformat.v4 import new_markdown_cell, new_notebook
+
+from jupyter_export_html_style.daemon import DaemonBusy
+from jupyter_export_html_style.service import StyledExportService
+
+
+def _notebook(text="# Report"):
+    """Return a one-cell notebook."""
+    return new_notebook(cells=[new_markdown_cell(text, id="title")])
+
+
+def test_service_shares_jobs_for_the_same_revision():
+    """Test that identical requests share a job and edited notebooks get a new one."""
+    service = StyledExportService(exporters=["styled_html"], workers=0)
+
+    async def drive():
+        first, second = await asyncio.gather(
+            service.submit(_notebook(), "report.ipynb"),
+            service.submit(nbformat.writes(_notebook()), "report.ipynb"),
+        )
+        edited = await service.submit(_notebook("# Revised"), "report.ipynb")
+        await asyncio.gather(first.wait(), edited.wait())
+        again = await service.submit(_notebook(), "report.ipynb")
+        status = service.status()
+        await service.drain()
+        return first, second, edited, again, status
+
+    first, second, edited, again, status = asyncio.run(drive())
+
+    assert first is second is again
+    assert first.requests == 3
+    assert edited is not first and edited.revision != first.revision
+    assert first.describe()["stage"] == "finished"
+    assert first.describe()["progress"] == 1.0
+    assert first.describe()["output_extension"] == ".html"
+    assert "Report" in first.result.output and "Revised" in edited.result.output
+    assert service.content_type(first) == "text/html; charset=UTF-8"
+    assert service.get(first.id) is first
+    assert status["ready"] and status["jobs"] == {"finished": 2}
+
+
+def test_service_refuses_when_busy_and_retries_failed_jobs():
+    """Test backpressure, failed jobs that are not shared and expiry of jobs."""
+    service = StyledExportService(exporters=["styled_html"], workers=0, max_pending=1, job_ttl=0)
+
+    async def drive():
+        with pytest.raises(KeyError):
+            await service.submit(_notebook(), "report.ipynb", exporter="styled_latex")
+        job = await service.submit(_notebook(), "report.ipynb")
+        with pytest.raises(DaemonBusy):
+            await service.submit(_notebook("# Other"), "other.ipynb")
+        await job.wait()
+        broken = await (await service.submit("{not json", "broken.ipynb")).wait()
+        retry = await (await service.submit("{not json", "broken.ipynb")).wait()
+        await asyncio.sleep(0.01)
+        await service.drain()
+        return job, broken, retry
+
+    job, broken, retry = asyncio.run(drive())
+
+    assert job.stage == "finished"
+    assert broken.stage == "failed" and "InvalidNotebook" in broken.describe()["error"]
+    assert retry is not broken and retry.stage == "failed"
+    assert service.get(job.id) is None and service.get(retry.id) is None
+    assert service.status()["jobs"] == {}
+
+
+def test_service_resolves_local_files_only_in_the_given_directory(tmp_path, monkeypatch):
+    """Test that notebooks without a directory do not read the working directory."""
+    (tmp_path / "style.css").write_text("h1 { color: rebeccapurple; }")
+    monkeypatch.chdir(tmp_path)
+    notebook = _notebook()
+    notebook.metadata["stylesheet"] = "style.css"
+    service = StyledExportService(exporters=["styled_html"], workers=0)
+
+    async def drive():
+        detached = await (await service.submit(notebook, "remote/report.ipynb")).wait()
+        local = await (
+            await service.submit(notebook, "report.ipynb", directory=str(tmp_path))
+        ).wait()
+        await service.drain()
+        return detached, local
+
+    detached, local = asyncio.run(drive())
+
+    assert "rebeccapurple" not in detached.result.output
+    assert '<link rel="stylesheet" href="style.css">' in detached.result.output
+    assert "rebeccapurple" in local.result.output
+
+
+def test_service_drops_the_oldest_exports_beyond_the_size_limit():
+    """Test that finished exports are evicted oldest first to respect max_retained_bytes."""
+    service = StyledExportService(exporters=["styled_html"], workers=0)
+
+    async def drive():
+        jobs = []
+        for title in ("One", "Two", "Three"):
+            job = await (await service.submit(_notebook(f"# {title}"), f"{title}.ipynb")).wait()
+            jobs.append(job)
+            if len(jobs) == 1:
+                service.max_retained_bytes = 2 * len(job.result.output) + 1024
+        status = service.status()
+        await service.drain()
+        return jobs, status
+
+    (one, two, three), status = asyncio.run(drive())
+
+    assert service.get(one.id) is None
+    assert service.get(two.id) is two and service.get(three.id) is three
+    assert status["retained_bytes"] == len(two.result.output) + len(three.result.output)
+    assert status["jobs"] == {"finished": 2}
@@ -40,7 +40,7 @@ def _extract_css_rules(html_string):
         if style_content:
             # Parse CSS rules using regex
             # Matches patterns like: #cell-0 { background-color: #fff; padding: 10px }
-            rule_pattern = r"([#.\w-]+)\s*\{([^}]+)\}"
+            rule_pattern = r"(:is\([^)]*\)|[#.\w-]+)\s*\{([^}]+)\}"
             for match in re.finditer(rule_pattern, style_content):
                 selector = match.group(1).strip()
                 properties_str = match.group(2).strip()
@@ -179,6 +179,27 @@ def test_styled_slides_with_input_output_styles():
     assert ".jp-Cell-outputWrapper" in output
 
 
+def test_styled_slides_share_classes_for_identical_styles():
+    """Test that cells with the same style share one generated class and CSS rule."""
+    cells = [
+        new_markdown_cell(
+            f"# Slide {i}",
+            metadata={"slideshow": {"slide_type": "slide"}, "style": {"color": "navy"}},
+        )
+        for i in range(3)
+    ]
+    nb = new_notebook(cells=cells)
+
+    exporter = StyledSlidesExporter()
+    output, resources = exporter.from_notebook_node(nb)
+
+    class_name = resources["style_classes"]["cell-0"]
+    assert set(resources["style_classes"].values()) == {class_name}
+    assert output.count(f":is(#{class_name}, .{class_name}) {{ color: navy }}") == 1
+    # One CSS rule, naming the class twice, plus the three cells using it
+    assert output.count(class_name) == 5
+
+
 def test_styled_slides_notebook_level_styles():
     """Test that notebook-level styles are included in slides."""
     cells = [
@@ -199,3 +220,22 @@ def test_styled_slides_template_name():
     """Test that the correct template name is used."""
     exporter = StyledSlidesExporter()
     assert exporter.template_name == "styled_reveal"
+
+
+def test_styled_slides_sanitize_html_strips_markdown_scripts():
+    """Test that sanitize_html cleans styled markdown cells as the lab template does."""
+    cells = [
+        new_markdown_cell(
+            "# Title\n\n<script>alert(1)</script>",
+            metadata={"style": {"color": "navy"}},
+        )
+    ]
+    nb = new_notebook(cells=cells)
+
+    sanitized, _ = StyledSlidesExporter(sanitize_html=True).from_notebook_node(nb)
+    unsanitized, _ = StyledSlidesExporter().from_notebook_node(nb)
+
+    markdown = _parse_html(sanitized).find(class_="jp-MarkdownCell")
+    assert markdown.find("script") is None
+    assert "<script>alert(1)</script>" not in sanitized
+    assert "<script>alert(1)</script>" in unsanitized
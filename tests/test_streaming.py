@@ -0,0 +1,250 @@
+"""
+Tests for the streaming export API and jupyter_export_html_style.streaming.
+"""
+
+import asyncio
+import base64
+import io
+import os
+import tempfile
+from unittest.mock import AsyncMock, MagicMock
+
+from bs4 import BeautifulSoup
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook, new_output
+
+from jupyter_export_html_style import (
+    StyledHTMLExporter,
+    StyledSlidesExporter,
+    StyledWebPDFExporter,
+)
+from jupyter_export_html_style.exporters.webpdf import _stream_pdf
+from jupyter_export_html_style.fragments import get_fragment_cache
+from jupyter_export_html_style.streaming import (
+    MISSING_ALT_TEXT,
+    AccessibilityRewriter,
+    TagRewriter,
+    add_attributes,
+)
+
+
+def _notebook():
+    """Create a notebook with styles, markdown images and outputs.
+
+    Returns:
+        (NotebookNode): The notebook.
+    """
+    code = new_code_cell(
+        "print('hi')",
+        outputs=[new_output("stream", name="stdout", text="hi\n")],
+        metadata={"style": {"color": "red"}},
+    )
+    markdown = new_markdown_cell("# Title\n\n![plot](plot.png)", metadata={"style": "color: red"})
+    nb = new_notebook(cells=[markdown, code])
+    nb.metadata["style"] = "body { margin: 0; }"
+    return nb
+
+
+def test_tag_rewriter_rewrites_selected_tags_across_chunks():
+    """Test that only the requested tags are rewritten, whatever the chunking."""
+    html = '<div class="a"><p>x</p><!-- <div> --><script>"<div>"</script><DIV id=b></div>'
+    expected = '<div class="a" data-x="1"><p>x</p><!-- <div> --><script>"<div>"</script>' + (
+        '<DIV id=b data-x="1"></div>'
+    )
+    for size in (1, 2, 3, 7, len(html)):
+        rewriter = TagRewriter({"div": lambda tag: add_attributes(tag, {"data-x": "1"})})
+        chunks = [html[i : i + size] for i in range(0, len(html), size)]
+        assert "".join(rewriter.iter_rewrite(chunks)) == expected
+
+
+def test_add_attributes_replaces_existing_values():
+    """Test that add_attributes can replace an attribute that is already present."""
+    tag = '<div tabindex="-1" class="x"/>'
+    assert add_attributes(tag, {"tabindex": "0"}, replace=True) == '<div class="x" tabindex="0"/>'
+
+
+def test_accessibility_rewriter_matches_nbconvert():
+    """Test that alt text and tabindex are added like nbconvert's BeautifulSoup pass."""
+    html = (
+        '<div class="jp-Cell-inputWrapper">before body</div>'
+        '<body class="jp-Notebook">'
+        '<img src="a.png"><img src="b.png" alt="">'
+        '<div class="jp-Cell-inputWrapper x">in</div>'
+        '<div class="jp-OutputArea-output" tabindex="-1">out</div>'
+        '<div class="jp-OutputArea">other</div>'
+        "</body>"
+    )
+    rewriter = AccessibilityRewriter()
+
+    output = rewriter.feed(html) + rewriter.close()
+
+    soup = BeautifulSoup(output, "html.parser")
+    assert soup.find("img", src="a.png")["alt"] == MISSING_ALT_TEXT
+    assert soup.find("img", src="b.png")["alt"] == ""
+    wrappers = soup.select("div.jp-Cell-inputWrapper")
+    assert "tabindex" not in wrappers[0].attrs
+    assert wrappers[1]["tabindex"] == "0"
+    assert soup.select_one("div.jp-OutputArea-output")["tabindex"] == "0"
+    assert "tabindex" not in soup.select_one("div.jp-OutputArea").attrs
+    assert rewriter.missing_alt == 1
+
+
+def test_iter_from_notebook_node_matches_from_notebook_node():
+    """Test that the streamed document equals the one from from_notebook_node."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "plot.png"), "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+        resources = {"metadata": {"path": tmpdir}}
+        nb = _notebook()
+        for exporter_class in (StyledHTMLExporter, StyledSlidesExporter):
+            exporter = exporter_class()
+            output, _ = exporter.from_notebook_node(nb, resources=dict(resources))
+
+            chunks, streamed_resources = exporter.iter_from_notebook_node(
+                nb, resources=dict(resources)
+            )
+            assert streamed_resources["compiled_styles"]
+            assert "".join(chunks) == output
+
+    assert not output.startswith("\n")
+    assert 'src="data:image/png;base64,' in output
+    assert output.count("{ color: red }") == 1
+    assert exporter.embed_images is True
+
+
+def test_iter_from_notebook_node_is_lazy_and_leaves_settings_alone():
+    """Test that rendering happens while iterating without changing the exporter."""
+    exporter = StyledHTMLExporter()
+    nb = _notebook()
+    nb.metadata["anchors"] = False
+
+    chunks, resources = exporter.iter_from_notebook_node(nb)
+    first = next(chunks)
+    assert first.startswith("<!DOCTYPE html>")
+    assert exporter.embed_images is True
+    assert exporter.exclude_anchor_links is False
+
+    rest = "".join(chunks)
+    assert 'class="anchor-link"' not in first + rest
+    assert resources["markdown_render"]["exclude_anchor_links"] is True
+
+
+def test_interleaved_and_abandoned_streams_keep_their_own_settings():
+    """Test that streams sharing an exporter do not see each other's settings."""
+    exporter = StyledHTMLExporter()
+    without_anchors = _notebook()
+    without_anchors.metadata["anchors"] = False
+    with_anchors = _notebook()
+
+    abandoned, _ = exporter.iter_from_notebook_node(without_anchors)
+    next(abandoned)
+    first, _ = exporter.iter_from_notebook_node(without_anchors)
+    second, _ = exporter.iter_from_notebook_node(with_anchors)
+    first_html, second_html = next(first), next(second)
+    for chunk_a, chunk_b in zip(first, second):
+        first_html += chunk_a
+        second_html += chunk_b
+    first_html += "".join(first)
+    second_html += "".join(second)
+    abandoned.close()
+
+    assert 'class="anchor-link"' not in first_html
+    assert 'class="anchor-link"' in second_html
+    assert exporter.from_notebook_node(with_anchors)[0] == second_html
+    assert exporter.embed_images is True
+    assert exporter.exclude_anchor_links is False
+
+
+def test_interleaved_streams_keep_their_own_highlighter_and_fragments():
+    """Test that each stream highlights and caches its own notebook's cells."""
+    get_fragment_cache().clear()
+    exporter = StyledHTMLExporter(incremental=True)
+    notebooks = []
+    for language, source in (("python", "def f(): pass"), ("sql", "SELECT 1 FROM t")):
+        nb = new_notebook(cells=[new_code_cell(source, id="code")])
+        nb.metadata["language_info"] = {"name": language, "pygments_lexer": language}
+        notebooks.append(nb)
+
+    python_chunks, python_resources = exporter.iter_from_notebook_node(notebooks[0])
+    sql_chunks, sql_resources = exporter.iter_from_notebook_node(notebooks[1])
+    python_html = next(python_chunks)
+    sql_html = "".join(sql_chunks)
+    python_html += "".join(python_chunks)
+
+    assert "hl-python" in python_html and "hl-sql" not in python_html
+    assert "hl-sql" in sql_html and "hl-python" not in sql_html
+    assert python_resources["fragment_cache"] == {"hits": 0, "misses": 1}
+    assert sql_resources["fragment_cache"] == {"hits": 0, "misses": 1}
+    again, resources = exporter.from_notebook_node(notebooks[0])
+    assert resources["fragment_cache"] == {"hits": 1, "misses": 0}
+    assert again == python_html
+
+
+def test_export_to_stream_writes_text_and_binary_streams():
+    """Test that export_to_stream writes the same document to text and binary streams."""
+    exporter = StyledHTMLExporter()
+    nb = _notebook()
+    output, _ = exporter.from_notebook_node(nb)
+
+    text_stream = io.StringIO()
+    resources = exporter.export_to_stream(nb, text_stream)
+    binary_stream = io.BytesIO()
+    exporter.export_to_stream(nb, binary_stream)
+
+    assert text_stream.getvalue() == output
+    assert binary_stream.getvalue() == output.encode("utf-8")
+    assert resources["output_extension"] == ".html"
+
+
+def test_webpdf_export_to_file_streams_html_and_pdf():
+    """Test that the WebPDF exporter prints a streamed HTML file into the destination."""
+    exporter = StyledWebPDFExporter()
+    printed = {}
+
+    def fake_print_pdf(html_path, stream=None, base_dir=None):
+        with open(html_path, encoding="utf-8") as f:
+            printed["html"] = f.read()
+        stream.write(b"%PDF-1.7 fake")
+
+    exporter._print_pdf = fake_print_pdf
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = os.path.join(tmpdir, "out.pdf")
+        resources = exporter.export_to_file(_notebook(), output_path)
+        with open(output_path, "rb") as f:
+            assert f.read() == b"%PDF-1.7 fake"
+
+    assert resources["output_extension"] == ".pdf"
+    assert printed["html"].startswith("<!DOCTYPE html>")
+    assert "color: red" in printed["html"]
+
+
+def test_stream_pdf_copies_protocol_stream_in_chunks():
+    """Test that _stream_pdf reads the PDF through the DevTools protocol IO stream."""
+    parts = [b"%PDF-1.7\n", b"body", b"%%EOF"]
+    replies = [{"stream": "handle-1"}]
+    replies += [
+        {"data": base64.b64encode(part).decode(), "base64Encoded": True, "eof": False}
+        for part in parts
+    ]
+    replies += [{"data": "", "eof": True}, {}]
+
+    session = MagicMock()
+    session.send = AsyncMock(side_effect=replies)
+    session.detach = AsyncMock()
+    page = MagicMock()
+    page.context.new_cdp_session = AsyncMock(return_value=session)
+    stream = io.BytesIO()
+
+    asyncio.run(
+        _stream_pdf(page, {"print_background": True, "tagged": True, "width": 960}, stream)
+    )
+
+    assert stream.getvalue() == b"".join(parts)
+    method, params = session.send.call_args_list[0].args
+    assert method == "Page.printToPDF"
+    assert params["transferMode"] == "ReturnAsStream"
+    assert params["printBackground"] is True
+    assert params["generateTaggedPDF"] is True
+    assert params["paperWidth"] == 10
+    assert session.send.call_args_list[-1].args == ("IO.close", {"handle": "handle-1"})
+    session.detach.assert_awaited_once()
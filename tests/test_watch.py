@@ -0,0 +1,99 @@
+"""
+Tests for watching notebooks and re-exporting them on change.
+"""
+
+import os
+import tempfile
+import threading
+
+import nbformat
+from nbformat.v4 import new_markdown_cell, new_notebook
+
+from jupyter_export_html_style.watch import NotebookWatcher
+
+_PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+def _write_notebook(directory, name, text):
+    """Write a notebook with one markdown cell."""
+    path = os.path.join(directory, name)
+    nbformat.write(new_notebook(cells=[new_markdown_cell(text)]), path)
+    return path
+
+
+def _exported(results):
+    """Return the names of the notebooks that were exported, not skipped."""
+    return sorted(
+        os.path.basename(result.source)
+        for result in results
+        if result.error is None and not result.skipped
+    )
+
+
+def test_poll_reports_notebooks_and_dependencies():
+    """Test that changes to a notebook's image select that notebook only."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "logo.png"), "wb") as f:
+            f.write(_PIXEL)
+        _write_notebook(tmpdir, "a.ipynb", "# A")
+        _write_notebook(tmpdir, "b.ipynb", "# B ![logo](logo.png)")
+        watcher = NotebookWatcher([tmpdir], output_dir=os.path.join(tmpdir, "out"))
+        assert _exported(watcher.export()) == ["a.ipynb", "b.ipynb"]
+        assert watcher.poll() == set()
+
+        with open(os.path.join(tmpdir, "logo.png"), "ab") as f:
+            f.write(b"\0")
+        changed = watcher.poll()
+
+        assert changed == {os.path.join(tmpdir, "logo.png")}
+        assert [os.path.basename(path) for path in watcher.affected(changed)] == ["b.ipynb"]
+        assert watcher.poll() == set()
+
+
+def test_watch_reexports_affected_notebooks():
+    """Test that edits, new notebooks and deletions are picked up by the watch loop."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_dir = os.path.join(tmpdir, "out")
+        with open(os.path.join(tmpdir, "style.css"), "w") as f:
+            f.write("h1 { color: red }")
+        a = _write_notebook(tmpdir, "a.ipynb", "# A")
+        b = _write_notebook(tmpdir, "b.ipynb", "# B")
+        nb = nbformat.read(b, as_version=4)
+        nb.metadata["stylesheet"] = "style.css"
+        nbformat.write(nb, b)
+
+        stop = threading.Event()
+        # Ends the loop, failing the test, if an expected re-export never comes.
+        timeout = threading.Timer(30, stop.set)
+        timeout.start()
+        watcher = NotebookWatcher([tmpdir], output_dir=output_dir, debounce=0.3, interval=0.01)
+        loop = watcher.watch(stop)
+        assert _exported(next(loop)) == ["a.ipynb", "b.ipynb"]
+
+        # A burst of saves to one notebook triggers one export of that notebook.
+        for text in ["# A1", "# A2", "# A, revised"]:
+            _write_notebook(tmpdir, "a.ipynb", text)
+        assert _exported(next(loop)) == ["a.ipynb"]
+        with open(os.path.join(output_dir, "a.html"), encoding="utf-8") as f:
+            assert "A, revised" in f.read()
+
+        with open(os.path.join(tmpdir, "style.css"), "w") as f:
+            f.write("h1 { color: blue }")
+        assert _exported(next(loop)) == ["b.ipynb"]
+        with open(os.path.join(output_dir, "b.html"), encoding="utf-8") as f:
+            assert "color: blue" in f.read()
+
+        _write_notebook(tmpdir, "c.ipynb", "# C")
+        os.unlink(a)
+        assert _exported(next(loop)) == ["c.ipynb"]
+        assert sorted(os.listdir(output_dir)) == [
+            ".jupyter-export-manifest.json",
+            "b.html",
+            "c.html",
+        ]
+        stop.set()
+        timeout.cancel()
+        assert list(loop) == []
@@ -0,0 +1,217 @@
+"""
+Tests for the batch PDF API of StyledWebPDFExporter, using a fake browser pool.
+"""
+
+import asyncio
+import multiprocessing.util
+import os
+import tempfile
+import threading
+
+import nbformat
+import pytest
+from nbformat.v4 import new_markdown_cell, new_notebook
+
+from jupyter_export_html_style import StyledWebPDFExporter
+from jupyter_export_html_style.browser import BrowserPool
+from jupyter_export_html_style.exporters.webpdf import _batch_context
+
+
+class FakeRoute:
+    """A route that records the document it is fulfilled with."""
+
+    def __init__(self, url):
+        self.request = self
+        self.url = url
+        self.body = None
+
+    async def fulfill(self, path=None, body=None, **kw):
+        if body is not None:
+            self.body = body.decode("utf-8")
+            return
+        with open(path, encoding="utf-8") as f:
+            self.body = f.read()
+
+
+class FakePage:
+    """A page that prints the routed HTML document, slowly for notebooks marked "slow"."""
+
+    async def emulate_media(self, media):
+        pass
+
+    async def evaluate(self, script):
+        return "signal"
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+    async def goto(self, url, wait_until=None):
+        route = FakeRoute(url)
+        await self.handler(route)
+        self.html = route.body
+
+    async def pdf(self, **params):
+        if "SLOW" in self.html:
+            await asyncio.sleep(0.5)
+        return b"%PDF-" + str(self.html.count("Notebook")).encode()
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    """A browser whose context hands out fake pages."""
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self):
+        return self
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    """Stands in for async_playwright() and the started Playwright instance."""
+
+    def __init__(self):
+        self.chromium = self
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+    async def launch(self, **kw):
+        return FakeBrowser()
+
+
+def _exporter(**kw):
+    """Create a WebPDF exporter printing through a fake browser pool."""
+    exporter = StyledWebPDFExporter(**kw)
+    pool = BrowserPool(pages_per_browser=4, playwright_factory=FakePlaywright)
+    exporter._get_browser_pool = lambda: pool
+    return exporter, pool
+
+
+def _write_notebooks(tmpdir, titles):
+    """Write one notebook per title and return their paths."""
+    paths = []
+    for title in titles:
+        path = os.path.join(tmpdir, f"{title}.ipynb")
+        nbformat.write(new_notebook(cells=[new_markdown_cell(f"# {title}")]), path)
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("handoff", ["memory", "file"])
+def test_iter_batch_yields_results_as_they_complete(handoff, monkeypatch):
+    """Test that slow PDFs do not hold back the others and errors are isolated."""
+    exporter, pool = _exporter(html_handoff=handoff)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        scratch = os.path.join(tmpdir, "scratch")
+        os.makedirs(scratch)
+        # Keep the directory multiprocessing creates for its workers out of scratch.
+        multiprocessing.util.get_temp_dir()
+        monkeypatch.setattr(tempfile, "tempdir", scratch)
+        paths = _write_notebooks(tmpdir, ["SLOW", "a", "b"])
+        paths.append(os.path.join(tmpdir, "missing.ipynb"))
+        try:
+            results = list(exporter.iter_batch(paths, workers=2))
+        finally:
+            pool.close()
+        leftovers = os.listdir(scratch)
+
+    assert len(results) == 4
+    assert results[-1].source == paths[0]
+    by_index = {result.index: result for result in results}
+    assert by_index[1].output.startswith(b"%PDF-")
+    assert by_index[1].resources["output_extension"] == ".pdf"
+    assert by_index[1].resources["metadata"]["name"] == "a"
+    assert isinstance(by_index[3].error, FileNotFoundError)
+    assert by_index[3].output is None
+    assert not leftovers
+
+
+def test_iter_batch_renders_in_spawned_workers():
+    """Test that the rendering workers can be started without forking."""
+    exporter, pool = _exporter()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = _write_notebooks(tmpdir, ["a", "b"])
+        try:
+            results = sorted(exporter.iter_batch(paths, workers=1, start_method="spawn"))
+        finally:
+            pool.close()
+
+    assert [result.error for result in results] == [None, None]
+    assert all(result.output.startswith(b"%PDF-") for result in results)
+
+
+def test_batch_workers_are_not_forked_while_threads_run():
+    """Test that fork is only chosen while this process runs a single thread."""
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        assert _batch_context().get_start_method() != "fork"
+    finally:
+        stop.set()
+        thread.join()
+    assert _batch_context("spawn").get_start_method() == "spawn"
+
+
+def test_iter_batch_applies_timeouts_and_concurrency_limit():
+    """Test per-job timeouts with in-process rendering and a concurrency limit of one."""
+    exporter, pool = _exporter()
+    notebooks = [new_notebook(cells=[new_markdown_cell(f"# {title}")]) for title in ("SLOW", "a")]
+    try:
+        results = list(exporter.iter_batch(notebooks, workers=0, concurrency=1, timeout=0.1))
+    finally:
+        pool.close()
+
+    errors = {result.index: result.error for result in results}
+    assert isinstance(errors[0], TimeoutError)
+    assert errors[1] is None
+
+
+def test_iter_batch_uses_export_cache():
+    """Test that a second batch run is served from the export cache."""
+    exporter, pool = _exporter(export_cache="memory")
+    cache = exporter._get_export_cache()
+    cache.clear()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = _write_notebooks(tmpdir, ["a", "b"])
+        try:
+            first = sorted(exporter.iter_batch(paths, workers=0))
+            second = sorted(exporter.iter_batch(paths, workers=0))
+        finally:
+            pool.close()
+
+    assert [result.output for result in first] == [result.output for result in second]
+    assert cache.cache_info().hits == 2
+
+
+def test_iter_batch_prints_in_workers_with_weasyprint(monkeypatch):
+    """Test that the weasyprint engine prints in the rendering workers, not the pool."""
+
+    def fake_weasyprint_pdf(router, stream=None):
+        body, _ = router.fetch(router.url, None)
+        return b"%PDF " + body[body.index(b"<h1") :].split(b">", 1)[1].split(b"<", 1)[0]
+
+    monkeypatch.setattr(
+        "jupyter_export_html_style.exporters.webpdf.weasyprint_pdf", fake_weasyprint_pdf
+    )
+    exporter = StyledWebPDFExporter(pdf_engine="weasyprint")
+    exporter._get_browser_pool = None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = _write_notebooks(tmpdir, ["alpha", "beta"])
+        results = sorted(exporter.iter_batch(paths, workers=0))
+
+    assert [result.error for result in results] == [None, None]
+    assert [result.output for result in results] == [b"%PDF alpha", b"%PDF beta"]
+    assert results[0].resources["output_extension"] == ".pdf"
@@ -6,15 +6,34 @@ WebPDFExporter functionality to use StyledHTMLExporter for HTML generation,
 ensuring that cell styles and embedded images are included in the PDF output.
 """
 
+import asyncio
+import logging
+import os
+import tempfile
 from importlib import util as importlib_util
+from unittest.mock import patch
 
 import pytest
-from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook, new_output
 
-from jupyter_export_html_style import StyledWebPDFExporter
+from jupyter_export_html_style import StyledHTMLExporter, StyledWebPDFExporter
 
 # Check if playwright is available
 PLAYWRIGHT_AVAILABLE = importlib_util.find_spec("playwright") is not None
+WEASYPRINT_AVAILABLE = importlib_util.find_spec("weasyprint") is not None
+
+
+def _rule(class_name, declarations):
+    """Return the CSS rule generated for a style class.
+
+    Args:
+        class_name (str): Generated class, e.g. "styled-1a2b3c4d".
+        declarations (str): The rule's declarations.
+
+    Returns:
+        (str): The rule as written to the style block.
+    """
+    return f":is(#{class_name}, .{class_name}) {{ {declarations} }}"
 
 
 def test_styled_webpdf_exporter_initialization():
@@ -26,8 +45,6 @@ def test_styled_webpdf_exporter_initialization():
 
 def test_styled_webpdf_exporter_inherits_from_styled_html():
     """Test that StyledWebPDFExporter inherits from StyledHTMLExporter."""
-    from jupyter_export_html_style import StyledHTMLExporter
-
     exporter = StyledWebPDFExporter()
     assert isinstance(exporter, StyledHTMLExporter)
 
@@ -150,8 +167,8 @@ def test_styled_webpdf_html_includes_cell_styles():
     """Test that the HTML generated by StyledWebPDFExporter includes custom cell styles.
 
     This test verifies that the webpdf exporter generates HTML with:
-    1. CSS rules for styled cells (#cell-0, #cell-0-input, #cell-0-output)
-    2. HTML elements with matching id attributes
+    1. CSS rules for the generated classes of styled cells
+    2. HTML elements with matching id attributes and classes
     This ensures that custom cell styles will be applied in the final PDF.
     """
     exporter = StyledWebPDFExporter()
@@ -186,18 +203,19 @@ def test_styled_webpdf_html_includes_cell_styles():
 
     # Verify CSS rules are present
     assert "Custom cell styles" in html_captured
-    assert "#cell-0 {" in html_captured
-    assert "background-color: #f0f0f0" in html_captured
-    assert "#cell-1-input {" in html_captured
-    assert "color: red" in html_captured
-    assert "#cell-2 {" in html_captured
-    assert "padding: 10px" in html_captured
+    style_classes = resources["style_classes"]
+    assert _rule(style_classes["cell-0"], "background-color: #f0f0f0") in html_captured
+    assert _rule(style_classes["cell-1-input"], "color: red") in html_captured
+    assert _rule(style_classes["cell-2"], "padding: 10px") in html_captured
 
     # Verify HTML elements with matching IDs are present
     assert 'id="cell-0"' in html_captured
     assert 'id="cell-1"' in html_captured
     assert 'id="cell-1-input"' in html_captured
     assert 'id="cell-2"' in html_captured
+    assert f'<div id="cell-0" class="jp-Cell jp-CodeCell' in html_captured
+    # The rule names the class twice, and one cell uses it
+    assert html_captured.count(style_classes["cell-0"]) == 3
 
 
 @pytest.mark.skipif(not PLAYWRIGHT_AVAILABLE, reason="Playwright not installed")
@@ -221,8 +239,7 @@ def test_styled_webpdf_uses_tagged_pdf():
     mock_page.pdf = AsyncMock(return_value=mock_pdf_data)
     mock_page.emulate_media = AsyncMock()
     mock_page.goto = AsyncMock()
-    mock_page.wait_for_timeout = AsyncMock()
-    mock_page.evaluate = AsyncMock(return_value={"width": 800, "height": 600})
+    mock_page.evaluate = AsyncMock(return_value="signal")
 
     mock_browser = AsyncMock()
     mock_browser.new_page = AsyncMock(return_value=mock_page)
@@ -266,3 +283,143 @@ def test_styled_webpdf_uses_tagged_pdf():
             if "No suitable chromium executable" in str(e):
                 pytest.skip("Chromium not installed")
             raise
+
+
+def test_styled_webpdf_html_signals_readiness():
+    """Test that only the webpdf template injects the document readiness signal."""
+    nb = new_notebook(cells=[new_markdown_cell("$x^2$")])
+    exporter = StyledWebPDFExporter()
+    captured = []
+    exporter.run_playwright = lambda html: captured.append(html) or b"fake pdf"
+    exporter.from_notebook_node(nb)
+
+    html, _ = StyledHTMLExporter().from_notebook_node(nb)
+    assert 'root.dataset.exportReady = "ready"' in captured[0]
+    assert "MathJax" in captured[0]
+    assert "exportReady" not in html
+
+
+class ReadinessPage:
+    """A page whose readiness script resolves after a delay."""
+
+    def __init__(self, reason, delay=0):
+        self.reason = reason
+        self.delay = delay
+
+    async def evaluate(self, script):
+        await asyncio.sleep(self.delay)
+        return self.reason
+
+
+@pytest.mark.parametrize("reason", ["signal", "load"])
+def test_styled_webpdf_logs_what_ended_the_wait(reason, caplog):
+    """Test that the exporter reports which wait ended the page load."""
+    exporter = StyledWebPDFExporter(log=logging.getLogger("test-webpdf"))
+    with caplog.at_level(logging.INFO, logger="test-webpdf"):
+        assert asyncio.run(exporter._wait_until_ready(ReadinessPage(reason), "nb.html")) == reason
+
+    assert "nb.html ready after" in caplog.text
+    assert ("signalled" in caplog.text) == (reason == "signal")
+
+
+def test_styled_webpdf_ready_timeout_bounds_the_wait(caplog):
+    """Test that a document that never becomes ready is printed after ready_timeout."""
+    exporter = StyledWebPDFExporter(ready_timeout=0.05, log=logging.getLogger("test-webpdf"))
+    with caplog.at_level(logging.WARNING, logger="test-webpdf"):
+        reason = asyncio.run(exporter._wait_until_ready(ReadinessPage("signal", 10), "nb.html"))
+
+    assert reason == "timeout"
+    assert "nb.html was not ready after 0.1s" in caplog.text
+
+
+@pytest.mark.parametrize("serve", [True, False])
+def test_styled_webpdf_serves_local_images_instead_of_embedding(serve):
+    """Test that local images are referenced for the browser unless disabled."""
+    nb = new_notebook(cells=[new_markdown_cell("![plot](plot.png)")])
+    exporter = StyledWebPDFExporter(serve_local_images=serve)
+    printed = []
+
+    def fake_print_pdf(html_path, stream=None, base_dir=None, html=None):
+        printed.append((html, base_dir))
+        return b"fake pdf"
+
+    exporter._print_pdf = fake_print_pdf
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "plot.png"), "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+        exporter.from_notebook_node(nb, resources={"metadata": {"path": tmpdir}})
+
+    html, base_dir = printed[0]
+    assert base_dir == tmpdir
+    assert ('src="plot.png"' in html) == serve
+    assert ('src="data:image/png;base64,' in html) != serve
+
+
+def test_styled_webpdf_weasyprint_engine_prints_static_document():
+    """Test that the weasyprint engine prints a script-free document in-process."""
+    output = new_output(
+        "display_data",
+        data={"application/javascript": "alert('hi')", "text/plain": "static fallback"},
+    )
+    nb = new_notebook(cells=[new_markdown_cell("$x^2$"), new_code_cell("x", outputs=[output])])
+    exporter = StyledWebPDFExporter(pdf_engine="weasyprint")
+    printed = []
+
+    def fake_weasyprint_pdf(router, stream=None):
+        body, content_type = router.fetch(router.url, None)
+        printed.append((router, body.decode("utf-8"), content_type))
+        return b"%PDF weasyprint"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with patch(
+            "jupyter_export_html_style.exporters.webpdf.weasyprint_pdf", fake_weasyprint_pdf
+        ):
+            pdf, resources = exporter.from_notebook_node(
+                nb, resources={"metadata": {"path": tmpdir}}
+            )
+
+    router, html, content_type = printed[0]
+    assert pdf == b"%PDF weasyprint"
+    assert resources["output_extension"] == ".pdf"
+    assert resources["javascript"] is False
+    assert router.base_dir == os.path.realpath(tmpdir)
+    assert content_type.startswith("text/html")
+    assert "<script" not in html
+    assert "static fallback" in html
+    assert "$x^2$" in html
+    assert len(nb.cells[1].outputs[0].data) == 2
+
+
+def test_styled_webpdf_weasyprint_engine_embeds_repeated_images(caplog):
+    """Test that deduplicate_images falls back to full embedding without JavaScript."""
+    png = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR4nGNgAAIAAAUAAXpeqz8AAAAASUVORK5CYII="
+    cells = [
+        new_code_cell("plot()", outputs=[new_output("display_data", data={"image/png": png})])
+        for _ in range(3)
+    ]
+    exporter = StyledWebPDFExporter(pdf_engine="weasyprint", deduplicate_images=True)
+    printed = []
+
+    def fake_weasyprint_pdf(router, stream=None):
+        printed.append(router.fetch(router.url, None)[0].decode("utf-8"))
+        return b"%PDF weasyprint"
+
+    with caplog.at_level(logging.WARNING):
+        with patch(
+            "jupyter_export_html_style.exporters.webpdf.weasyprint_pdf", fake_weasyprint_pdf
+        ):
+            exporter.from_notebook_node(new_notebook(cells=cells))
+
+    assert printed[0].count(png) == 3
+    assert "data-styled-image-ref" not in printed[0]
+    assert "deduplicate_images needs JavaScript" in caplog.text
+
+
+def test_styled_webpdf_weasyprint_engine_raises_without_weasyprint():
+    """Test that the weasyprint engine reports how to install WeasyPrint."""
+    if WEASYPRINT_AVAILABLE:
+        pytest.skip("WeasyPrint is installed, test not applicable")
+
+    exporter = StyledWebPDFExporter(pdf_engine="weasyprint")
+    with pytest.raises(RuntimeError, match="WeasyPrint is not installed"):
+        exporter.run_weasyprint("<html><body>Test</body></html>")